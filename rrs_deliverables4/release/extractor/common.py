@@ -20,6 +20,9 @@ import hashlib
 # // re.sub()
 import re
 
+# // maketrans()
+import string
+
 # // listdir()
 import os
 
@@ -34,6 +37,17 @@ from cStringIO import StringIO
 # default timeout for web related operations
 DEFAULT_TIMEOUT=30
 
+# translation of white characters to spaces and expressions of normalize()
+WHITE_SPACES = string.maketrans("\t\n\r\f\v", "     ")
+WHITE_SPACES_UNICODE = dict((ord(c), u" ") for c in "\t\n\r\f\v")
+RE_DOTS_DASHES = re.compile(r'\.\s*\.\s*\.\s*[\.\s*]+|-\s*-\s*-\s*[-\s*]+')
+RE_ENCODED_EOLS = re.compile(r'\\[ntr]')
+RE_XML_TAGS = re.compile(r'<[^>]+>')
+RE_ENCODED_XML_TAGS = re.compile(r'&lt;[^&]+&gt;')
+RE_HTML_ENTITIES = re.compile(r'&[^ ]+;')
+RE_SPACES = re.compile(r'  +')
+RE_SPLITTED_WORDS = re.compile(r'(\w)- (\w)')
+
 def info(aText):
     print "Info: %s" % str(aText)
 
@@ -214,24 +228,41 @@ def pdf2txt(path):
         return None
 
 def normalize(txt):
+    '''
+    Normalizes text of a deliverable to one line without markup. Expressions
+    are precompiled and passes of characters not present in the text are
+    skipped.
+    '''
+
     if txt == None:
         return None
 
+    # white characters to spaces (after this, spaces are the only white
+    # characters in text)
+    if isinstance(txt, unicode):
+        txt = txt.translate(WHITE_SPACES_UNICODE)
+    else:
+        txt = txt.translate(WHITE_SPACES)
     # remove sequences of dots and dashes
-    txt = re.sub(r'\s|\.\s*\.\s*\.\s*[\.\s*]+|-\s*-\s*-\s*[-\s*]+', " ", txt)
+    txt = RE_DOTS_DASHES.sub(" ", txt)
     # remove encoded EOLs and tabs
-    txt = re.sub(r'\\[ntr]', " ", txt)
+    if "\\" in txt:
+        txt = RE_ENCODED_EOLS.sub(" ", txt)
     # remove xml tags
-    txt = re.sub(r'<[^>]+>', "", txt)
-    # remove endcoded xml tags
-    txt = re.sub(r'&lt;[^&]+&gt;', "", txt)
-    # remove html entities
-    txt = re.sub(r'&[^ ]+;', " ", txt)
+    if "<" in txt:
+        txt = RE_XML_TAGS.sub("", txt)
+    if "&" in txt:
+        # remove endcoded xml tags
+        if "&lt;" in txt:
+            txt = RE_ENCODED_XML_TAGS.sub("", txt)
+        # remove html entities
+        txt = RE_HTML_ENTITIES.sub(" ", txt)
     #txt = re.sub(r'\\u(..)(..)', lambda match: (chr(int(match.group(2), 16))+chr(int(match.group(1), 16))).decode("utf-16le"), txt)
     # remove sequences of spaces
-    txt = re.sub(r'\s+', " ", txt)
+    txt = RE_SPACES.sub(" ", txt)
     # join splitted words
-    txt = re.sub(r'(\w)- (\w)', r'\1\2', txt)
+    if "- " in txt:
+        txt = RE_SPLITTED_WORDS.sub(r'\1\2', txt)
 
     return txt
 
@@ -1,6 +1,7 @@
 #!/usr/bin/env python
 import sys, re
 from gethtmlandparse import GetHTMLAndParse
+from rrslib.web.urltools import URLSeenSet, url_key
 import deliverrno as derrno
 
 class GetDelivPage:
@@ -26,6 +27,12 @@ class GetDelivPage:
         index = 0, noindex = 1, frame = 2, unvisited = 0, visited = 1 """
         self._link_stack = { url : [0,0,0] }
 
+        # url_key -> link in self._link_stack, spellings of one page
+        # ("/a", "/a#top", "HTTP://Host/a") are stacked only once, the link
+        # is fetched as it was found ("/a/" is kept, its relative links are
+        # resolved differently)
+        self._link_keys = { url_key(url) or url : url }
+
         self.base_url = url # save base (input) url
 
         # Open an parsing agent to get needed data from page
@@ -75,11 +82,19 @@ class GetDelivPage:
     """ Initialize item in dictionary to noindex/unvisited/rank=0 """
     def _link_item_init__(self, link, index=1, visit=0, rank=0):
         # default setting: noindex,unvisited,norank
-        if not self._link_stack.has_key(link):
+        key = url_key(link) or link
+        if not self._link_keys.has_key(key):
            self._link_stack[link] = [index,visit,rank]
+           self._link_keys[key] = link
         return
 
 
+    """ Returns the link under which the page is saved in self._link_stack
+    (or None if the page is not there) """
+    def _stacked_link(self, link):
+        return self._link_keys.get(url_key(link) or link)
+
+
     """ Edits item in dictionary self._link_stack """
     def _link_item_edit(self, link, index=None, visit=None, rank=None):
         if index is not None:
@@ -127,9 +142,10 @@ class GetDelivPage:
                     link = re.sub('#.*$', '', link)
                 if len(link) > 200:  
                     continue                
-                if self._link_stack.get(link):
+                stacked = self._stacked_link(link)
+                if stacked:
                     # RANK if you see those links for first
-                    if self._link_stack[link][self.VISIT] == 0:
+                    if self._link_stack[stacked][self.VISIT] == 0:
                         self._link_item_edit(self._current_url, rank=rank)
                     continue
                 if not self.agent.compare_domains(self.base_url, link):
@@ -350,6 +366,8 @@ class GetDelivPage:
     def _get_deliv_link_list(self,first_link):
         # agent gets first_link
         final_list = []
+        # pager links are repeated on every page
+        seen = URLSeenSet([first_link])
         nonvisited = [first_link]
         current = nonvisited.pop()
         while current:
@@ -366,7 +384,8 @@ class GetDelivPage:
                     break
                 continue
 
-            nonvisited.extend(self.agent.get_pager_links(base=current))
+            nonvisited.extend(link for link in self.agent.get_pager_links(base=current)
+                              if seen.add(link))
             final_list.append(current) # append only one link
             try:
                 current = nonvisited.pop()
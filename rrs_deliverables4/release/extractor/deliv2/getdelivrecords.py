@@ -21,10 +21,11 @@ from rrslib.web.mime import MIMEHandler
 from rrslib.web.crawler import Crawler
 from rrslib.xml.xmlconverter import Model2XMLConverter
 from rrslib.db.model import RRSPublication,RRSUrl,RRSRelationshipPublicationUrl,RRSPublication_type
+from rrslib.web.entities import TextFormatUtils
 from urlparse import urlsplit
 from lxml import etree
-import string, textwrap
-import lxml, unicodedata, htmlentitydefs
+import string
+import lxml
 from gethtmlandparse import GetHTMLAndParse
 from collections import deque
 from delivdbglib import DeliverableDebugger
@@ -34,89 +35,6 @@ import re
 import string as s
 import StringIO
 
-
-""" Decode HTML entities to text """
-class HtmlEntityDecoder:
-
-    def __init__(self):
-        # pattern to recognize html entity
-        self.pattern = re.compile(r'&(#?)(x?)(\w+);')
-        # dictionary translating usual entities
-        self.name2text = {'apos': '\'', 'nbsp': ' ', 'mdash': '-', 'ndash': '-',
-                          'ldquo': '\"', 'rdquo': '\"', 'lsquo': '\'',
-                          'rsquo': '\'', 'lsaquo': '<', 'rsaquo': '>'}
-
-
-    """ Get the entity and return character or unicode """
-    def _substitute_entity(self, match):
-        entity_name = match.group(3)
-        try:
-            entdef = self.name2text.get(entity_name)
-        except:
-            entdef = htmlentitydefs.entitydefs.get(entity_name)
-        return entdef
-
-
-    """ Returns string with decoded entities"""
-    def decode_htmlentities(self, string):
-        dec_string = self.pattern.sub(self._substitute_entity, string)
-        return dec_string
-
-# End of class HtmlEntityDecoder
-
-
-""" Utility for encoding and formatting text """
-class TextFormatUtils:
-
-    def __init__(self):
-        # init wrapper
-        self.wrapper = textwrap.TextWrapper(width=500, expand_tabs=False)
-
-        # init entity decoder
-        self.hed = HtmlEntityDecoder()
-
-        # charset (iso-8859-2, cp1250 etc.)
-        self.charset = None
-
-    """ Charset initializer """
-    def set_charset(self, chs):
-        self.charset = chs
-
-    """ Get formatter charset """
-    def get_charset(self):
-        return self.charset
-
-
-    """ Main method formats the string:
-     delete white characters (\t,\n etc),
-     encode the string to utf-8 and return useful text. """
-    def format(self, data):
-        # endcode
-        encode_flag = False
-        for chset in (self.charset, 'iso-8859-2', 'cp1250', 'iso-8859-1'):
-            try:
-                data = data.decode(chset).encode('utf-8')
-                encode_flag = True
-                break
-            except:
-                continue
-        if encode_flag:
-            data = unicode(data, 'utf-8')
-            data = unicodedata.normalize('NFKD', data)
-        # decode html entities
-        data = self.hed.decode_htmlentities(data)
-        # delete white characters
-        try:
-            wrapped_array = self.wrapper.wrap(data)
-            data = ''.join(wrapped_array)
-        except:
-            pass
-        # delete spaces
-        data = re.sub('[ ]+', ' ', data)
-        return data.lstrip(' ').rstrip(' ')
-
-# End of class TextFormatUtils
-
 "Search region with deliverables. Only used when processing"
 class GetDeliverableRegion:
 
@@ -6,12 +6,18 @@ from urlparse import urlsplit
 from urlparse import urlparse
 from rrslib.web.crawler import GetHTMLPage
 from rrslib.web.mime import MIMEHandler
+from rrslib.web.urltools import same_host, unique_urls, url_key
+from rrslib.others.pattern import LRUCache
 import socket
 import urllib2
 
 # socket module settings
 socket.setdefaulttimeout(15)
 
+# MIME types of already checked links (shared by all agents, the same files
+# are linked from many pages of the project site)
+_content_types = LRUCache(maxsize=10000, ttl=3600)
+
 
 class GetHTMLAndParse:
 
@@ -88,6 +94,10 @@ class GetHTMLAndParse:
         # returns MIME type of current page in GHAP if parameter url is None
         if url == None:
             return False
+        key = url_key(url) or url
+        ctype = _content_types.get(key)
+        if ctype is not None:
+            return ctype
         res = self.mime_handler.start([url])
      
 
@@ -95,16 +105,16 @@ class GetHTMLAndParse:
             print "Chyba pri zistovani mime"
             return False
         else:
+            if res[url]:
+                _content_types[key] = res[url]
             return res[url]
 
 
 
         """ Compare two domain names from their URLs"""
     def compare_domains(self, right, left):
-        rsplit = urlsplit(right)
-        lsplit = urlsplit(left)
-        # now we have two tuples of parsed URLs
-        if re.match("(wiki\.|www\.)?" + rsplit[1], lsplit[1], re.I):
+        # hosts are compared without "www." and "wiki." prefixes
+        if same_host(right, left):
             return 1
         else:
             return 0
@@ -142,7 +152,7 @@ class GetHTMLAndParse:
                     final.append(link.get('href')) # get URL
             else:
                 final.append(link.get('href'))
-        return list(set(final)) # my little uniq
+        return self._uniq_links(final, base)
 
 
     """ Helper method for searching pagers """
@@ -158,7 +168,15 @@ class GetHTMLAndParse:
             # search pager pattern
             if re.search('(^ ?[0-9]+ ?$)|(next)', text, re.I):
                 final.append(link.get('href')) # get URL
-        return list(set(final)) # my little uniq
+        return self._uniq_links(final, base)
+
+
+    """ Removes duplicate links. Spellings of one absolute URL (fragments,
+    case of host etc.) are returned once, in the first spelling. """
+    def _uniq_links(self, links, base=None):
+        if base is None:
+            return list(set(links)) # my little uniq
+        return unique_urls(links)
 
 
     """ Get, filter and count header titles on one page """
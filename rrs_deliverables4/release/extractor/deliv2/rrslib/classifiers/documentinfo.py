@@ -18,7 +18,8 @@ __date__ = "$9-September-2010 18:21:10$"
 #Imports
 ################################################################################
 from rrslib.dictionaries.rrsdictionary import EVENT_ACRONYMS, CASE_SENSITIVE, \
-    RRSDictionary, RET_ORIG_TERM
+    RET_ORIG_TERM
+from rrslib.dictionaries.rrsregistry import get_dictionary
 import commands
 import re
 import sys
@@ -133,7 +134,7 @@ class DocumentInfo(object):
                        re.DOTALL)
 
 
-        self.rrsdict_events = RRSDictionary(EVENT_ACRONYMS, CASE_SENSITIVE)
+        self.rrsdict_events = get_dictionary(EVENT_ACRONYMS, CASE_SENSITIVE)
 
 
     def _find_events(self, text):
@@ -17,6 +17,7 @@ import os
 import subprocess
 import tempfile
 from rrslib.dictionaries.rrsdictionary import *
+from rrslib.dictionaries.rrsregistry import get_dictionary
 
 # ------------------------------------------------------------------------------
 # TESTING:
@@ -44,7 +45,7 @@ class PDF2TextCredibility(object):
        if wppc == 0:
            raise AttributeError("Word per page count cannot be zero.")
        self.info = {}
-       self.bnc_dict = RRSDictionary("bnc_unlemmatised2frequency", CASE_INSENSITIVE)
+       self.bnc_dict = get_dictionary(BNC_UNLEMMATISED, CASE_INSENSITIVE)
        self.splitted = []
        self.wppc = wppc
 
@@ -64,14 +65,11 @@ class PDF2TextCredibility(object):
 
 
     def _check_words(self):
-        self.ok = 0
-        self.bad = 0
         #print self.cleaned
-        for word in self.cleaned:
-            if self.bnc_dict.contains_key(word):
-                self.ok +=1
-            else:
-                self.bad += 1
+        # all words are looked up in one batch
+        flags = self.bnc_dict.contains_many(self.cleaned)
+        self.ok = sum(flags)
+        self.bad = len(self.cleaned) - self.ok
 
 
     def _calculate_credibility(self):
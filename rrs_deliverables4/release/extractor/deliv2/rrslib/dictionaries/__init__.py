@@ -10,9 +10,26 @@ out of the API frame is forbidden.
 The rrslib-dictionary has mostly this architecture:
  * dict.info - XML information file containing dictionary metadata
  * keys.rrsdict - pickled list of keys
- * keys_compiled.rrsdict - compiled keys in regular expression
+ * keys_compiled.rrsdict - compiled keys in regular expression (not used
+   anymore, texts are searched by automaton, see rrsmatcher.py)
  * values.rrsdict - pickled list of values
  * translate_*.rrsdict - alphabecital list of pickled python-dicts {key:[values]}
+ * dict.rrsbin - binary form of all the above, searched in place via mmap
+   (see rrsbinary.py), including index for prefix and fuzzy search of keys
+   (see rrskeyindex.py)
+
+Frequency dictionaries (key -> number) have compact binary form freq.rrsbin
+(see rrsfrequency.py).
+
+Load time, memory and lookup throughput of dictionaries are measured by
+rrsbenchmark.py.
+
+Components of the process share dictionaries through registry (see
+rrsregistry.py), dictionaries used together are precomputed as merged_*
+dictionaries, groups of dictionaries whose keys are classified together as
+classes_* indexes (key -> bitmask of groups).
 """
 
-__all__ = ['rrsdictionary']
\ No newline at end of file
+__all__ = ['rrsdictionary', 'rrsdictcreator', 'rrsbinary', 'rrsmatcher',
+           'rrsregistry', 'rrstranslation', 'rrsfrequency',
+           'rrskeyindex', 'rrsbenchmark']
\ No newline at end of file
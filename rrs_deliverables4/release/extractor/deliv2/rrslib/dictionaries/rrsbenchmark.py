@@ -0,0 +1,279 @@
+#!/usr/bin/env python
+
+"""
+Module rrsbenchmark measures load time, memory and lookup throughput of rrslib
+dictionaries, so that changes of dictionary formats (pickled files, binary
+file, indexes) can be compared.
+
+For every dictionary (all shipped dictionaries by default) it measures:
+ * cold load - the dictionary is loaded in a new process: time of creating
+   RRSDictionary, time of the first lookups (lazy loading of keys, indexes
+   and translations) and of preload(), RSS of the process after each step,
+ * warm load - the same dictionary loaded again in the same process (files
+   are in page cache, binary file is already mapped),
+ * throughput of contains_key(), contains_many(), translate() and
+   text_search() on synthetic workload (keys of the dictionary sampled with
+   fixed seed, half of them changed so they are not in the dictionary) and
+   on real text (file given by --text, or built-in sample of deliverable
+   text).
+
+Every dictionary is measured in its own process, so the results don't depend
+on dictionaries measured before. Results are written as JSON:
+    python rrsbenchmark.py [--output results.json] [--text file.txt]
+                           [--sensitivity 0|1|2] [--size N] [--seed N]
+                           [--repeat N] [dictionary ...]
+"""
+
+__modulename__ = "rrsbenchmark"
+__date__ = "$19.10.2026 23:12:40$"
+
+import json
+import os
+import platform
+import random
+import subprocess
+import sys
+import time
+from optparse import OptionParser
+
+from rrslib.dictionaries.rrsbinary import BINARY_FILE
+from rrslib.dictionaries.rrsdictionary import CASE_SENSITIVE, RET_DICT_TERM, \
+                                              RRSDictionary
+from rrslib.dictionaries.rrsregistry import DICTIONARY_DIR, _rss
+
+# default count of synthetic probes
+SIZE = 20000
+SEED = 42
+REPEAT = 3
+
+SAMPLE_TEXT = """\
+Deliverable D2.1 - Requirements analysis and system architecture
+
+This deliverable was prepared by John Smith (University of Cambridge, United
+Kingdom), Jana Novakova and Petr Svoboda (Brno University of Technology, Czech
+Republic) and Maria Garcia (Universidad Politecnica de Madrid, Spain) within
+the project funded by the European Commission under the Seventh Framework
+Programme. The consortium meeting took place in Brussels, Belgium, on 12 March
+2010, the next one will be held in Prague and Vienna.
+
+The work package analyses requirements of partners from Germany, France,
+Italy and the Netherlands. Results were presented at the International
+Conference on Information Systems in Paris and at the workshop in Berlin.
+Dr. Thomas Mueller from the Fraunhofer Institute in Munich coordinates the
+evaluation, Prof. Anna Kowalska from Warsaw University of Technology the
+dissemination activities. Contact: Jan Dvorak, Faculty of Information
+Technology, Bozetechova 2, 612 66 Brno.
+"""
+
+
+def shipped_dictionaries():
+    """
+    Returns sorted list of names of dictionaries in the dictionary directory.
+    """
+    names = []
+    for name in os.listdir(DICTIONARY_DIR):
+        if os.path.isfile(os.path.join(DICTIONARY_DIR, name, "dict.info")):
+            names.append(name)
+    names.sort()
+    return names
+
+
+def _disk_size(name):
+    path = os.path.join(DICTIONARY_DIR, name)
+    return sum(os.path.getsize(os.path.join(path, f)) for f in os.listdir(path))
+
+
+def synthetic_workload(keys, size=SIZE, seed=SEED):
+    """
+    Returns list of size probes: keys sampled from keys (every second one
+    in upper case) and the same count of changed keys, which are mostly not
+    in the dictionary. The same seed gives the same probes.
+    """
+    rnd = random.Random(seed)
+    if not keys:
+        return []
+    hits = [keys[rnd.randrange(len(keys))] for _ in xrange(size // 2)]
+    probes = []
+    for i, k in enumerate(hits):
+        if i % 2:
+            probes.append(k.upper())
+        else:
+            probes.append(k)
+        pos = rnd.randrange(len(k) + 1)
+        probes.append(k[:pos] + rnd.choice("qxzj") + k[pos:])
+    rnd.shuffle(probes)
+    return probes
+
+
+def _throughput(fnc, count, repeat):
+    """
+    Returns operations per second of the best of repeat runs of fnc, which
+    performs count operations.
+    """
+    best = None
+    for _ in xrange(repeat):
+        start = time.time()
+        fnc()
+        t = time.time() - start
+        if best is None or t < best:
+            best = t
+    if not count:
+        return None
+    return count / max(best, 1e-9)
+
+
+def benchmark_dictionary(name, sensitivity=CASE_SENSITIVE, text=SAMPLE_TEXT,
+                         size=SIZE, seed=SEED, repeat=REPEAT):
+    """
+    Measures one dictionary in the current process (see module
+    documentation). Returns dictionary of results, times are in seconds,
+    memory in bytes, throughput in operations (text_search: characters) per
+    second.
+    """
+    result = {'name': name, 'sensitivity': sensitivity,
+              'format': os.path.isfile(os.path.join(DICTIONARY_DIR, name, BINARY_FILE))
+                        and "binary" or "pickled",
+              'disk_size': _disk_size(name)}
+    rss = _rss()
+
+    # cold load
+    start = time.time()
+    d = RRSDictionary(name, sensitivity)
+    result['load_seconds'] = time.time() - start
+    result['rss_load'] = _rss() - rss
+    start = time.time()
+    d.contains_key("the")
+    found = d.text_search(text, ret=RET_DICT_TERM)
+    if d.get_type() == "dict" and found:
+        d.translate(found[0])
+    result['first_lookup_seconds'] = time.time() - start
+    start = time.time()
+    d.preload()
+    result['preload_seconds'] = time.time() - start
+    result['rss_preload'] = _rss() - rss
+
+    # warm load
+    start = time.time()
+    warm = RRSDictionary(name, sensitivity)
+    warm.preload()
+    result['warm_load_seconds'] = time.time() - start
+    del warm
+
+    # throughput
+    keys = list(d.get_keys())
+    probes = synthetic_workload(keys, size, seed)
+    result['keys'] = len(keys)
+    result['probes'] = len(probes)
+    result['hits'] = sum(d.contains_many(probes))
+    result['contains_key'] = _throughput(lambda: [d.contains_key(p) for p in probes],
+                                         len(probes), repeat)
+    result['contains_many'] = _throughput(lambda: d.contains_many(probes),
+                                          len(probes), repeat)
+    if d.get_type() == "dict":
+        found = [p for p, f in zip(probes, d.contains_many(probes)) if f]
+        result['translate'] = _throughput(lambda: [d.translate(p) for p in found],
+                                          len(found), repeat)
+    else:
+        result['translate'] = None
+    synthetic = " ".join(probes)
+    result['text_search_synthetic'] = _throughput(lambda: d.text_search(synthetic),
+                                                  len(synthetic), repeat)
+    result['text_search_text'] = _throughput(lambda: d.text_search(text),
+                                             len(text), repeat)
+    result['text_matches'] = len(d.text_search(text))
+    result['rss_total'] = _rss() - rss
+    return result
+
+
+def run(names, sensitivity=CASE_SENSITIVE, text_file=None, size=SIZE,
+        seed=SEED, repeat=REPEAT):
+    """
+    Measures dictionaries, each in new process. Returns document with
+    environment and list of results (see benchmark_dictionary()).
+    Dictionaries which fail are reported with key 'error'.
+    """
+    env = dict(os.environ)
+    root = os.path.dirname(os.path.dirname(DICTIONARY_DIR))
+    env['PYTHONPATH'] = os.pathsep.join(filter(None, [root, env.get('PYTHONPATH')]))
+    results = []
+    for name in names:
+        cmd = [sys.executable, os.path.abspath(__file__), "--worker",
+               "--sensitivity", str(sensitivity), "--size", str(size),
+               "--seed", str(seed), "--repeat", str(repeat)]
+        if text_file is not None:
+            cmd += ["--text", text_file]
+        cmd.append(name)
+        proc = subprocess.Popen(cmd, stdout=subprocess.PIPE,
+                                stderr=subprocess.PIPE, env=env)
+        out, err = proc.communicate()
+        if proc.returncode != 0:
+            lines = err.strip().splitlines()
+            results.append({'name': name, 'sensitivity': sensitivity,
+                            'error': lines and lines[-1] or "exit code %d" % proc.returncode})
+            continue
+        results.append(json.loads(out))
+    return {'environment': {'python': platform.python_version(),
+                            'platform': platform.platform(),
+                            'time': time.strftime("%Y-%m-%dT%H:%M:%S"),
+                            'sensitivity': sensitivity, 'size': size,
+                            'seed': seed, 'repeat': repeat,
+                            'text': text_file or "built-in sample"},
+            'results': results}
+
+
+def _print_summary(document, f):
+    f.write("%-30s %-7s %8s %8s %8s %8s %10s %10s %10s %10s\n" %
+            ("dictionary", "format", "load ms", "first ms", "warm ms", "rss MB",
+             "contains/s", "batch/s", "transl/s", "search c/s"))
+    for r in document['results']:
+        if 'error' in r:
+            f.write("%-30s error: %s\n" % (r['name'], r['error']))
+            continue
+        fmt = lambda v: v is None and "-" or "%d" % v
+        f.write("%-30s %-7s %8.1f %8.1f %8.1f %8.1f %10s %10s %10s %10s\n" %
+                (r['name'], r['format'], 1000 * r['load_seconds'],
+                 1000 * r['first_lookup_seconds'], 1000 * r['warm_load_seconds'],
+                 r['rss_preload'] / 1048576.0, fmt(r['contains_key']),
+                 fmt(r['contains_many']), fmt(r['translate']),
+                 fmt(r['text_search_text'])))
+
+
+if __name__ == "__main__":
+    parser = OptionParser(usage="%prog [options] [dictionary ...]")
+    parser.add_option("-o", "--output", dest="output",
+                      help="write JSON results into file (default stdout)")
+    parser.add_option("-t", "--text", dest="text",
+                      help="file with real text for text_search() workload")
+    parser.add_option("-s", "--sensitivity", dest="sensitivity", type="int",
+                      default=CASE_SENSITIVE, help="sensitivity of dictionaries")
+    parser.add_option("--size", dest="size", type="int", default=SIZE,
+                      help="count of synthetic probes")
+    parser.add_option("--seed", dest="seed", type="int", default=SEED,
+                      help="seed of synthetic workload")
+    parser.add_option("--repeat", dest="repeat", type="int", default=REPEAT,
+                      help="runs of every measurement (the best is taken)")
+    parser.add_option("--worker", dest="worker", action="store_true",
+                      help="measure one dictionary in this process")
+    (options, args) = parser.parse_args()
+
+    if options.worker:
+        text = SAMPLE_TEXT
+        if options.text:
+            f = open(options.text)
+            text = f.read()
+            f.close()
+        result = benchmark_dictionary(args[0], options.sensitivity, text,
+                                      options.size, options.seed, options.repeat)
+        sys.stdout.write(json.dumps(result))
+        sys.exit(0)
+
+    document = run(args or shipped_dictionaries(), options.sensitivity,
+                   options.text, options.size, options.seed, options.repeat)
+    _print_summary(document, sys.stderr)
+    if options.output:
+        f = open(options.output, "w")
+        json.dump(document, f, indent=1, sort_keys=True)
+        f.close()
+    else:
+        json.dump(document, sys.stdout, indent=1, sort_keys=True)
+        sys.stdout.write("\n")
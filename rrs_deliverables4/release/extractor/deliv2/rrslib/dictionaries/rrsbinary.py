@@ -0,0 +1,768 @@
+#!/usr/bin/env python
+
+"""
+Module rrsbinary implements binary format of rrslib dictionaries, which is
+searched in place through mmap instead of being unpickled into python lists
+and dicts.
+
+The file (dict.rrsbin in the directory of the dictionary) consists of header
+and named sections:
+
+ * header: magic "RRSBIN01", uint32 version, uint32 count of sections and for
+   every section its name (16 bytes), offset and length (uint64),
+ * keys.offsets, keys.data - sorted table of keys: keys are concatenated in
+   keys.data, key i is keys.data[offsets[i]:offsets[i+1]],
+ * values.offsets, values.data - sorted table of values (dict type only),
+ * translate.index, translate.values - values of key i are values with
+   indexes translate.values[index[i]:index[i+1]] (dict type only),
+ * sublists.index, sublists.values - nested lists of values (e.g.
+   ['23785', 'n', ['12606', 'v']]), only if there are some: index with bit
+   SUBLIST set in translate.values or sublists.values refers to the nested
+   list j = index & ~SUBLIST, whose items are sublists.values[index[j]:
+   index[j+1]],
+ * keys.hash, keys.foldhash - open addressing hash tables (linear probing,
+   power-of-two size, crc32 of the key) of key indexes + 1 (0 is empty slot).
+   keys.hash is keyed by exact keys, keys.foldhash by case-folded keys (see
+   fold_case()); for keys differing only in case, the first of them in the
+   sorted table is stored.
+
+All integers are little-endian uint32 unless said otherwise. Strings are
+stored as they were given to the writer (unicode is encoded to utf-8) and
+returned as byte strings, the same way as pickled dictionaries return them.
+Tables are sorted bytewise, which is also the order of python's sort() of
+byte strings.
+
+Files are written by BinaryWriter section by section, so large dictionaries
+(see RRSDictionaryCreator) don't have to be kept in memory while writing.
+
+Opened file is shared by all instances in the process and, thanks to the page
+cache, by all processes using the dictionary.
+"""
+
+__modulename__ = "rrsbinary"
+__date__ = "$19.10.2026 16:02:12$"
+
+import array
+import mmap
+import os
+import shutil
+import struct
+import sys
+import tempfile
+import threading
+import zlib
+
+MAGIC = "RRSBIN01"
+# version 2 added nested lists of values
+VERSION = 2
+BINARY_FILE = "dict.rrsbin"
+
+_header = struct.Struct("<8sII")
+_section = struct.Struct("<16sQQ")
+_uint = struct.Struct("<I")
+_ALIGN = 8
+
+SUBLIST = 0x80000000
+
+HASH_SECTION = "keys.hash"
+FOLD_HASH_SECTION = "keys.foldhash"
+
+
+class RRSBinaryError(Exception):
+    pass
+
+#-------------------------------------------------------------------------------
+# End of class RRSBinaryError
+#-------------------------------------------------------------------------------
+
+
+def _encode(s):
+    if isinstance(s, unicode):
+        return s.encode('utf-8')
+    return s
+
+
+def iter_strings(values):
+    """
+    Yields strings of list of values (utf-8 encoded), strings of nested lists
+    included.
+    """
+    for v in values:
+        if isinstance(v, list):
+            for s in iter_strings(v):
+                yield s
+        else:
+            yield _encode(v)
+
+
+def fold_case(s):
+    """
+    Returns case-folded form of the string as utf-8 byte string. Byte strings
+    are decoded from utf-8 (invalid bytes are replaced) as RRSDictionary
+    always did.
+    """
+    if isinstance(s, str):
+        s = unicode(s, errors="replace", encoding="utf-8")
+    return s.lower().encode("utf-8")
+
+
+def _hash(s):
+    return zlib.crc32(s) & 0xffffffff
+
+
+def _new_uint_array(values=()):
+    a = array.array('I', values)
+    if a.itemsize != 4:
+        # array.array('I') has 4 bytes on all platforms we run on, but to be
+        # sure..
+        a = array.array('L', values)
+    return a
+
+
+def _uint_array(values):
+    a = _new_uint_array(values)
+    if sys.byteorder != 'little':
+        a.byteswap()
+    return a.tostring()
+
+
+def _hash_table(strings, fold=False):
+    """
+    Returns hash table (uint32 array) of sequence of strings: slot contains
+    index of the string + 1, or 0. If fold is True, strings are folded (see
+    fold_case()). Equal strings are stored only once (the first one).
+    """
+    size = 8
+    while size < 2 * len(strings):
+        size *= 2
+    mask = size - 1
+    slots = _new_uint_array([0]) * size
+    for i, s in enumerate(strings):
+        if fold:
+            s = fold_case(s)
+        pos = _hash(s) & mask
+        while slots[pos]:
+            other = strings[slots[pos] - 1]
+            if fold:
+                other = fold_case(other)
+            if other == s:
+                break
+            pos = (pos + 1) & mask
+        else:
+            slots[pos] = i + 1
+    return slots
+
+
+class StringTable(object):
+    """
+    Read-only sorted sequence of strings stored in a buffer (mmap). Supports
+    len(), indexing and iteration, so it can be used wherever sorted list of
+    keys was used. Method find() searches the table by bisection comparing
+    raw bytes, nothing is decoded or copied except the probed strings.
+    """
+    def __init__(self, buf, offsets_pos, offsets_len, data_pos):
+        self._buf = buf
+        self._opos = offsets_pos
+        self._dpos = data_pos
+        self._len = offsets_len // 4 - 1 if offsets_len else 0
+
+
+    def __len__(self):
+        return self._len
+
+
+    def __getitem__(self, i):
+        if isinstance(i, slice):
+            return [self[j] for j in xrange(*i.indices(self._len))]
+        if i < 0:
+            i += self._len
+        if not 0 <= i < self._len:
+            raise IndexError("StringTable index out of range")
+        start, end = struct.unpack_from("<II", self._buf, self._opos + 4 * i)
+        return self._buf[self._dpos + start:self._dpos + end]
+
+
+    def __iter__(self):
+        buf, dpos = self._buf, self._dpos
+        unpack = _uint.unpack_from
+        opos = self._opos
+        start = unpack(buf, opos)[0]
+        for i in xrange(1, self._len + 1):
+            end = unpack(buf, opos + 4 * i)[0]
+            yield buf[dpos + start:dpos + end]
+            start = end
+
+
+    def __contains__(self, s):
+        return self.find(s) >= 0
+
+
+    def bisect_left(self, s):
+        """
+        Returns index where string s would be inserted to keep the table
+        sorted.
+        """
+        s = _encode(s)
+        lo, hi = 0, self._len
+        while lo < hi:
+            mid = (lo + hi) // 2
+            if self[mid] < s:
+                lo = mid + 1
+            else:
+                hi = mid
+        return lo
+
+
+    def find(self, s):
+        """
+        Returns index of string s in the table or -1.
+        """
+        s = _encode(s)
+        i = self.bisect_left(s)
+        if i < self._len and self[i] == s:
+            return i
+        return -1
+
+#-------------------------------------------------------------------------------
+# End of class StringTable
+#-------------------------------------------------------------------------------
+
+
+class UIntArray(object):
+    """
+    Read-only array of uint32 stored in a buffer (mmap).
+    """
+    def __init__(self, buf, pos, length):
+        self._buf = buf
+        self._pos = pos
+        self._len = length // 4
+
+
+    def __len__(self):
+        return self._len
+
+
+    def __getitem__(self, i):
+        if isinstance(i, slice):
+            return [self[j] for j in xrange(*i.indices(self._len))]
+        if i < 0:
+            i += self._len
+        if not 0 <= i < self._len:
+            raise IndexError("UIntArray index out of range")
+        return _uint.unpack_from(self._buf, self._pos + 4 * i)[0]
+
+
+    def __iter__(self):
+        for start in xrange(0, self._len, 4096):
+            count = min(4096, self._len - start)
+            for n in struct.unpack_from("<%dI" % count, self._buf, self._pos + 4 * start):
+                yield n
+
+#-------------------------------------------------------------------------------
+# End of class UIntArray
+#-------------------------------------------------------------------------------
+
+
+class BinaryDictionary(object):
+    """
+    Dictionary stored in binary format (see module documentation) opened via
+    mmap. Use function open_binary() to get the instance shared in the
+    process. If use_mmap is False, the file is read into memory instead.
+    """
+    def __init__(self, path, use_mmap=True):
+        self.path = path
+        self.use_mmap = use_mmap
+        f = open(path, "rb")
+        try:
+            if use_mmap:
+                self._buf = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+            else:
+                self._buf = f.read()
+        finally:
+            f.close()
+        magic, version, nsect = _header.unpack_from(self._buf, 0)
+        if magic != MAGIC:
+            raise RRSBinaryError("%s is not rrslib binary dictionary." % path)
+        if version > VERSION:
+            raise RRSBinaryError("%s has unsupported version %d." % (path, version))
+        self.sections = {}
+        pos = _header.size
+        for _ in xrange(nsect):
+            name, offset, length = _section.unpack_from(self._buf, pos)
+            self.sections[name.rstrip("\0")] = (offset, length)
+            pos += _section.size
+        self.keys = self.string_table("keys")
+        if "values.offsets" in self.sections:
+            self.values = self.string_table("values")
+        else:
+            self.values = None
+
+
+    def has_section(self, name):
+        return name in self.sections
+
+
+    def section(self, name):
+        """
+        Returns (offset, length) of the section in the buffer.
+        """
+        try:
+            return self.sections[name]
+        except KeyError:
+            raise RRSBinaryError("Dictionary %s has no section %s." % (self.path, name))
+
+
+    def get_buffer(self):
+        return self._buf
+
+
+    def string_table(self, name):
+        """
+        Returns StringTable stored in sections name.offsets and name.data.
+        """
+        opos, olen = self.section(name + ".offsets")
+        dpos = self.section(name + ".data")[0]
+        return StringTable(self._buf, opos, olen, dpos)
+
+
+    def uint_array(self, name):
+        """
+        Returns uint32 array stored in the section: UIntArray over the mapped
+        file, or array.array copied into memory if the file isn't mapped.
+        """
+        pos, length = self.section(name)
+        if self.use_mmap:
+            return UIntArray(self._buf, pos, length)
+        a = _new_uint_array()
+        a.fromstring(self._buf[pos:pos + length])
+        if sys.byteorder != 'little':
+            a.byteswap()
+        return a
+
+
+    def get_translation(self, index):
+        """
+        Returns list of values of the key with given index.
+        """
+        ipos = self.section("translate.index")[0]
+        vpos = self.section("translate.values")[0]
+        start, end = struct.unpack_from("<II", self._buf, ipos + 4 * index)
+        if start == end:
+            return []
+        ids = struct.unpack_from("<%dI" % (end - start), self._buf, vpos + 4 * start)
+        values = self.values
+        if "sublists.index" not in self.sections:
+            return [values[i] for i in ids]
+        return self._get_values(ids)
+
+
+    def _get_values(self, ids):
+        # values of ids with nested lists (see module documentation)
+        result = []
+        for i in ids:
+            if i & SUBLIST:
+                ipos = self.section("sublists.index")[0]
+                vpos = self.section("sublists.values")[0]
+                start, end = struct.unpack_from("<II", self._buf,
+                                                ipos + 4 * (i & ~SUBLIST))
+                result.append(self._get_values(struct.unpack_from(
+                    "<%dI" % (end - start), self._buf, vpos + 4 * start)))
+            else:
+                result.append(self.values[i])
+        return result
+
+
+    def find_key(self, key, fold=False):
+        """
+        Returns index of the key or -1 if there's no such key. If fold is
+        True, keys are compared case-insensitively (see fold_case()). Keys
+        are looked up in hash tables, if the file has them (files written by
+        older version are searched by bisection, which can't fold case).
+        """
+        if fold:
+            name = FOLD_HASH_SECTION
+            key = fold_case(key)
+        else:
+            name = HASH_SECTION
+            key = _encode(key)
+        if name not in self.sections:
+            if fold:
+                raise RRSBinaryError("Dictionary %s has no case-folded index." % self.path)
+            return self.keys.find(key)
+        pos, length = self.sections[name]
+        mask = length // 4 - 1
+        buf, keys, unpack = self._buf, self.keys, _uint.unpack_from
+        slot = _hash(key) & mask
+        while True:
+            i = unpack(buf, pos + 4 * slot)[0]
+            if not i:
+                return -1
+            k = keys[i - 1]
+            if fold:
+                k = fold_case(k)
+            if k == key:
+                return i - 1
+            slot = (slot + 1) & mask
+
+
+    def translate(self, key):
+        """
+        Returns list of values of the key or None if the key is not in the
+        dictionary.
+        """
+        i = self.find_key(key)
+        if i < 0:
+            return None
+        return self.get_translation(i)
+
+
+    def touch(self):
+        """
+        Reads all pages of the file, so that the first lookups don't wait
+        for the disc. Returns size of the file.
+        """
+        self._buf[::mmap.PAGESIZE]
+        return len(self._buf)
+
+#-------------------------------------------------------------------------------
+# End of class BinaryDictionary
+#-------------------------------------------------------------------------------
+
+
+_opened = {}
+_opened_lock = threading.Lock()
+
+def open_binary(path):
+    """
+    Returns BinaryDictionary of the file. Every file is mapped only once in the
+    process.
+    """
+    path = os.path.abspath(path)
+    _opened_lock.acquire()
+    try:
+        d = _opened.get(path)
+        if d is None:
+            d = _opened[path] = BinaryDictionary(path)
+        return d
+    finally:
+        _opened_lock.release()
+
+
+class BinaryWriter(object):
+    """
+    Streaming writer of binary dictionary. Sections are written into
+    temporary files (so they don't have to be kept in memory) and joined
+    into the resulting file by close(). The file is written under temporary
+    name and renamed at the end.
+    """
+    def __init__(self, path, tmpdir=None):
+        self.path = path
+        self.tmpdir = tmpdir
+        self._sections = []
+
+
+    def section(self, name):
+        """
+        Returns file object of new section.
+        """
+        if len(name) > 16:
+            raise RRSBinaryError("Section name %s is too long." % name)
+        f = tempfile.TemporaryFile(dir=self.tmpdir)
+        self._sections.append((name, f))
+        return f
+
+
+    def add_section(self, name, data):
+        self.section(name).write(data)
+
+
+    def string_table(self, name):
+        """
+        Returns StringTableWriter of sections name.offsets and name.data.
+        """
+        return StringTableWriter(self.section(name + ".offsets"),
+                                 self.section(name + ".data"))
+
+
+    def uint_array(self, name):
+        """
+        Returns UIntArrayWriter of new section.
+        """
+        return UIntArrayWriter(self.section(name))
+
+
+    def open_section(self, name):
+        """
+        Returns already written section mapped into memory (read-only).
+        """
+        for n, f in self._sections:
+            if n == name:
+                f.flush()
+                if os.fstat(f.fileno()).st_size == 0:
+                    return ""
+                return mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        raise RRSBinaryError("Section %s hasn't been written." % name)
+
+
+    def open_string_table(self, name):
+        """
+        Returns StringTable of already written sections.
+        """
+        offsets = self.open_section(name + ".offsets")
+        data = self.open_section(name + ".data")
+        if not data:
+            return StringTable(offsets, 0, len(offsets), 0)
+        # offsets and data are in different buffers, join them in a view
+        return _SplitStringTable(offsets, data)
+
+
+    def close(self):
+        sizes = []
+        for name, f in self._sections:
+            f.flush()
+            sizes.append(os.fstat(f.fileno()).st_size)
+        pos = _header.size + _section.size * len(self._sections)
+        layout = []
+        for (name, f), size in zip(self._sections, sizes):
+            pos += (-pos) % _ALIGN
+            layout.append((name, pos, size))
+            pos += size
+
+        tmp = self.path + ".tmp"
+        out = open(tmp, "wb")
+        try:
+            out.write(_header.pack(MAGIC, VERSION, len(self._sections)))
+            for name, offset, length in layout:
+                out.write(_section.pack(name, offset, length))
+            written = _header.size + _section.size * len(self._sections)
+            for (name, offset, length), (_, f) in zip(layout, self._sections):
+                out.write("\0" * (offset - written))
+                f.seek(0)
+                shutil.copyfileobj(f, out, 1 << 20)
+                f.close()
+                written = offset + length
+        finally:
+            out.close()
+        os.rename(tmp, self.path)
+        self._sections = []
+        return self.path
+
+#-------------------------------------------------------------------------------
+# End of class BinaryWriter
+#-------------------------------------------------------------------------------
+
+
+class UIntArrayWriter(object):
+    """
+    Writes array of uint32 into file in blocks.
+    """
+    _FLUSH = 65536
+
+    def __init__(self, f):
+        self._f = f
+        self._buf = _new_uint_array()
+        self.count = 0
+
+
+    def append(self, n):
+        self._buf.append(n)
+        self.count += 1
+        if len(self._buf) >= self._FLUSH:
+            self._flush()
+
+
+    def extend(self, numbers):
+        n = len(self._buf)
+        self._buf.extend(numbers)
+        self.count += len(self._buf) - n
+        if len(self._buf) >= self._FLUSH:
+            self._flush()
+
+
+    def _flush(self):
+        if sys.byteorder != 'little':
+            self._buf.byteswap()
+        self._f.write(self._buf.tostring())
+        self._buf = _new_uint_array()
+
+
+    def close(self):
+        self._flush()
+
+#-------------------------------------------------------------------------------
+# End of class UIntArrayWriter
+#-------------------------------------------------------------------------------
+
+
+class StringTableWriter(object):
+    """
+    Writes sorted table of strings. Strings have to be added in ascending
+    order without duplicates.
+    """
+    def __init__(self, f_offsets, f_data):
+        self._offsets = UIntArrayWriter(f_offsets)
+        self._offsets.append(0)
+        self._f_data = f_data
+        self._pos = 0
+        self._last = None
+        self.count = 0
+
+
+    def add(self, s):
+        """
+        Adds string, returns its index in the table.
+        """
+        s = _encode(s)
+        if self._last is not None and s <= self._last:
+            raise RRSBinaryError("Strings have to be added sorted and unique.")
+        self._last = s
+        self._f_data.write(s)
+        self._pos += len(s)
+        if self._pos > 0xffffffff:
+            raise RRSBinaryError("String table is too large.")
+        self._offsets.append(self._pos)
+        self.count += 1
+        return self.count - 1
+
+
+    def close(self):
+        self._offsets.close()
+
+#-------------------------------------------------------------------------------
+# End of class StringTableWriter
+#-------------------------------------------------------------------------------
+
+
+class _SplitStringTable(StringTable):
+    """
+    StringTable with offsets and data in separate buffers (used while the
+    dictionary is being written).
+    """
+    def __init__(self, offsets, data):
+        StringTable.__init__(self, offsets, 0, len(offsets), 0)
+        self._data = data
+
+
+    def __getitem__(self, i):
+        if isinstance(i, slice):
+            return [self[j] for j in xrange(*i.indices(self._len))]
+        if i < 0:
+            i += self._len
+        if not 0 <= i < self._len:
+            raise IndexError("StringTable index out of range")
+        start, end = struct.unpack_from("<II", self._buf, 4 * i)
+        return self._data[start:end]
+
+
+    def __iter__(self):
+        buf, data = self._buf, self._data
+        unpack = _uint.unpack_from
+        start = unpack(buf, 0)[0]
+        for i in xrange(1, self._len + 1):
+            end = unpack(buf, 4 * i)[0]
+            yield data[start:end]
+            start = end
+
+#-------------------------------------------------------------------------------
+# End of class _SplitStringTable
+#-------------------------------------------------------------------------------
+
+
+class SubListWriter(object):
+    """
+    Collects nested lists of values and writes them into sections
+    sublists.index and sublists.values (see module documentation) by
+    close(), if there are some. Nested lists are rare, they are kept in
+    memory.
+    """
+    def __init__(self, writer):
+        self._writer = writer
+        self._index = [0]
+        self._ids = []
+
+
+    def ids(self, values, value_id):
+        """
+        Returns list of indexes of values (strings and nested lists) to be
+        stored in translate.values. Function value_id returns index of
+        utf-8 encoded string in the table of values.
+        """
+        ids = []
+        for v in values:
+            if isinstance(v, list):
+                items = self.ids(v, value_id)
+                self._ids.extend(items)
+                self._index.append(len(self._ids))
+                ids.append(SUBLIST | (len(self._index) - 2))
+            else:
+                i = value_id(_encode(v))
+                if i & SUBLIST:
+                    raise RRSBinaryError("Too many values.")
+                ids.append(i)
+        return ids
+
+
+    def close(self):
+        if len(self._index) > 1:
+            self._writer.add_section("sublists.index", _uint_array(self._index))
+            self._writer.add_section("sublists.values", _uint_array(self._ids))
+
+#-------------------------------------------------------------------------------
+# End of class SubListWriter
+#-------------------------------------------------------------------------------
+
+
+def write_hash_tables(writer, keys):
+    """
+    Writes exact and case-folded hash tables of the keys (sequence of sorted
+    keys, e.g. StringTable).
+    """
+    for name, fold in ((HASH_SECTION, False), (FOLD_HASH_SECTION, True)):
+        slots = _hash_table(keys, fold)
+        if sys.byteorder != 'little':
+            slots.byteswap()
+        writer.add_section(name, slots.tostring())
+
+
+def write_binary(path, keys, translations=None, sections=()):
+    """
+    Writes dictionary into binary file.
+
+    keys is iterable of keys, translations (for dictionaries of type 'dict')
+    is mapping key -> list of values (strings or nested lists of values, as
+    in pickled dictionaries). Additional sections can be given as
+    list of (name, data) tuples. Everything is kept in memory, for large
+    dictionaries use BinaryWriter (see RRSDictionaryCreator).
+    """
+    writer = BinaryWriter(path)
+    keys = sorted(set(_encode(k) for k in keys))
+    table = writer.string_table("keys")
+    for k in keys:
+        table.add(k)
+    table.close()
+    write_hash_tables(writer, keys)
+    if translations is not None:
+        values = set()
+        for vals in translations.itervalues():
+            values.update(iter_strings(vals))
+        values = sorted(values)
+        table = writer.string_table("values")
+        for v in values:
+            table.add(v)
+        table.close()
+        value_ids = dict((v, i) for i, v in enumerate(values))
+        sublists = SubListWriter(writer)
+        index = [0]
+        ids = []
+        enc = {}
+        for k, vals in translations.iteritems():
+            enc[_encode(k)] = vals
+        for k in keys:
+            ids.extend(sublists.ids(enc.get(k, ()), value_ids.__getitem__))
+            index.append(len(ids))
+        writer.add_section("translate.index", _uint_array(index))
+        writer.add_section("translate.values", _uint_array(ids))
+        sublists.close()
+    for name, data in sections:
+        writer.add_section(name, data)
+    return writer.close()
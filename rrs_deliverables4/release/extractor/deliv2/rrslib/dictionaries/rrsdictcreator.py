@@ -6,6 +6,36 @@ This module improves previous scripts make_dict and make_list and creates common
 library for creating rrs dictinaries.
 
 Usage of this module is described in docstring of RRSDictionaryCreator class.
+
+Dictionaries created by RRSDictionaryCreator contain also binary file
+dict.rrsbin (module rrsbinary), which is searched in place via mmap. Existing
+pickled dictionaries can be converted by function convert_to_binary() or from
+command line:
+    python rrsdictcreator.py --binary path/to/dictionary [path/to/dictionary ...]
+
+Frequency dictionaries (module rrsfrequency) are created from existing
+dictionaries by function convert_to_frequency() or from command line:
+    python rrsdictcreator.py --frequency path/to/dictionary [path/to/dictionary ...]
+Frequency of a key is its first value. Homographs of BNC dictionaries have
+frequencies of their other parts of speech in nested lists [frequency, tag]
+(e.g. force: ['23785', 'n', ['12606', 'v']]), their frequency is the sum of
+all parts of speech (force: 36391), the tags are not stored.
+
+Dictionaries used together can be joined into one dictionary when they are
+built (function merge_dictionaries(), see also module rrsregistry):
+    python rrsdictcreator.py --merge path/to/result path/to/dict1 path/to/dict2 ...
+Groups of dictionaries can be indexed by class of keys (function
+build_class_index(), e.g. first names, surnames and non-names for name
+recognition), so that one lookup tells which groups contain the key.
+Cities can be resolved offline up to the continent (function
+build_geo_hierarchy()), so that one lookup gives the whole hierarchy.
+
+Rows of the source file are sorted externally: runs of rows are sorted in
+memory, saved into temporary files and merged, so the time of creation is
+n*log(n) and memory usage of the binary dictionary doesn't depend on the size
+of the source file (except for the hash tables and the automaton for
+more-word keys). Pickled files for older versions of rrslib need the whole
+dictionary in memory, they can be switched off (create(legacy=False)).
 """
 
 
@@ -15,15 +45,74 @@ __email__ = "xhelle03@stud.fit.vutbr.cz"
 __date__ = "$9-September-2010 18:21:10$"
 
 import cPickle
+import glob
+import heapq
+import itertools
 import re
 import os
 import sys
+import tempfile
+import time
 from rrslib.others.progressbar import ProgressBar
+from rrslib.dictionaries.rrsbinary import BINARY_FILE, BinaryDictionary, \
+                                          BinaryWriter, SubListWriter, \
+                                          write_binary, fold_case, \
+                                          iter_strings, write_hash_tables
+from rrslib.dictionaries.rrskeyindex import KeyIndex
+from rrslib.dictionaries.rrsmatcher import AhoCorasick, compiled_keys_fold
 
 
 DTYPE_LIST = 0
 DTYPE_DICT = 1
 
+# count of rows sorted in memory
+RUN_SIZE = 200000
+# count of rows in one pickled block of the run
+_BLOCK_SIZE = 1000
+# up to this count of values, indexes of values are kept in python dict,
+# larger tables are searched by bisection
+VALUE_MAP_LIMIT = 1000000
+
+_notsimple_re = re.compile("[ \"\(\)\[\]{}\,\.\+\!\?\:\;@#\$%\^&\*]")
+
+
+def _write_run(items, tmpdir):
+    """
+    Saves sorted items into temporary file in pickled blocks.
+    """
+    f = tempfile.TemporaryFile(dir=tmpdir)
+    for i in xrange(0, len(items), _BLOCK_SIZE):
+        cPickle.dump(items[i:i + _BLOCK_SIZE], f, cPickle.HIGHEST_PROTOCOL)
+    return f
+
+
+def _read_run(f):
+    f.seek(0)
+    while True:
+        try:
+            block = cPickle.load(f)
+        except EOFError:
+            return
+        for item in block:
+            yield item
+
+
+def _unique(iterable):
+    # unique items of sorted iterable
+    last = None
+    for i, item in enumerate(iterable):
+        if i and item == last:
+            continue
+        last = item
+        yield item
+
+
+def _start_char(key):
+    start_char = key[0].lower()
+    if not start_char.isalpha():
+        start_char = "other"
+    return start_char
+
 
 class RRSDictionaryCreatorError(Exception):
     pass
@@ -65,9 +154,8 @@ class RRSDictionaryCreator(object):
         except IOError, e:
             raise RRSDictionaryCreatorError(e)
 
-        # get number of lines
-        self.lines = sum([1 for line in self.fd])
-        self.fd.seek(0)
+        # size of the file (for progressbar)
+        self.size = os.fstat(self.fd.fileno()).st_size
 
         # name of the dictionary
         self.name = dname
@@ -89,9 +177,6 @@ class RRSDictionaryCreator(object):
             self.d[char] = {}
         self.d["other"] = {}
 
-        # regexp for searching keys in text
-        self.regular_expression = "(?<![a-zA-Z0-9\-])("
-
         # flag idicating keys in "simple" form - that means: the key doesnt
         # contain any white character (\t\n<space> etc.)
         self.simplekeys = True
@@ -99,6 +184,9 @@ class RRSDictionaryCreator(object):
         # minimal key length
         self.minkey = sys.maxint
 
+        # statistics of the last create()
+        self.stats = {}
+
 
     def _dir_create(self):
         # create directory for dict
@@ -124,62 +212,142 @@ class RRSDictionaryCreator(object):
 
 
 
-    def _close_regexp(self):
-        """
-        Closes regular expression, compiles it and dumps it into a pickle file.
-        """
-        if not self.simplekeys:
-            # close the regular exptression ane compile it
-            self.regular_expression = self.regular_expression.rstrip("|") + ")(?![a-zA-Z0-9\-])"
-            compiled = re.compile(self.regular_expression)
-            # and save it
-            f_compiled = open(self.path + "keys_compiled.rrsdict", "wb")
-            cPickle.dump(compiled, f_compiled)
-            f_compiled.close()
-
-
     def _check_if_simplekey(self, key):
-        if re.search("[ \"\(\)\[\]{}\,\.\+\!\?\:\;@#\$%\^&\*]", key):
+        if _notsimple_re.search(key):
             self.simplekeys = False
 
 
-    def _save_dict_files(self):
-        # save keys
-        f_keys = open(self.path + "keys.rrsdict", "wb")
-        self.keys.sort()
-        cPickle.dump(self.keys, f_keys)
-        f_keys.close()
+    def _sort_runs(self, run_size, tmpdir, progressbar=None):
+        """
+        Reads rows of the file and saves them in sorted runs. Returns list of
+        runs of (key, rownum, values) and list of runs of unique values.
+        """
+        key_runs, value_runs = [], []
+        items, values = [], set()
+        row = self.fd.readline()
+        rownum = 0
+        while row:
+            rownum += 1
+            if progressbar is not None and rownum % 1000 == 0:
+                percent = int(100 * float(self.fd.tell()) / max(self.size, 1))
+                progressbar.render(percent, 'step %s\nCreating dictionary %s...\n' %
+                                   (percent, self.name))
+            # if we are in dict
+            if self.type == DTYPE_DICT:
+                try:
+                    key, vals = self.parse_row(row)
+                except Exception, e:
+                    raise RRSDictionaryCreatorError("Bad parsing function. Exception: "+str(e))
+                assert type(key) == str, "Key has to be type string. Probably bad parsing function used."
+                assert type(vals) == list, "Values have to be list. Probably bad parsing function used."
+                values.update(iter_strings(vals))
+            # list otherwise
+            else:
+                key = row.rstrip("\r\n")
+                vals = None
+            row = self.fd.readline()
+            # empty lines
+            if not key:
+                continue
+
+            self._check_if_simplekey(key)
+            # check minimal length of key in dictionary
+            len_k = len(key)
+            if len_k < self.minkey:
+                self.minkey = len_k
 
-        # if we converted dictionary key->values, not list, save all values and
-        # python dictionaries into pickled file
-        if self.type == DTYPE_DICT:
-            # save values
-            f_values = open(self.path + "values.rrsdict", "wb")
-            self.values.sort()
-            cPickle.dump(self.values, f_values)
-            f_values.close()
-
-            # save translation dictionaries
-            for k in self.d:
-                f_trans = open(self.path + "translate_" + k + ".rrsdict", "wb")
-                cPickle.dump(self.d[k], f_trans)
-                f_trans.close()
-
-        # create dict.info (I know, this is ugly way, but pretty easy to write...:) )
-        f_info = open(self.path + "dict.info", "w")
-
-        if self.type == DTYPE_DICT: _type = "dict"
-        else: _type = "list"
-
-        f_info.write('<?xml version="1.0" encoding="utf-8"?>\n')
-        f_info.write('<rrsdictionary>\n')
-        f_info.write('    <name value=\"' + self.name + '\"/>\n')
-        f_info.write('    <type value=\"' + _type + '\"/>\n')
-        f_info.write('    <keysize value=\"' + str(len(self.keys)) + '\"/>\n')
-        f_info.write('    <valuesize value=\"' + str(len(self.values)) + '\"/>\n')
-        f_info.write('    <min-key-length value=\"' + str(self.minkey) + '\"/>\n')
-        f_info.write('    <simplekeys value=\"' + str(self.simplekeys) + '\"/>\n')
-        f_info.write('</rrsdictionary>\n')
+            items.append((key, rownum, vals))
+            if len(items) >= run_size:
+                items.sort()
+                key_runs.append(_write_run(items, tmpdir))
+                value_runs.append(_write_run(sorted(values), tmpdir))
+                items, values = [], set()
+        if items:
+            items.sort()
+            key_runs.append(_write_run(items, tmpdir))
+            value_runs.append(_write_run(sorted(values), tmpdir))
+        self.stats['rows'] = rownum
+        self.stats['runs'] = len(key_runs)
+        return key_runs, value_runs
+
+
+    def _save_dict_files(self, key_runs, value_runs, legacy, tmpdir):
+        is_dict = self.type == DTYPE_DICT
+        writer = BinaryWriter(self.path + BINARY_FILE, tmpdir)
+
+        # merge values
+        if is_dict:
+            table = writer.string_table("values")
+            for v in _unique(heapq.merge(*[_read_run(f) for f in value_runs])):
+                table.add(v)
+                if legacy:
+                    self.values.append(v)
+            table.close()
+            values = writer.open_string_table("values")
+            if len(values) <= VALUE_MAP_LIMIT:
+                value_id = dict((v, i) for i, v in enumerate(values)).__getitem__
+            else:
+                value_id = values.find
+            index = writer.uint_array("translate.index")
+            index.append(0)
+            ids = writer.uint_array("translate.values")
+            sublists = SubListWriter(writer)
+
+        # merge keys, values of the same key are joined in order of rows
+        table = writer.string_table("keys")
+        merged = heapq.merge(*[_read_run(f) for f in key_runs])
+        for key, group in itertools.groupby(merged, lambda item: item[0]):
+            table.add(key)
+            if legacy:
+                self.keys.append(key)
+            if is_dict:
+                kvalues = []
+                for _, _, vals in group:
+                    kvalues.extend(vals)
+                ids.extend(sublists.ids(kvalues, value_id))
+                index.append(ids.count)
+                if legacy:
+                    self.d[_start_char(key)][key] = kvalues
+        table.close()
+        if is_dict:
+            index.close()
+            ids.close()
+            sublists.close()
+        keys = writer.open_string_table("keys")
+        self.stats['keys'] = len(keys)
+        self.stats['values'] = len(values) if is_dict else 0
+        write_hash_tables(writer, keys)
+        # index for prefix and fuzzy search
+        for name, data in KeyIndex.build(keys).to_sections():
+            writer.add_section(name, data)
+        # automaton for searching more-word keys in text
+        if not self.simplekeys:
+            for name, data in AhoCorasick.build(keys).to_sections():
+                writer.add_section(name, data)
+        writer.close()
+
+        if legacy:
+            # save keys
+            f_keys = open(self.path + "keys.rrsdict", "wb")
+            cPickle.dump(self.keys, f_keys)
+            f_keys.close()
+
+            # if we converted dictionary key->values, not list, save all values and
+            # python dictionaries into pickled file
+            if is_dict:
+                # save values
+                f_values = open(self.path + "values.rrsdict", "wb")
+                cPickle.dump(self.values, f_values)
+                f_values.close()
+
+                # save translation dictionaries
+                for k in self.d:
+                    f_trans = open(self.path + "translate_" + k + ".rrsdict", "wb")
+                    cPickle.dump(self.d[k], f_trans)
+                    f_trans.close()
+
+        _write_info(self.path, self.name, is_dict, self.stats['keys'],
+                    self.stats['values'], self.minkey, self.simplekeys)
 
 
     #---------------------------------------------------------------------------
@@ -195,85 +363,318 @@ class RRSDictionaryCreator(object):
         self.parse_row = func
 
 
-    def create(self, showprogress=True):
+    def create(self, showprogress=True, legacy=True, run_size=RUN_SIZE, tmpdir=None):
         """
         Create dictionary in order of selected type, name and file. Note, that
         you have to set row-parser (method set_parser(func)) to get result you want.
 
         Parameter showprogress: if True, shows progressbar while creating dictionary.
+        Parameter legacy: if False, pickled files aren't created (only binary
+        dict.rrsbin), so the dictionary doesn't have to fit into memory.
+        Parameter run_size: count of rows sorted in memory at once.
+        Parameter tmpdir: directory for temporary files (sorted runs and
+        sections of the binary file).
+
+        Empty rows are skipped. Statistics of the creation (count of rows,
+        keys and values, time and throughput) are stored in attribute stats.
         """
-
-        p = ProgressBar('green', width=40, block='▣', empty='□')
+        start = time.time()
+        p = None
+        if showprogress:
+            p = ProgressBar('green', width=40, block='▣', empty='□')
 
         # create directory for this dictionary
         self._dir_create()
-        # read lines
-        row = self.fd.readline()
-        rownum = 1
-        while row:
-            if showprogress and rownum % 10 == 0:
-                p.render(int(101*float(rownum)/float(self.lines)), 'step %s\nCreating dictionary %s...\n' %
-                         (str(int(101*float(rownum)/float(self.lines))), self.name))
-            # if we are in dict
-            if self.type == DTYPE_DICT:
-                try:
-                    key, values = self.parse_row(row)
-                except Exception, e:
-                    raise RRSDictionaryCreatorError("Bad parsing function. Exception: "+str(e))
-                assert type(key) == str, "Key has to be type string. Probably bad parsing function used."
-                assert type(values) == list, "Values have to be list. Probably bad parsing function used."
-            # list otherwise
-            else:
-                key = row.rstrip("\r\n")
+        self.stats = {}
+        key_runs, value_runs = self._sort_runs(run_size, tmpdir, p)
+        self.fd.close()
+        try:
+            self._save_dict_files(key_runs, value_runs, legacy, tmpdir)
+        finally:
+            for f in key_runs + value_runs:
+                f.close()
+
+        seconds = time.time() - start
+        self.stats['seconds'] = seconds
+        self.stats['rows_per_second'] = self.stats['rows'] / max(seconds, 1e-6)
+        print "Successfully created RRS dictionary %s (%d rows, %d keys, %.1f s, %d rows/s)." % \
+              (self.name, self.stats['rows'], self.stats['keys'], seconds,
+               self.stats['rows_per_second'])
+        return 1
 
-            self._check_if_simplekey(key)
-            #print key, values
-            if self.type == DTYPE_DICT:
-                # set start char (a-z or other)
-                start_char = key[0].lower()
-                if not start_char.isalpha():
-                    start_char = "other"
-
-                # if key doesnt exist in dictionary yet, add it
-                if not key in self.d[start_char].keys():
-                    self.d[start_char][key] = values
-                # if it exists, extend values
-                else:
-                    self.d[start_char][key].extend(values)
+#-------------------------------------------------------------------------------
+# End of class RRSDictionaryCreator
+#-------------------------------------------------------------------------------
 
-                # add values to global value storage
-                for v in values:
-                    if not v in self.values:
-                        self.values.append(v)
 
-            # add key to global key storage
-            if key not in self.keys:
-                self.keys.append(key)
 
-            # handle regular expressions
-            self.regular_expression += re.escape(key) + "|"
+def _write_info(path, name, is_dict, keysize, valuesize, minkey, simplekeys):
+    # create dict.info (I know, this is ugly way, but pretty easy to write...:) )
+    f_info = open(path + "dict.info", "w")
 
-            # check minimal length of key in dictionary
-            len_k = len(key)
-            if len_k < self.minkey:
-                self.minkey = len_k
+    if is_dict: _type = "dict"
+    else: _type = "list"
 
-            # read new line and start over
-            row = self.fd.readline()
-            rownum += 1
+    f_info.write('<?xml version="1.0" encoding="utf-8"?>\n')
+    f_info.write('<rrsdictionary>\n')
+    f_info.write('    <name value=\"' + name + '\"/>\n')
+    f_info.write('    <type value=\"' + _type + '\"/>\n')
+    f_info.write('    <keysize value=\"' + str(keysize) + '\"/>\n')
+    f_info.write('    <valuesize value=\"' + str(valuesize) + '\"/>\n')
+    f_info.write('    <min-key-length value=\"' + str(minkey) + '\"/>\n')
+    f_info.write('    <simplekeys value=\"' + str(simplekeys) + '\"/>\n')
+    f_info.write('</rrsdictionary>\n')
+    f_info.close()
 
-        self._close_regexp()
-        self._save_dict_files()
-        print "Successfully created RRS dictionary %s." % self.name
-        return 1
 
-#-------------------------------------------------------------------------------
-# End of class RRSDictionaryCreator
-#-------------------------------------------------------------------------------
+def _read_info(path):
+    """
+    Returns (is_dict, simplekeys, minkey) from dict.info of the dictionary.
+    """
+    try:
+        f_info = open(path + "/dict.info")
+    except IOError, e:
+        raise RRSDictionaryCreatorError(e)
+    info = f_info.read()
+    f_info.close()
+    minkey = re.search('<min-key-length value="(\d+)"/>', info)
+    return ('<type value="dict"/>' in info,
+            '<simplekeys value="True"/>' in info,
+            minkey and int(minkey.group(1)) or 0)
+
+
+def _load_pickled(path, is_dict):
+    """
+    Returns keys, translations (None for lists) and case folding of the
+    automaton of pickled dictionary. Keys are taken from keys.rrsdict and
+    from all translation files (some dictionaries don't have keys.rrsdict).
+    """
+    keys = []
+    if os.path.isfile(path + "/keys.rrsdict"):
+        f_keys = open(path + "/keys.rrsdict", "rb")
+        keys = cPickle.load(f_keys)
+        f_keys.close()
+    translations = None
+    if is_dict:
+        translations = {}
+        for fname in sorted(glob.glob(path + "/translate_*.rrsdict")):
+            f_trans = open(fname, "rb")
+            for key, values in cPickle.load(f_trans).iteritems():
+                if key in translations:
+                    translations[key].extend(v for v in values if v not in translations[key])
+                else:
+                    translations[key] = list(values)
+            f_trans.close()
+        keys = set(keys)
+        keys.update(translations)
+    # some old compiled expressions ignored case
+    return keys, translations, compiled_keys_fold(path)
+
+
+def _load_dictionary(path, is_dict):
+    """
+    Returns keys, translations and case folding of the automaton of
+    dictionary, from binary file if there is one.
+    """
+    if not os.path.isfile(path + "/" + BINARY_FILE):
+        return _load_pickled(path, is_dict)
+    binary = BinaryDictionary(path + "/" + BINARY_FILE)
+    keys = list(binary.keys)
+    translations = None
+    if is_dict:
+        translations = dict((k, binary.get_translation(i))
+                            for i, k in enumerate(keys))
+    automaton = AhoCorasick.from_binary(binary)
+    return keys, translations, automaton is not None and automaton.fold
+
+
+def convert_to_binary(path):
+    """
+    Creates binary file dict.rrsbin from pickled files of existing dictionary
+    in directory path. Keys are taken from keys.rrsdict and from all
+    translation files (some dictionaries don't have keys.rrsdict).
+    """
+    path = path.rstrip("/")
+    is_dict, simplekeys, _ = _read_info(path)
+    keys, translations, fold = _load_pickled(path, is_dict)
+    sections = KeyIndex.build(keys).to_sections()
+    if not simplekeys:
+        sections += AhoCorasick.build(keys, fold).to_sections()
+    return write_binary(path + "/" + BINARY_FILE, keys, translations, sections)
+
+
+def _key_frequency(values):
+    """
+    Returns frequency of key with values: the first value, or the sum of the
+    frequencies of all parts of speech of BNC homograph.
+    """
+    other = [v[0] for v in values[1:] if isinstance(v, list) and v]
+    if not other:
+        return values[0]
+    # BNC frequencies are counts of occurrences
+    return sum(int(f) for f in [values[0]] + other)
 
 
+def convert_to_frequency(path, out=None):
+    """
+    Creates frequency file freq.rrsbin (or file out) of existing dictionary
+    in directory path (see module rrsfrequency). Frequency of a key is its
+    first value plus the frequencies of the other parts of speech of BNC
+    homographs (see module documentation), keys without values are left out.
+    """
+    from rrslib.dictionaries.rrsfrequency import FREQUENCY_FILE, write_frequency
+    path = path.rstrip("/")
+    is_dict, _, _ = _read_info(path)
+    if not is_dict:
+        raise RRSDictionaryCreatorError("Dictionary %s has no values." % path)
+    _, translations, _ = _load_dictionary(path, is_dict)
+    frequencies = {}
+    for key, values in translations.iteritems():
+        if values:
+            frequencies[key] = _key_frequency(values)
+    if out is None:
+        out = path + "/" + FREQUENCY_FILE
+    return write_frequency(out, frequencies)
+
+
+def merge_dictionaries(paths, dname):
+    """
+    Creates dictionary in directory dname by joining existing dictionaries
+    (directories paths) the same way RRSDictionary.extend() does: union of
+    keys, values of keys occurring in more dictionaries are appended in
+    order of the dictionaries. This is done once when the dictionaries are
+    built, so the joined dictionary doesn't have to be merged in every
+    process which uses it (see rrsregistry). Only the binary file is written.
+    """
+    if not paths:
+        raise RRSDictionaryCreatorError("Nothing to merge.")
+    infos = [_read_info(p.rstrip("/")) for p in paths]
+    is_dict = infos[0][0]
+    if [i for i in infos if i[0] != is_dict]:
+        raise RRSDictionaryCreatorError("Dictionaries has different types.")
+    simplekeys = all(i[1] for i in infos)
+    minkey = min(i[2] for i in infos)
+
+    keys = set()
+    translations = None
+    if is_dict:
+        translations = {}
+    fold = None
+    for path, info in zip(paths, infos):
+        k, t, f = _load_dictionary(path.rstrip("/"), is_dict)
+        keys.update(k)
+        if fold is None and not info[1]:
+            # the automaton of the first dictionary with more-word keys
+            fold = f
+        if is_dict:
+            for key, values in t.iteritems():
+                if key in translations:
+                    translations[key].extend(v for v in values if v not in translations[key])
+                else:
+                    translations[key] = list(values)
+    sections = KeyIndex.build(keys).to_sections()
+    if not simplekeys:
+        sections += AhoCorasick.build(keys, bool(fold)).to_sections()
+
+    dname = dname.rstrip("/")
+    if not os.path.isdir(dname):
+        os.mkdir(dname)
+    write_binary(dname + "/" + BINARY_FILE, keys, translations, sections)
+    valuesize = 0
+    if is_dict:
+        valuesize = len(set(v for values in translations.itervalues()
+                            for v in iter_strings(values)))
+    _write_info(dname + "/", os.path.basename(dname), is_dict, len(keys),
+                valuesize, minkey, simplekeys)
+    return dname
+
+
+def build_class_index(groups, dname):
+    """
+    Creates class index in directory dname from groups of dictionaries
+    (list of lists of directories). Class index is frequency dictionary
+    (module rrsfrequency) mapping case-folded key to bitmask of its classes:
+    bit i is set if the key is in some dictionary of groups[i]. Looked up
+    case-insensitively, it gives the same answers as contains_key() of the
+    dictionaries with CASE_INSENSITIVE sensitivity, with one lookup per key
+    (see rrsregistry.get_class_index()).
+    """
+    from rrslib.dictionaries.rrsfrequency import FREQUENCY_FILE, write_frequency
+    classes = {}
+    minkeys = set()
+    for bit, paths in enumerate(groups):
+        for path in paths:
+            path = path.rstrip("/")
+            is_dict, _, minkey = _read_info(path)
+            minkeys.add(minkey)
+            keys, _, _ = _load_dictionary(path, is_dict)
+            for key in keys:
+                key = fold_case(key)
+                classes[key] = classes.get(key, 0) | 1 << bit
+    if len(minkeys) > 1:
+        # minimal key length is checked once for all classes
+        raise RRSDictionaryCreatorError("Dictionaries of class index have "
+                                        "different minimal key lengths.")
+    dname = dname.rstrip("/")
+    if not os.path.isdir(dname):
+        os.mkdir(dname)
+    write_frequency(dname + "/" + FREQUENCY_FILE, classes)
+    _write_info(dname + "/", os.path.basename(dname), True, len(classes),
+                len(set(classes.itervalues())), minkeys and minkeys.pop() or 0,
+                True)
+    return dname
+
+
+def build_geo_hierarchy(city2woeid, woeid2country, country2countrywoeid,
+                        countrywoeid2continent, dname):
+    """
+    Creates geographic hierarchy table in directory dname from loaded
+    dictionaries (RRSDictionary instances). The table maps city to list
+    [woeid, country, country woeid, continent] resolved the same way as
+    GeographicLocationExtractor resolves the city (the last woeid of the
+    city, the first value of the other dictionaries). The list is cut where
+    the chain ends (e.g. [woeid] if the woeid has no country), so resolution
+    of a city is one translation (see rrsregistry.get_geo_hierarchy()).
+    The table is meant for translate() only, text_search() of more-word
+    cities is not supported.
+    """
+    translations = {}
+    for city in city2woeid.get_keys():
+        chain = []
+        woeids = city2woeid.translate(city)
+        if woeids:
+            chain.append(woeids[-1])
+            for d in (woeid2country, country2countrywoeid, countrywoeid2continent):
+                values = d.translate(chain[-1])
+                if not values:
+                    break
+                chain.append(values[0])
+        translations[city] = chain
+    keys = translations.keys()
+    dname = dname.rstrip("/")
+    if not os.path.isdir(dname):
+        os.mkdir(dname)
+    write_binary(dname + "/" + BINARY_FILE, keys, translations,
+                 KeyIndex.build(keys).to_sections())
+    _write_info(dname + "/", os.path.basename(dname), True, len(keys),
+                len(set(v for chain in translations.itervalues() for v in chain)),
+                city2woeid.get_mintextlen(), True)
+    return dname
+
 
 if __name__ == "__main__":
+    if len(sys.argv) > 2 and sys.argv[1] == "--binary":
+        for path in sys.argv[2:]:
+            print "Created", convert_to_binary(path)
+        sys.exit(0)
+    if len(sys.argv) > 2 and sys.argv[1] == "--frequency":
+        for path in sys.argv[2:]:
+            print "Created", convert_to_frequency(path)
+        sys.exit(0)
+    if len(sys.argv) > 3 and sys.argv[1] == "--merge":
+        print "Created", merge_dictionaries(sys.argv[3:], sys.argv[2])
+        sys.exit(0)
+
     def my_parse_fnc(x):
         s = x.split(" - ")
         return (s[0], map(lambda x: x.rstrip("\r\n"), s[1:]))
@@ -8,6 +8,10 @@ manipulating with large dictionaries.
 The main feature of module is, that there are many compromises between memory usage,
 hard-disc storage and speed of searching. The design can be for some kinds of
 dictionaries not very optimized, but... it happens. (yea, it's correct, IT!).
+
+If the directory of the dictionary contains binary file dict.rrsbin (see
+module rrsbinary), keys and translations are searched in place in the
+memory-mapped file instead of unpickling them.
 """
 
 __modulename__ = "rrsdictionary"
@@ -18,9 +22,19 @@ __date__ = "$3-August-2010 18:15:38$"
 
 import cPickle
 import lxml.etree as lh
+import os
 import re
 import sys
 
+from bisect import bisect_left
+from rrslib.dictionaries.rrsbinary import BINARY_FILE, FOLD_HASH_SECTION, \
+                                         StringTable, fold_case, open_binary
+from rrslib.dictionaries.rrskeyindex import KeyIndex
+from rrslib.dictionaries.rrsmatcher import AhoCorasick, TextMatcher, compiled_keys_fold
+from rrslib.dictionaries.rrstranslation import AddedSource, BinarySource, \
+                                              PickledSource, TranslationStore, \
+                                              start_char
+
 try:
     import psyco
     psyco.full()
@@ -99,10 +113,38 @@ class RRSDictionary(object):
     sorted, so searching is done by binary search. This way we boosted the speed
     of searching and reduced the complexity form o(n) to O(log2n).
 
+    Keys (contains_key(), translate(), text_search() of simple keys) are
+    looked up in a hash index of exact or case-folded keys, so the lookup is
+    O(1). Binary dictionaries have the index stored in the file, for pickled
+    ones it is built on the first lookup.
+
+    Keys can be searched tolerantly: by normalised prefix (prefix_search()),
+    normalised form (normalized_lookup()) and edit distance (fuzzy_search()),
+    see module rrskeyindex. The index is stored in binary dictionaries, or
+    built on the first use.
+
+    Keys with more words are searched in texts by Aho-Corasick automaton (see
+    module rrsmatcher), which is stored in binary dictionaries, or built from
+    keys on the first text_search(). The automaton ignores case if the
+    dictionary is not case sensitive or if its old compiled expression
+    ignored case.
+
     Manipulating with pickled files in other way than this class is deprecated.
+
+    Dictionaries with binary file (dict.rrsbin) are not unpickled at all, keys
+    and translations are read from the memory-mapped file. Keys are read from
+    binary file until the dictionary is modified by extend() or add(), then
+    they are copied into list. Translations of extended dictionaries are
+    merged key by key (see module rrstranslation). Parameter max_resident
+    bounds count of translation shards (and buckets of merged translations)
+    kept in memory, prefetch() loads them in advance.
+
+    Dictionaries shared by more components of the process are obtained from
+    module rrsregistry. Shared dictionaries (attribute shared is True) can't
+    be modified.
     """
 
-    def __init__(self, name, sensitivity=CASE_SENSITIVE):
+    def __init__(self, name, sensitivity=CASE_SENSITIVE, max_resident=None):
         if not isinstance(sensitivity, int) or sensitivity < 0 or sensitivity > 2:
             raise RRSDictionaryError("Sensitivity has to have values CASE_SENSITIVE,"\
                                      " CASE_INSENSITIVE or FIRST_UPPER.")
@@ -112,10 +154,26 @@ class RRSDictionary(object):
         self._load_info()
         self.keys = None
         self.values = None
-        self.dict = {}
         self.dict_added = {}
-        self.keys_compiled = None
+        self._matcher = None
         self.extended_names = []
+        # hash indexes {normalized key: key} of pickled dictionaries
+        self._indexes = {}
+        # index of normalised keys (see module rrskeyindex)
+        self._key_index = None
+        self._binary = None
+        if os.path.isfile(self.name + "/" + BINARY_FILE):
+            self._binary = open_binary(self.name + "/" + BINARY_FILE)
+        self.shared = False
+        # layers of translations (see module rrstranslation)
+        self.max_resident = max_resident
+        self._translation_layers = []
+        if self.type == "dict":
+            if self._binary is not None:
+                self._translation_layers.append(BinarySource(self._binary))
+            else:
+                self._translation_layers.append(PickledSource(self.name, max_resident))
+        self._translations = None
 
 
     def _load_info(self):
@@ -135,47 +193,184 @@ class RRSDictionary(object):
 
 
     def _load_keys(self):
+        if self._binary is not None:
+            self.keys = self._binary.keys
+            return
+        if self.type == "dict" and not os.path.isfile(self.name + "/keys.rrsdict"):
+            # some dictionaries have only translation files
+            self.keys = sorted(self._translation_layers[0].keys())
+            return
         f_keys = open(self.name + "/keys.rrsdict", "rb")
         self.keys = cPickle.load(f_keys)
         f_keys.close()
 
 
     def _load_values(self):
+        if self._binary is not None and self._binary.values is not None:
+            self.values = self._binary.values
+            return
         f_values = open(self.name + "/values.rrsdict", "rb")
         self.values = cPickle.load(f_values)
         f_values.close()
 
 
-    def _load_translate(self, letter):
-        f_trans = open(self.name + "/translate_" + letter.lower() + ".rrsdict", "rb")
-        d = cPickle.load(f_trans)
-        f_trans.close()
-        for name in self.extended_names:
-            f_trans = open(name + "/translate_" + letter.lower() + ".rrsdict", "rb")
-            _n_dict = cPickle.load(f_trans)
-            for key in _n_dict.keys():
-                if not self._binary_search(d.keys(), key, False)[0]:
-                #if not key in d.keys():
-                    d[key] = _n_dict[key]
-                else:
-                    for val in _n_dict[key]:
-                        #if not val in d[key]:
-                        if not self._binary_search(d[key], val, False)[0]:
-                            d[key].append(val)
-            f_trans.close()
-        return d
-
-
-    def _load_compiled_keys(self):
-        # if we are on ucs4 compiled system, we can use normal compiled re
-        if self._ucs4():
-            f_keys_com = open(self.name + "/keys_compiled.rrsdict", "rb")
-        # if we are on ucs2, we have to use special compiled regular expression,
-        # which doesnt throw OverflowError.
+    def _unshare(self):
+        """
+        Makes keys and values modifiable lists and stops using binary file
+        (called before the dictionary is modified).
+        """
+        if self.keys is None:
+            self._load_keys()
+        if isinstance(self.keys, StringTable):
+            self.keys = list(self.keys)
+        if self.values is None and self._binary is not None \
+        and self._binary.values is not None:
+            self.values = self._binary.values
+        if isinstance(self.values, StringTable):
+            self.values = list(self.values)
+        self._binary = None
+        self._indexes = {}
+        self._key_index = None
+
+
+    def _get_key_index(self):
+        """
+        Returns KeyIndex of keys, loaded from binary dictionary or built on
+        the first call.
+        """
+        if self._key_index is None:
+            if self._binary is not None:
+                self._key_index = KeyIndex.from_binary(self._binary)
+            if self._key_index is None:
+                if self.keys is None:
+                    self._load_keys()
+                self._key_index = KeyIndex.build(self.keys)
+        return self._key_index
+
+
+    def _get_index(self, fold):
+        """
+        Returns hash index of keys {key: key} or {folded key: key}. For keys
+        differing only in case, the first one in sorted order is used.
+        """
+        index = self._indexes.get(fold)
+        if index is None:
+            if self.keys is None:
+                self._load_keys()
+            index = {}
+            if fold:
+                for k in self.keys:
+                    index.setdefault(fold_case(k), k)
+            else:
+                for k in self.keys:
+                    index.setdefault(k, k)
+            self._indexes[fold] = index
+        return index
+
+
+    def _find(self, key):
+        """
+        Returns the key of the dictionary matching the key with respect to
+        sensitivity of the dictionary, or None.
+        """
+        # boost speed by filtering values shorter than minimal text length
+        if len(key) < self.mintextlen:
+            return None
+        if self.sensitivity == FIRST_UPPER and key:
+            if key[0].isalpha() and key[0].islower():
+                return None
+        fold = self.sensitivity != CASE_SENSITIVE
+        if self._binary is not None and (not fold or \
+        self._binary.has_section(FOLD_HASH_SECTION)):
+            i = self._binary.find_key(key, fold)
+            if i < 0:
+                return None
+            return self._binary.keys[i]
+        if fold:
+            key = fold_case(key)
+        elif isinstance(key, unicode):
+            key = key.encode("utf-8")
+        return self._get_index(fold).get(key)
+
+
+    def _find_many(self, keys):
+        """
+        Batch version of _find(): returns dictionary {key: key of the
+        dictionary or None} of distinct keys. Every distinct key is looked
+        up once and the state of the dictionary (sensitivity, index) is
+        resolved once for the whole batch.
+        """
+        found = {}
+        for key in keys:
+            if key in found:
+                continue
+            if not isinstance(key, basestring):
+                raise RRSDictionaryError("Key has to be string or unicode.")
+            found[key] = None
+        mintextlen = self.mintextlen
+        first_upper = self.sensitivity == FIRST_UPPER
+        fold = self.sensitivity != CASE_SENSITIVE
+        probes = []
+        for key in found:
+            if len(key) < mintextlen:
+                continue
+            if first_upper and key and key[0].isalpha() and key[0].islower():
+                continue
+            probes.append(key)
+        if self._binary is not None and (not fold or \
+        self._binary.has_section(FOLD_HASH_SECTION)):
+            find_key, table = self._binary.find_key, self._binary.keys
+            for key in probes:
+                i = find_key(key, fold)
+                if i >= 0:
+                    found[key] = table[i]
         else:
-            f_keys_com = open(self.name + "/keys_compiled_ucs2.rrsdict", "rb")
-        self.keys_compiled = cPickle.load(f_keys_com)
-        f_keys_com.close()
+            index = self._get_index(fold)
+            for key in probes:
+                if fold:
+                    found[key] = index.get(fold_case(key))
+                elif isinstance(key, unicode):
+                    found[key] = index.get(key.encode("utf-8"))
+                else:
+                    found[key] = index.get(key)
+        return found
+
+
+    def _get_translations(self):
+        if self._translations is None:
+            layers = self._translation_layers + [AddedSource(self.dict_added)]
+            self._translations = TranslationStore(layers, self.max_resident)
+        return self._translations
+
+
+    def _check_modifiable(self):
+        if self.shared:
+            raise RRSDictionaryError("Shared dictionary %s can't be modified, "\
+                                     "create new RRSDictionary instead." % self.name)
+
+
+    def _get_matcher(self, build=True):
+        """
+        Returns TextMatcher of keys. The automaton is loaded from binary
+        dictionary, or built from keys (if build is True, None is returned
+        otherwise). Stored automaton which doesn't ignore case is not used by
+        case insensitive dictionaries.
+        """
+        if self._matcher is None:
+            fold = self.sensitivity != CASE_SENSITIVE
+            automaton = None
+            if self._binary is not None:
+                automaton = AhoCorasick.from_binary(self._binary)
+                if automaton is not None and fold and not automaton.fold:
+                    automaton = None
+            if automaton is not None:
+                self._matcher = TextMatcher([automaton])
+            elif build:
+                if self.keys is None:
+                    self._load_keys()
+                fold = fold or compiled_keys_fold(self.name)
+                self._matcher = TextMatcher.build(self.keys, fold)
+        return self._matcher
 
 
     def _binary_search(self, l, val, is_text_search=False):
@@ -227,22 +422,6 @@ class RRSDictionary(object):
         return False, ""
 
 
-    def _ucs4(self):
-        if len(u'\U00010800') == 1:
-            return True
-        return False
-
-
-    def _compile_keys(self, keys):
-        regular_expression = ["(?<![a-zA-Z0-9\-])("]
-        for key in keys:
-            regular_expression.append(re.escape(key))
-            regular_expression.append("|")
-        regular_expression = "".join(regular_expression).rstrip("|") + ")"
-        #compiled = None
-        compiled = re.compile(regular_expression)
-        return compiled
-
     #===========================================================================
     # def _save_dictionary(self):
     #    path = self.name + "/"
@@ -343,8 +522,7 @@ class RRSDictionary(object):
         """
         if not isinstance(key, basestring):
             raise RRSDictionaryError("Key has to be string or unicode.")
-        if self.keys is None: self._load_keys()
-        return self._binary_search(self.keys, key, True)[0]
+        return self._find(key) is not None
 
 
     def contains_value(self, value):
@@ -362,14 +540,52 @@ class RRSDictionary(object):
         return self._binary_search(self.values, value, True)[0]
 
 
+    def contains_many(self, keys):
+        """
+        Batch version of contains_key(): looks for all keys (list of strings,
+        e.g. words of a document) at once. Returns list of True/False (as
+        contains_key() would return) in order of the keys.
+        """
+        found = self._find_many(keys)
+        return [found[k] is not None for k in keys]
+
+
+    def translate_many(self, keys):
+        """
+        Batch version of translate(): returns list of translations (lists of
+        values, None for keys which are not in dictionary) in order of the
+        keys. Every distinct key is translated once.
+        """
+        if self.type != "dict":
+            raise RRSDictionaryError("RRSDictionary.translate_many() cannot be called "\
+                                     "on list dictionaries.")
+        found = self._find_many(keys)
+        translations = {}
+        for key in found.itervalues():
+            if key is None or key in translations:
+                continue
+            if self._binary is not None:
+                translations[key] = self._binary.translate(key)
+            else:
+                translations[key] = self._get_translations().get(key)
+        return [translations.get(found[k]) for k in keys]
+
+
     def text_search(self, text, force_bs=False, ret=RET_ORIG_TERM):
         """
         Looks in text for terms from dictionary.
         Returns list of found terms.
+
+        Text can be string or list (tuple) of words of already tokenised
+        text. Words are looked up in one batch (see contains_many()), for
+        dictionaries with more-word keys the words are joined by spaces.
         """
         # typechecking
-        if not isinstance(text, basestring):
-            raise RRSDictionaryError("Text has to be string or unicode.")
+        tokens = None
+        if isinstance(text, (list, tuple)):
+            tokens = text
+        elif not isinstance(text, basestring):
+            raise RRSDictionaryError("Text has to be string, unicode or list of words.")
         if not isinstance(force_bs, bool):
             raise RRSDictionaryError("Parameter force_bs has to be True or False.")
         if not isinstance(ret, bool):
@@ -379,26 +595,25 @@ class RRSDictionary(object):
         # if it is loaded dictionary with basic key format (one word), search
         # in a binary way, but sadly, this doesn't work with more-word keys..
         if self.simplekeys or force_bs == True:
-            # if keys not loaded yet, load it
-            if self.keys is None: self._load_keys()
-            # splitting into words
-            t = re.sub("[\"\(\)\[\]{}\,\.\+\!\?\:\;@#\$%\^&\*]", " ", text)
-            splitted = t.split(" ")
+            if tokens is None:
+                # splitting into words
+                t = re.sub("[\"\(\)\[\]{}\,\.\+\!\?\:\;@#\$%\^&\*]", " ", text)
+                tokens = t.split(" ")
+            tokens = [w for w in tokens if w]
             # searching
-            _buffer = []
-            for w in splitted:
-                res = self._binary_search(self.keys, w, True)
-                if res[0]:
-                    if ret:
-                        _buffer.append(w)
-                    else:
-                        _buffer.append(res[1])
-            return _buffer
+            found = self._find_many(tokens)
+            if ret:
+                return [w for w in tokens if found[w] is not None]
+            return [found[w] for w in tokens if found[w] is not None]
         else:
+            if tokens is not None:
+                text = " ".join(tokens)
             # because there are keys with more than one word in them, we have to
-            # use regular expressions.
-            if self.keys_compiled is None: self._load_compiled_keys()
-            return self.keys_compiled.findall(text)
+            # use automaton matching whole keys.
+            found = self._get_matcher().findall(text)
+            if self.sensitivity == FIRST_UPPER:
+                found = [w for w in found if not w[:1].islower()]
+            return found
 
 
     def translate(self, key):
@@ -406,48 +621,105 @@ class RRSDictionary(object):
         Translates key to it's values.
         Returns list of values.
         """
-        if self.keys is None:
-            self._load_keys()
-        res = self._binary_search(self.keys, key, True)
-        if not res[0]:
-            return None
-        else:
-            key = res[1]
-
         if not isinstance(key, basestring):
             raise RRSDictionaryError("Key has to be string or unicode.")
+        key = self._find(key)
+        if key is None:
+            return None
+
         if self.type != "dict":
             raise RRSDictionaryError("RRSDictionary.translate() cannot be called "\
                                      "on list dictionaries.")
-        self.st_char = key[0].lower()
-        if not self.st_char in self.dict:
-            if not self.st_char.isalpha():
-                self.st_char = "other"
-            self.dict[self.st_char] = self._load_translate(self.st_char)
-            if self.st_char in self.dict_added.keys():
-                for k in self.dict_added[self.st_char]:
-                    #if not k in self.dict[self.st_char].keys():
-                    if not self._binary_search(self.dict[self.st_char].keys(), k, False)[0]:
-                        self.dict[self.st_char][k] = self.dict_added[self.st_char][k]
-                    else:
-                        for val in self.dict_added[self.st_char][k]:
-                            if not self._binary_search(self.dict[self.st_char][k],
-                            val, False)[0]:
-                            #if val not in self.dict[self.st_char][k]:
-                                self.dict[self.st_char][k].append(val)
-        return self.dict[self.st_char][key]
+        if self._binary is not None:
+            return self._binary.translate(key)
+        return self._get_translations().get(key)
+
+
+    def prefetch(self, background=True):
+        """
+        Loads all translations of the dictionary (see
+        rrstranslation.TranslationStore.prefetch()). If background is True,
+        they are loaded by daemon thread, which is returned.
+        """
+        if self.type != "dict":
+            return None
+        return self._get_translations().prefetch(background)
 
 
     def key_startswith(self, s):
         """
         Returns list of keys which starts with specified char.
         """
+        if self.keys is None:
+            self._load_keys()
+        if isinstance(s, unicode):
+            s = s.encode("utf-8")
+        # keys are sorted, keys with the prefix are a continuous range
         res = []
-        for k in self.keys:
-            if k.startswith(s): res.append(k)
+        keys = self.keys
+        for i in xrange(bisect_left(keys, s), len(keys)):
+            if not keys[i].startswith(s):
+                break
+            res.append(keys[i])
         return res
 
 
+    def prefix_search(self, prefix, limit=None):
+        """
+        Returns list of keys which start with prefix, compared in normalised
+        form (case, diacritics and hyphens are ignored, see
+        rrskeyindex.normalize()). At most limit keys are returned.
+        """
+        if not isinstance(prefix, basestring):
+            raise RRSDictionaryError("Prefix has to be string or unicode.")
+        return self._get_key_index().prefix(prefix, limit)
+
+
+    def normalized_lookup(self, word):
+        """
+        Returns list of keys with the same normalised form as the word (e.g.
+        "NOVA-\nKOVA" finds key "Novakova" and the same name with
+        diacritics).
+        """
+        if not isinstance(word, basestring):
+            raise RRSDictionaryError("Word has to be string or unicode.")
+        return self._get_key_index().lookup(word)
+
+
+    def fuzzy_search(self, word, max_distance=1, limit=None):
+        """
+        Returns list of (key, distance) tuples of keys whose normalised form
+        is at most max_distance edits (inserted, deleted or substituted
+        characters) from normalised word, sorted by distance. Meant for words
+        mangled by OCR or pdf conversion.
+        """
+        if not isinstance(word, basestring):
+            raise RRSDictionaryError("Word has to be string or unicode.")
+        if not isinstance(max_distance, int) or max_distance < 0:
+            raise RRSDictionaryError("Maximal distance has to be non-negative integer.")
+        return self._get_key_index().fuzzy(word, max_distance, limit)
+
+
+    def preload(self):
+        """
+        Loads everything the lookups of the dictionary need (keys, hash
+        index, translations and automaton), so that the first lookups are
+        not slow. Call this before forking worker processes, so that the
+        workers share the loaded dictionary (copy-on-write) instead of
+        loading it each for its own.
+        """
+        if self._binary is not None:
+            self._binary.touch()
+            if self.sensitivity != CASE_SENSITIVE \
+            and not self._binary.has_section(FOLD_HASH_SECTION):
+                self._get_index(True)
+        else:
+            self._get_index(self.sensitivity != CASE_SENSITIVE)
+        self.prefetch(background=False)
+        if not self.simplekeys:
+            self._get_matcher()
+
+
     def change_sensitivity(self, sensitivity):
         """
         Changes case sensitivity of the dictionary.
@@ -455,12 +727,14 @@ class RRSDictionary(object):
             0 - CASE_SENSITIVE
             1 - CASE_INSENSITIVE
             2 - FIRST_UPPER
-        Case sensitivity works only for dictionaries which containins only
-        simple words.
+        Automaton of more-word keys is rebuilt on the next text_search().
         """
         if not isinstance(sensitivity, int) or sensitivity < 0 or sensitivity > 2:
             raise RRSDictionaryError("Sensitivity has to have values CASE_SENSITIVE,"\
                                      " CASE_INSENSITIVE or FIRST_UPPER.")
+        self._check_modifiable()
+        if (sensitivity != CASE_SENSITIVE) != (self.sensitivity != CASE_SENSITIVE):
+            self._matcher = None
         self.sensitivity = sensitivity
     #---------------------------------------------------------------------------
     # dictionary editing and manipulation
@@ -475,10 +749,16 @@ class RRSDictionary(object):
             raise RRSDictionaryError("Dictionary has to be instance of RRSDictionary.")
         if self.get_type() != d.get_type():
             raise RRSDictionaryError("Dictionaries has different types.")
+        self._check_modifiable()
+
+        # automaton of keys before extending (the other dictionary's automaton
+        # is added to it, nothing is rebuilt)
+        matcher = None
+        if not self.simplekeys or not d.is_simplekeys():
+            matcher = self._get_matcher()
 
         #extends keys
-        if self.keys is None:
-            self._load_keys()
+        self._unshare()
         self.keysize = len(self.keys)
         _new_keys = []
         for key in d.get_keys():
@@ -489,10 +769,12 @@ class RRSDictionary(object):
         self.keysize = len(self.keys)
 
         if self.type == 'dict':
-            self.dict = {}
-
-            #appends dictionary names to buffer for a possible translation
+            #appends translations of the dictionary as new layers
             self.extended_names.append(d.get_name())
+            for layer in d._translation_layers:
+                if layer not in self._translation_layers:
+                    self._translation_layers.append(layer)
+            self._translations = None
 
             #extends values
             if self.values is None:
@@ -507,29 +789,20 @@ class RRSDictionary(object):
             self.valuesize = len(self.values)
 
             #extends added dict
-            _ad = d.get_added_dict()
-            for st_char in _ad.keys():
-                if not self._binary_search(self.dict_added.keys(), st_char, False)[0]:
-                #if not st_char in self.dict_added.keys():
-                    self.dict_added[st_char] = _ad[st_char]
-                else:
-                    for key in _ad[st_char].keys():
-                        if not self._binary_search(self.dict_added[st_char].keys(),
-                        key, False)[0]:
-                        #if not key in self.dict_added[st_char].keys():
-                            self.dict_added[st_char][key] = _ad[st_char][key]
-                        else:
-                            for val in _ad[st_char][key]:
-                                if not self._binary_search(self.dict_added[st_char][key],
-                                val, False)[0]:
-                                #if val not in self.dict_added[st_char][key]:
-                                    self.dict_added[st_char][key].append(val)
-        #extends compiled keys and simplekey value
+            for st_char, shard in d.get_added_dict().iteritems():
+                added = self.dict_added.setdefault(st_char, {})
+                for key, values in shard.iteritems():
+                    if not key in added:
+                        added[key] = list(values)
+                    else:
+                        added[key].extend(v for v in values if v not in added[key])
+        #extends automaton and simplekey value
         if not d.is_simplekeys(): self.simplekeys = False
         if not self.simplekeys:
-            self.keys_compiled = self._compile_keys(self.keys)
+            matcher.extend(d._get_matcher())
+            self._matcher = matcher
         else:
-            self.keys_compiled = None
+            self._matcher = None
 
 #===============================================================================
 #
@@ -594,9 +867,11 @@ class RRSDictionary(object):
             raise RRSDictionaryError("Key has to be string or unicode.")
         if behaviour != ADD and behaviour != NOTHING:
             raise RRSDictionaryError("Behaviour value has to be ADD or NOTHING.")
+        self._check_modifiable()
 
-        if self.keys is None:
-            self._load_keys()
+        # load stored automaton before the binary file is abandoned
+        self._get_matcher(build=False)
+        self._unshare()
         self.keysize = len(self.keys)
 
         #check if still simplekeys:
@@ -629,21 +904,15 @@ class RRSDictionary(object):
                     self.values.sort()
 
             #adds relations to dict
-            st_char = key[0].lower()
-            if not st_char.isalpha():
-                st_char = "other"
-            if not self._binary_search(self.dict_added.keys(), st_char, False)[0]:
-            #if not st_char in self.dict_added.keys():
+            st_char = start_char(key)
+            if not st_char in self.dict_added:
                 self.dict_added[st_char] = {key:values}
             else:
-                if not self._binary_search(self.dict_added[st_char].keys(), key, False)[0]:
-                #if not key in self.dict_added[st_char].keys():
-                    self.dict_added[st_char] = {key:values}
+                if not key in self.dict_added[st_char]:
+                    self.dict_added[st_char][key] = values
                 else:
                     for val in values:
-                        if not self._binary_search(self.dict_added[st_char][key],
-                        val, False)[0]:
-                        #if val not in self.dict_added[st_char][key]:
+                        if val not in self.dict_added[st_char][key]:
                             self.dict_added[st_char][key].append(val)
 
         #adds to list
@@ -655,13 +924,17 @@ class RRSDictionary(object):
                 self.keys.append(key)
                 self.keys.sort()
                 self.keysize += 1
-        self.dict = {}
+        if self._translations is not None:
+            self._translations.clear()
 
-        #recompile regular expression if it's necessary
+        #add key to automaton if it's necessary
         if not self.simplekeys:
-            self.keys_compiled = self._compile_keys(self.keys)
+            if self._matcher is None:
+                self._get_matcher()
+            else:
+                self._matcher.add([key])
         else:
-            self.keys_compiled = None
+            self._matcher = None
 
 
 
@@ -670,7 +943,25 @@ class RRSDictionary(object):
 #-------------------------------------------------------------------------------
 
 if __name__ == '__main__':
-    d = RRSDictionary(CITIES)
-    s = ["ahojs", "cau"]
-    print d._binary_search(s, "ahoj", False)[0]
-    pass
+    # Benchmark of key lookup: bisection (used before the hash index) against
+    # contains_key() on name dictionaries. Probes are keys of the dictionary
+    # in different case and the same amount of words which are not there.
+    import random
+    import timeit
+    random.seed(0)
+    for name in (NAME_FF_CZ, NAME_FF_US, NAME_FM_XX, NAME_SM_CZ, NAME_S_US, NON_NAMES):
+        for sensitivity in (CASE_SENSITIVE, CASE_INSENSITIVE):
+            d = RRSDictionary(name, sensitivity)
+            keys = list(d.get_keys())
+            sample = random.sample(keys, min(2000, len(keys)))
+            probes = [k.upper() for k in sample[::2]] + sample[1::2] + \
+                     [k[::-1] + "x" for k in sample]
+            bisect = lambda: [d._binary_search(keys, p, True)[0] for p in probes]
+            lookup = lambda: [d.contains_key(p) for p in probes]
+            lookup() # build the index
+            tb = min(timeit.repeat(bisect, number=3, repeat=3)) / 3
+            tl = min(timeit.repeat(lookup, number=3, repeat=3)) / 3
+            print "%-32s %-6s %6d keys  bisection %7.2f us  hash %5.2f us  (found %d/%d)" % \
+                  (name, sensitivity and "ci" or "cs", len(keys),
+                   1e6 * tb / len(probes), 1e6 * tl / len(probes),
+                   sum(bisect()), sum(lookup()))
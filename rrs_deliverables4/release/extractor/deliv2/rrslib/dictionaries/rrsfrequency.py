@@ -0,0 +1,285 @@
+#!/usr/bin/env python
+
+"""
+Module rrsfrequency implements frequency dictionaries - dictionaries mapping
+keys to one number (bnc_*2frequency, firstname_*2frequency,
+surname_*2frequency).
+
+RRSDictionary keeps every value as list of strings in pickled translation
+shards, so a frequency costs a list, a string and a dict entry and the whole
+shard has to be unpickled to read it. FrequencyDictionary stores the keys in
+sorted string table and frequencies in packed uint32 array, both in binary
+file freq.rrsbin (format of module rrsbinary) in the directory of the
+dictionary:
+
+ * keys.offsets, keys.data, keys.hash, keys.foldhash - keys (see rrsbinary),
+ * freq.values - frequency of key i,
+ * freq.order - key indexes sorted by descending frequency (keys of equal
+   frequency by key), used by range() and top(),
+ * freq.scale - count of decimal places: frequencies which are not integers
+   (percentages of names) are stored in fixed point, value * 10^scale.
+
+The file is memory-mapped (shared by processes thanks to the page cache) or
+read into memory (use_mmap=False). It is created from existing dictionary by
+rrsdictcreator.convert_to_frequency() or from command line:
+    python rrsdictcreator.py --frequency path/to/dictionary [...]
+Dictionaries without the file are converted into temporary file when they
+are opened.
+
+Frequency of a key is the first value of the key in the source dictionary
+(the other values of BNC dictionaries are part-of-speech tags). Homographs of
+BNC dictionaries have the frequency of each part of speech, their frequency
+is the sum of them (see rrsdictcreator.convert_to_frequency()).
+"""
+
+__modulename__ = "rrsfrequency"
+__date__ = "$19.10.2026 21:14:36$"
+
+import itertools
+import os
+import re
+import tempfile
+
+from rrslib.dictionaries.rrsbinary import BinaryDictionary, BinaryWriter, \
+                                          open_binary, write_hash_tables, \
+                                          _encode, _uint_array
+from rrslib.dictionaries.rrsdictionary import CASE_SENSITIVE, FIRST_UPPER, \
+                                              RRSDictionaryError
+
+FREQUENCY_FILE = "freq.rrsbin"
+
+_MAX_UINT = 0xffffffff
+
+
+def _parse_number(s):
+    """
+    Returns (digits, decimal places) of non-negative decimal number s, e.g.
+    "0.0271" -> (271, 4).
+    """
+    s = s.strip()
+    whole, dot, fraction = s.partition(".")
+    if not (whole or fraction) or (whole and not whole.isdigit()) or \
+       (fraction and not fraction.isdigit()):
+        raise RRSDictionaryError("Frequency %r is not a non-negative number." % s)
+    return int(whole + fraction or "0"), len(fraction)
+
+
+def write_frequency(path, frequencies):
+    """
+    Writes frequency dictionary into binary file path. Frequencies is
+    mapping key -> frequency (number or string with decimal number).
+    """
+    parsed = {}
+    scale = 0
+    for key, freq in frequencies.iteritems():
+        if not isinstance(freq, basestring):
+            freq = repr(freq)
+        number, places = _parse_number(freq)
+        parsed[_encode(key)] = (number, places)
+        scale = max(scale, places)
+    keys = sorted(parsed)
+    values = []
+    for key in keys:
+        number, places = parsed[key]
+        number *= 10 ** (scale - places)
+        if number > _MAX_UINT:
+            raise RRSDictionaryError("Frequency of %s is too large." % key)
+        values.append(number)
+    order = sorted(xrange(len(keys)), key=lambda i: -values[i])
+
+    writer = BinaryWriter(path)
+    table = writer.string_table("keys")
+    for key in keys:
+        table.add(key)
+    table.close()
+    write_hash_tables(writer, keys)
+    writer.add_section("freq.values", _uint_array(values))
+    writer.add_section("freq.order", _uint_array(order))
+    writer.add_section("freq.scale", _uint_array([scale]))
+    return writer.close()
+
+
+class FrequencyDictionary(object):
+    """
+    Dictionary of frequencies (see module documentation). Keys are looked up
+    with given sensitivity and minimal length the same way as in
+    RRSDictionary.
+
+    Frequencies are returned as int, or as float if the dictionary has
+    decimal frequencies. Methods range() and top() return lists of
+    (key, frequency) tuples sorted by descending frequency.
+    """
+
+    def __init__(self, name, sensitivity=CASE_SENSITIVE, use_mmap=True):
+        if not isinstance(sensitivity, int) or sensitivity < 0 or sensitivity > 2:
+            raise RRSDictionaryError("Sensitivity has to have values CASE_SENSITIVE,"\
+                                     " CASE_INSENSITIVE or FIRST_UPPER.")
+        self.sensitivity = sensitivity
+        __dictpath = "/".join(__file__.split("/")[:-1])
+        self.name = __dictpath + "/" + name
+        try:
+            f_info = open(self.name + "/dict.info")
+        except IOError:
+            raise RRSDictionaryError("rrs_library doesn't contain any dictionary"\
+                                     " named " + self.name)
+        minkey = re.search('<min-key-length value="(\d+)"/>', f_info.read())
+        f_info.close()
+        self.mintextlen = minkey and int(minkey.group(1)) or 0
+        path = self.name + "/" + FREQUENCY_FILE
+        if os.path.isfile(path):
+            if use_mmap:
+                self._binary = open_binary(path)
+            else:
+                self._binary = BinaryDictionary(path, use_mmap=False)
+        else:
+            self._binary = self._convert()
+        self.keys = self._binary.keys
+        self._values = self._binary.uint_array("freq.values")
+        self._order = self._binary.uint_array("freq.order")
+        self.scale = self._binary.uint_array("freq.scale")[0]
+        self._fold = sensitivity != CASE_SENSITIVE
+        self.shared = False
+
+
+    def _convert(self):
+        # dictionary without frequency file is converted into temporary file,
+        # which is read into memory
+        from rrslib.dictionaries.rrsdictcreator import convert_to_frequency
+        fd, tmp = tempfile.mkstemp(suffix=".rrsbin")
+        os.close(fd)
+        try:
+            convert_to_frequency(self.name, tmp)
+            return BinaryDictionary(tmp, use_mmap=False)
+        finally:
+            os.remove(tmp)
+
+
+    def _number(self, value):
+        if self.scale:
+            return value / float(10 ** self.scale)
+        return int(value)
+
+
+    def _stored(self, number, up):
+        # converts number into stored (fixed point) value, rounded up or down
+        value = number * 10 ** self.scale
+        if abs(value - round(value)) < 1e-6:
+            # 0.0271 * 10^4 is 270.99999999999997
+            return int(round(value))
+        stored = int(value)
+        if up:
+            stored += 1
+        return stored
+
+
+    def _find(self, key):
+        if not isinstance(key, basestring):
+            raise RRSDictionaryError("Key has to be string or unicode.")
+        if len(key) < self.mintextlen:
+            return -1
+        if self.sensitivity == FIRST_UPPER and key and key[0].isalpha() \
+           and key[0].islower():
+            return -1
+        return self._binary.find_key(key, self._fold)
+
+
+    def __len__(self):
+        return len(self.keys)
+
+
+    def __contains__(self, key):
+        return self._find(key) >= 0
+
+
+    def contains_key(self, key):
+        """
+        Returns True if the key is in the dictionary.
+        """
+        return self._find(key) >= 0
+
+
+    def frequency(self, key, default=None):
+        """
+        Returns frequency of the key or default if the key is not in the
+        dictionary.
+        """
+        i = self._find(key)
+        if i < 0:
+            return default
+        return self._number(self._values[i])
+
+
+    def frequencies_many(self, keys, default=None):
+        """
+        Batch version of frequency(): returns list of frequencies of the keys
+        (default for keys which are not in the dictionary). Every distinct key
+        is looked up once.
+        """
+        found = {}
+        for key in keys:
+            if key not in found:
+                found[key] = self.frequency(key, default)
+        return [found[key] for key in keys]
+
+
+    def _position(self, value):
+        # index of the first key in order with frequency lower than value
+        lo, hi = 0, len(self._order)
+        order, values = self._order, self._values
+        while lo < hi:
+            mid = (lo + hi) // 2
+            if values[order[mid]] >= value:
+                lo = mid + 1
+            else:
+                hi = mid
+        return lo
+
+
+    def range(self, low=None, high=None):
+        """
+        Returns keys with frequency between low and high (both inclusive,
+        None means unbounded).
+        """
+        start = 0
+        if high is not None:
+            start = self._position(self._stored(high, False) + 1)
+        end = len(self._order)
+        if low is not None:
+            end = self._position(self._stored(low, True))
+        return self._items(start, end)
+
+
+    def top(self, k):
+        """
+        Returns k most frequent keys.
+        """
+        return self._items(0, min(max(k, 0), len(self._order)))
+
+
+    def _items(self, start, end):
+        keys, values, order = self.keys, self._values, self._order
+        result = []
+        for j in xrange(start, end):
+            i = order[j]
+            result.append((keys[i], self._number(values[i])))
+        return result
+
+
+    def iteritems(self):
+        """
+        Iterates (key, frequency) tuples in order of keys.
+        """
+        number = self._number
+        for key, value in itertools.izip(self.keys, self._values):
+            yield key, number(value)
+
+
+    def preload(self):
+        """
+        Reads whole file of the dictionary (see RRSDictionary.preload()).
+        """
+        self._binary.touch()
+
+#-------------------------------------------------------------------------------
+# End of class FrequencyDictionary
+#-------------------------------------------------------------------------------
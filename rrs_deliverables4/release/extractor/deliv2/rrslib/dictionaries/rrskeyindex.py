@@ -0,0 +1,247 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+Module rrskeyindex implements index of dictionary keys for tolerant matching
+of words coming from converted documents (OCR errors, words hyphenated at the
+end of line, missing diacritics):
+
+ * prefix enumeration (keys starting with given prefix),
+ * lookup of normalised keys (see normalize()),
+ * lookup of keys within bounded edit (Levenshtein) distance.
+
+Index consists of sorted table of distinct normalised keys and for every
+normalised key list of indexes of keys it was made of. Sorted table is trie
+flattened in lexicographic order: keys sharing prefix of length d are a
+continuous range of the table and children of the prefix are subranges with
+the same character at position d, found by bisection. Edit distance lookup
+walks this implicit trie depth first, computing one row of Levenshtein matrix
+per trie node and skipping subtrees whose row exceeds the maximal distance,
+so only a small part of the keys is visited.
+
+Index is stored in sections of binary dictionary (module rrsbinary):
+ * norm.offsets, norm.data - sorted table of normalised keys,
+ * norm.index, norm.ids - indexes of keys of normalised key i are
+   norm.ids[norm.index[i]:norm.index[i+1]].
+Dictionaries without the sections build the index in memory on the first
+use.
+
+Distances are counted in bytes of utf-8 encoded normalised keys, which are
+plain ascii letters for latin names (diacritics are removed).
+"""
+
+__modulename__ = "rrskeyindex"
+__date__ = "$19.10.2026 22:05:17$"
+
+import array
+import re
+import sys
+import unicodedata
+from bisect import bisect_left
+
+from rrslib.dictionaries.rrsmatcher import to_unicode
+
+SECTION_PREFIX = "norm."
+
+# hyphens (with line break after them) are removed, other white spaces are
+# joined into one space
+_HYPHENS_RE = re.compile(u"[\\-\u00ad\u2010\u2011\u2012\u2013]\\s*", re.U)
+_SPACES_RE = re.compile(u"\\s+", re.U)
+# letters which have no decomposition in unicode
+_LETTERS = {u"ł": u"l", u"ø": u"o", u"đ": u"d", u"ß": u"ss",
+            u"æ": u"ae", u"œ": u"oe", u"ı": u"i", u"þ": u"th",
+            u"ð": u"d", u"ħ": u"h"}
+
+
+def normalize(s):
+    """
+    Returns normalised form of the string (utf-8 byte string): lowercase,
+    without diacritics and hyphens, compatibility characters (ligatures) are
+    decomposed and white spaces are joined into one space.
+    """
+    s = to_unicode(s).lower()
+    s = _HYPHENS_RE.sub(u"", s)
+    try:
+        s.encode("ascii")
+    except UnicodeEncodeError:
+        s = unicodedata.normalize("NFKD", s)
+        s = u"".join([_LETTERS.get(c, c) for c in s if not unicodedata.combining(c)])
+    return _SPACES_RE.sub(u" ", s).strip().encode("utf-8")
+
+
+def _new_uint_array(values=()):
+    a = array.array('I', values)
+    if a.itemsize != 4:
+        a = array.array('L', values)
+    return a
+
+
+def _uint_data(a):
+    if sys.byteorder != 'little':
+        a = array.array(a.typecode, a)
+        a.byteswap()
+    return a.tostring()
+
+
+class KeyIndex(object):
+    """
+    Index of normalised keys (see module documentation). Keys is sorted
+    sequence of keys of the dictionary (list or rrsbinary.StringTable),
+    norms sorted sequence of distinct normalised keys, ids of keys of
+    norms[i] are ids[index[i]:index[i+1]].
+    """
+    def __init__(self, keys, norms, index, ids):
+        self.keys = keys
+        self.norms = norms
+        self.index = index
+        self.ids = ids
+        self._norm_list = None
+
+
+    @classmethod
+    def build(cls, keys):
+        """
+        Builds index of keys (sorted and encoded the same way as keys of
+        binary dictionary).
+        """
+        keys = sorted(set(k.encode("utf-8") if isinstance(k, unicode) else k
+                          for k in keys))
+        groups = {}
+        for i, k in enumerate(keys):
+            groups.setdefault(normalize(k), []).append(i)
+        norms = sorted(groups)
+        index = _new_uint_array([0])
+        ids = _new_uint_array()
+        for n in norms:
+            ids.extend(groups[n])
+            index.append(len(ids))
+        return cls(keys, norms, index, ids)
+
+
+    @classmethod
+    def from_binary(cls, binary):
+        """
+        Loads index from sections of BinaryDictionary (see to_sections()).
+        Returns None if the dictionary has no index.
+        """
+        if not binary.has_section(SECTION_PREFIX + "index"):
+            return None
+        return cls(binary.keys, binary.string_table("norm"),
+                   binary.uint_array(SECTION_PREFIX + "index"),
+                   binary.uint_array(SECTION_PREFIX + "ids"))
+
+
+    def to_sections(self):
+        """
+        Returns list of (name, data) sections for rrsbinary.write_binary().
+        """
+        offsets = _new_uint_array([0])
+        pos = 0
+        for n in self.norms:
+            pos += len(n)
+            offsets.append(pos)
+        return [(SECTION_PREFIX + "offsets", _uint_data(offsets)),
+                (SECTION_PREFIX + "data", "".join(self.norms)),
+                (SECTION_PREFIX + "index", _uint_data(_new_uint_array(self.index))),
+                (SECTION_PREFIX + "ids", _uint_data(_new_uint_array(self.ids)))]
+
+
+    def _keys_of(self, i):
+        keys = self.keys
+        return [keys[j] for j in self.ids[self.index[i]:self.index[i + 1]]]
+
+
+    def _prefix_range(self, prefix, lo=0, hi=None):
+        # range of norms starting with prefix
+        if hi is None:
+            hi = len(self.norms)
+        start = bisect_left(self.norms, prefix, lo, hi)
+        if not prefix:
+            return start, hi
+        last = prefix[-1]
+        if last == "\xff":
+            end = start
+            while end < hi and self.norms[end].startswith(prefix):
+                end += 1
+            return start, end
+        return start, bisect_left(self.norms, prefix[:-1] + chr(ord(last) + 1), start, hi)
+
+
+    def lookup(self, word):
+        """
+        Returns keys with the same normalised form as the word.
+        """
+        n = normalize(word)
+        i = bisect_left(self.norms, n)
+        if i < len(self.norms) and self.norms[i] == n:
+            return self._keys_of(i)
+        return []
+
+
+    def prefix(self, prefix, limit=None):
+        """
+        Returns keys whose normalised form starts with normalised prefix (in
+        order of normalised keys), at most limit keys.
+        """
+        start, end = self._prefix_range(normalize(prefix))
+        result = []
+        for i in xrange(start, end):
+            result.extend(self._keys_of(i))
+            if limit is not None and len(result) >= limit:
+                return result[:limit]
+        return result
+
+
+    def fuzzy(self, word, max_distance=1, limit=None):
+        """
+        Returns list of (key, distance) of keys whose normalised form is
+        within max_distance edits (insertion, deletion, substitution) from
+        normalised word, sorted by distance and key.
+        """
+        target = normalize(word)
+        found = []
+        if self._norm_list is None:
+            # the walk reads many strings of the table, reading them from
+            # list is much faster than from mapped file
+            self._norm_list = list(self.norms)
+        norms = self._norm_list
+        # stack of (prefix, start, end, row of Levenshtein matrix)
+        stack = [("", 0, len(norms), range(len(target) + 1))]
+        while stack:
+            prefix, start, end, row = stack.pop()
+            depth = len(prefix)
+            if start < end and len(norms[start]) == depth:
+                # the prefix itself is normalised key
+                if row[-1] <= max_distance:
+                    found.append((row[-1], start))
+                start += 1
+            while start < end:
+                c = norms[start][depth]
+                child = prefix + c
+                if c == "\xff":
+                    cend = start
+                    while cend < end and norms[cend].startswith(child):
+                        cend += 1
+                else:
+                    cend = bisect_left(norms, prefix + chr(ord(c) + 1), start, end)
+                new = [row[0] + 1]
+                for j in xrange(1, len(row)):
+                    cost = row[j - 1]
+                    if target[j - 1] != c:
+                        cost += 1
+                    new.append(min(new[j - 1] + 1, row[j] + 1, cost))
+                if min(new) <= max_distance:
+                    stack.append((child, start, cend, new))
+                start = cend
+        result = []
+        for distance, i in found:
+            for key in self._keys_of(i):
+                result.append((key, distance))
+        result.sort(key=lambda item: (item[1], item[0]))
+        if limit is not None:
+            return result[:limit]
+        return result
+
+#-------------------------------------------------------------------------------
+# End of class KeyIndex
+#-------------------------------------------------------------------------------
@@ -0,0 +1,336 @@
+#!/usr/bin/env python
+
+"""
+Module rrsmatcher implements multi-pattern matching used by
+RRSDictionary.text_search() for dictionaries with more-word keys.
+
+Keys are compiled into Aho-Corasick automaton, so the text is scanned once
+and the time of the search depends on the length of the text, not on the
+count of keys (one alternation regular expression of thousands of keys used
+to be tried at every position of the text).
+
+Matches have to be whole words: the characters before and after the match
+must not be letters, digits or hyphen. Of overlapping matches, the leftmost
+and then the longest one is returned.
+
+Results differ from the regular expressions (?<![a-zA-Z0-9\-])(key1|key2...)
+(?![a-zA-Z0-9\-]) compiled by older versions (keys_compiled.rrsdict):
+ - the expression returned the first key of the alternation which matched
+   at the position, not the longest one (project_acronym2title found "COST"
+   in "COST ACTION 623", the automaton finds "COST ACTION 623"),
+ - expressions of non_names and country2continent had only the lookbehind
+   and matched prefixes of words too ("WE" in "WEB"), the automaton
+   doesn't,
+ - case insensitive expressions folded only ASCII letters.
+
+Automata ignore case if the expression compiled by older versions of the
+dictionary did (see compiled_keys_fold()) or if the dictionary is not case
+sensitive.
+
+Automaton is stored in arrays, which can be saved as sections of binary
+dictionary (module rrsbinary) and loaded without rebuilding. TextMatcher can
+be extended by other automata or keys without rebuilding the automata it
+already contains.
+"""
+
+__modulename__ = "rrsmatcher"
+__date__ = "$19.10.2026 17:40:51$"
+
+import array
+import cPickle
+import os
+import re
+import struct
+import sys
+from bisect import bisect_left
+from collections import deque
+
+SECTION_PREFIX = "match."
+COMPILED_KEYS_FILE = "keys_compiled.rrsdict"
+_ARRAYS = ("index", "chars", "next", "fail", "out", "link")
+
+# characters which can't surround the match
+WORD_CHARS = frozenset(u"abcdefghijklmnopqrstuvwxyzABCDEFGHIJKLMNOPQRSTUVWXYZ0123456789-")
+
+
+def to_unicode(s):
+    """
+    Decodes byte string from utf-8, or iso-8859-1 if it is not valid utf-8
+    (keys of some dictionaries are in latin-1).
+    """
+    if isinstance(s, unicode):
+        return s
+    try:
+        return s.decode("utf-8")
+    except UnicodeDecodeError:
+        return s.decode("iso-8859-1")
+
+
+def _pattern_flags(module, name):
+    if (module, name) != ("re", "_compile"):
+        raise cPickle.UnpicklingError("%s.%s is not a regular expression" % (module, name))
+    return lambda pattern, flags: flags
+
+
+def compiled_keys_fold(path):
+    """
+    Returns True if the regular expression of keys, which older versions
+    pickled into keys_compiled.rrsdict in directory path, ignored case. Only
+    the flags are read, the expression isn't compiled.
+    """
+    fname = os.path.join(path, COMPILED_KEYS_FILE)
+    if not os.path.isfile(fname):
+        return False
+    f = open(fname, "rb")
+    try:
+        unpickler = cPickle.Unpickler(f)
+        unpickler.find_global = _pattern_flags
+        return bool(unpickler.load() & re.IGNORECASE)
+    finally:
+        f.close()
+
+
+def _uint_array(data=None):
+    a = array.array('I')
+    if a.itemsize != 4:
+        a = array.array('L')
+    if data is not None:
+        a.fromstring(data)
+        if sys.byteorder != 'little':
+            a.byteswap()
+    return a
+
+
+class AhoCorasick(object):
+    """
+    Aho-Corasick automaton of keys. Transitions of state s are stored in
+    chars[index[s]:index[s+1]] (sorted) and next[index[s]:index[s+1]], fail
+    is the failure function, out[s] is length of the key ending in state s
+    (0 if none) and link[s] is the nearest state on the failure path with
+    nonzero out.
+    """
+    def __init__(self, arrays, fold=False):
+        (self.index, self.chars, self.next, self.fail,
+         self.out, self.link) = arrays
+        self.fold = fold
+        lo, hi = self.index[0], self.index[1]
+        self._root = dict(zip(self.chars[lo:hi], self.next[lo:hi]))
+
+
+    @classmethod
+    def build(cls, keys, fold=False):
+        """
+        Builds automaton of the keys. If fold is True, keys and texts are
+        compared case-insensitively.
+        """
+        goto = [{}]
+        out = [0]
+        for key in keys:
+            key = to_unicode(key)
+            if fold:
+                key = key.lower()
+            if not key:
+                continue
+            s = 0
+            for ch in key:
+                c = ord(ch)
+                t = goto[s].get(c)
+                if t is None:
+                    t = len(goto)
+                    goto[s][c] = t
+                    goto.append({})
+                    out.append(0)
+                s = t
+            out[s] = len(key)
+
+        n = len(goto)
+        fail = [0] * n
+        link = [0] * n
+        queue = deque(goto[0].itervalues())
+        while queue:
+            s = queue.popleft()
+            for c, t in goto[s].iteritems():
+                f = fail[s]
+                while f and c not in goto[f]:
+                    f = fail[f]
+                if s:
+                    fail[t] = goto[f].get(c, 0)
+                if out[fail[t]]:
+                    link[t] = fail[t]
+                else:
+                    link[t] = link[fail[t]]
+                queue.append(t)
+
+        index, chars, nxt = [0], [], []
+        for edges in goto:
+            for c in sorted(edges):
+                chars.append(c)
+                nxt.append(edges[c])
+            index.append(len(chars))
+        arrays = []
+        for a in (index, chars, nxt, fail, out, link):
+            ua = _uint_array()
+            ua.extend(a)
+            arrays.append(ua)
+        return cls(arrays, fold)
+
+
+    @classmethod
+    def from_binary(cls, binary):
+        """
+        Loads automaton from sections of BinaryDictionary (see to_sections()).
+        Returns None if the dictionary has no automaton.
+        """
+        if not binary.has_section(SECTION_PREFIX + "index"):
+            return None
+        buf = binary.get_buffer()
+        arrays = []
+        for name in _ARRAYS:
+            pos, length = binary.section(SECTION_PREFIX + name)
+            arrays.append(_uint_array(buf[pos:pos + length]))
+        pos, length = binary.section(SECTION_PREFIX + "flags")
+        fold = struct.unpack_from("<I", buf, pos)[0] & 1 == 1
+        return cls(arrays, fold)
+
+
+    def to_sections(self):
+        """
+        Returns list of (name, data) sections for rrsbinary.write_binary().
+        """
+        sect = []
+        for name in _ARRAYS:
+            a = getattr(self, name)
+            if sys.byteorder != 'little':
+                a = array.array(a.typecode, a)
+                a.byteswap()
+            sect.append((SECTION_PREFIX + name, a.tostring()))
+        sect.append((SECTION_PREFIX + "flags", struct.pack("<I", int(self.fold))))
+        return sect
+
+
+    def iter_matches(self, text):
+        """
+        Yields (start, end) of all occurrences of keys in unicode text
+        (overlapping too, without checking word boundaries).
+        """
+        if self.fold:
+            text = text.lower()
+        index, chars, nxt = self.index, self.chars, self.next
+        fail, out, link = self.fail, self.out, self.link
+        root = self._root
+        s = 0
+        for pos, ch in enumerate(text):
+            c = ord(ch)
+            if s == 0:
+                s = root.get(c, 0)
+                if not s:
+                    continue
+            else:
+                while True:
+                    lo, hi = index[s], index[s + 1]
+                    i = bisect_left(chars, c, lo, hi)
+                    if i < hi and chars[i] == c:
+                        s = nxt[i]
+                        break
+                    s = fail[s]
+                    if s == 0:
+                        s = root.get(c, 0)
+                        break
+            t = s if out[s] else link[s]
+            while t:
+                yield pos + 1 - out[t], pos + 1
+                t = link[t]
+
+#-------------------------------------------------------------------------------
+# End of class AhoCorasick
+#-------------------------------------------------------------------------------
+
+
+class TextMatcher(object):
+    """
+    Finds keys of the dictionary in texts (see module documentation).
+    TextMatcher consists of one or more automata; extend() and add() append
+    new automata instead of rebuilding the existing ones.
+    """
+    def __init__(self, automata=()):
+        self.automata = list(automata)
+
+
+    @classmethod
+    def build(cls, keys, fold=False):
+        return cls([AhoCorasick.build(keys, fold)])
+
+
+    def extend(self, other):
+        """
+        Adds automata of other TextMatcher.
+        """
+        for a in other.automata:
+            if a not in self.automata:
+                self.automata.append(a)
+
+
+    def add(self, keys, fold=None):
+        """
+        Adds keys (builds automaton only of these keys). If fold is None,
+        case sensitivity of the first automaton is used.
+        """
+        if fold is None:
+            fold = bool(self.automata) and self.automata[0].fold
+        self.automata.append(AhoCorasick.build(keys, fold))
+
+
+    def finditer(self, text):
+        """
+        Returns sorted list of (start, end) of non-overlapping whole-word
+        matches in unicode text.
+        """
+        tlen = len(text)
+        candidates = []
+        for a in self.automata:
+            for start, end in a.iter_matches(text):
+                if start > 0 and text[start - 1] in WORD_CHARS:
+                    continue
+                if end < tlen and text[end] in WORD_CHARS:
+                    continue
+                candidates.append((start, -end))
+        candidates.sort()
+        result = []
+        last = 0
+        for start, end in candidates:
+            if start >= last:
+                result.append((start, -end))
+                last = -end
+        return result
+
+
+    def findall(self, text):
+        """
+        Returns list of found keys as they are written in the text. Byte
+        string text is decoded from utf-8 and found keys are encoded back. If
+        the text is not valid utf-8, it is decoded line by line and lines
+        which are not valid utf-8 are decoded from iso-8859-1 (see
+        to_unicode()), so that stray bytes don't spoil the rest of the text.
+        """
+        if isinstance(text, unicode):
+            return [text[s:e] for s, e in self.finditer(text)]
+        try:
+            utext = text.decode("utf-8")
+        except UnicodeDecodeError:
+            pass
+        else:
+            return [utext[s:e].encode("utf-8") for s, e in self.finditer(utext)]
+        found = []
+        for line in text.splitlines(True):
+            try:
+                uline = line.decode("utf-8")
+                enc = "utf-8"
+            except UnicodeDecodeError:
+                uline = line.decode("iso-8859-1")
+                enc = "iso-8859-1"
+            found.extend(uline[s:e].encode(enc) for s, e in self.finditer(uline))
+        return found
+
+#-------------------------------------------------------------------------------
+# End of class TextMatcher
+#-------------------------------------------------------------------------------
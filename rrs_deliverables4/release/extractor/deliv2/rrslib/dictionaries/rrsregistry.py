@@ -0,0 +1,488 @@
+#!/usr/bin/env python
+
+"""
+Module rrsregistry keeps dictionaries shared by all components of the process.
+
+Extractors and classifiers used to create their own RRSDictionary instances,
+so one dictionary was loaded as many times as there were components using it,
+and joined dictionaries (e.g. countries and cities) were merged by
+RRSDictionary.extend() in every component. Dictionaries obtained by
+get_dictionary() (and frequency dictionaries obtained by
+get_frequency_dictionary(), see module rrsfrequency) are loaded once per
+process and sensitivity and shared by all components. Shared dictionaries can't be modified (extend(), add() and
+change_sensitivity() raise RRSDictionaryError), create your own RRSDictionary
+if you need to modify it.
+
+Dictionaries which are used together are defined as merged views
+(MERGED_VIEWS). The merged view is precomputed when the dictionaries are
+built:
+    python rrsregistry.py --build-merged [view ...]
+creates dictionary merged_<view> (see rrsdictcreator.merge_dictionaries()).
+If the precomputed dictionary doesn't exist or is older than the
+dictionaries it was made of, the view is merged by extend() when it's loaded.
+
+Groups of dictionaries whose keys are classified together (first names,
+surnames and non-names for name recognition) are defined as class views
+(CLASS_VIEWS). Class index of the view maps key to bitmask of groups
+containing it (see rrsdictcreator.build_class_index()), so one lookup
+replaces lookups in all dictionaries of the view. It is precomputed by
+    python rrsregistry.py --build-classes [view ...]
+and get_class_index() returns None if it isn't built or is outdated.
+
+Not all dictionaries of the views are shipped with the library (e.g. Czech
+and US male first names). Views are merged, indexed and loaded from the
+shipped dictionaries only, missing members are skipped with a warning (see
+shipped()).
+
+Cities are resolved up to the continent by geographic hierarchy table
+(GEO_HIERARCHY, city -> [woeid, country, country woeid, continent], see
+rrsdictcreator.build_geo_hierarchy()) instead of the chain of translations
+through GEO_SOURCES. It is precomputed by
+    python rrsregistry.py --build-geo
+and get_geo_hierarchy() returns None if it isn't built or is outdated.
+
+Before forking worker processes, call warm_up() to load the dictionaries the
+workers will use. The workers then share the loaded dictionaries with the
+parent (copy-on-write) instead of loading them each for its own. Function
+stats() returns time and memory used by loading of each dictionary.
+"""
+
+__modulename__ = "rrsregistry"
+__date__ = "$19.10.2026 19:02:37$"
+
+import os
+import resource
+import sys
+import threading
+import time
+import warnings
+
+from rrslib.dictionaries.rrsdictionary import *
+from rrslib.dictionaries.rrsfrequency import FrequencyDictionary
+
+
+# merged views
+LOCATIONS = "locations"
+NAMES = "names"
+NON_NAMES_ALL = "non_names_all"
+
+MERGED_VIEWS = {
+    LOCATIONS: (COUNTRIES, CITIES),
+    NAMES: (NAME_FF_CZ, NAME_FM_CZ, NAME_FF_US, NAME_FM_US, NAME_FF_XX,
+            NAME_FM_XX, NAME_SF_CZ, NAME_SM_CZ, NAME_S_US),
+    NON_NAMES_ALL: (NON_NAMES, NON_SURNAMES),
+}
+
+# precomputed merged view is stored as dictionary MERGED_PREFIX + view
+MERGED_PREFIX = "merged_"
+
+# class views: groups of dictionaries, bit i of class of key is set if the
+# key is in some dictionary of group i
+NAME_CLASSES = "names"
+
+CLASS_VIEWS = {
+    NAME_CLASSES: ((NAME_FF_CZ, NAME_FM_CZ, NAME_FF_US, NAME_FM_US, NAME_FF_XX,
+                    NAME_FM_XX),
+                   (NAME_SF_CZ, NAME_SM_CZ, NAME_S_US),
+                   (NON_NAMES,)),
+}
+
+# class index of view is stored as dictionary CLASSES_PREFIX + view
+CLASSES_PREFIX = "classes_"
+
+# geographic hierarchy table and dictionaries it is resolved from
+GEO_HIERARCHY = "geo_hierarchy"
+GEO_SOURCES = (CITY2WOEID, WOEID2COUNTRY, COUNTRY2CWOEID, CWOEID2CONTINENT)
+
+DICTIONARY_DIR = os.path.dirname(os.path.abspath(__file__))
+
+
+def _rss():
+    """
+    Returns resident set size of the process in bytes (maximal RSS if the
+    current one is not available).
+    """
+    try:
+        f = open("/proc/self/statm")
+        try:
+            return int(f.read().split()[1]) * resource.getpagesize()
+        finally:
+            f.close()
+    except (IOError, IndexError, ValueError):
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+
+
+def _mtime(name):
+    path = os.path.join(DICTIONARY_DIR, name)
+    times = [os.path.getmtime(os.path.join(path, f)) for f in os.listdir(path)]
+    return max(times)
+
+
+def is_shipped(name):
+    """
+    Returns True if the library contains dictionary of given name.
+    """
+    return os.path.isfile(os.path.join(DICTIONARY_DIR, name, "dict.info"))
+
+
+def shipped(names):
+    """
+    Returns names of dictionaries (in given order) which the library
+    contains. Missing dictionaries are skipped with a warning.
+    """
+    result = []
+    for name in names:
+        if is_shipped(name):
+            result.append(name)
+        else:
+            warnings.warn("rrs_library doesn't contain dictionary %s, it is "
+                          "skipped." % name, RuntimeWarning, stacklevel=2)
+    return result
+
+
+def _view_groups(view):
+    # shipped dictionaries of groups of class view
+    return [shipped(group) for group in CLASS_VIEWS[view]]
+
+
+def merged_dictionary_name(view):
+    return MERGED_PREFIX + view
+
+
+def is_merged_built(view):
+    """
+    Returns True if the merged view is precomputed and newer than all
+    dictionaries it is made of.
+    """
+    name = merged_dictionary_name(view)
+    if not os.path.isfile(os.path.join(DICTIONARY_DIR, name, "dict.info")):
+        return False
+    try:
+        sources = max(_mtime(n) for n in shipped(MERGED_VIEWS[view]))
+    except OSError:
+        return False
+    return _mtime(name) >= sources
+
+
+def build_merged(views=None):
+    """
+    Precomputes merged views (all if views is None). Returns list of paths
+    of created dictionaries.
+    """
+    from rrslib.dictionaries.rrsdictcreator import merge_dictionaries
+    if views is None:
+        views = sorted(MERGED_VIEWS)
+    created = []
+    for view in views:
+        if view not in MERGED_VIEWS:
+            raise RRSDictionaryError("Unknown merged view %s." % view)
+        paths = [os.path.join(DICTIONARY_DIR, n) for n in shipped(MERGED_VIEWS[view])]
+        created.append(merge_dictionaries(paths,
+                       os.path.join(DICTIONARY_DIR, merged_dictionary_name(view))))
+    return created
+
+
+def class_index_name(view):
+    return CLASSES_PREFIX + view
+
+
+def is_class_index_built(view):
+    """
+    Returns True if the class index of the view is precomputed and newer
+    than all dictionaries it is made of.
+    """
+    name = class_index_name(view)
+    if not os.path.isfile(os.path.join(DICTIONARY_DIR, name, "dict.info")):
+        return False
+    try:
+        sources = max(_mtime(n) for group in _view_groups(view) for n in group)
+    except OSError:
+        return False
+    return _mtime(name) >= sources
+
+
+def build_class_indexes(views=None):
+    """
+    Precomputes class indexes of class views (all if views is None).
+    Returns list of paths of created dictionaries.
+    """
+    from rrslib.dictionaries.rrsdictcreator import build_class_index
+    if views is None:
+        views = sorted(CLASS_VIEWS)
+    created = []
+    for view in views:
+        if view not in CLASS_VIEWS:
+            raise RRSDictionaryError("Unknown class view %s." % view)
+        groups = [[os.path.join(DICTIONARY_DIR, n) for n in group]
+                  for group in _view_groups(view)]
+        created.append(build_class_index(groups,
+                       os.path.join(DICTIONARY_DIR, class_index_name(view))))
+    return created
+
+
+def is_geo_hierarchy_built():
+    """
+    Returns True if the geographic hierarchy table is precomputed and newer
+    than all dictionaries it is resolved from.
+    """
+    if not os.path.isfile(os.path.join(DICTIONARY_DIR, GEO_HIERARCHY, "dict.info")):
+        return False
+    try:
+        sources = max(_mtime(n) for n in GEO_SOURCES)
+    except OSError:
+        return False
+    return _mtime(GEO_HIERARCHY) >= sources
+
+
+def build_geo_hierarchy():
+    """
+    Precomputes the geographic hierarchy table. Returns path of created
+    dictionary.
+    """
+    from rrslib.dictionaries.rrsdictcreator import build_geo_hierarchy
+    sources = [RRSDictionary(n, CASE_INSENSITIVE) for n in GEO_SOURCES]
+    return build_geo_hierarchy(*(sources + [os.path.join(DICTIONARY_DIR,
+                                                         GEO_HIERARCHY)]))
+
+
+class DictionaryRegistry(object):
+    """
+    Registry of shared dictionaries (see module documentation). Dictionaries
+    are identified by name (or name of merged view) and sensitivity.
+    """
+    def __init__(self):
+        self._dicts = {}
+        self._stats = {}
+        self._lock = threading.RLock()
+
+
+    def _load(self, name, sensitivity):
+        if name not in MERGED_VIEWS:
+            return RRSDictionary(name, sensitivity), None
+        if is_merged_built(name):
+            return RRSDictionary(merged_dictionary_name(name), sensitivity), \
+                   merged_dictionary_name(name)
+        sources = shipped(MERGED_VIEWS[name])
+        d = RRSDictionary(sources[0], sensitivity)
+        for source in sources[1:]:
+            d.extend(RRSDictionary(source, sensitivity))
+        return d, "extend"
+
+
+    def get(self, name, sensitivity=CASE_SENSITIVE):
+        """
+        Returns shared dictionary of given name (name of dictionary or merged
+        view) and sensitivity. The dictionary is loaded on the first call.
+        """
+        return self._get((name, sensitivity),
+                         lambda: self._load(name, sensitivity))
+
+
+    def get_frequency(self, name, sensitivity=CASE_SENSITIVE):
+        """
+        Returns shared frequency dictionary (see module rrsfrequency) of given
+        name and sensitivity.
+        """
+        return self._get((name, sensitivity, "frequency"),
+                         lambda: (FrequencyDictionary(name, sensitivity), None))
+
+
+    def get_class_index(self, view):
+        """
+        Returns shared class index of class view (frequency dictionary of
+        bitmasks, keys are compared case-insensitively) or None if it isn't
+        built.
+        """
+        if view not in CLASS_VIEWS:
+            raise RRSDictionaryError("Unknown class view %s." % view)
+        key = (view, CASE_INSENSITIVE, "classes")
+        if key not in self._dicts and not is_class_index_built(view):
+            return None
+        return self._get(key, lambda: (FrequencyDictionary(class_index_name(view),
+                                                           CASE_INSENSITIVE), None))
+
+
+    def get_geo_hierarchy(self):
+        """
+        Returns shared geographic hierarchy table (dictionary with
+        CASE_INSENSITIVE sensitivity) or None if it isn't built.
+        """
+        key = (GEO_HIERARCHY, CASE_INSENSITIVE)
+        if key not in self._dicts and not is_geo_hierarchy_built():
+            return None
+        return self.get(*key)
+
+
+    def _get(self, key, load):
+        d = self._dicts.get(key)
+        if d is not None:
+            # statistics may be forgotten by concurrent clear()
+            stats = self._stats.get(key)
+            if stats is not None:
+                stats['requests'] += 1
+            return d
+        self._lock.acquire()
+        try:
+            d = self._dicts.get(key)
+            if d is None:
+                rss = _rss()
+                start = time.time()
+                d, merged = load()
+                d.shared = True
+                self._stats[key] = {'name': key[0],
+                                    'sensitivity': key[1],
+                                    'binary': d._binary is not None,
+                                    'merged': merged,
+                                    'load_seconds': time.time() - start,
+                                    'preload_seconds': None,
+                                    'rss_delta': _rss() - rss,
+                                    'requests': 0}
+                self._dicts[key] = d
+            self._stats[key]['requests'] += 1
+            return d
+        finally:
+            self._lock.release()
+
+
+    def warm_up(self, entries=None):
+        """
+        Loads dictionaries and everything their lookups need (see
+        RRSDictionary.preload()). Entries are names or (name, sensitivity)
+        tuples, (name, sensitivity, "frequency") for frequency dictionaries,
+        (view, CASE_INSENSITIVE, "classes") for class indexes and GEO_HIERARCHY
+        for the geographic hierarchy table (both skipped if they aren't
+        built). If entries is None, all dictionaries loaded so far are warmed
+        up. Returns time of the warm-up in seconds.
+        """
+        start = time.time()
+        if entries is None:
+            keys = self._dicts.keys()
+        else:
+            keys = []
+            for entry in entries:
+                if isinstance(entry, basestring):
+                    entry = (entry, CASE_SENSITIVE)
+                if len(entry) > 2 and entry[2] == "classes":
+                    if self.get_class_index(entry[0]) is None:
+                        continue
+                elif entry[0] == GEO_HIERARCHY:
+                    if self.get_geo_hierarchy() is None:
+                        continue
+                    entry = (GEO_HIERARCHY, CASE_INSENSITIVE)
+                elif len(entry) > 2:
+                    # (name, sensitivity, "frequency")
+                    self.get_frequency(*entry[:2])
+                else:
+                    self.get(*entry)
+                keys.append(tuple(entry))
+        self._lock.acquire()
+        try:
+            for key in keys:
+                stats = self._stats[key]
+                if stats['preload_seconds'] is not None:
+                    continue
+                rss = _rss()
+                t = time.time()
+                self._dicts[key].preload()
+                stats['preload_seconds'] = time.time() - t
+                stats['rss_delta'] += _rss() - rss
+        finally:
+            self._lock.release()
+        return time.time() - start
+
+
+    def stats(self):
+        """
+        Returns list of statistics of loaded dictionaries (dicts with keys
+        name, sensitivity, binary, merged, load_seconds, preload_seconds,
+        rss_delta and requests). Memory used by memory-mapped binary files
+        is counted only for pages which were read.
+        """
+        return [dict(self._stats[key]) for key in sorted(self._stats)]
+
+
+    def clear(self):
+        """
+        Forgets all dictionaries (components keep the instances they have).
+        """
+        self._lock.acquire()
+        try:
+            self._dicts.clear()
+            self._stats.clear()
+        finally:
+            self._lock.release()
+
+#-------------------------------------------------------------------------------
+# End of class DictionaryRegistry
+#-------------------------------------------------------------------------------
+
+
+_registry = DictionaryRegistry()
+
+def get_dictionary(name, sensitivity=CASE_SENSITIVE):
+    """
+    Returns shared dictionary of the process (see DictionaryRegistry.get()).
+    """
+    return _registry.get(name, sensitivity)
+
+
+def get_frequency_dictionary(name, sensitivity=CASE_SENSITIVE):
+    """
+    Returns shared frequency dictionary of the process (see
+    DictionaryRegistry.get_frequency()).
+    """
+    return _registry.get_frequency(name, sensitivity)
+
+
+def get_class_index(view):
+    """
+    Returns shared class index of the process (see
+    DictionaryRegistry.get_class_index()).
+    """
+    return _registry.get_class_index(view)
+
+
+def get_geo_hierarchy():
+    """
+    Returns shared geographic hierarchy table of the process (see
+    DictionaryRegistry.get_geo_hierarchy()).
+    """
+    return _registry.get_geo_hierarchy()
+
+
+def warm_up(entries=None):
+    """
+    Warms up shared dictionaries (see DictionaryRegistry.warm_up()).
+    """
+    return _registry.warm_up(entries)
+
+
+def stats():
+    """
+    Returns statistics of shared dictionaries (see DictionaryRegistry.stats()).
+    """
+    return _registry.stats()
+
+
+if __name__ == "__main__":
+    if len(sys.argv) > 1 and sys.argv[1] == "--build-merged":
+        for path in build_merged(sys.argv[2:] or None):
+            print "Created", path
+        sys.exit(0)
+    if len(sys.argv) > 1 and sys.argv[1] == "--build-classes":
+        for path in build_class_indexes(sys.argv[2:] or None):
+            print "Created", path
+        sys.exit(0)
+    if len(sys.argv) > 1 and sys.argv[1] == "--build-geo":
+        print "Created", build_geo_hierarchy()
+        sys.exit(0)
+    # load and warm up dictionaries used by extractors
+    entries = [(LOCATIONS, CASE_INSENSITIVE), (LOCATIONS, FIRST_UPPER),
+               (PROJECT_ACRONYMS, CASE_INSENSITIVE), (CITY2WOEID, CASE_INSENSITIVE),
+               (BNC_UNLEMMATISED, CASE_INSENSITIVE), (NON_NAMES_ALL, FIRST_UPPER),
+               GEO_HIERARCHY]
+    print "warm-up %.2f s" % warm_up(entries)
+    for s in stats():
+        print "%(name)-28s %(sensitivity)d  merged %(merged)-16s binary %(binary)-5s " \
+              "load %(load_seconds)6.3f s  preload %(preload_seconds)6.3f s  " \
+              "rss %(rss_delta)10d B" % s
@@ -0,0 +1,306 @@
+#!/usr/bin/env python
+
+"""
+Module rrstranslation implements storage of translations (key -> values) of
+RRSDictionary.
+
+Translations of the dictionary consist of layers: the dictionary itself,
+dictionaries it was extended by (in order of extend() calls) and keys added
+by add(). Values of a key are values of the first layer containing the key,
+followed by values of the next layers which are not there yet (the same
+result extend() always meant to give).
+
+Layers are:
+ * BinarySource - binary dictionary (dict.rrsbin, see rrsbinary), values of
+   a key are read directly from the memory-mapped file,
+ * PickledSource - pickled translate_<letter>.rrsdict files, loaded when the
+   first key of the letter is translated and kept in LRU cache,
+ * AddedSource - keys added by RRSDictionary.add().
+
+Dictionary of one layer is translated directly. For more layers, merged
+values of translated keys are kept in buckets by hash of the key (so one
+merge costs only the merge of one key, not of the whole letter of every
+extended dictionary), buckets are kept in LRU cache too. Residency of shards
+and buckets can be bounded (max_resident), least recently used are evicted
+and loaded again when needed. Translations can be prefetched (all shards
+loaded) in background thread, see TranslationStore.prefetch().
+
+Dictionaries used together can also be merged when they are built (see
+rrsdictcreator.merge_dictionaries()), then they have only one binary layer.
+"""
+
+__modulename__ = "rrstranslation"
+__date__ = "$19.10.2026 19:48:10$"
+
+import cPickle
+import glob
+import os
+import threading
+import zlib
+
+from rrslib.others.pattern import LRUCache
+
+# count of buckets of merged translations (power of two)
+BUCKETS = 256
+
+
+def start_char(key):
+    """
+    Returns name of the shard of the key (lowercase first letter or "other").
+    """
+    st_char = key[0].lower()
+    if not st_char.isalpha():
+        st_char = "other"
+    return st_char
+
+
+class BinarySource(object):
+    """
+    Translations of binary dictionary (rrsbinary.BinaryDictionary).
+    """
+    def __init__(self, binary):
+        self.binary = binary
+
+
+    def get(self, key):
+        i = self.binary.find_key(key)
+        if i < 0:
+            return None
+        return self.binary.get_translation(i)
+
+
+    def keys(self):
+        return self.binary.keys
+
+
+    def prefetch(self):
+        self.binary.touch()
+
+
+    def info(self):
+        return {'source': self.binary.path, 'shards': None}
+
+#-------------------------------------------------------------------------------
+# End of class BinarySource
+#-------------------------------------------------------------------------------
+
+
+class PickledSource(object):
+    """
+    Translations in pickled files translate_<letter>.rrsdict of the
+    dictionary in directory path. At most max_resident shards are kept in
+    memory (None means all).
+    """
+    def __init__(self, path, max_resident=None):
+        self.path = path
+        self._shards = LRUCache(max_resident)
+        self._lock = threading.RLock()
+
+
+    def _file(self, st_char):
+        return self.path + "/translate_" + st_char + ".rrsdict"
+
+
+    def shard_names(self):
+        names = [os.path.basename(f)[10:-8] for f in glob.glob(self._file("*"))]
+        names.sort()
+        return names
+
+
+    def shard(self, st_char):
+        """
+        Returns translation dictionary of keys starting with st_char.
+        """
+        shard = self._shards.get(st_char)
+        if shard is None:
+            self._lock.acquire()
+            try:
+                shard = self._shards.get(st_char)
+                if shard is None:
+                    if os.path.isfile(self._file(st_char)):
+                        f_trans = open(self._file(st_char), "rb")
+                        shard = cPickle.load(f_trans)
+                        f_trans.close()
+                    else:
+                        shard = {}
+                    self._shards.set(st_char, shard)
+            finally:
+                self._lock.release()
+        return shard
+
+
+    def get(self, key):
+        return self.shard(start_char(key)).get(key)
+
+
+    def keys(self):
+        keys = set()
+        for st_char in self.shard_names():
+            keys.update(self.shard(st_char))
+        return keys
+
+
+    def prefetch(self):
+        names = self.shard_names()
+        if self._shards.maxsize is not None:
+            names = names[:self._shards.maxsize]
+        for st_char in names:
+            self.shard(st_char)
+
+
+    def info(self):
+        return {'source': self.path, 'shards': self._shards.info()}
+
+#-------------------------------------------------------------------------------
+# End of class PickledSource
+#-------------------------------------------------------------------------------
+
+
+class AddedSource(object):
+    """
+    Translations added by RRSDictionary.add() ({letter: {key: values}}, the
+    dictionary is shared with RRSDictionary, not copied).
+    """
+    def __init__(self, added):
+        self.added = added
+
+
+    def get(self, key):
+        shard = self.added.get(start_char(key))
+        if shard is None:
+            return None
+        return shard.get(key)
+
+
+    def keys(self):
+        keys = set()
+        for shard in self.added.itervalues():
+            keys.update(shard)
+        return keys
+
+
+    def prefetch(self):
+        pass
+
+
+    def info(self):
+        return {'source': 'added', 'shards': None}
+
+#-------------------------------------------------------------------------------
+# End of class AddedSource
+#-------------------------------------------------------------------------------
+
+
+def _hashable(value):
+    # values can be nested lists (BNC: ['23785', 'n', ['12606', 'v']])
+    if isinstance(value, list):
+        return tuple(_hashable(v) for v in value)
+    return value
+
+
+class TranslationStore(object):
+    """
+    Translations of layers (see module documentation). At most max_resident
+    buckets of merged translations are kept in memory (None means all).
+    """
+    def __init__(self, layers, max_resident=None, buckets=BUCKETS):
+        self.layers = list(layers)
+        self._mask = buckets - 1
+        self._buckets = LRUCache(max_resident)
+        self._prefetching = None
+        self._direct = self._direct_layer()
+
+
+    def _direct_layer(self):
+        # the only layer with translations (nothing to merge) or None
+        nonempty = [l for l in self.layers
+                    if not isinstance(l, AddedSource) or l.added]
+        if len(nonempty) == 1:
+            return nonempty[0]
+        return None
+
+
+    def _merge(self, key):
+        result = None
+        for layer in self.layers:
+            values = layer.get(key)
+            if values is None:
+                continue
+            if result is None:
+                result = list(values)
+                seen = set(_hashable(v) for v in result)
+                continue
+            for v in values:
+                h = _hashable(v)
+                if h not in seen:
+                    result.append(v)
+                    seen.add(h)
+        if result is None:
+            return []
+        return result
+
+
+    def get(self, key):
+        """
+        Returns list of values of the key (empty list if the key has no
+        values in any layer).
+        """
+        if self._direct is not None:
+            values = self._direct.get(key)
+            if values is None:
+                return []
+            return values
+
+        hkey = key
+        if isinstance(hkey, unicode):
+            hkey = hkey.encode("utf-8")
+        b = zlib.crc32(hkey) & self._mask
+        bucket = self._buckets.get(b)
+        if bucket is None:
+            bucket = {}
+            self._buckets.set(b, bucket)
+        try:
+            return bucket[key]
+        except KeyError:
+            values = bucket[key] = self._merge(key)
+            return values
+
+
+    def prefetch(self, background=False):
+        """
+        Loads translations of all layers (all pickled shards, pages of
+        binary files). If background is True, loading runs in daemon thread,
+        which is returned (translations can be used meanwhile).
+        """
+        def run():
+            for layer in self.layers:
+                layer.prefetch()
+        if not background:
+            run()
+            return None
+        if self._prefetching is None or not self._prefetching.is_alive():
+            self._prefetching = threading.Thread(target=run, name="rrstranslation-prefetch")
+            self._prefetching.daemon = True
+            self._prefetching.start()
+        return self._prefetching
+
+
+    def clear(self):
+        """
+        Forgets merged translations (called when layers change).
+        """
+        self._buckets.clear()
+        self._direct = self._direct_layer()
+
+
+    def info(self):
+        """
+        Returns statistics of caches: buckets of merged translations and
+        shards of layers.
+        """
+        return {'buckets': self._buckets.info(),
+                'layers': [l.info() for l in self.layers]}
+
+#-------------------------------------------------------------------------------
+# End of class TranslationStore
+#-------------------------------------------------------------------------------
@@ -8,4 +8,5 @@ and semi-strucured (markup languages) text.
 """
 
 __all__ = ['entityextractor', 'rrsregex', 'articlemetaextractor', 'documentwrapper',
-           'citationentityextractor', 'bibtexparser', 'normalize']
\ No newline at end of file
+           'citationentityextractor', 'bibtexparser', 'normalize', 'rrsspans',
+           'streamextractor', 'extractorbenchmark']
\ No newline at end of file
@@ -16,10 +16,10 @@ from rrslib.db.model import RRSKeyword, RRSContact, RRSPublication, \
     RRSRelationshipPublication_sectionPublication, RRSRelationshipContactPerson, \
     RRSRelationshipPublicationKeyword, RRSFile, RRSUrl, RRSRelationshipFileUrl, \
     RRSRelationshipFilePublication, RRSCitation, RRSText, RRSLanguage
-from rrslib.dictionaries.rrsdictionary import RRSDictionary, NAME_FF_CZ, \
-    FIRST_UPPER, NAME_FM_CZ, NAME_FF_US, NAME_FM_US, NAME_FF_XX, NAME_FM_XX, \
-    COUNTRIES, CITIES, NON_SURNAMES, CASE_INSENSITIVE, NON_NAMES, NOTHING, \
-    RRSDictionaryError
+from rrslib.dictionaries.rrsdictionary import NAME_FF_CZ, FIRST_UPPER, \
+    NAME_FM_CZ, NAME_FF_US, NAME_FM_US, NAME_FF_XX, NAME_FM_XX, NON_SURNAMES, \
+    CASE_INSENSITIVE, NON_NAMES, NOTHING, RRSDictionaryError
+from rrslib.dictionaries.rrsregistry import get_dictionary, LOCATIONS
 from rrslib.extractors.normalize import TextCleaner
 from rrslib.xml.xmlconverter import Model2XMLConverter
 import StringIO
@@ -166,8 +166,7 @@ class MetaExtractor(object):
 
         #Dictionaries
         try:
-            self.rrsdict_locations = RRSDictionary(COUNTRIES, FIRST_UPPER)
-            self.rrsdict_locations.extend(RRSDictionary(CITIES, FIRST_UPPER))
+            self.rrsdict_locations = get_dictionary(LOCATIONS, FIRST_UPPER)
         except RRSDictionaryError:
             raise DictionaryError("Failed to load dictionaries.")
 
@@ -612,10 +611,9 @@ class ArticleMetaExtractor(object):
             publication.set("publication_section", _rel)
         
         #Get citations from document and store them into publication
-        for cit in textual_document.get_citations():
-            if cit == None:
-                continue
-            _cit = self.cita_parser.extract(cit)
+        #(all citations of the document are extracted in one batch)
+        citations = [cit for cit in textual_document.get_citations() if cit != None]
+        for _cit in self.cita_parser.extract_many(citations):
             if _cit.isset('reference'):
                 _cit['reference']['publication'] = publication
             _rel = RRSRelationshipPublicationCitation()
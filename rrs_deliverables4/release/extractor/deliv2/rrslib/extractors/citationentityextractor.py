@@ -4,12 +4,19 @@
 """
 CitationEntityExtractor is a module, which provides methods for extracting
 entities from reference of citation.
+
+References of one document are extracted in batch by extract_many():
+identical references are extracted once, capitalized words of all references
+are looked up in name dictionaries at once and distinct references can be
+extracted in pool of processes.
 """
 from rrslib.db.model import *
 from rrslib.xml.xmlconverter import Model2XMLConverter
 import StringIO
+import copy
 import entityextractor as ee
 import lxml.html as lh
+import multiprocessing
 import re
 import sys
 
@@ -89,14 +96,34 @@ class CitationEntityExtractorError(Exception):
 # End of class CitationEntityExtractorError
 #-------------------------------------------------------------------------------
 
-class CitationEntityExtractor(object):
+# extractor used by worker processes of the pool (the workers inherit it when
+# the pool is created, see CitationEntityExtractor.extract_many())
+_pool_extractor = None
+
+
+def _extract_references(args):
+    # extracts entities of references (runs in worker process), target may
+    # be changed after the pool was created
+    target, texts = args
+    _pool_extractor.params = target
+    return _pool_extractor._extract_batch(texts)
 
-    def __init__(self, target=ALL, xmlcompatibility='db08'):
+
+class CitationEntityExtractor(object):
+    """
+    Extracts publication from reference of citation (RRSCitation). Workers
+    is count of processes used by extract_many() (1 means extraction in this
+    process), the pool of workers is created on first use and stopped by
+    close().
+    """
+    def __init__(self, target=ALL, xmlcompatibility='db08', workers=1):
         self.accuracy = {}
         self._load_ee_method_acc()
         self.params = target
         self.entity_extractor = ee.EntityExtractor()
         self.xmlvalid = int(xmlcompatibility.lstrip('db'))
+        self.workers = workers
+        self._pool = None
 
 
     def _load_ee_method_acc(self):
@@ -231,30 +258,104 @@ class CitationEntityExtractor(object):
         return self.rest
 
 
-    def extract(self, citation):
-
-        if not isinstance(citation, RRSCitation):
-            raise CitationEntityExtractorError("citations has to be instance of RRSCitation")
-        self.publ = None
-        # extracting data
+    def _extract_entities(self, text):
+        # runs extracting methods in order of their accuracy, returns found
+        # entities {entity constant: result} and the rest of text
         entities = {}
-        if citation.get('reference') != None:
-            self.rest = citation.get('reference').get('content')
-        else:
-            self.rest = ""
-        self.citation_text = citation.get('reference').get('content')
+        rest = text
         for x in self.acc_sorted:
             for entity_const in self.accuracy[x]:
                 if entity_const & self.params:
                     # get extracting method by name
                     extractor_method = getattr(self.entity_extractor, ee.ENTITY2METHOD[entity_const])
-                    method_result = extractor_method(self.rest)
+                    method_result = extractor_method(rest)
                     # if some result, set it to dict
                     if method_result[0] is not None and method_result[0]:
                         result = method_result[0]
-                        self.rest = self._whitening(method_result[1])
+                        rest = self._whitening(method_result[1])
                         if result is not None:
                             entities[entity_const] = result
+        return entities, rest
+
+
+    def _extract_batch(self, texts):
+        # extracts entities of distinct texts, words of names are looked up
+        # for all of them at once
+        if (AUTHOR | EDITOR) & self.params:
+            self.entity_extractor.name_e.preload_names(texts)
+        return [self._extract_entities(text) for text in texts]
+
+
+    def _check_citation(self, citation):
+        if not isinstance(citation, RRSCitation):
+            raise CitationEntityExtractorError("citations has to be instance of RRSCitation")
+
+
+    def extract(self, citation):
+        self._check_citation(citation)
+        entities, rest = self._extract_entities(citation.get('reference').get('content'))
+        return self._assign(citation, entities, rest)
+
+
+    def extract_many(self, citations):
+        """
+        Batch version of extract(): extracts publications of list of
+        citations and returns the citations in the same order. Citations
+        with the same reference text are extracted once (every citation gets
+        its own copy of the entities). If workers > 1, distinct references
+        are extracted in pool of processes.
+        """
+        global _pool_extractor
+        texts = []
+        index = {}
+        uses = []
+        for citation in citations:
+            self._check_citation(citation)
+            text = citation.get('reference').get('content')
+            if text not in index:
+                index[text] = len(texts)
+                texts.append(text)
+                uses.append(0)
+            uses[index[text]] += 1
+        if self.workers > 1 and len(texts) > 1:
+            if self._pool is None:
+                _pool_extractor = self
+                self._pool = multiprocessing.Pool(self.workers)
+            size = -(-len(texts) // (self.workers * 4))
+            found = []
+            parts = [(self.params, texts[i:i + size])
+                     for i in xrange(0, len(texts), size)]
+            for part in self._pool.map(_extract_references, parts):
+                found.extend(part)
+        else:
+            found = self._extract_batch(texts)
+        for citation in citations:
+            i = index[citation.get('reference').get('content')]
+            entities, rest = found[i]
+            uses[i] -= 1
+            if uses[i]:
+                # publication is made of the entities, the last citation
+                # gets the original ones
+                entities = copy.deepcopy(entities)
+            self._assign(citation, entities, rest)
+        return citations
+
+
+    def close(self):
+        """
+        Stops pool of workers.
+        """
+        if self._pool is not None:
+            self._pool.close()
+            self._pool.join()
+            self._pool = None
+
+
+    def _assign(self, citation, entities, rest):
+        # creates publication from extracted entities and sets it into
+        # citation
+        self.rest = rest
+        self.citation_text = citation.get('reference').get('content')
         # assign
         self.publ = RRSPublication()
         for entity_key in entities:
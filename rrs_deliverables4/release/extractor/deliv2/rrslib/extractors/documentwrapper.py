@@ -18,6 +18,10 @@ from rrslib.db.model import RRSCitation, RRSDatabaseEntityChecker, \
     RRSPublication_section, RRSReference, RRSRelationshipPublicationReference, \
     RRSRelationshipReferenceCitation
 from rrslib.dictionaries.rrsdictionary import *
+from rrslib.dictionaries.rrsregistry import get_dictionary, LOCATIONS, NAMES, \
+    NON_NAMES_ALL
+from rrslib.others.pattern import LRUCache
+import bisect
 import re
 
 try:
@@ -181,10 +185,89 @@ class _MetaWrapper(object):
 # End of class _MetaWrapper
 #-------------------------------------------------------------------------------
 
+#Numbering schemes of headings in _HeadingTable
+_ARABIC, _ROMAN, _LINE = 0, 1, 2
+
+class _HeadingTable(object):
+    """
+    Table of candidate headings of a text - lines starting by an arabic
+    numeral, by a roman numeral or (_LINE) by anything.
+
+    Every heading pattern of _ChapterWrapper starts by newline(s) and
+    whitespace followed by the number (or name) of the chapter, so its match
+    starts in the whitespace before the first character of some line (or
+    just before it). The table is built by one scan of the text and stores
+    for every line of the scheme this range of starts, the numeral (token)
+    and the first letters of the following word (or of the line). search()
+    tries the pattern only at starts of lines with the given token or word,
+    which gives the same match as pattern.search(text), without scanning the
+    whole text for every pattern.
+    """
+    _re_starts = {_ARABIC: re.compile('\n\s*(?=[0-9])'),
+                  _ROMAN: re.compile('\n\s*(?=[ivxIVX])'),
+                  _LINE: re.compile('\n\s*(?=\S)')}
+    _re_tokens = {_ARABIC: re.compile('([0-9]+)\.?\s*'),
+                  _ROMAN: re.compile('([ivxIVX]+)\.?\s*'),
+                  _LINE: re.compile('()')}
+    #Length of the word key
+    _WORD = 3
+
+    def __init__(self, text):
+        self.text = text
+        self._schemes = {}
+
+    def _index(self, scheme):
+        """
+        Returns dictionaries token -> lines and word -> lines of the scheme,
+        line is (first start of a match, position of the first character).
+        """
+        if scheme not in self._schemes:
+            text = self.text
+            re_token = self._re_tokens[scheme]
+            tokens, words = {}, {}
+            for m in self._re_starts[scheme].finditer(text):
+                #Start of the whitespace before the line
+                start = m.start()
+                while start > 0 and text[start - 1].isspace():
+                    start -= 1
+                line = (max(start - 1, 0), m.end())
+                token = re_token.match(text, m.end())
+                word = text[token.end():token.end() + self._WORD].lower()
+                tokens.setdefault(token.group(1).lower(), []).append(line)
+                words.setdefault(word, []).append(line)
+            self._schemes[scheme] = tokens, words
+        return self._schemes[scheme]
+
+    def search(self, pattern, scheme, token=None, word=None):
+        """
+        Returns the first match of compiled pattern in lines of the scheme
+        starting by the token (numeral) or whose text after the numeral
+        starts by the word (case insensitive), None if there is none.
+        """
+        tokens, words = self._index(scheme)
+        if token is not None:
+            lines = tokens.get(token.lower(), ())
+        else:
+            lines = words.get(word[:self._WORD].lower(), ())
+        for start, end in lines:
+            for pos in xrange(start, end):
+                match = pattern.match(self.text, pos)
+                if match is not None:
+                    return match
+        return None
+
+#-------------------------------------------------------------------------------
+# End of class _HeadingTable
+#-------------------------------------------------------------------------------
+
 class _ChapterWrapper(object):
     """
     This class process publication/article/paper and looks for it's chapters.
+
+    Headings are searched in the table of candidate headings of the text (see
+    _HeadingTable), compiled patterns are shared by all instances.
     """
+    _patterns = LRUCache(maxsize=4096)
    
     def __init__(self):
         
@@ -258,6 +341,37 @@ class _ChapterWrapper(object):
                                   re.DOTALL)
         self._re_dots = re.compile('^(.+?)([.:] ?){5,}', re.DOTALL)
         self._lst_sub_chpt_nums = []
+        self._heading_table = None
+
+    def _compile(self, pattern, flags=0):
+        """
+        Returns compiled pattern from the cache of patterns.
+        """
+        compiled = self._patterns.get((pattern, flags))
+        if compiled is None:
+            compiled = re.compile(pattern, flags)
+            self._patterns.set((pattern, flags), compiled)
+        return compiled
+
+    def _search(self, pattern, text, scheme, token=None, word=None):
+        """
+        Returns the first match of compiled heading pattern in the text (see
+        _HeadingTable.search()). The table is built again only if the text
+        changes.
+        """
+        if self._heading_table is None or self._heading_table.text is not text:
+            self._heading_table = _HeadingTable(text)
+        return self._heading_table.search(pattern, scheme, token, word)
+
+    def _text_after(self, chpt, text, flags=0):
+        """
+        Returns the text after the first occurrence of chpt, None if there is
+        no occurrence.
+        """
+        found = re.search(re.escape(chpt), text, flags)
+        if found:
+            return text[found.end():]
+        return None
 
     def get_chapters(self, text):
         """
@@ -277,21 +391,23 @@ class _ChapterWrapper(object):
         cont1, cont2 = True, True
     
         #Oriznuti casti s pouzitou literaturou
-        if self._re_ref.search(text):   
-            text = self._re_ref.search(text).group(1) + "\n\n"
+        ref = self._re_ref.search(text)
+        if ref:
+            text = ref.group(1) + "\n\n"
         #Vyjmuti symbolu z textu (napr. "\Lambda")
         text = self._remove_symbols(text)
-        
+
         #Hledani nazvu kapitol v obsahu
-        if self._re_content.search(text):
-            content = "\n" + self._re_content.search(text).group(2)
+        content = self._re_content.search(text)
+        if content:
+            content = "\n" + content.group(2)
             content = re.sub('^[\n\s]+', '\n', content)
             not_found = 0
             while self._re_line.search(content) and not_found < 2:
                 line = self._re_line.search(content).group(1)
                 if self._re_dots.search(line):
                     line = self._re_dots.search(line).group(1)
-                content = re.sub('' + re.escape(line) + '', "", content)
+                content = content.replace(line, "")
                 if cont1 and self._re_chpt_1.search(line):
                     chpt = self._re_chpt_1.search(line).group(1)
                     chapters.append({'data':chpt, 'credibility':100})
@@ -370,27 +486,25 @@ class _ChapterWrapper(object):
           
             #Vytvori regularni vyraz, ktery zjisti cislo bezne kapitoly a zjisit
             #radkove oddeleni
-            re_num_1 = re.compile('\n\n\s*(([0-9]+)\.?\s+' + str(recent_chapter)
-                                  + '(\.?\s*|:.*?))\n\n', re.DOTALL | 
-                                  re.IGNORECASE)
-            re_num_2 = re.compile('[^\n]\n\s*(([0-9]+)\.?\s+' 
-                                  + str(recent_chapter) + '(\.?\s*|:.*?))\n\n',
-                                  re.DOTALL | re.IGNORECASE)
-            re_num_3 = re.compile('\n\n\s*(([0-9]+)\.?\s+' + str(recent_chapter)
-                                  + '(\.?\s*|:.*?))[^\n]', re.DOTALL | 
-                                  re.IGNORECASE)
-            re_num_4 = re.compile('[^\n]\n\s*(([0-9]+)\.?\s+' 
-                                  + str(recent_chapter) + '(\.?\s*|:.*?))\n'
-                                  '[^\n]', re.DOTALL | re.IGNORECASE)
+            re_num_1 = self._compile('\n\n\s*(([0-9]+)\.?\s+' + str(recent_chapter)
+                                     + '(\.?\s*|:.*?))\n\n', re.DOTALL | 
+                                     re.IGNORECASE)
+            re_num_2 = self._compile('[^\n]\n\s*(([0-9]+)\.?\s+' 
+                                     + str(recent_chapter) + '(\.?\s*|:.*?))\n\n',
+                                     re.DOTALL | re.IGNORECASE)
+            re_num_3 = self._compile('\n\n\s*(([0-9]+)\.?\s+' + str(recent_chapter)
+                                     + '(\.?\s*|:.*?))[^\n]', re.DOTALL | 
+                                     re.IGNORECASE)
+            re_num_4 = self._compile('[^\n]\n\s*(([0-9]+)\.?\s+' 
+                                     + str(recent_chapter) + '(\.?\s*|:.*?))\n'
+                                     '[^\n]', re.DOTALL | re.IGNORECASE)
           
-            if re_num_1.search(text): 
-                start_i, num = 1, re_num_1.search(text)
-            elif re_num_2.search(text): 
-                start_i, num = 2, re_num_2.search(text)
-            elif re_num_3.search(text): 
-                start_i, num = 3, re_num_3.search(text)
-            elif re_num_4.search(text): 
-                start_i, num = 4, re_num_4.search(text)
+            for i, re_num in ((1, re_num_1), (2, re_num_2), (3, re_num_3),
+                              (4, re_num_4)):
+                num = self._search(re_num, text, _ARABIC, word=recent_chapter)
+                if num:
+                    start_i = i
+                    break
             else:
                 continue
             
@@ -418,29 +532,28 @@ class _ChapterWrapper(object):
                                              'credibility':100})
                         break
             #Vytvori regularni vyraz pro podkapitoly dane kapitoly
-            re_sub_chapt = re.compile('\n\s{,10}(' + str(num) + 
-                                      '\.[1-9]([0-9]|\.)*[\s\n]{1,10}([A-Z]|'
-                                      '[0-9]+[^\s\n])[^=+*/\n]{2,100}?)\n')  
+            re_sub_chapt = self._compile('\n\s{,10}(' + str(num) + 
+                                         '\.[1-9]([0-9]|\.)*[\s\n]{1,10}([A-Z]|'
+                                         '[0-9]+[^\s\n])[^=+*/\n]{2,100}?)\n')  
             #Pokud je k danemu cislu nalezena bezna kapitola
             if str(num) in found_chapters.keys():
                 chapters.append({'data':found_chapters[str(num)],
                                  'credibility':100})
-                if re.search('^.*?' + re.escape(found_chapters[str(num)]) + 
-                             '(.*$)', text, re.DOTALL | re.IGNORECASE):
-                    text = str("\n" + re.search('^.*?' + 
-                                re.escape(found_chapters[str(num)]) 
-                                + '(.*$)', text,
-                                re.DOTALL | re.IGNORECASE).group(1))
-                elif re.search('^.*?' + re.escape(found_chapters[str(num)]) + 
-                               '(.*$)', text_tmp, re.DOTALL | re.IGNORECASE):
-                    text = str("\n" + re.search('^.*?' + 
-                                re.escape(found_chapters[str(num)]) 
-                                + '(.*$)', text_tmp,
-                                re.DOTALL | re.IGNORECASE).group(1))
+                rest = self._text_after(found_chapters[str(num)], text,
+                                        re.IGNORECASE)
+                if rest is None:
+                    rest = self._text_after(found_chapters[str(num)], text_tmp,
+                                            re.IGNORECASE)
+                if rest is not None:
+                    text = str("\n" + rest)
                 #Hledani podkapitol
-                while re_sub_chapt.search(text):
+                while True:
+                    sub_chapt = self._search(re_sub_chapt, text, _ARABIC,
+                                             str(num))
+                    if not sub_chapt:
+                        break
                     chapters[len(chapters) - 1]['subChpts'] = []
-                    chpt = re_sub_chapt.search(text).group(1)
+                    chpt = sub_chapt.group(1)
                     chpt = self._repair_chapter(chpt, text)
                     sub_chapter_num = \
                         self._re_sub_chpt_num.search(chpt).group(1)
@@ -449,8 +562,7 @@ class _ChapterWrapper(object):
                         self._lst_sub_chpt_nums.append(sub_chapter_num)
                         chapters[len(chapters) - 1]['subChpts'].append(
                             {'data':chpt.replace("\n", " "), 'credibility':70})
-                        text = re.sub('' + re.escape(chpt) + '', "", text)
-                    else: text = re.sub('' + re.escape(chpt) + '', "", text)
+                    text = text.replace(chpt, "")
                 del found_chapters[str(num)]
                 num += 1
                 continue
@@ -461,22 +573,15 @@ class _ChapterWrapper(object):
           
             #Pokud nebyla nalezena, zkusime hledat podle danych formatu
             else:
-                #Vytvoreni reularnich vyrazu podle nalezeneho formatu
-                if len(found_recent_chapters): 
-                    re_chapter_upper, re_chapter_lower = \
-                    self._create_regular_expressions(1, num, 4, end_dot)
-                else:
-                    re_chapter_upper, re_chapter_lower = \
-                    self._create_regular_expressions(tecka, num, start_i,
-                                                     end_dot)
                 #Nejprve se hledaji kapitoly psany s velkym pismenem na zacatku 
-                #slova, potom s malym pismenem a potom je treba zkouset jine 
-                #formaty
-                if re_chapter_upper.search(text):
-                    chpt = re_chapter_upper.search(text).group(2)
-                elif re_chapter_lower.search(text):
-                    chpt = re_chapter_lower.search(text).group(2)
+                #slova, potom s malym pismenem podle nalezeneho formatu a potom
+                #je treba zkouset jine formaty
+                if len(found_recent_chapters): 
+                    chpt = self._find_chapter(1, num, 4, end_dot, text)
                 else:
+                    chpt = self._find_chapter(tecka, num, start_i, end_dot,
+                                              text)
+                if chpt == None:
                     #Zmeny poctu prazdnych radku pred a za nazvem kapitoly
                     if len(found_recent_chapters) == 0: 
                         i = 4
@@ -485,18 +590,10 @@ class _ChapterWrapper(object):
                         if i == start_i: 
                             i += 1
                             continue
-                        #Vytvoreni novych regularnich vyrazu
-                        re_chapter_upper, re_chapter_lower = \
-                        self._create_regular_expressions(tecka, num, i, end_dot)
-                        if re_chapter_upper.search(text):
-                            chpt = re_chapter_upper.search(text).group(2)
+                        chpt = self._find_chapter(tecka, num, i, end_dot, text)
+                        if chpt != None:
                             break
-                        elif re_chapter_lower.search(text):
-                            chpt = re_chapter_lower.search(text).group(2)
-                            break
-                        else:
-                            i += 1
-                            chpt = None
+                        i += 1
     
                     #Pokud nebyl nazev porad nalezen, hledame znova s ignoraci 
                     #tecky za cislici
@@ -510,19 +607,11 @@ class _ChapterWrapper(object):
                             if i == start_i: 
                                 i += 1
                                 continue
-                            #Vytvoreni novych regularnich vyrazu
-                            re_chapter_upper, re_chapter_lower = \
-                            self._create_regular_expressions(tecka, num, i,
-                                                             end_dot)
-                            if re_chapter_upper.search(text): 
-                                chpt = re_chapter_upper.search(text).group(2)
+                            chpt = self._find_chapter(tecka, num, i, end_dot,
+                                                      text)
+                            if chpt != None:
                                 break
-                            elif re_chapter_lower.search(text):
-                                chpt = re_chapter_lower.search(text).group(2)
-                                break
-                            else:
-                                i += 1
-                                chpt = None
+                            i += 1
             #Pokud porad nebyl nazev nalezen, jdeme hledat nazev dalsi kapitoly
             #v poradi
             if chpt == None:
@@ -548,21 +637,24 @@ class _ChapterWrapper(object):
                     #Pokud obsahuje nepovolene sekvence znaku, nejedna se o 
                     #nazev kapitoly
                     if self._is_chapter_wrong(chpt, end_dot):
-                        text = re.sub('' + re.escape(chpt) + '', "", text)
+                        text = text.replace(chpt, "")
                         continue
                     #Pokud velikosti pismen neodpovidaji vzoru, nejedna se o 
                     #nazev kapitoly
                     if is_upper and not is_lower \
                     and self._re_lower.search(chpt):
-                        text = re.sub('' + re.escape(chpt) + '', "", text)
+                        text = text.replace(chpt, "")
                         continue
                     chapters.append({'data':chpt, 'credibility':cred})
-                    text = re.search('^.*?' + re.escape(chpt) + '(.*)$',
-                                     text, re.DOTALL).group(1)
+                    text = self._text_after(chpt, text)
                 #Hledani podkapitol dane kapitoly
-                while re_sub_chapt.search(text):
+                while True:
+                    sub_chapt = self._search(re_sub_chapt, text, _ARABIC,
+                                             str(num))
+                    if not sub_chapt:
+                        break
                     chapters[len(chapters) - 1]['subChpts'] = []
-                    chpt = re_sub_chapt.search(text).group(1)
+                    chpt = sub_chapt.group(1)
                     #Pokud jsou tam nazvy vice podkapitol, tak se rozdeli
                     if self._re_split.search(chpt):
                         chapters, text, cont = \
@@ -584,8 +676,7 @@ class _ChapterWrapper(object):
                             self._lst_sub_chpt_nums.append(sub_chapter_num)
                             chapters[len(chapters) - 1]['subChpts'].append(
                             {'data':chpt.replace("\n", " "), 'credibility':70})
-                            text = re.sub('' + re.escape(chpt) + '', "", text)
-                        else: text = re.sub('' + re.escape(chpt) + '', "", text)
+                        text = text.replace(chpt, "")
                 num += 1
                 not_found = 0
         if len(chapters) < 3 and len(found_recent_chapters) == 0: 
@@ -601,12 +692,12 @@ class _ChapterWrapper(object):
               
         #Prochazime postupne rimske cislice a hledame kapitoly
         for rom_num in self._lst__roman_numerals:
-            re_chpt = re.compile('^.*?\n\s*(' + re.escape(rom_num) 
-                                 + '\.?\s.*?)\s*\n', re.IGNORECASE | re.DOTALL)
-            if re_chpt.search(text):
-                chapter = re_chpt.search(text).group(1)
-                text = re.search('^.*?' + re.escape(chapter) + '(.*)$', text,
-                                 re.DOTALL).group(1)
+            re_chpt = self._compile('\n\s*(' + re.escape(rom_num) 
+                                    + '\.?\s.*?)\s*\n', re.IGNORECASE | re.DOTALL)
+            chapter = self._search(re_chpt, text, _ROMAN, rom_num)
+            if chapter:
+                chapter = chapter.group(1)
+                text = self._text_after(chapter, text)
                 chapts.append({'data':chapter, 'credibility':70})
           
         return chapters
@@ -624,20 +715,28 @@ class _ChapterWrapper(object):
         for recent_chapter in self._lst_recent_chapters:    
             if recent_chapter == "references": 
                 continue
-            if re.search('\n\s*' + re.escape(recent_chapter.upper()) + '\s*\n',
-                         text):
+            if self._search(self._compile('\n\s*' + 
+                                          re.escape(recent_chapter.upper()) +
+                                          '\s*\n'),
+                            text, _LINE, word=recent_chapter):
                 is_upper = True
                 break
-            elif re.search('\n\n\s*' + re.escape(recent_chapter) + '\s*\n\n',
-                           text, re.IGNORECASE):
+            elif self._search(self._compile('\n\n\s*' + 
+                                            re.escape(recent_chapter) + 
+                                            '\s*\n\n', re.IGNORECASE),
+                              text, _LINE, word=recent_chapter):
                 is_double_nl = True
                 break
-            elif re.search('\n\s*' + re.escape(recent_chapter) + '\s*\n\n',
-                           text, re.IGNORECASE):
+            elif self._search(self._compile('\n\s*' + 
+                                            re.escape(recent_chapter) + 
+                                            '\s*\n\n', re.IGNORECASE),
+                              text, _LINE, word=recent_chapter):
                 is_double_nl_s = True
                 break
-            elif re.search('\n\n\s*' + re.escape(recent_chapter) + '\s*\n',
-                           text, re.IGNORECASE):
+            elif self._search(self._compile('\n\n\s*' + 
+                                            re.escape(recent_chapter) + 
+                                            '\s*\n', re.IGNORECASE),
+                              text, _LINE, word=recent_chapter):
                 is_double_nl_p = True
                 break
     
@@ -654,12 +753,14 @@ class _ChapterWrapper(object):
             re_chapter = re.compile('\n\n\s*(([A-Z]|[0-9]+[^\s.]).*?)\n')
         
         #Hleda nazvy kapitol
-        while re_chapter.search(text):
-            chpt = re_chapter.search(text).group(1)
-            text = re.sub('' + re.escape(chpt) + '', "", text)
+        chpt = re_chapter.search(text)
+        while chpt:
+            chpt = chpt.group(1)
+            text = text.replace(chpt, "")
             chpt = self._repair_chapter(chpt, text)
             if not self._is_chapter_wrong(chpt, 0): 
                 chapters.append({'data':chpt, 'credibility':10})
+            chpt = re_chapter.search(text)
         
         #Odstrani nazvy, ktere jsou pravdepodobně jmena a adresy z hlavicky
         for i in range(0, len(chapters)):
@@ -679,8 +780,10 @@ class _ChapterWrapper(object):
         """
         This method detects dot after numeral.
         """
-        if re.search('\n\s*(([0-9]+|[ixv]+)\.\s+' + str(recent_chapter) 
-                     + ')\s*\.?\s*\n', text, re.DOTALL | re.IGNORECASE): 
+        re_dot = self._compile('\n\s*(([0-9]+|[ixv]+)\.\s+' + str(recent_chapter)
+                               + ')\s*\.?\s*\n', re.DOTALL | re.IGNORECASE)
+        if self._search(re_dot, text, _ARABIC, word=recent_chapter) \
+        or self._search(re_dot, text, _ROMAN, word=recent_chapter): 
             return 1
         else: 
             return 2
@@ -689,8 +792,10 @@ class _ChapterWrapper(object):
         """
         This method detects dot after chapter name.
         """
-        if re.search('\n\s*(([0-9]+|[ixv]+)\.?\s+' + str(recent_chapter) 
-                     + ')\s*\.\s*\n', text, re.DOTALL | re.IGNORECASE): 
+        re_dot = self._compile('\n\s*(([0-9]+|[ixv]+)\.?\s+' + str(recent_chapter)
+                               + ')\s*\.\s*\n', re.DOTALL | re.IGNORECASE)
+        if self._search(re_dot, text, _ARABIC, word=recent_chapter) \
+        or self._search(re_dot, text, _ROMAN, word=recent_chapter): 
             return True
         else: 
             return False
@@ -715,16 +820,16 @@ class _ChapterWrapper(object):
         This method repairs incomplete name of chapter.
         """
         if re.search('^.*[,:]$', chpt, re.DOTALL):
-            if re.search('' + re.escape(chpt) + '\n.+?\n', text):
-                chpt = re.search('' + re.escape(chpt) + '\n.+?\n',
-                                 text).group(0)
+            repaired = re.search('' + re.escape(chpt) + '\n.+?\n', text)
+            if repaired:
+                chpt = repaired.group(0)
             else: return chpt
         elif self._re_last_word.search(chpt):
             last_word = self._re_last_word.search(chpt).group(1)
             if last_word.lower() in self._lst_last_words:
-                if re.search('' + re.escape(chpt) + '\n.+?\n', text):
-                    chpt = re.search('' + re.escape(chpt) + '\n.+?\n',
-                                     text).group(0)
+                repaired = re.search('' + re.escape(chpt) + '\n.+?\n', text)
+                if repaired:
+                    chpt = repaired.group(0)
             else: return chpt
         return chpt
 
@@ -732,23 +837,29 @@ class _ChapterWrapper(object):
         """
         This method finds if a chapter is introduced by an arabic numeral.
         """
-        if re.search('\n\s*[0-9]+\.?\s+' + recent_chapter + '(\.?\s*|:.*?)\n',
-                     text, re.DOTALL | re.IGNORECASE): return True
+        re_chpt = self._compile('\n\s*[0-9]+\.?\s+' + recent_chapter + 
+                                '(\.?\s*|:.*?)\n', re.DOTALL | re.IGNORECASE)
+        if self._search(re_chpt, text, _ARABIC, word=recent_chapter): 
+            return True
         return False
 
     def _is_introduced_roman(self, recent_chapter, text):
         """
         This method finds if a chapter is introduced by an roman numeral.
         """ 
-        if re.search('\n\s*[ivx]+\.?\s+' + recent_chapter + '\.?\s*\n', text,
-                     re.DOTALL | re.IGNORECASE): return True
+        re_chpt = self._compile('\n\s*[ivx]+\.?\s+' + recent_chapter + 
+                                '\.?\s*\n', re.DOTALL | re.IGNORECASE)
+        if self._search(re_chpt, text, _ROMAN, word=recent_chapter): 
+            return True
         return False
     
     def _is_introduced_not(self, recent_chapter, text):
         """
         This method finds if a chapter is not introduced.
         """
-        if re.search('\n\s*' + recent_chapter + '\s*\n', text, re.IGNORECASE): 
+        re_chpt = self._compile('\n\s*' + recent_chapter + '\s*\n',
+                                re.IGNORECASE)
+        if self._search(re_chpt, text, _LINE, word=recent_chapter): 
             return True
         return False
     
@@ -770,10 +881,10 @@ class _ChapterWrapper(object):
         #Prvni nazev
         chpt1 = self._repair_chapter(data.group(1), text)
         if self._is_chapter_wrong(chpt1, dot_end):
-            text = re.sub('' + re.escape(chpt1) + '', "", text)
+            text = text.replace(chpt1, "")
             return chapters, text, True
         if is_upper and self._re_lower.search(chpt1):
-            text = re.sub('' + re.escape(chpt1) + '', "", text)
+            text = text.replace(chpt1, "")
             return chapters, text, True
         if self._re_sub_chpt_num.search(chpt1):
             sub_chpt_num = self._re_sub_chpt_num.search(chpt1).group(1)
@@ -782,12 +893,11 @@ class _ChapterWrapper(object):
                 chapters.append({'data':chpt1, 'credibility':cred})    
         else:
             chapters.append({'data':chpt1, 'credibility':cred})    
-        text = re.search('^.*?' + re.escape(chpt1) + '(.*)$', text,
-                         re.DOTALL).group(1)
+        text = self._text_after(chpt1, text)
         #Druhy nazev
         chpt2 = self._repair_chapter(data.group(2), text)  
         if self._is_chapter_wrong(chpt1, dot_end):
-            text = re.sub('' + re.escape(chpt1) + '', "", text)
+            text = text.replace(chpt1, "")
             return chapters, text, True
         if self._re_sub_chpt_num.search(chpt2):
             sub_chpt_num = self._re_sub_chpt_num.search(chpt2).group(1)
@@ -796,8 +906,7 @@ class _ChapterWrapper(object):
                 chapters[len(chapters) - 1]['subchpt'] = \
                 [{'data':chpt2, 'credibility':70}]
             #    chapters.append({'data':chpt2,'credibility':70})
-            text = re.search('^.*?' + re.escape(chpt2) + '(.*)$',
-                             text, re.DOTALL).group(1)
+            text = self._text_after(chpt2, text)
     
         return chapters, text, False
     
@@ -832,13 +941,10 @@ class _ChapterWrapper(object):
         #Vyhledani celeho textu kapitoly
         for i in range(0, len_chapters - 1):
             if chapters[i]['num'] + 1 == chapters[i + 1]['num']:
-                if re.search(re.escape(chapters[i]['data']) + '(.+?)' 
-                             + re.escape(chapters[i + 1]['data']), text,
-                             re.DOTALL):
-                    fulltext = re.search(re.escape(chapters[i]['data']) + 
-                                         '(.+?)' 
-                                         + re.escape(chapters[i + 1]['data']),
-                                         text, re.DOTALL)
+                fulltext = re.search(re.escape(chapters[i]['data']) + '(.+?)' 
+                                     + re.escape(chapters[i + 1]['data']), text,
+                                     re.DOTALL)
+                if fulltext:
                     chapters[i]['fulltext'] = fulltext.group(1)
                 elif re.search(re.escape(chapters[i]['data']) + '\s*(.+?)\n\n',
                                text, re.DOTALL):
@@ -868,12 +974,13 @@ class _ChapterWrapper(object):
         """
         This method finds shorted content of a chapter.
         """
-        if re.search(re.escape(chapter) + '\s*(.+?)\.\n\n', text, re.DOTALL):
-            return re.search(re.escape(chapter) + '\s*(.+?)\.\n\n', text,
-                             re.DOTALL).group(1)
-        elif re.search(re.escape(chapter) + '\s*(.+?)\n\n', text, re.DOTALL):
-            return re.search(re.escape(chapter) + '\s*(.+?)\n\n', text,
-                             re.DOTALL).group(1)
+        fulltext = re.search(re.escape(chapter) + '\s*(.+?)\.\n\n', text,
+                             re.DOTALL)
+        if not fulltext:
+            fulltext = re.search(re.escape(chapter) + '\s*(.+?)\n\n', text,
+                                 re.DOTALL)
+        if fulltext:
+            return fulltext.group(1)
         else: 
             return ""
     
@@ -927,7 +1034,7 @@ class _ChapterWrapper(object):
     def _create_regular_expressions(self, dot, num, level, end_dot):
         """
         This method creates regular expression according to found pattern to 
-        find chapters.
+        find chapters. Group 1 of the match is the chapter.
         """
         if end_dot: 
             sufix = '\s*\.\s*'
@@ -935,131 +1042,144 @@ class _ChapterWrapper(object):
             sufix = ''
         if level == 1:
             if dot == 1:
-                re_chpt_upper = re.compile('^(.|\n)*?\n\n\s*?(' + str(num) 
-                                           + '\.(\n\n?| +?)(([A-Z][^\s\n]+?|'
-                                           '[0-9]+?[-.:stndrd]+?|' 
-                                           + self._pat_prepositions + 
-                                           ')\s+?)+?)' + sufix + '\n\n')
-                re_chpt_lower = re.compile('^(.|\n)*?\n\n\s*?(' + str(num) 
-                                           + '\.(\n\n?| +?)([A-Z]|'
-                                           '[0-9]+?[-.:stndrd]+?).{2,100}?)' 
-                                           + sufix + '\n\n')
+                re_chpt_upper = self._compile('\n\n\s*?(' + str(num) 
+                                              + '\.(\n\n?| +?)(([A-Z][^\s\n]+?|'
+                                              '[0-9]+?[-.:stndrd]+?|' 
+                                              + self._pat_prepositions + 
+                                              ')\s+?)+?)' + sufix + '\n\n')
+                re_chpt_lower = self._compile('\n\n\s*?(' + str(num) 
+                                              + '\.(\n\n?| +?)([A-Z]|'
+                                              '[0-9]+?[-.:stndrd]+?).{2,100}?)' 
+                                              + sufix + '\n\n')
             elif dot == 2:
-                re_chpt_upper = re.compile('^(.|\n)*?\n\n\s*?(' + str(num) 
-                                           + '(\n\n?| +?)(([A-Z][^\s\n]+?|'
-                                           '[0-9]+?[-.:stndrd]+?|' 
-                                           + self._pat_prepositions + 
-                                           ')\s+?)+?)' + sufix + '\n\n')
-                re_chpt_lower = re.compile('^(.|\n)*?\n\n\s*?(' + str(num) 
-                                           + '(\n\n?| +?)([A-Z]|'
-                                           '[0-9]+?[-.:stndrd]+?).{2,100}?)' 
-                                           + sufix + '\n\n')
+                re_chpt_upper = self._compile('\n\n\s*?(' + str(num) 
+                                              + '(\n\n?| +?)(([A-Z][^\s\n]+?|'
+                                              '[0-9]+?[-.:stndrd]+?|' 
+                                              + self._pat_prepositions + 
+                                              ')\s+?)+?)' + sufix + '\n\n')
+                re_chpt_lower = self._compile('\n\n\s*?(' + str(num) 
+                                              + '(\n\n?| +?)([A-Z]|'
+                                              '[0-9]+?[-.:stndrd]+?).{2,100}?)' 
+                                              + sufix + '\n\n')
             else:
-                re_chpt_upper = re.compile('^(.|\n)*?\n\n\s*?(' + str(num) 
-                                           + '(\.?|\.0)(\n\n?| +?)(([A-Z]'
-                                           '[^\s\n]+?|[0-9]+?[-.:stndrd]+?|' 
-                                           + self._pat_prepositions + 
-                                           ')\s+?)+?)' + sufix + '\n\n')
-                re_chpt_lower = re.compile('^(.|\n)*?\n\n\s*?(' + str(num) 
-                                           + '(\.?|\.0)(\n\n?| +?)([A-Z]|'
-                                           '[0-9]+?[-.:stndrd]+?).{2,100}?)' 
-                                           + sufix + '\n\n')
+                re_chpt_upper = self._compile('\n\n\s*?(' + str(num) 
+                                              + '(\.?|\.0)(\n\n?| +?)(([A-Z]'
+                                              '[^\s\n]+?|[0-9]+?[-.:stndrd]+?|' 
+                                              + self._pat_prepositions + 
+                                              ')\s+?)+?)' + sufix + '\n\n')
+                re_chpt_lower = self._compile('\n\n\s*?(' + str(num) 
+                                              + '(\.?|\.0)(\n\n?| +?)([A-Z]|'
+                                              '[0-9]+?[-.:stndrd]+?).{2,100}?)' 
+                                              + sufix + '\n\n')
         if level == 2:
             if dot == 1:
-                re_chpt_upper = re.compile('^(.|\n)*?[^\n]\n\s*?(' + str(num) 
-                                           + '\.(\n\n?| +?)(([A-Z][^\s\n]+?|'
-                                           '[0-9]+?[-.:stndrd]+?|' 
-                                           + self._pat_prepositions + 
-                                           ')\s+?)+?)' + sufix + '\n\n')
-                re_chpt_lower = re.compile('^(.|\n)*?[^\n]\n\s*?(' + str(num) 
-                                           + '\.(\n\n?| +?)([A-Z]|'
-                                           '[0-9]+?[-.:stndrd]+?).{2,100}?)' 
-                                           + sufix + '\n\n')
+                re_chpt_upper = self._compile('[^\n]\n\s*?(' + str(num) 
+                                              + '\.(\n\n?| +?)(([A-Z][^\s\n]+?|'
+                                              '[0-9]+?[-.:stndrd]+?|' 
+                                              + self._pat_prepositions + 
+                                              ')\s+?)+?)' + sufix + '\n\n')
+                re_chpt_lower = self._compile('[^\n]\n\s*?(' + str(num) 
+                                              + '\.(\n\n?| +?)([A-Z]|'
+                                              '[0-9]+?[-.:stndrd]+?).{2,100}?)' 
+                                              + sufix + '\n\n')
             elif dot == 2:
-                re_chpt_upper = re.compile('^(.|\n)*?[^\n]\n\s*?(' + str(num) 
-                                           + '(\n\n?| +?)(([A-Z][^\s\n]+?|'
-                                           '[0-9]+?[-.:stndrd]+?|' 
-                                           + self._pat_prepositions + 
-                                           ')\s+?)+?)' + sufix + '\n\n')
-                re_chpt_lower = re.compile('^(.|\n)*?[^\n]\n\s*?(' + str(num) 
-                                           + '(\n\n?| +?)([A-Z]|'
-                                           '[0-9]+?[-.:stndrd]+?).{2,100}?)' 
-                                           + sufix + '\n\n')
+                re_chpt_upper = self._compile('[^\n]\n\s*?(' + str(num) 
+                                              + '(\n\n?| +?)(([A-Z][^\s\n]+?|'
+                                              '[0-9]+?[-.:stndrd]+?|' 
+                                              + self._pat_prepositions + 
+                                              ')\s+?)+?)' + sufix + '\n\n')
+                re_chpt_lower = self._compile('[^\n]\n\s*?(' + str(num) 
+                                              + '(\n\n?| +?)([A-Z]|'
+                                              '[0-9]+?[-.:stndrd]+?).{2,100}?)' 
+                                              + sufix + '\n\n')
             else:
-                re_chpt_upper = re.compile('^(.|\n)*?[^\n]\n\s*?(' + str(num) 
-                                           + '(\.?|\.0)(\n\n?| +?)(([A-Z]'
-                                           '[^\s\n]+?|[0-9]+?[-.:stndrd]+?|' 
-                                           + self._pat_prepositions + 
-                                           ')\s+?)+?)' + sufix + '\n\n')
-                re_chpt_lower = re.compile('^(.|\n)*?[^\n]\n\s*?(' + str(num) 
-                                           + '(\.?|\.0)(\n\n?| +?)([A-Z]|'
-                                           '[0-9]+?[-.:stndrd]+?).{2,100}?)' 
-                                           + sufix + '\n\n')
+                re_chpt_upper = self._compile('[^\n]\n\s*?(' + str(num) 
+                                              + '(\.?|\.0)(\n\n?| +?)(([A-Z]'
+                                              '[^\s\n]+?|[0-9]+?[-.:stndrd]+?|' 
+                                              + self._pat_prepositions + 
+                                              ')\s+?)+?)' + sufix + '\n\n')
+                re_chpt_lower = self._compile('[^\n]\n\s*?(' + str(num) 
+                                              + '(\.?|\.0)(\n\n?| +?)([A-Z]|'
+                                              '[0-9]+?[-.:stndrd]+?).{2,100}?)' 
+                                              + sufix + '\n\n')
         if level == 3:
             if dot == 1:
-                re_chpt_upper = re.compile('^(.|\n)*?\n\n\s*?(' + str(num) 
-                                           + '\.(\n\n?| +?)(([A-Z][^\s\n]+?|'
-                                           '[0-9]+?[-.:stndrd]+?|' 
-                                           + self._pat_prepositions + 
-                                           ')\s+?)+?)' + sufix + '\n[^\n]')
-                re_chpt_lower = re.compile('^(.|\n)*?\n\n\s*?(' + str(num) 
-                                           + '\.(\n\n?| +?)([A-Z]|'
-                                           '[0-9]+?[-.:stndrd]+?).{2,100}?)' 
-                                           + sufix + '\n[^\n]')
+                re_chpt_upper = self._compile('\n\n\s*?(' + str(num) 
+                                              + '\.(\n\n?| +?)(([A-Z][^\s\n]+?|'
+                                              '[0-9]+?[-.:stndrd]+?|' 
+                                              + self._pat_prepositions + 
+                                              ')\s+?)+?)' + sufix + '\n[^\n]')
+                re_chpt_lower = self._compile('\n\n\s*?(' + str(num) 
+                                              + '\.(\n\n?| +?)([A-Z]|'
+                                              '[0-9]+?[-.:stndrd]+?).{2,100}?)' 
+                                              + sufix + '\n[^\n]')
             elif dot == 2:
-                re_chpt_upper = re.compile('^(.|\n)*?\n\n\s*?(' + str(num) 
-                                           + '(\n\n?| +?)(([A-Z][^\s\n]+?|'
-                                           '[0-9]+?[-.:stndrd]+?|' 
-                                           + self._pat_prepositions + 
-                                           ')\s+?)+?v)' + sufix + '\n[^\n]')
-                re_chpt_lower = re.compile('^(.|\n)*?\n\n\s*?(' + str(num) 
-                                           + '(\n\n?| +?)([A-Z]|'
-                                           '[0-9]+?[-.:stndrd]+?).{2,100}?)' 
-                                           + sufix + '\n[^\n]')
+                re_chpt_upper = self._compile('\n\n\s*?(' + str(num) 
+                                              + '(\n\n?| +?)(([A-Z][^\s\n]+?|'
+                                              '[0-9]+?[-.:stndrd]+?|' 
+                                              + self._pat_prepositions + 
+                                              ')\s+?)+?v)' + sufix + '\n[^\n]')
+                re_chpt_lower = self._compile('\n\n\s*?(' + str(num) 
+                                              + '(\n\n?| +?)([A-Z]|'
+                                              '[0-9]+?[-.:stndrd]+?).{2,100}?)' 
+                                              + sufix + '\n[^\n]')
             else:
-                re_chpt_upper = re.compile('^(.|\n)*?\n\n\s*?(' + str(num) 
-                                           + '(\.?|\.0)(\n\n?| +?)(([A-Z]'
-                                           '[^\s\n]+?|[0-9]+?[-.:stndrd]+?|' 
-                                           + self._pat_prepositions + 
-                                           ')\s+?)+?)' + sufix + '\n[^\n]')
-                re_chpt_lower = re.compile('^(.|\n)*?\n\n\s*?(' + str(num) 
-                                           + '(\.?|\.0)(\n\n?| +?)([A-Z]|'
-                                           '[0-9]+?[-.:stndrd]+?).{2,100}?)' 
-                                           + sufix + '\n[^\n]')
+                re_chpt_upper = self._compile('\n\n\s*?(' + str(num) 
+                                              + '(\.?|\.0)(\n\n?| +?)(([A-Z]'
+                                              '[^\s\n]+?|[0-9]+?[-.:stndrd]+?|' 
+                                              + self._pat_prepositions + 
+                                              ')\s+?)+?)' + sufix + '\n[^\n]')
+                re_chpt_lower = self._compile('\n\n\s*?(' + str(num) 
+                                              + '(\.?|\.0)(\n\n?| +?)([A-Z]|'
+                                              '[0-9]+?[-.:stndrd]+?).{2,100}?)' 
+                                              + sufix + '\n[^\n]')
         if level == 4:
             if dot == 1:
-                re_chpt_upper = re.compile('^(.|\n)*?\n+?\s*?(' + str(num) 
-                                           + '\.(\n\n?| +?)(([A-Z][^\s\n]+?|'
-                                           '[0-9]+?[-.:stndrd]+?|' 
-                                           + self._pat_prepositions + 
-                                           ')\s+?)+?)' + sufix + '\n+')
-                re_chpt_lower = re.compile('^(.|\n)*?\n+?\s*?(' + str(num) 
-                                           + '\.(\n\n?| +?)([A-Z]|'
-                                           '[0-9]+?[-.:stndrd]+?).{2,100}?)' 
-                                           + sufix + '\n+')
+                re_chpt_upper = self._compile('\n+?\s*?(' + str(num) 
+                                              + '\.(\n\n?| +?)(([A-Z][^\s\n]+?|'
+                                              '[0-9]+?[-.:stndrd]+?|' 
+                                              + self._pat_prepositions + 
+                                              ')\s+?)+?)' + sufix + '\n+')
+                re_chpt_lower = self._compile('\n+?\s*?(' + str(num) 
+                                              + '\.(\n\n?| +?)([A-Z]|'
+                                              '[0-9]+?[-.:stndrd]+?).{2,100}?)' 
+                                              + sufix + '\n+')
             elif dot == 2:
-                re_chpt_upper = re.compile('^(.|\n)*?\n+?\s*?(' + str(num) 
-                                           + '(\n\n?| +?)(([A-Z][^\s\n]+?|'
-                                           '[0-9]+?[-.:stndrd]+?|' 
-                                           + self._pat_prepositions 
-                                           + ')\s+?)+?)' + sufix + '\n+')
-                re_chpt_lower = re.compile('^(.|\n)*?\n+?\s*?(' + str(num) 
-                                           + '(\n\n?| +?)([A-Z]|'
-                                           '[0-9]+?[-.:stndrd]+?).{2,100}?)' 
-                                           + sufix + '\n+')
+                re_chpt_upper = self._compile('\n+?\s*?(' + str(num) 
+                                              + '(\n\n?| +?)(([A-Z][^\s\n]+?|'
+                                              '[0-9]+?[-.:stndrd]+?|' 
+                                              + self._pat_prepositions 
+                                              + ')\s+?)+?)' + sufix + '\n+')
+                re_chpt_lower = self._compile('\n+?\s*?(' + str(num) 
+                                              + '(\n\n?| +?)([A-Z]|'
+                                              '[0-9]+?[-.:stndrd]+?).{2,100}?)' 
+                                              + sufix + '\n+')
             else:
-                re_chpt_upper = re.compile('^(.|\n)*?\n+?\s*?(' + str(num) 
-                                           + '(\.?|\.0)(\n\n?| +?)'
-                                           '(([A-Z][^\s\n]+?|[0-9]+?'
-                                           '[-.:stndrd]+?|'
-                                           + self._pat_prepositions + 
-                                           ')\s+?)+?)' + sufix + '\n+')
-                re_chpt_lower = re.compile('^(.|\n)*?\n+?\s*?(' + str(num) 
-                                           + '(\.?|\.0)(\n\n?| +?)'
-                                           '([A-Z]|[0-9]+?[-.:stndrd]+?)'
-                                           '.{2,100}?)' + sufix + '\n+')  
+                re_chpt_upper = self._compile('\n+?\s*?(' + str(num) 
+                                              + '(\.?|\.0)(\n\n?| +?)'
+                                              '(([A-Z][^\s\n]+?|[0-9]+?'
+                                              '[-.:stndrd]+?|'
+                                              + self._pat_prepositions + 
+                                              ')\s+?)+?)' + sufix + '\n+')
+                re_chpt_lower = self._compile('\n+?\s*?(' + str(num) 
+                                              + '(\.?|\.0)(\n\n?| +?)'
+                                              '([A-Z]|[0-9]+?[-.:stndrd]+?)'
+                                              '.{2,100}?)' + sufix + '\n+')  
         return re_chpt_upper, re_chpt_lower
 
+    def _find_chapter(self, dot, num, level, end_dot, text):
+        """
+        This method finds chapter num written with upper or lower letter by
+        regular expressions of the pattern (see _create_regular_expressions).
+        Returns None if the chapter is not found.
+        """
+        for re_chpt in self._create_regular_expressions(dot, num, level,
+                                                        end_dot):
+            chpt = self._search(re_chpt, text, _ARABIC, str(num))
+            if chpt:
+                return chpt.group(1)
+        return None
+
     def get_rest(self):
         """
         Returns the rest of the text.
@@ -1124,29 +1244,50 @@ class _CitationWrapper(object):
             re.compile('(^( |and |\.|,|&|;|%S%)+|( |and |\.|,|&|;|%S%)+$)')
         self._re_new_line = re.compile('\n')
         self._re_multiple_white_spaces = re.compile('\s\s+')
+        self._re_letter = re.compile('[A-Za-z]')
+        self._re_bibliography_end = \
+            re.compile('$|\n *?\n *?\n|[Aa](ppendix|PPENDIX)|'
+                       '[Ll](ist of [Ff]igures|IST OF FIGURES)', re.DOTALL)
+        self._re_and_bibliography = \
+            re.compile('(and|AND)\s([rR](eferences|EFERENCES)|'
+                       '[Bb](ibliography|IBLIOGRAPHY))', re.IGNORECASE)
         
         #Dictionaries
         try:
-            self._rrsdict_names = RRSDictionary(NAME_FF_CZ, FIRST_UPPER)
-            self._rrsdict_names.extend(RRSDictionary(NAME_FM_CZ, FIRST_UPPER))
-            self._rrsdict_names.extend(RRSDictionary(NAME_FF_US, FIRST_UPPER))
-            self._rrsdict_names.extend(RRSDictionary(NAME_FM_US, FIRST_UPPER))
-            self._rrsdict_names.extend(RRSDictionary(NAME_FF_XX, FIRST_UPPER))
-            self._rrsdict_names.extend(RRSDictionary(NAME_FM_XX, FIRST_UPPER))
-            self._rrsdict_names.extend(RRSDictionary(NAME_SF_CZ, FIRST_UPPER))
-            self._rrsdict_names.extend(RRSDictionary(NAME_SM_CZ, FIRST_UPPER))
-            self._rrsdict_names.extend(RRSDictionary(NAME_S_US, FIRST_UPPER))
-            
-            self._rrsdict_non_names = RRSDictionary(NON_NAMES, FIRST_UPPER)
-            self._rrsdict_non_names.extend(RRSDictionary(NON_SURNAMES,
-                                                         FIRST_UPPER))
-            
-            self.rrsdict_locations = RRSDictionary(COUNTRIES, FIRST_UPPER)
-            self.rrsdict_locations.extend(RRSDictionary(CITIES, FIRST_UPPER))
+            self._rrsdict_names = get_dictionary(NAMES, FIRST_UPPER)
+            self._rrsdict_non_names = get_dictionary(NON_NAMES_ALL, FIRST_UPPER)
+            self.rrsdict_locations = get_dictionary(LOCATIONS, FIRST_UPPER)
         except RRSDictionaryError:
             raise DictionaryError("Failed to load dictionaries.")
         
           
+    def _find_heading(self, text, heading):
+        """
+        This function returns part of the text from the newline before the
+        last line containing heading (followed by a non-letter) to the end of
+        the bibliography (end of the text, two empty lines, appendix or list
+        of figures). The text is scanned from the end. Returns "" if there is
+        no such line.
+        """
+        end = len(text)
+        while True:
+            pos = text.rfind(heading, 0, end)
+            if pos == -1:
+                return ""
+            after = pos + len(heading)
+            if after < len(text) and not self._re_letter.match(text, after):
+                break
+            end = after - 1
+        line = text.rfind("\n", 0, pos)
+        if line == -1:
+            return ""
+        #Bibliografie zacina prvnim vyskytem nadpisu na radku
+        pos = text.find(heading, line)
+        while self._re_letter.match(text, pos + len(heading)):
+            pos = text.find(heading, pos + 1)
+        end = self._re_bibliography_end.search(text, pos + len(heading) + 1)
+        return text[line:end.start()]
+
     def _find_bibliography_text(self, text):
         """
         This function gets the last part of articles/publications, which
@@ -1158,35 +1299,13 @@ class _CitationWrapper(object):
         #Promenne pro zjednoduseni regularnich vyrazu:
         b = ""
         #Vyrizne vhodny text:
-        pat_end = '$|\n *?\n *?\n|[Aa](ppendix|PPENDIX)|' \
-                  '[Ll](ist of [Ff]igures|IST OF FIGURES)'
-        reg_1 = re.compile(
-          '(^.*)(\n[^\n]*?References[^A-Za-z].*?)(' + pat_end + ')',
-          re.DOTALL)
-        reg_2 = re.compile(
-          '(^.*)(\n[^\n]*?REFERENCES[^A-Za-z].*?)(' + pat_end + ')',
-          re.DOTALL)
-        reg_3 = re.compile(
-          '(^.*)(\n[^\n]*?Bibliography[^A-Za-z].*?)(' + pat_end + ')',
-          re.DOTALL)
-        reg_4 = re.compile(
-          '(^.*)(\n[^\n]*?BIBLIOGRAPHY[^A-Za-z].*?)(' + pat_end + ')',
-          re.DOTALL)
-        reg_and = re.compile('(and|AND)\s([rR](eferences|EFERENCES)|'
-                             '[Bb](ibliography|IBLIOGRAPHY))', re.IGNORECASE)
-        
-        if reg_1.search(text) and reg_and.search(text) == None :
-            a = reg_1.search(text).group(2)
-        elif reg_2.search(text) and reg_and.search(text) == None:
-            a = reg_2.search(text).group(2)
+        if self._re_and_bibliography.search(text) == None:
+            a = self._find_heading(text, "References") \
+                or self._find_heading(text, "REFERENCES")
+            c = self._find_heading(text, "Bibliography") \
+                or self._find_heading(text, "BIBLIOGRAPHY")
         else:
-            a = ""
-        if reg_3.search(text) and reg_and.search(text) == None:
-            c = reg_3.search(text).group(2)
-        elif reg_4.search(text) and reg_and.search(text) == None:
-            c = reg_4.search(text).group(2)
-        else:
-            c = ""
+            a, c = "", ""
         
         lengths = \
             list(set([str(len(a)) + "a", str(len(b)) + "b", str(len(c)) + "c"]))
@@ -1210,9 +1329,9 @@ class _CitationWrapper(object):
         if not found:
             return ""
         
-        re_rest = re.compile('(^.*?)' + re.escape(text) + '', re.DOTALL)
-        if re_rest.search(self._rest):
-            self._rest = re_rest.search(self._rest).group(1)
+        pos = self._rest.find(text)
+        if pos != -1:
+            self._rest = self._rest[:pos]
         else:
             return ""
         
@@ -1260,9 +1379,12 @@ class _CitationWrapper(object):
                 reg_square_parenthesis_2 = \
                     re.compile('(([[].*?[]]).*?) .{10,1000}?\.\s*?$', re.DOTALL)
                 reg_sub_hz = re.compile('^(.*?)([A-Z[[]])')
-                while reg_square_parenthesis_1.search(text):
-                    cit = reg_square_parenthesis_1.search(text)
-                    text = re.sub('' + re.escape(cit.group(1)) + '', "", text)
+                #Citace se hledaji od zacatku predchozi, pred ni uz zadna
+                #hranata zavorka neni
+                cit = reg_square_parenthesis_1.search(text)
+                while cit:
+                    start = cit.start()
+                    text = text[:start] + text[start:].replace(cit.group(1), "")
                     ref_ok = reg_sub_hz.sub("\g<2>", cit.group(1), re.DOTALL)
                     if len(ref_ok) > 40 and len(ref_ok) < 1000:
                         p_space = len(reg_non_word.findall(cit.group(2)))
@@ -1274,8 +1396,9 @@ class _CitationWrapper(object):
                         else:
                             self._citations.append({'data':ref_ok,
                                                     'credibility':80})  
-                if reg_square_parenthesis_2.search(text):
-                    cit = reg_square_parenthesis_2.search(text)
+                    cit = reg_square_parenthesis_1.search(text, start)
+                cit = reg_square_parenthesis_2.search(text)
+                if cit:
                     if len(cit.group(0)) < 1000:
                         p_space = len(reg_non_word.findall(cit.group(2)))
                         if p_space > 0:
@@ -1294,9 +1417,9 @@ class _CitationWrapper(object):
                 reg_square_parenthesis_right_2 = \
                     re.compile('(((\s|^)\d+[]]).*?) .{10,1000}?\.\s*$',
                                re.DOTALL)
-                while reg_square_parenthesis_right_1.search(text):
-                    cit = reg_square_parenthesis_right_1.search(text)
-                    text = re.sub('' + re.escape(cit.group(1)) + '', "", text)
+                cit = reg_square_parenthesis_right_1.search(text)
+                while cit:
+                    text = text.replace(cit.group(1), "")
                     if len(cit.group(1)) > 40 and len(cit.group(1)) < 1000: 
                         p_space = len(reg_non_word.findall(cit.group(3)))
                         if p_space > 0:
@@ -1306,8 +1429,9 @@ class _CitationWrapper(object):
                         else:
                             self._citations.append({'data':cit.group(1),
                                     'credibility':70})
-                if reg_square_parenthesis_right_2.search(text):
-                    cit = reg_square_parenthesis_right_2.search(text)
+                    cit = reg_square_parenthesis_right_1.search(text)
+                cit = reg_square_parenthesis_right_2.search(text)
+                if cit:
                     if len(cit.group(0)) < 1000: 
                         p_space = len(reg_non_word.findall(cit.group(3)))
                         if p_space > 0:
@@ -1335,17 +1459,21 @@ class _CitationWrapper(object):
                 reg_roman_numeral_4 = \
                     re.compile('^ *' + self._pat_roman_numeral + ' ',
                                re.IGNORECASE)
-                while reg_roman_numeral_1.search(text):    
-                    cit = reg_roman_numeral_1.search(text).group(1)
-                    text = re.sub('' + re.escape(cit) + '', "", text)
+                cit = reg_roman_numeral_1.search(text)
+                while cit:    
+                    cit = cit.group(1)
+                    text = text.replace(cit, "")
                     if len(cit) < 1000: 
                         self._citations.append({'data':cit, 'credibility':70})
-                if reg_roman_numeral_2.search(text):
-                    cit = reg_roman_numeral_2.search(text).group(1)
+                    cit = reg_roman_numeral_1.search(text)
+                cit_2 = reg_roman_numeral_2.search(text)
+                cit_3 = not cit_2 and reg_roman_numeral_3.search(text)
+                if cit_2:
+                    cit = cit_2.group(1)
                     if len(cit) < 1000: 
                         self._citations.append({'data':cit, 'credibility':60})
-                elif reg_roman_numeral_3.search(text):
-                    cit = reg_roman_numeral_3.search(text).group(1)
+                elif cit_3:
+                    cit = cit_3.group(1)
                     if len(cit) < 1000: 
                         self._citations.append({'data':cit, 'credibility':50})
                 for i in range(len(self._citations)):
@@ -1358,19 +1486,22 @@ class _CitationWrapper(object):
                 reg_numeral_dot_1 = \
                     re.compile('^ *(' + str(index) + '\. .{10,1000}?)(' 
                                + str(index + 1) + '\.)', re.DOTALL)
-                while reg_numeral_dot_1.search(text):
-                    cit = reg_numeral_dot_1.search(text).group(1)
-                    text = re.sub('' + re.escape(cit) + '', "", text)
+                cit = reg_numeral_dot_1.search(text)
+                while cit:
+                    cit = cit.group(1)
+                    text = text.replace(cit, "")
                     if len(cit) < 1000: 
                         self._citations.append({'data':cit, 'credibility':70})
                     index += 1
                     reg_numeral_dot_1 = \
                         re.compile('^ *(' + str(index) + '\. .*?)(' 
                                    + str(index + 1) + '\.)', re.DOTALL)
+                    cit = reg_numeral_dot_1.search(text)
                 reg_numeral_dot_2 = \
                     re.compile('(' + str(index) + '\. .*?\.\s*$)', re.DOTALL)
-                if reg_numeral_dot_2.search(text):
-                    cit = reg_numeral_dot_2.search(text).group(1)
+                cit = reg_numeral_dot_2.search(text)
+                if cit:
+                    cit = cit.group(1)
                     if len(cit) < 1000: 
                         self._citations.append({'data':cit, 'credibility':60})
         
@@ -1380,19 +1511,22 @@ class _CitationWrapper(object):
                 reg_numeral_parenthesis_1 = \
                     re.compile('^ *(\(' + str(index) + '\) .{10,1000}?)(\(' 
                                + str(index + 1) + '\))', re.DOTALL)
-                while reg_numeral_parenthesis_1.search(text):
-                    cit = reg_numeral_parenthesis_1.search(text).group(1)
-                    text = re.sub('' + re.escape(cit) + '', "", text)
+                cit = reg_numeral_parenthesis_1.search(text)
+                while cit:
+                    cit = cit.group(1)
+                    text = text.replace(cit, "")
                     if len(cit) < 1000: 
                         self._citations.append({'data':cit, 'credibility':80})
                     index += 1
                     reg_numeral_parenthesis_1 = \
                         re.compile('^ *(\(' + str(index) + '\) .*?)(\(' 
                                    + str(index + 1) + '\))', re.DOTALL)
+                    cit = reg_numeral_parenthesis_1.search(text)
                 reg_numeral_parenthesis_2 = \
                     re.compile('(\(' + str(index) + '\) .*?\.\s*$)', re.DOTALL)
-                if reg_numeral_parenthesis_2.search(text):
-                    cit = reg_numeral_parenthesis_2.search(text).group(1)
+                cit = reg_numeral_parenthesis_2.search(text)
+                if cit:
+                    cit = cit.group(1)
                     if len(cit) < 1000: 
                         self._citations.append({'data':cit, 'credibility':70})
           
@@ -1473,7 +1607,7 @@ class _CitationWrapper(object):
                 reg_zn = re.compile('!ZN!')
                 for i in range(0, len(tmp)):
                     cit = tmp[i][1]
-                    text = re.sub('' + re.escape(cit) + '', "", text)
+                    text = text.replace(cit, "")
                     cit = reg_zn.sub("", cit) 
                     len_cit = len(self._citations)
     
@@ -1651,19 +1785,45 @@ class _ReferenceHandler(object):
         self._re_quotation = re.compile('' + self._pat_quotations + '')
         self._re_sub_mark = re.compile('^.*%ZN%', re.DOTALL)
         self._re_sub = re.compile('^[.!?\s]+', re.DOTALL)
+        self._re_marker_rest = re.compile('[-,\w]*\Z')
         
+    def _markers(self, text):
+        """
+        This function returns list of (content, position) of square brackets
+        in the text (content is the text between "[" and the nearest "]"),
+        only the first occurrence of every content is kept. The list is
+        sorted by position.
+        """
+        markers, seen = [], set()
+        pos = text.find("[")
+        while pos != -1:
+            end = text.find("]", pos + 1)
+            if end == -1:
+                break
+            content = text[pos + 1:end]
+            if content not in seen:
+                seen.add(content)
+                markers.append((content, pos))
+            pos = text.find("[", pos + 1)
+        return markers
+
     def _sources_numeral_dot(self, citation_list, sources, text):
         """
         This function looks for sources which begins with numeral and dot.
         """
+        markers = self._markers(text)
         for i in range(0, len(citation_list)):
             re_cis_tec = re.compile('^\s*([0-9]+)\.\s')
-            if re_cis_tec.search(citation_list[i]['data']):
-                num = re_cis_tec.search(citation_list[i]['data']).group(1)
+            num = re_cis_tec.search(citation_list[i]['data'])
+            if num:
+                num = num.group(1)
                 source = "[" + num + "]"
-                re_source = re.compile('[[]' + num + '[-,\w]*?[]]',)
-                if re_source.search(text):
-                    sources.append((re_source.search(text).group(0), i))
+                #Prvni zavorka zacinajici cislem citace
+                for content, pos in markers:
+                    if content.startswith(num) \
+                    and self._re_marker_rest.match(content, len(num)):
+                        sources.append(("[" + content + "]", i))
+                        break
                 sources.append((source, i))
         return sources
 
@@ -1674,17 +1834,17 @@ class _ReferenceHandler(object):
         """
         
         for i in range(0, len(citation_list)):
-            if self._re_square_brackets_right.search(citation_list[i]['data']):
-                tmp = self._re_square_brackets_right.search(citation_list[i]
-                                                            ['data']) 
+            tmp = self._re_square_brackets_right.search(citation_list[i]['data'])
+            if tmp:
                 source = tmp.group(0)
                 num = tmp.group(1)
                 re_source = re.compile('^\s*([-,\w]+' + re.escape(num) + 
                                        '[-,\w]+|[-,\w]+' + re.escape(num) + 
                                        '|' + re.escape(num) + '[-,\w]+)[]]',
                                        re.DOTALL)
-                if re_source.search(text):
-                    sources.append((re_source.search(text).group(0), i))
+                found = re_source.search(text)
+                if found:
+                    sources.append((found.group(0), i))
                 sources.append((source, i))
         return sources
 
@@ -1692,16 +1852,20 @@ class _ReferenceHandler(object):
         """
         This function looks for sources which begins with square parenthesis.
         """
+        markers = self._markers(text)
         for i in range(0, len(citation_list)):
-            if self._re_square_brackets.search(citation_list[i]['data']):
-                tmp = self._re_square_brackets.search(citation_list[i]['data']) 
+            tmp = self._re_square_brackets.search(citation_list[i]['data'])
+            if tmp:
                 source = tmp.group(0)
                 num = tmp.group(1)
-                re_source = re.compile('[[]([-,\w]+' + re.escape(num) + 
+                re_source = re.compile('([-,\w]+' + re.escape(num) + 
                                        '[-,\w]+|[-,\w]+' + re.escape(num) + '|' 
-                                       + re.escape(num) + '[-,\w]+)[]]')
-                if re_source.search(text):
-                    sources.append((re_source.search(text).group(0), i))
+                                       + re.escape(num) + '[-,\w]+)\Z')
+                #Prvni zavorka obsahujici cislo citace
+                for content, pos in markers:
+                    if num in content and re_source.match(content):
+                        sources.append(("[" + content + "]", i))
+                        break
                 sources.append((source, i))
         return sources
 
@@ -1713,20 +1877,53 @@ class _ReferenceHandler(object):
         for i in range(0, len(aut)):
             pat_aut = aut[i] + ',? ?' + self._re_etal + ',? ?' + self._re_date
             re_aut = re.compile('' + pat_aut + '', re.DOTALL)
-            while re_aut.search(text_tmp):
-                source = re_aut.search(text_tmp).group(0)
-                text_tmp = re.sub('' + re.escape(source) + '', "", text_tmp)
+            source = re_aut.search(text_tmp)
+            while source:
+                source = source.group(0)
+                text_tmp = text_tmp.replace(source, "")
                 sources.append((source, -1))
+                source = re_aut.search(text_tmp)
         text_tmp = text
         re_aut_more = \
             re.compile('by (([A-Z][a-z]+ (and|&) )*[A-Z][a-z]+ '
                        '\(?[0-9]{2,}[a-z]?\)?)')
-        while re_aut_more.search(text_tmp):
-            source = re_aut_more.search(text_tmp).group(1)
-            text_tmp = re.sub('' + re.escape(source) + '', "", text_tmp)
+        source = re_aut_more.search(text_tmp)
+        while source:
+            source = source.group(1)
+            text_tmp = text_tmp.replace(source, "")
             sources.append((source, -1))
+            source = re_aut_more.search(text_tmp)
         return sources, text
     
+    def _index_sentences(self, sentences, sources):
+        """
+        This function returns dictionary index of sentence -> index of the
+        first source (in sources) contained in the sentence. Every distinct
+        source is searched once in all sentences joined together, sentences
+        without any source are not in the dictionary.
+        """
+        joined = "\n".join(sentences)
+        starts, pos = [], 0
+        for sentence in sentences:
+            starts.append(pos)
+            pos += len(sentence) + 1
+        index, seen = {}, set()
+        for i in range(0, len(sources)):
+            source = sources[i][0]
+            if source in seen:
+                continue
+            seen.add(source)
+            pos = joined.find(source)
+            while pos != -1:
+                j = bisect.bisect_right(starts, pos) - 1
+                end = starts[j] + len(sentences[j])
+                if pos + len(source) <= end:
+                    index.setdefault(j, i)
+                    pos = joined.find(source, end + 1)
+                else:
+                    pos = joined.find(source, pos + 1)
+        return index
+
     def _clear_text(self, text):
         """
         This function clears text from white spaces and redundant characters.
@@ -1753,6 +1950,8 @@ class _ReferenceHandler(object):
         
         something_found = False
         second_round = False
+        #Posledni prirazena veta a text, ze ktereho se odstrani
+        last_assigned = None
         while not something_found:
             sources, aut = [], []
             #Pokud jsou reference oznaceny hranatymi zavorkami
@@ -1849,9 +2048,12 @@ class _ReferenceHandler(object):
             
             text_tmp = text
             #Prohledame vsechny sentences a zaznamename je, pokud obsahuji 
-            #nejaky nalezeny zdroj
-            for sentence in sentences:
-                for source, ri in sources:
+            #nejaky nalezeny zdroj (vety bez zdroje se preskoci)
+            index = self._index_sentences(sentences, sources)
+            for i_sentence, sentence in enumerate(sentences):
+                if i_sentence not in index:
+                    continue
+                for source, ri in sources[index[i_sentence]:]:
                     if sentence.find(source) != -1:
                         credibility = 100
                         #Upravi vetu zacinajici malym pismenem
@@ -1917,8 +2119,7 @@ class _ReferenceHandler(object):
                                     (self._clear_text(sentence), int((credibility 
                                      + citation_list[ri]["credibility"]) / 2))
                                     
-                                self.rest = \
-                                    re.sub(re.escape(sentence), "", text)
+                                last_assigned = (sentence, text)
                             else:
                                 for i in range(0, len(citation_list)):
                                     if citation_list[i]['content'] != None:
@@ -1945,6 +2146,8 @@ class _ReferenceHandler(object):
                                                          + citation_list[ri]["credibility"]) 
                                                          / 2) - 10)
                                                     break
+        if last_assigned != None:
+            self.rest = last_assigned[1].replace(last_assigned[0], "")
         return citation_list
 
     def get_rest(self):
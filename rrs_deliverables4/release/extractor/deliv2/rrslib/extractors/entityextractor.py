@@ -8,8 +8,14 @@ named entities from text.
 from lxml import etree
 from rrslib.db.model import *
 from rrslib.dictionaries.rrsdictionary import *
+from rrslib.dictionaries.rrsregistry import get_dictionary, get_class_index, \
+                                            get_geo_hierarchy, LOCATIONS, \
+                                            NAME_CLASSES, shipped
+from rrslib.others.pattern import LRUCache
 from rrslib.xml.xmlconverter import Model2XMLConverter
 from rrsregex import ISBNre, URLre
+from rrsspans import SpanSet
+from bisect import bisect_right
 import StringIO
 import os
 import re
@@ -153,7 +159,7 @@ class EntityExtractor(object):
         self.mail_e = EntityExtractor.EmailExtractor()
         self.loca_e = EntityExtractor.GeographicLocationExtractor()
         self.name_e = EntityExtractor.NameExtractor()
-        self.email_e = EntityExtractor.EmailExtractor
+        self.email_e = self.mail_e
         self.even_e = EntityExtractor.EventExtractor()
         self.date_e = EntityExtractor.DateExtractor()
         self.orga_e = EntityExtractor.OrganizationExtractor()
@@ -168,10 +174,9 @@ class EntityExtractor(object):
 
         def __init__(self):
             _EntityExtractorComponent.__init__(self)
-            self._rrsdict_acronyms = RRSDictionary(PROJECT_ACRONYMS, CASE_INSENSITIVE)
-            self._rrsdict_titles = RRSDictionary(PROJECT_TITLES, CASE_INSENSITIVE)
-            self._rrsdict_locations = RRSDictionary(COUNTRIES, CASE_INSENSITIVE)
-            self._rrsdict_locations.extend(RRSDictionary(CITIES, CASE_INSENSITIVE))
+            self._rrsdict_acronyms = get_dictionary(PROJECT_ACRONYMS, CASE_INSENSITIVE)
+            self._rrsdict_titles = get_dictionary(PROJECT_TITLES, CASE_INSENSITIVE)
+            self._rrsdict_locations = get_dictionary(LOCATIONS, CASE_INSENSITIVE)
 
             self.org_e = EntityExtractor.OrganizationExtractor()
             self.rest = ""
@@ -211,12 +216,14 @@ class EntityExtractor(object):
                 the ALT project
                 the project CUTE (Clean Urban Transport for Europe)
             """
-            projects = []
             initial_credibility = 50
+            # projects of the second search overlapping projects of the first
+            # one are dropped
+            spans = SpanSet(text)
 
             #First search
-            potential_projects = self._re_the_project_1.findall(text)
-            for p in potential_projects:
+            for match in self._re_the_project_1.finditer(text):
+                p = match.groups()
                 if re.search('research|sponsored', p[2], re.I) or p[2][0].islower():
                     continue
                 credibility = initial_credibility
@@ -236,13 +243,11 @@ class EntityExtractor(object):
                         credibility -= 10
                 proj.set('title', title)
                 proj.set('credibility', credibility)
-                projects.append(proj)
-                text = re.sub(re.escape(p[0]), "", text)
-                self._rest = text
+                spans.add_match(match, PROJECT, credibility, 0, proj, 1)
 
             #Second search
-            potential_projects = self._re_the_project_2.findall(text)
-            for p in potential_projects:
+            for match in self._re_the_project_2.finditer(text):
+                p = match.groups()
                 credibility = initial_credibility + 20
                 proj = RRSProject()
                 if len(p[5]) > len(p[6]):
@@ -264,11 +269,11 @@ class EntityExtractor(object):
                 proj.set('title', title)
                 proj.set('acronym', acronym)
                 proj.set('credibility', credibility)
-                projects.append(proj)
-                text = re.sub(re.escape(p[0]), "", text)
-                self._rest = text
+                spans.add_match(match, PROJECT, credibility, 1, proj, 1)
 
-            return projects
+            found = spans.resolve()
+            found.sort(key=lambda span: (span.priority, span.start))
+            return [span.value for span in found]
 
         def _search_with_quotes(self, text):
             """
@@ -288,8 +293,6 @@ class EntityExtractor(object):
                     credibility += 20
                 proj.set('credibility', credibility)
                 projects.append(proj)
-                text = re.sub(re.escape(p[0]), "", text)
-                self._rest = text
 
             return projects
 
@@ -362,10 +365,10 @@ class EntityExtractor(object):
             return projects
 
 
-        def _complete_project_data(self, projects):
+        def _complete_project_data(self, projects, text=""):
             """
             This method completes founded data about project and recalculates
-            it's credibility.
+            it's credibility. Text is the text the projects were found in.
             """
             completed_projects = []
             completed_acronyms = {}
@@ -474,7 +477,7 @@ class EntityExtractor(object):
             projects.extend(self._search_with_the(text))
             projects.extend(self._search_with_acronyms(text))
 
-            projects = self._complete_project_data(projects)
+            projects = self._complete_project_data(projects, text)
 
             return projects
 
@@ -627,7 +630,16 @@ class EntityExtractor(object):
         -----
         We hope, that one day there in RRS will be implemented real geographical
         onotology and this class became useless.
+        -----
+        Cities are resolved by one lookup in the geographic hierarchy table
+        (see rrsregistry.get_geo_hierarchy()) if it is built, otherwise by the
+        chain of translations of TemporaryGeographicalOntology. Resolved
+        hierarchies of cities and countries are kept in LRU cache shared by
+        all instances, so hot cities are resolved once per process.
         """
+        # hierarchies of cities and countries, cities of countries
+        _hierarchies = LRUCache(maxsize=4096)
+        _country_cities = LRUCache(maxsize=256)
 
         def __init__(self):
             """
@@ -635,15 +647,16 @@ class EntityExtractor(object):
             """
             _EntityExtractorComponent.__init__(self)
 
-            self.city2woeid = RRSDictionary(CITY2WOEID, CASE_INSENSITIVE)
-            self.woeid2city = RRSDictionary(WOEID2CITY, CASE_INSENSITIVE)
-            self.woeid2cityaltname = RRSDictionary(WOEID2ALTNAME, CASE_INSENSITIVE)
-            self.woeid2country = RRSDictionary(WOEID2COUNTRY, CASE_INSENSITIVE)
-            self.country2countrywoeid = RRSDictionary(COUNTRY2CWOEID, CASE_INSENSITIVE)
-            self.countrywoeid2city = RRSDictionary(CWOEID2CITY, CASE_INSENSITIVE)
-            self.countrywoeid2country = RRSDictionary(CWOEID2COUNTRY, CASE_INSENSITIVE)
-            self.countrywoeid2continent = RRSDictionary(CWOEID2CONTINENT, CASE_INSENSITIVE)
-            self.city2postcode = RRSDictionary(POSTCODES, CASE_INSENSITIVE)
+            self.city2woeid = get_dictionary(CITY2WOEID, CASE_INSENSITIVE)
+            self.woeid2city = get_dictionary(WOEID2CITY, CASE_INSENSITIVE)
+            self.woeid2cityaltname = get_dictionary(WOEID2ALTNAME, CASE_INSENSITIVE)
+            self.woeid2country = get_dictionary(WOEID2COUNTRY, CASE_INSENSITIVE)
+            self.country2countrywoeid = get_dictionary(COUNTRY2CWOEID, CASE_INSENSITIVE)
+            self.countrywoeid2city = get_dictionary(CWOEID2CITY, CASE_INSENSITIVE)
+            self.countrywoeid2country = get_dictionary(CWOEID2COUNTRY, CASE_INSENSITIVE)
+            self.countrywoeid2continent = get_dictionary(CWOEID2CONTINENT, CASE_INSENSITIVE)
+            self.city2postcode = get_dictionary(POSTCODES, CASE_INSENSITIVE)
+            self.geo_hierarchy = get_geo_hierarchy()
 
 
         class TemporaryGeographicalOntology(object):
@@ -766,6 +779,51 @@ class EntityExtractor(object):
                 return h
 
 
+        def _hierarchy(self, objname, objname_type, search_altnames=False):
+            """
+            Returns hierarchy of city or country (see
+            TemporaryGeographicalOntology.go_up_in_hierarchy()), from cache if
+            it was already resolved. Altnames are not cached.
+            """
+            onto = EntityExtractor.GeographicLocationExtractor.TemporaryGeographicalOntology
+            if search_altnames:
+                return onto.go_up_in_hierarchy(objname, objname_type,
+                    self.city2woeid, self.woeid2city, self.woeid2cityaltname,
+                    self.woeid2country, self.country2countrywoeid,
+                    self.countrywoeid2country, self.countrywoeid2continent,
+                    search_altnames)
+            key = (objname_type, objname)
+            h = self._hierarchies.get(key)
+            if h is None:
+                if objname_type == 'city' and self.geo_hierarchy is not None:
+                    h = {'city': objname, 'city_woeid': None, 'city_altnames': None,
+                         'country' : None, 'country_altnames': None,
+                         'country_woeid': None, 'continent': None}
+                    chain = self.geo_hierarchy.translate(objname) or ()
+                    for attr, value in zip(('city_woeid', 'country',
+                                            'country_woeid', 'continent'), chain):
+                        h[attr] = value
+                else:
+                    h = onto.go_up_in_hierarchy(objname, objname_type,
+                        self.city2woeid, self.woeid2city, self.woeid2cityaltname,
+                        self.woeid2country, self.country2countrywoeid,
+                        self.countrywoeid2country, self.countrywoeid2continent)
+                self._hierarchies.set(key, h)
+            return dict(h)
+
+
+        def _cities_of_country(self, country):
+            """
+            Returns set of cities of the country (empty if there are none).
+            """
+            cities = self._country_cities.get(country)
+            if cities is None:
+                cwoeids = self.country2countrywoeid.translate(country)
+                cities = frozenset(self.countrywoeid2city.translate(cwoeids[0]) or ())
+                self._country_cities.set(country, cities)
+            return cities
+
+
         def find_street(self, text):
             """
             Tries to find a street in text.
@@ -867,19 +925,17 @@ class EntityExtractor(object):
             cities = self.city2woeid.text_search(text, force_bs=False, ret=RET_ORIG_TERM)
             _res = []
             self.rest = text
-            onto = EntityExtractor.GeographicLocationExtractor.TemporaryGeographicalOntology
             while(iterate == 1): # endless cycle - but it's stopped always during first iteration
                 if cities:
+                    # countries for "city in country" backcheck
+                    countries = self.country2countrywoeid.text_search(text,
+                                      force_bs=False, ret=RET_ORIG_TERM)
                     for c in cities:
                         if c.__str__() not in invalid_cities:
                             backcheck_hit = 0 # used in "city in country" backcheck control
                             credibility = 61 # implicite credibility for "city" is 61
                             l = RRSLocation()
-                            loc = onto.go_up_in_hierarchy(c, 'city', self.city2woeid,
-                                    self.woeid2city, self.woeid2cityaltname,
-                                    self.woeid2country, self.country2countrywoeid,
-                                    self.countrywoeid2country, self.countrywoeid2continent,
-                                    search_altnames)
+                            loc = self._hierarchy(c, 'city', search_altnames)
                             #for attr in ('city', 'city_altnames', 'country', 'country_altnames', 'continent'):
                             for attr in ('city', 'country', 'continent'):
                                 l.set(attr, loc[attr], strict=False)
@@ -899,28 +955,20 @@ class EntityExtractor(object):
 
                             # NOTE xlokaj03 - is this check nessessary?
                             # double - check the country
-                            countries = self.country2countrywoeid.text_search(text,
-                                              force_bs=False, ret=RET_ORIG_TERM)
                             if countries:
                                 if loc['country'] in countries:
                                     credibility += 15
                                 else:
                                     for country_tmp in countries:
-                                        cwoeid_tmp = self.country2countrywoeid.translate(country_tmp)
-                                        cities_tmp = self.countrywoeid2city.translate(cwoeid_tmp[0])
-                                        if cities_tmp != None:
-                                            if loc['city'] in cities_tmp:
-                                                backcheck_hit = 1
-                                                break
+                                        if loc['city'] in self._cities_of_country(country_tmp):
+                                            backcheck_hit = 1
+                                            break
                                     if backcheck_hit == 1:
                                         credibility += 15
                                     else: # country in text doesn't belong to city that was found
                                         credibility -= 37
-                                    loc = onto.go_up_in_hierarchy(countries[0],
-                                        'country', self.city2woeid, self.woeid2city,
-                                        self.woeid2cityaltname, self.woeid2country,
-                                        self.country2countrywoeid, self.countrywoeid2country,
-                                        self.countrywoeid2continent, search_altnames)
+                                    loc = self._hierarchy(countries[0], 'country',
+                                                          search_altnames)
                                     
                                     # xlokaj03: this is not necessary, altnames are not 
                                     # in db yet, search_altnames is always false
@@ -955,10 +1003,7 @@ class EntityExtractor(object):
                     for c in countries:
                         credibility = 40 # implicite credibility for "country" is 61
                         l = RRSLocation()
-                        loc = onto.go_up_in_hierarchy(c, 'country', self.city2woeid,
-                            self.woeid2city, self.woeid2cityaltname, self.woeid2country,
-                            self.country2countrywoeid, self.countrywoeid2country,
-                            self.countrywoeid2continent, search_altnames)
+                        loc = self._hierarchy(c, 'country', search_altnames)
                         
                         # xlokaj03: this is not necessary, altnames are not 
                         # in db yet, search_altnames is always false 
@@ -1017,14 +1062,26 @@ class EntityExtractor(object):
         Wiki;)
         Improve pylint score
         """
+        # classes of words (groups of class view NAME_CLASSES)
+        _FIRSTNAME = 1
+        _SURNAME = 2
+        _ANTINAME = 4
+        # maximal count of cached words (the cache is cleared when exceeded)
+        _NAME_CACHE_SIZE = 100000
+
         def __init__(self):
             _EntityExtractorComponent.__init__(self)
             self.persons = []
             # Loaded dictionaries
             self._firstnames = []
             self._surnames = []
-            self._toerase = []
             self._antinames = None
+            self._name_classes = None
+            # {word: bitmask of classes} of words looked up in dictionaries
+            # (in batches, see _resolve_names()), kept between texts
+            self._name_cache = {}
+            # text and {pattern: matches} of patterns matched in it
+            self._matched = (None, {})
             self._example = RRSPerson()
             # Compiles regexps
             self.__REsname_pref = '(?:O\'|Mc|Mac|van |von )?'
@@ -1061,46 +1118,112 @@ class EntityExtractor(object):
                                        + self.__REsnames + ')' + self.__REetal
                                        + '\s*,\s*(?P<first>' + self.__REfnames
                                        + ')', re.M)
+            self.__RE_word = re.compile('[A-Z]' + self.__REletters + '+(?:-[A-Z]'
+                                        + self.__REletters + '+)?')
+            self._patterns = {self.extract_Snm: self.__RE_Snm,
+                              self.extract_nmS: self.__RE_nmS,
+                              self.extract_NMS: self.__RE_NMS,
+                              self.extract_NmS: self.__RE_NmS,
+                              self.extract_SN: self.__RE_SN}
             self.init_dicts()
 
         def init_dicts(self):
             """
-            Load dictionaries into the memory
+            Load dictionaries into the memory. If class index of names is
+            built, words are looked up only in it.
             """
-            self._firstnames.append(RRSDictionary(NAME_FF_CZ, CASE_INSENSITIVE))
-            self._firstnames.append(RRSDictionary(NAME_FM_CZ, CASE_INSENSITIVE))
-            self._firstnames.append(RRSDictionary(NAME_FF_US, CASE_INSENSITIVE))
-            self._firstnames.append(RRSDictionary(NAME_FM_US, CASE_INSENSITIVE))
-            self._firstnames.append(RRSDictionary(NAME_FF_XX, CASE_INSENSITIVE))
-            self._firstnames.append(RRSDictionary(NAME_FM_XX, CASE_INSENSITIVE))
-            self._surnames.append(RRSDictionary(NAME_SF_CZ, CASE_INSENSITIVE))
-            self._surnames.append(RRSDictionary(NAME_SM_CZ, CASE_INSENSITIVE))
-            self._surnames.append(RRSDictionary(NAME_S_US, CASE_INSENSITIVE))
-            self._antinames = RRSDictionary(NON_NAMES, CASE_INSENSITIVE)
+            self._name_classes = get_class_index(NAME_CLASSES)
+            if self._name_classes is not None:
+                return
+            # dictionaries which are not shipped are skipped
+            for name in shipped((NAME_FF_CZ, NAME_FM_CZ, NAME_FF_US, NAME_FM_US,
+                                 NAME_FF_XX, NAME_FM_XX)):
+                self._firstnames.append(get_dictionary(name, CASE_INSENSITIVE))
+            for name in shipped((NAME_SF_CZ, NAME_SM_CZ, NAME_S_US)):
+                self._surnames.append(get_dictionary(name, CASE_INSENSITIVE))
+            self._antinames = get_dictionary(NON_NAMES, CASE_INSENSITIVE)
+
+        def _resolve_names(self, words):
+            """
+            Looks up classes of words (not looked up yet) at once - in class
+            index (one lookup per word) or in all dictionaries (one
+            contains_many() call per dictionary) - and caches them.
+            """
+            cache = self._name_cache
+            new = list(set([w for w in words if w and w not in cache]))
+            if not new:
+                return
+            if self._name_classes is not None:
+                classes = self._name_classes.frequencies_many(new, 0)
+            else:
+                classes = bytearray(len(new))
+                for cls, dicts in ((self._FIRSTNAME, self._firstnames),
+                                   (self._SURNAME, self._surnames),
+                                   (self._ANTINAME, [self._antinames])):
+                    for x in dicts:
+                        for i, found in enumerate(x.contains_many(new)):
+                            if found:
+                                classes[i] |= cls
+            for i, w in enumerate(new):
+                cache[w] = classes[i]
+
+        def preload_names(self, texts):
+            """
+            Looks up capitalized words of all texts (e.g. references of one
+            document) in one batch, so extraction of the texts finds them in
+            cache.
+            """
+            words = set()
+            for text in texts:
+                words.update(self.__RE_word.findall(text))
+            self._resolve_names(words)
+
+        def _resolve_matches(self, matches):
+            # looks up all names of regexp matches in one batch
+            words = []
+            for match in matches:
+                words.extend(match.groupdict().values())
+            self._resolve_names(words)
+
+        def _lookup(self, word):
+            if word not in self._name_cache:
+                self._resolve_names([word])
+            return self._name_cache.get(word, 0)
+
+        def _matches(self, text, pattern):
+            """
+            Returns list of matches of name pattern in text. Matches in the
+            last text are kept, so scan_types() and extract functions scan
+            the text with every pattern once.
+            """
+            if self._matched[0] is not text:
+                self._matched = (text, {})
+            found = self._matched[1]
+            if pattern not in found:
+                found[pattern] = list(pattern.finditer(text))
+            return found[pattern]
 
         def is_firstname(self, word):
             """
             Compare word with dictionaries
             """
-            for x in self._firstnames:
-                if x.contains_key(word):
-                    return True
+            if self._lookup(word) & self._FIRSTNAME:
+                return True
             return None
 
         def is_surname(self, word):
             """
             Compare word with dictionaries
             """
-            for x in self._surnames:
-                if x.contains_key(word):
-                    return True
+            if self._lookup(word) & self._SURNAME:
+                return True
             return None
 
         def is_antiname(self, word):
             """
             Compare word with anti-names dict
             """
-            if self._antinames.contains_key(word):
+            if self._lookup(word) & self._ANTINAME:
                 return True
             else:
                 return None
@@ -1128,11 +1251,11 @@ class EntityExtractor(object):
             __match_dict[self.extract_nmS] = 0
             __match_dict[self.extract_NMS] = 0
             __match_dict[self.extract_NmS] = 0
-            __match_dict[self.extract_Snm] = len(self.__RE_Snm.findall(text))
-            __match_dict[self.extract_nmS] = len(self.__RE_nmS.findall(text))
-            __match_dict[self.extract_NMS] = len(self.__RE_NMS.findall(text))
-            __match_dict[self.extract_NmS] = len(self.__RE_NmS.findall(text))
-            __match_dict[self.extract_SN] = len(self.__RE_SN.findall(text))
+            __match_dict[self.extract_Snm] = len(self._matches(text, self.__RE_Snm))
+            __match_dict[self.extract_nmS] = len(self._matches(text, self.__RE_nmS))
+            __match_dict[self.extract_NMS] = len(self._matches(text, self.__RE_NMS))
+            __match_dict[self.extract_NmS] = len(self._matches(text, self.__RE_NmS))
+            __match_dict[self.extract_SN] = len(self._matches(text, self.__RE_SN))
 
             if __match_dict[self.extract_Snm] or __match_dict[self.extract_nmS]:
                 if __match_dict[self.extract_Snm] >= __match_dict[self.extract_nmS]:
@@ -1149,11 +1272,32 @@ class EntityExtractor(object):
 
             return __func_list
 
+        def _add_persons(self, text, list, candidates, spans, priority):
+            """
+            Adds (match, person) candidates of an extract function. Without
+            spans, persons are appended to list and text without the matches
+            is returned. Otherwise they are added to spans (persons are
+            chosen by main_extract()) and text is returned unchanged.
+            """
+            standalone = spans is None
+            if standalone:
+                spans = SpanSet(text)
+            for match, person in candidates:
+                spans.add_match(match, AUTHOR, person.get('credibility'),
+                                priority, person)
+            if not standalone:
+                return text
+            for span in spans.resolve():
+                list.append(span.value)
+            return spans.rest()
+
         #Extract functions extract_<type>:
 
-        def extract_Snm(self, text, list):
+        def extract_Snm(self, text, list, spans=None, priority=0):
             # Search for: Surname, N. M.
-            n_s = self.__RE_Snm.finditer(text)
+            n_s = self._matches(text, self.__RE_Snm)
+            self._resolve_matches(n_s)
+            candidates = []
             for match in n_s:
                 if self.is_antiname(match.group('last')):
                     continue
@@ -1166,16 +1310,14 @@ class EntityExtractor(object):
                     new_person.set('credibility', 80)
                 else:
                     new_person.set('credibility', 50)
-                self._toerase.append(text[match.start():match.end()])
-                list.append(new_person)
-            for name in self._toerase:
-                text = re.sub(name, "", text)
-            self._toerase = []
-            return text
+                candidates.append((match, new_person))
+            return self._add_persons(text, list, candidates, spans, priority)
 
-        def extract_SN(self, text, list):
+        def extract_SN(self, text, list, spans=None, priority=0):
             # Search for: Surname, Name
-            n_s = self.__RE_SN.finditer(text)
+            n_s = self._matches(text, self.__RE_SN)
+            self._resolve_matches(n_s)
+            candidates = []
             for match in n_s:
                 if self.is_antiname(match.group('last')):
                     continue
@@ -1187,16 +1329,14 @@ class EntityExtractor(object):
                     new_person.set('credibility', 80)
                 else:
                     new_person.set('credibility', 50)
-                self._toerase.append(text[match.start():match.end()])
-                list.append(new_person)
-            for name in self._toerase:
-                text = re.sub(name, "", text)
-            self._toerase = []
-            return text 
-
-        def extract_nmS(self, text, list):
+                candidates.append((match, new_person))
+            return self._add_persons(text, list, candidates, spans, priority) 
+
+        def extract_nmS(self, text, list, spans=None, priority=0):
             # Search for: N. M. Surname
-            n_s = self.__RE_nmS.finditer(text)
+            n_s = self._matches(text, self.__RE_nmS)
+            self._resolve_matches(n_s)
+            candidates = []
             for match in n_s:
                 # Main condition
                 if self.is_antiname(match.group('last')):
@@ -1210,16 +1350,14 @@ class EntityExtractor(object):
                     new_person.set('credibility', 80)
                 else:
                     new_person.set('credibility', 50)
-                self._toerase.append(text[match.start():match.end()])
-                list.append(new_person)
-            for name in self._toerase:
-                text = re.sub(name, "", text)
-            self._toerase = []
-            return text
+                candidates.append((match, new_person))
+            return self._add_persons(text, list, candidates, spans, priority)
 
-        def extract_NMS(self, text, list):
+        def extract_NMS(self, text, list, spans=None, priority=0):
             # Search for: Name Middle Surname
-            n_s = self.__RE_NMS.finditer(text)
+            n_s = self._matches(text, self.__RE_NMS)
+            self._resolve_matches(n_s)
+            candidates = []
             for match in n_s:
                 # Main condition
                 if self.is_antiname(match.group('first')) or \
@@ -1259,16 +1397,14 @@ class EntityExtractor(object):
                         new_person.set('credibility', 60)
                     else:
                         new_person.set('credibility', 50)
-                self._toerase.append(text[match.start():match.end()])
-                list.append(new_person)
-            for name in self._toerase:
-                text = re.sub(name, "", text)
-            self._toerase = []
-            return text
+                candidates.append((match, new_person))
+            return self._add_persons(text, list, candidates, spans, priority)
 
-        def extract_NmS(self, text, list):
+        def extract_NmS(self, text, list, spans=None, priority=0):
             # Search for: Name M. Surname
-            n_s = self.__RE_NmS.finditer(text)
+            n_s = self._matches(text, self.__RE_NmS)
+            self._resolve_matches(n_s)
+            candidates = []
             for match in n_s:
                 if self.is_antiname(match.group('last')) or \
                     self.is_antiname(match.group('first')):
@@ -1286,12 +1422,8 @@ class EntityExtractor(object):
                         new_person.set('credibility', 60)
                     else:
                         new_person.set('credibility', 40)
-                self._toerase.append(text[match.start():match.end()])
-                list.append(new_person)
-            for name in self._toerase:
-                text = re.sub(name, "", text)
-            self._toerase = []
-            return text
+                candidates.append((match, new_person))
+            return self._add_persons(text, list, candidates, spans, priority)
 
         def main_extract(self, text):
             """
@@ -1303,14 +1435,32 @@ class EntityExtractor(object):
             """
             __person_list = []
             __scan_list = []
-
+            if len(self._name_cache) > self._NAME_CACHE_SIZE:
+                self._name_cache = {}
+
+            # all extract functions annotate the same text, names found by
+            # more of them are resolved at the end in favour of the function
+            # scanned first; words which become adjacent only after another
+            # name is removed are not matched as a name
+            spans = SpanSet(text)
             __scan_list = self.scan_types(text)
+            # words of all matches are looked up in one batch
+            matches = []
             for func in __scan_list:
-                text = func(text, __person_list)
+                matches.extend(self._matches(text, self._patterns[func]))
+            self._resolve_matches(matches)
+            for priority, func in enumerate(__scan_list):
+                func(text, __person_list, spans, priority)
+
+            found = spans.resolve()
+            found.sort(key=lambda span: (span.priority, span.start))
+            for span in found:
+                __person_list.append(span.value)
 
             for person in __person_list:
                 self.fill_name(person)
-            return __person_list, text
+            self._matched = (None, {})
+            return __person_list, spans.rest()
 
 
         def extract_persons(self, text):
@@ -1389,7 +1539,7 @@ class EntityExtractor(object):
             Class constructor
             """
             _EntityExtractorComponent.__init__(self)
-            self.eventdict = RRSDictionary(EVENT_ACRONYMS, CASE_INSENSITIVE)
+            self.eventdict = get_dictionary(EVENT_ACRONYMS, CASE_INSENSITIVE)
 
 
         def _guess_type(self, title):
@@ -1564,9 +1714,10 @@ class EntityExtractor(object):
             self._buffer_organization_credibility = {}
             self.rest = ""
             self.work_text = ""
+            self._marks = SpanSet("")
 
             #Dictionaries
-            self._rrsdict_universities = RRSDictionary(UNIVERSITIES,
+            self._rrsdict_universities = get_dictionary(UNIVERSITIES,
                                                             CASE_INSENSITIVE)
             self.significant_words_and_actions = {
                 "university":self._university, "univ":self._university,
@@ -1635,22 +1786,88 @@ class EntityExtractor(object):
             self._pat_word_1 = "(([A-Z]\.)+|[(][A-Z]{2,}[)]|[-'A-Za-z&/]+)"
             self._pat_word_2 = "(([A-Z]\.)+|[A-Z][a-z]{1,7}\.|[(][A-Z]{2,}[)]|[-'A-Za-z&/]+)"
             self._pat_separator = "[\s,;:.]"
-            self._pat_markers_sub = "#START_MARK#\g<1>#END_MARK#"
+            # keywords of organization types (see _find_organization())
+            self._pat_keywords = {
+                'group': '([Gg][Rr][Oo][Uu][Pp])',
+                'university': '([Uu][Nn][Ii][Vv][Ee][Rr][Ss][Ii][Tt][Yy]'
+                              '|[Uu][Nn][Ii][Vv]\.'
+                              '|[Uu][Nn][Ii][Vv][Ee][Rr][Zz][Ii][Tt][Aa]'
+                              '|[Uu][Nn][Ii][Vv][Ee][Rr][Ss][Ii][Tt][ÄäAa][Tt]'
+                              '|[Uu][Nn][Ii][Vv][Ee][Rr][Ss][Ii][Tt][Aa][Ii][Rr][Ee]'
+                              ')',
+                'department': '([Dd][Ee][Pp][Aa][Rr][Tt][Mm][Ee][Nn][Tt]'
+                              '|[Dd][Ee][Pp][Tt]\.'
+                              '|[Oo][Dd][Dd][ĚěEe][Ll][Ee][Nn][ÍíIi]'
+                              '|[Dd][EeÉé][Pp][Aa][Rr][Tt][Ee][Mm][Ee][Nn][Tt]'
+                              '|[Aa][Bb][Tt][Ee][Ii][Ll][Uu][Nn][Gg]'
+                              ')',
+                'faculty': '([Ff][Aa][Cc][Uu][Ll][Tt][Yy]'
+                           '|[Ff][Aa][Kk][Uu][Ll][Tt][Aa]'
+                           '|[Ff][Aa][Kk][Uu][Ll][Tt][ÄäAa][Tt]'
+                           '|[Ff][Aa][Cc][Uu][Ll][Tt][ÉéEe]'
+                           ')',
+                'school': '([Ss][Cc][Hh][Oo][Oo][Ll])',
+                'institute': '([Ii][Nn][Ss][Tt][Ii][Tt][Uu][Tt][Ee])',
+                'corporation': '([Cc][Oo][Rr][Pp][Oo][Rr][Aa][Tt][Ii][Oo][Nn])',
+                'center': '([Cc][Ee][Nn][Tt]([Ee][Rr]|[Rr][Ee]))',
+                'laboratory': '([Ll][Aa][Bb][Oo][Rr][Aa][Tt][Oo][Rr][Yy]'
+                              '|[Ll][Aa][Bb]\.'
+                              ')',
+                'council': '([Cc][Oo][Uu][Nn][Cc][Ii][Ll])',
+                'college': '([Cc][Oo][Ll][Ll][Ee][Gg][Ee])',
+                'academy': '([Aa][Cc][Aa][Dd][Ee][Mm][Yy])',
+                'academica': '([Aa][Cc][Aa][Dd][Ee][Mm][Ii][Cc][Aa])',
+                'society': '([Ss][Oo][Cc][Ii][Ee][Tt][Yy]'
+                           '|[Ss][Oo][Cc]\.'
+                           ')',
+                'agency': '([Aa][Gg][Ee][Nn][Cc][Yy])',
+                'consortium': '([Cc][Oo][Nn][Ss][Oo][Rr][Tt][Ii][Uu][Mm])',
+                'office': '([Oo][Ff][Ff][Ii][Cc][Ee])',
+                'bureau': '([Bb][Uu][Rr][Ee][Aa][Uu])',
+                'association': '([Aa][Ss][Ss][Oo][Tt][Ii][Aa][Tt][Ii][Oo][Nn]'
+                               '|[Aa][Ss][Ss][Oo][Cc]\.'
+                               ')',
+            }
             self._pat_forbidden_words = '(meeting|seminar|symposium|conference|'\
                                         'journal|press|proc\.|proceedings|before'\
                                         '|when|while|is|review)'
             self._pat_forbidden_prefix = '(at|by|on|in|of the|with the)'
+            self._pat_significant_words = '(' + '|'.join(
+                self.significant_words_and_actions.keys()) + ')'
             self._pat_prefix_to_remove = '((at|by|on) the)'
             self._pat_report = '((technical|research) report|tech\.? report|tech'\
                                '\.? rep\.?|(technical|research) rep\.?|(?<!tech'\
                                'nical )report|(?<!research )report)'
 
             #Regular expressions
-            self._re_organization = re.compile('^.*?(#START_MARK#.+?#END_MARK#)')
-            self._re_join_organization = re.compile('#END_MARK#(\W+)#START_MARK#',
-                                                    re.DOTALL)
-            self._re_words_and_separators = re.compile('([a-z]+?)(\W+|$)',
-                                                       re.DOTALL)
+            self._re_gap = re.compile('\W+$', re.DOTALL)
+            # one scanner of all significant words (words are runs of [a-z] in
+            # the lowercased text followed by a non-word character)
+            self._re_significant_words = re.compile('(?<![a-z])('
+                + '|'.join(sorted([w for w in self.significant_words_and_actions
+                                   if re.match('[a-z]+$', w)], key=len,
+                                  reverse=True))
+                + ')(?!\w)')
+            # one scanner of keywords of all organization types
+            self._re_keywords = re.compile('|'.join(self._pat_keywords.values()))
+            # phrases made of characters of words, keywords and spaces - every
+            # organization found by _find_organization() lies in one of them
+            self._re_phrase = re.compile("[-'A-Za-z&/().\x80-\xff ]+")
+            # compiled patterns of _find_organization()
+            self._re_organizations = {}
+            # text, phrases with keywords and short form flag (see _scan())
+            self._region_gap = 256
+            self._scanned = (None, [], False)
+            # forbidden words before or after any significant word, forbidden
+            # prefix before it (see _check_organization())
+            self._re_forbidden_organizations = [
+                re.compile('(^|\W)' + self._pat_forbidden_words + '\W+.*?'
+                           + self._pat_significant_words, re.IGNORECASE),
+                re.compile(self._pat_significant_words + '\W+.*?'
+                           + self._pat_forbidden_words + '(\W|$)', re.IGNORECASE),
+                re.compile('(^|\W)' + self._pat_forbidden_prefix + '(\s.+?\s|\s)+'
+                           + self._pat_significant_words, re.IGNORECASE)
+            ]
             self._re_forbidden_words = re.compile('(^|\W)'
                                                   + self._pat_forbidden_words
                                                   + '(\W|$)', re.IGNORECASE)
@@ -1672,8 +1889,7 @@ class EntityExtractor(object):
             """
             Finds organizations containing phrase 'group'.
             """
-            _pat_group = '([Gg][Rr][Oo][Uu][Pp])'
-            return self._find_organization(_pat_group, reference)
+            return self._find_organization(self._pat_keywords['group'], reference)
 
 
         def _university(self, reference):
@@ -1681,14 +1897,7 @@ class EntityExtractor(object):
             Finds organizations containing phrases 'university' or 'univ.'
             or 'univerzita' or 'universität' or 'universitaire'.
             """
-            _pat_university = '('
-            _pat_university += '[Uu][Nn][Ii][Vv][Ee][Rr][Ss][Ii][Tt][Yy]'
-            _pat_university += '|[Uu][Nn][Ii][Vv]\.'
-            _pat_university += '|[Uu][Nn][Ii][Vv][Ee][Rr][Zz][Ii][Tt][Aa]'
-            _pat_university += '|[Uu][Nn][Ii][Vv][Ee][Rr][Ss][Ii][Tt][ÄäAa][Tt]'
-            _pat_university += '|[Uu][Nn][Ii][Vv][Ee][Rr][Ss][Ii][Tt][Aa][Ii][Rr][Ee]'
-            _pat_university += ')'
-            return self._find_organization(_pat_university, reference)
+            return self._find_organization(self._pat_keywords['university'], reference)
 
 
         def _department(self, reference):
@@ -1696,14 +1905,7 @@ class EntityExtractor(object):
             Finds organizations containing phrases 'department' or 'dept\.
             or 'oddělení' or 'département' or 'abteilung'.
             """
-            _pat_department = '('
-            _pat_department += '[Dd][Ee][Pp][Aa][Rr][Tt][Mm][Ee][Nn][Tt]'
-            _pat_department += '|[Dd][Ee][Pp][Tt]\.'
-            _pat_department += '|[Oo][Dd][Dd][ĚěEe][Ll][Ee][Nn][ÍíIi]'
-            _pat_department += '|[Dd][EeÉé][Pp][Aa][Rr][Tt][Ee][Mm][Ee][Nn][Tt]'
-            _pat_department += '|[Aa][Bb][Tt][Ee][Ii][Ll][Uu][Nn][Gg]'
-            _pat_department += ')'
-            return self._find_organization(_pat_department, reference)
+            return self._find_organization(self._pat_keywords['department'], reference)
 
 
         def _faculty(self, reference):
@@ -1711,177 +1913,174 @@ class EntityExtractor(object):
             Finds organizations containing phrases 'faculty' or 'fakulta'
             of 'fakultät' or 'faculté'.
             """
-            _pat_faculty = '('
-            _pat_faculty += '[Ff][Aa][Cc][Uu][Ll][Tt][Yy]'
-            _pat_faculty += '|[Ff][Aa][Kk][Uu][Ll][Tt][Aa]'
-            _pat_faculty += '|[Ff][Aa][Kk][Uu][Ll][Tt][ÄäAa][Tt]'
-            _pat_faculty += '|[Ff][Aa][Cc][Uu][Ll][Tt][ÉéEe]'
-            _pat_faculty += ')'
-            return self._find_organization(_pat_faculty, reference)
+            return self._find_organization(self._pat_keywords['faculty'], reference)
 
 
         def _school(self, reference):
             """
             Finds organizations containing phrase 'school'.
             """
-            _pat_school = '([Ss][Cc][Hh][Oo][Oo][Ll])'
-            return self._find_organization(_pat_school, reference)
+            return self._find_organization(self._pat_keywords['school'], reference)
 
 
         def _institute(self, reference):
             """
             Finds organizations containing phrase 'institute'.
             """
-            _pat_institute = '([Ii][Nn][Ss][Tt][Ii][Tt][Uu][Tt][Ee])'
-            return self._find_organization(_pat_institute, reference)
+            return self._find_organization(self._pat_keywords['institute'], reference)
 
 
         def _corporation(self, reference):
             """
             Finds organizations containing phrase 'corporation'.
             """
-            _pat_corporation = '([Cc][Oo][Rr][Pp][Oo][Rr][Aa][Tt][Ii][Oo][Nn])'
-            return self._find_organization(_pat_corporation, reference)
+            return self._find_organization(self._pat_keywords['corporation'], reference)
 
 
         def _center(self, reference):
             """
             Finds organizations containing phrases 'center' or 'centre'.
             """
-            _pat_center = '([Cc][Ee][Nn][Tt]([Ee][Rr]|[Rr][Ee]))'
-            return self._find_organization(_pat_center, reference)
+            return self._find_organization(self._pat_keywords['center'], reference)
 
 
         def _laboratory(self, reference):
             """
             Finds organizations containing phrases 'laboratory' or 'lab.'.
             """
-            _pat_laboratory = '('
-            _pat_laboratory += '[Ll][Aa][Bb][Oo][Rr][Aa][Tt][Oo][Rr][Yy]'
-            _pat_laboratory += '|[Ll][Aa][Bb]\.'
-            _pat_laboratory += ')'
-            return self._find_organization(_pat_laboratory, reference)
+            return self._find_organization(self._pat_keywords['laboratory'], reference)
 
 
         def _council(self, reference):
             """
             Finds organizations containing phrase 'council'.
             """
-            _pat_council = '([Cc][Oo][Uu][Nn][Cc][Ii][Ll])'
-            return self._find_organization(_pat_council, reference)
+            return self._find_organization(self._pat_keywords['council'], reference)
 
 
         def _college(self, reference):
             """
             Finds organizations containing phrase 'college'.
             """
-            _pat_college = '([Cc][Oo][Ll][Ll][Ee][Gg][Ee])'
-            return self._find_organization(_pat_college, reference)
+            return self._find_organization(self._pat_keywords['college'], reference)
 
 
         def _academy(self, reference):
             """
             Finds organizations containing phrase 'academy'.
             """
-            _pat_academy = '([Aa][Cc][Aa][Dd][Ee][Mm][Yy])'
-            return self._find_organization(_pat_academy, reference)
+            return self._find_organization(self._pat_keywords['academy'], reference)
 
 
         def _academica(self, reference):
             """
             Finds organizations containing phrase 'academica'.
             """
-            _pat_academica = '([Aa][Cc][Aa][Dd][Ee][Mm][Ii][Cc][Aa])'
-            return self._find_organization(_pat_academica, reference)
+            return self._find_organization(self._pat_keywords['academica'], reference)
 
 
         def _society(self, reference):
             """
             Finds organizations containing phrase 'society' or 'soc.'.
             """
-            _pat_society = '('
-            _pat_society += '[Ss][Oo][Cc][Ii][Ee][Tt][Yy]'
-            _pat_society += '|[Ss][Oo][Cc]\.'
-            _pat_society += ')'
-            return self._find_organization(_pat_society, reference)
+            return self._find_organization(self._pat_keywords['society'], reference)
 
 
         def _agency(self, reference):
             """
             Finds organizations containing phrase 'agency'.
             """
-            _pat_agency = '([Aa][Gg][Ee][Nn][Cc][Yy])'
-            return self._find_organization(_pat_agency, reference)
+            return self._find_organization(self._pat_keywords['agency'], reference)
 
 
         def _consortium(self, reference):
             """
             Finds organizations containing phrase 'consortium'.
             """
-            _pat_consortium = '([Cc][Oo][Nn][Ss][Oo][Rr][Tt][Ii][Uu][Mm])'
-            return self._find_organization(_pat_consortium, reference)
+            return self._find_organization(self._pat_keywords['consortium'], reference)
 
 
         def _office(self, reference):
             """
             Finds organizations containing phrase 'office'.
             """
-            _pat_office = '([Oo][Ff][Ff][Ii][Cc][Ee])'
-            return self._find_organization(_pat_office, reference)
+            return self._find_organization(self._pat_keywords['office'], reference)
 
 
         def _bureau(self, reference):
             """
             Finds organizations containing phrase 'bureau'.
             """
-            _pat_bureau = '([Bb][Uu][Rr][Ee][Aa][Uu])'
-            return self._find_organization(_pat_bureau, reference)
+            return self._find_organization(self._pat_keywords['bureau'], reference)
 
 
         def _association(self, reference):
             """
             Finds organizations containing phrases 'association' or 'assoc.'.
             """
-            _pat_association = '('
-            _pat_association += '[Aa][Ss][Ss][Oo][Tt][Ii][Aa][Tt][Ii][Oo][Nn]'
-            _pat_association += '|[Aa][Ss][Ss][Oo][Cc]\.'
-            _pat_association += ')'
-            return self._find_organization(_pat_association, reference)
+            return self._find_organization(self._pat_keywords['association'], reference)
 
 
         def _find_organization(self, pattern_organization, reference):
             """
             This method looks for organization specified in pattern.
             """
-            if self._re_shorted_organization.search(reference):
-                #Organization is in shorted form (univ., dept...)
-                pattern_1 = re.compile('((' + self._pat_word_2 + ' )*'
-                                       + pattern_organization + '( '
-                                       + self._pat_word_2 + ')+)')
-                pattern_2 = re.compile('((' + self._pat_word_2 + ' )+'
-                                       + pattern_organization + '( '
-                                       + self._pat_word_2 + ')*)')
-            else:
-                pattern_1 = re.compile('((' + self._pat_word_1 + ' )*'
-                                       + pattern_organization + '( '
-                                       + self._pat_word_1 + ')+)')
-                pattern_2 = re.compile('((' + self._pat_word_1 + ' )+'
-                                       + pattern_organization + '( '
-                                       + self._pat_word_1 + ')*)')
-
-            if pattern_1.search(reference):
-                if self._check_organization(pattern_1.search(reference).group(1)):
-                    self.work_text = pattern_1.sub(self._pat_markers_sub,
-                                                   self.work_text)
-                    return True
-            if pattern_2.search(reference):
-                if self._check_organization(pattern_2.search(reference).group(1)):
-                    self.work_text = pattern_2.sub(self._pat_markers_sub,
-                                                   self.work_text)
+            regions, shorted = self._scan(reference)
+            patterns = self._re_organizations.get((pattern_organization, shorted))
+            if patterns is None:
+                if shorted:
+                    #Organization is in shorted form (univ., dept...)
+                    word = self._pat_word_2
+                else:
+                    word = self._pat_word_1
+                pattern_1 = re.compile('((' + word + ' )*' + pattern_organization
+                                       + '( ' + word + ')+)')
+                pattern_2 = re.compile('((' + word + ' )+' + pattern_organization
+                                       + '( ' + word + ')*)')
+                patterns = (pattern_1, pattern_2)
+                self._re_organizations[(pattern_organization, shorted)] = patterns
+
+            #Only phrases with keywords are searched, the first match is the
+            #same as the first match in the whole text
+            for pattern in patterns:
+                match = None
+                for start, end in regions:
+                    match = pattern.search(reference, start, end)
+                    if match:
+                        break
+                if match and self._check_organization(match.group(1)):
+                    #Marks all occurrences
+                    for start, end in self._scan(self.work_text)[0]:
+                        for match in pattern.finditer(self.work_text, start, end):
+                            self._marks.cover(match.start(), match.end())
                     return True
             return False
 
 
+        def _scan(self, text):
+            """
+            Scans the text for keywords of all organization types at once.
+            Returns list of (start, end) of parts of the text with phrases
+            containing a keyword (phrases closer than _region_gap characters
+            are joined) and True if some organization is in shorted form.
+            Result for the last text is kept, so the type-specific searches
+            don't scan it again.
+            """
+            if self._scanned[0] is not text:
+                phrases = [m.span() for m in self._re_phrase.finditer(text)]
+                starts = [start for start, end in phrases]
+                regions = []
+                for match in self._re_keywords.finditer(text):
+                    start, end = phrases[bisect_right(starts, match.start()) - 1]
+                    if regions and start - regions[-1][1] < self._region_gap:
+                        regions[-1] = (regions[-1][0], end)
+                    else:
+                        regions.append((start, end))
+                shorted = self._re_shorted_organization.search(text) is not None
+                self._scanned = (text, regions, shorted)
+            return self._scanned[1:]
+
+
         def _check_organization(self, organization_title):
             """
             This method checks the organization and returns False if it's not
@@ -1890,17 +2089,8 @@ class EntityExtractor(object):
             if self._calculate_credibility(organization_title) < 10:
                 #Too low credibility
                 return False
-            for s_word in self.significant_words_and_actions.keys():
-                if re.search('(^|\W)' + self._pat_forbidden_words + '\W+.*?'
-                             + s_word, organization_title, re.IGNORECASE):
-                    return False
-                if re.search(s_word + '\W+.*?' + self._pat_forbidden_words
-                             + '(\W|$)', organization_title, re.IGNORECASE):
-                    return False
-            for s_word in self.significant_words_and_actions.keys():
-                if re.search('(^|\W)' + self._pat_forbidden_prefix
-                             + '(\s.+?\s|\s)+' + s_word, organization_title,
-                             re.IGNORECASE):
+            for regex in self._re_forbidden_organizations:
+                if regex.search(organization_title):
                     return False
             return True
 
@@ -1927,22 +2117,48 @@ class EntityExtractor(object):
             return text
 
 
-        def _fix_marks(self, text):
+        def _marked_organizations(self):
             """
-            This method fixes markers in a text.
+            Returns marked parts of the work text joined into organizations:
+            list of (start, end, marked title), where parts of organization
+            separated only by non-word characters are delimited by relation
+            marker.
             """
-            while re.search('(#START_MARK#){2,}', text):
-                text = re.sub('(#START_MARK#){2,}', '#START_MARK#', text)
-            while re.search('(#END_MARK#){2,}', text):
-                text = re.sub('(#END_MARK#){2,}', '#END_MARK#', text)
-            return text
+            text = self.work_text
+            organizations = []
+            for start, end in self._marks.runs():
+                if organizations and \
+                   self._re_gap.match(text, organizations[-1][1], start):
+                    last_start, last_end, marked = organizations[-1]
+                    marked += text[last_end:start] + "#RELATION_MARK#" \
+                              + text[start:end]
+                    organizations[-1] = (last_start, end, marked)
+                else:
+                    organizations.append((start, end, text[start:end]))
+            return organizations
+
+
+        def _mark_rest(self, rest, title):
+            """
+            Marks title (with separators before or after it) in the original
+            text, marked parts are not in the rest.
+            """
+            found = False
+            for match in re.finditer(self._pat_separator + '+\s*'
+                                     + re.escape(title), rest.text):
+                rest.cover(match.start(), match.end())
+                found = True
+            if not found:
+                for match in re.finditer(re.escape(title) + '\s*'
+                                         + self._pat_separator + '+', rest.text):
+                    rest.cover(match.start(), match.end())
 
 
         def _get_organization_type(self, organization_title):
             """
             This method returns type of the organization.
             """
-            if organization_title in self._buffer_organization_type.keys():
+            if organization_title in self._buffer_organization_type:
                 return self._buffer_organization_type[organization_title]
             for s_word in self.significant_words_and_actions.keys():
                 if re.search(s_word, organization_title, re.IGNORECASE):
@@ -1992,7 +2208,7 @@ class EntityExtractor(object):
             """
             This method calculates credibility of an organization title.
             """
-            if organization_title in self._buffer_organization_credibility.keys():
+            if organization_title in self._buffer_organization_credibility:
                 credibility = self._buffer_organization_credibility[organization_title]
             else:
                 credibility = 0
@@ -2014,7 +2230,7 @@ class EntityExtractor(object):
                         credibility += 100
                     elif word_lower in self._common_organizations_shortcuts:
                         credibility += 100
-                    elif word_lower in self.significant_words_and_actions.keys():
+                    elif word_lower in self.significant_words_and_actions:
                         credibility += 100
                     elif word_lower in self._common_organizations_words:
                         credibility += 50
@@ -2172,38 +2388,36 @@ class EntityExtractor(object):
             self.organizations = []
             result = False
             text_low = text.lower()
-            words_and_separators = self._re_words_and_separators.findall(text_low)
-            self.rest = text
+            # parts of the original text to remove from the rest
+            rest = SpanSet(text)
             text = self._repair_text(text)
+            # work text is not changed, found organizations are marked in the
+            # coverage of marks
             self.work_text = text
+            self._marks = SpanSet(text)
+
+            # significant words are found by one scanner, every action is
+            # called once even if its words are in the text more times
+            actions = []
+            for match in self._re_significant_words.finditer(text_low):
+                action = self.significant_words_and_actions[match.group(1)]
+                if action not in actions:
+                    actions.append(action)
+            for action in actions:
+                if action(text):
+                    result = True
 
-            for word_and_separator in words_and_separators:
-                word = word_and_separator[0]
-                if word in self.significant_words_and_actions.keys():
-                    if self.significant_words_and_actions.get(word)(text):
-                        result = True
-
-            self.work_text = self._fix_marks(self.work_text)
-
-            while self._re_join_organization.search(self.work_text):
-                self.work_text = \
-                    self._re_join_organization.sub("\g<1>#RELATION_MARK#",
-                                                   self.work_text)
-                    
             #University search with dictionary
             univs = self._rrsdict_universities.text_search(self.work_text,
                                                            force_bs=False,
                                                            ret=RET_ORIG_TERM)
             for univ in univs:
-                self.work_text = re.sub(re.escape(univ), "", self.work_text)
-                if re.search(self._pat_separator + '+\s*' + re.escape(univ),
-                             self.rest):
-                    self.rest = re.sub(self._pat_separator + '+\s*' 
-                                           + re.escape(univ), "", self.rest)
-                elif re.search(re.escape(univ) + '\s*' + self._pat_separator 
-                               + '+', self.rest):
-                    self.rest = re.sub(re.escape(univ) + '\s*' 
-                                       + self._pat_separator + '+', "", self.rest)
+                #University is not part of marked organizations
+                pos = text.find(univ)
+                while pos != -1:
+                    self._marks.uncover(pos, pos + len(univ))
+                    pos = text.find(univ, pos + len(univ))
+                self._mark_rest(rest, univ)
                 rrs_organization = RRSOrganization(id=None, title=None)
                 rrs_organization = self._set_organization_attributes(rrs_organization,
                                               univ, cred=100,
@@ -2212,22 +2426,9 @@ class EntityExtractor(object):
                 
             #Other searches
             if not result:
-                while self._re_organization.search(self.work_text):
-                    marked_organization = \
-                        self._re_organization.search(self.work_text).group(1)
+                for start, end, marked_organization in self._marked_organizations():
                     organization = self._remove_marks(marked_organization)
-                    self.work_text = re.sub(re.escape(marked_organization), "",
-                                            self.work_text)
-                    if re.search(self._pat_separator + '+\s*'
-                                 + re.escape(organization), self.rest):
-                        self.rest = re.sub(self._pat_separator + '+\s*'
-                                           + re.escape(organization), "",
-                                           self.rest)
-                    elif re.search(re.escape(organization) + '\s*'
-                                   + self._pat_separator + '+', self.rest):
-                        self.rest = re.sub(re.escape(organization) + '\s*'
-                                           + self._pat_separator + '+', "",
-                                           self.rest)
+                    self._mark_rest(rest, organization)
                     #Multiple organization in relations:
                     if self._re_relation.search(marked_organization):
                         self._find_relations(marked_organization, None)
@@ -2239,8 +2440,10 @@ class EntityExtractor(object):
                                               self._remove_marks(organization))
                         self.organizations.append(rrs_organization)
 
+            self.rest = rest.rest()
             self._buffer_organization_type = {}
             self._buffer_organization_credibility = {}
+            self._scanned = (None, [], False)
             return self.organizations
 
 
@@ -0,0 +1,534 @@
+#!/usr/bin/env python
+
+"""
+Module extractorbenchmark measures throughput of extractor components on
+reference sections of real deliverables, so that changes of their search
+strategies can be compared on the same input.
+
+Reference sections are cut from plain text of deliverables given on command
+line (the part after the last "References" or "Bibliography" heading, up to
+"Appendix"); built-in sample of references is used if no file is given.
+Every section is extracted repeat times, the best time is taken.
+
+Workloads:
+ * organizations - OrganizationExtractor.extract_organizations() with one
+   scan of keywords of all organization types (phrases with keywords only
+   are searched), compared to the full scan, where every organization type
+   searches the whole text. Results of both have to be the same.
+ * citations - references of the section (see split_references()) extracted
+   by CitationEntityExtractor.extract() one by one, compared to
+   extract_many() in this process and in pool of workers processes. All
+   have to give the same publications.
+ * chapters - chapters of whole documents (not only reference sections)
+   found by _ChapterWrapper of documentwrapper, which searches headings in
+   the table of candidate heading lines, compared to the search of every
+   heading pattern in the whole text. Results of both have to be the same.
+   Synthetic document of over 100 pages is used if no file is given.
+ * bibliography - citations of whole documents split by _CitationWrapper of
+   documentwrapper (bibliography is located from the end of the text) and
+   assigned to sentences of the text citing them by _ReferenceHandler.
+ * normalization - TextCleaner.clean_text() (one pass of all replaced
+   sequences and translation of characters), its clean_stream() in chunks,
+   Normalize.translate_national() (translation table) and
+   Normalize._white_space_fix() on documents repeated to at least one
+   megabyte, compared to the previous implementations with sequences of
+   regular expressions and replacements of single characters. Results have
+   to be the same byte for byte.
+
+Results are written as JSON:
+    python extractorbenchmark.py [--output results.json] [--repeat N]
+                                 [--workers N] [file.txt ...]
+"""
+
+__modulename__ = "extractorbenchmark"
+__date__ = "$20.10.2026 14:12:08$"
+
+import json
+import os
+import platform
+import re
+import sys
+import time
+from optparse import OptionParser
+
+from rrslib.db.model import RRSCitation, RRSReference
+from rrslib.extractors.citationentityextractor import CitationEntityExtractor, ALL
+from rrslib.extractors.documentwrapper import _ChapterWrapper, \
+    _CitationWrapper, _ReferenceHandler
+from rrslib.extractors.entityextractor import EntityExtractor
+from rrslib.extractors.normalize import TextCleaner, Normalize
+
+REPEAT = 3
+WORKERS = 4
+PAGE_CHARS = 3000
+MEGABYTE = 1024 * 1024
+CHUNK_SIZE = 65536
+
+# characters of wrongly decoded UTF-8 (ligatures, umlauts, quotes, dashes),
+# national and control characters added to texts of normalization
+SAMPLE_SPECIAL = u"\n\xef\xac\x81nal \xc3\xa8 \xe2\x80\x9cquoted\xe2\x80\x9d it\"s " \
+                 u"a\xe2\x80\x94b P\u0159\xedli\u0161 \u017elu\u0165ou\u010dk\xfd " \
+                 u"k\u016f\u0148\r\n\x0c\t  Universit\xe4t \xa0 end\n"
+
+SAMPLE_REFERENCES = """\
+References
+
+[1] J. Smith, P. Svoboda. Requirements of digital libraries. Technical
+report, Department of Computer Science, Brno University of Technology, 2009.
+[2] M. Garcia. Ontology alignment. In Proc. of the International Conference
+on Information Systems, Universidad Politecnica de Madrid, Spain, 2008.
+[3] T. Mueller, A. Kowalska. Evaluation of search engines. Fraunhofer
+Institute for Computer Graphics Research, Darmstadt, 2010.
+[4] Society for Industrial and Applied Mathematics. SIAM Review, 51(2), 2009.
+[5] K. Brown. Grid computing. Lawrence Livermore National Laboratory,
+Livermore, CA, 2007.
+[6] Institute of Computer Science, Academy of Sciences of the Czech Republic.
+Annual report 2008, Prague, 2009.
+[7] J. Dvorak. Semantic annotation. Faculty of Information Technology, Brno
+Univ. of Technology, Bozetechova 2, Brno, 2010.
+[8] IEEE Computer Soc. Standard for software requirements specification.
+IEEE Std 830-1998, 1998.
+[9] Electric Power Research Institute. Smart grid roadmap. EPRI, Palo Alto,
+2009.
+[10] European Research Consortium for Informatics and Mathematics. ERCIM
+News 77, 2009.
+"""
+
+_RE_REFERENCES = re.compile('^[^\n]{0,20}(References|REFERENCES|Bibliography|'
+                            'BIBLIOGRAPHY)[ \t]*$', re.MULTILINE)
+_RE_APPENDIX = re.compile('^[^\n]{0,20}(Appendix|APPENDIX)', re.MULTILINE)
+_RE_REFERENCE_START = re.compile('^\s*(?:\[\d+\]|\d+\.)\s')
+
+
+def reference_section(text):
+    """
+    Returns reference section of the text (from the last references heading
+    to appendix or end), empty string if there is none.
+    """
+    start = None
+    for match in _RE_REFERENCES.finditer(text):
+        start = match.start()
+    if start is None:
+        return ""
+    match = _RE_APPENDIX.search(text, start)
+    if match is not None:
+        return text[start:match.start()]
+    return text[start:]
+
+
+def split_references(section):
+    """
+    Returns list of references of reference section. Reference starts by
+    number ("[12] " or "12. ") at the beginning of line, following lines are
+    joined to it.
+    """
+    references = []
+    for line in section.splitlines()[1:]:
+        line = line.strip()
+        if _RE_REFERENCE_START.match(line) or not references:
+            if line:
+                references.append(line)
+        elif line:
+            references[-1] += " " + line
+    return references
+
+
+def sample_document(chapters=12, sections=8, paragraphs=8):
+    """
+    Returns synthetic document with numbered chapters and sections (over 100
+    pages with default arguments) followed by the sample of references.
+    """
+    words = SAMPLE_REFERENCES.split()
+    lines = ["Project Deliverable", ""]
+    for chapter in xrange(1, chapters + 1):
+        lines += ["", "%d. Chapter %s" % (chapter, words[chapter].strip(".,")),
+                  ""]
+        for section in xrange(1, sections + 1):
+            lines += ["%d.%d Section %s" % (chapter, section, words[section]),
+                      ""]
+            for paragraph in xrange(paragraphs):
+                start = (chapter * section + paragraph) % len(words)
+                text = " ".join((words * 4)[start:start + 60]) + "."
+                lines += [text[i:i + 80] for i in xrange(0, len(text), 80)]
+                lines.append("")
+    return "\n".join(lines) + "\n" + SAMPLE_REFERENCES
+
+
+def load_documents(paths):
+    """
+    Returns list of (name, text) of files, synthetic document (see
+    sample_document()) if paths are empty.
+    """
+    if not paths:
+        return [("built-in document", sample_document())]
+    documents = []
+    for path in paths:
+        f = open(path)
+        documents.append((os.path.basename(path), f.read()))
+        f.close()
+    return documents
+
+
+def load_sections(paths):
+    """
+    Returns list of (name, reference section) of files, files without
+    reference section are skipped. Built-in sample is returned if paths are
+    empty.
+    """
+    if not paths:
+        return [("built-in sample", SAMPLE_REFERENCES)]
+    sections = []
+    for path in paths:
+        f = open(path)
+        section = reference_section(f.read())
+        f.close()
+        if section:
+            sections.append((os.path.basename(path), section))
+    return sections
+
+
+class _FullScanOrganizationExtractor(EntityExtractor.OrganizationExtractor):
+    """
+    OrganizationExtractor whose organization types search the whole text.
+    """
+    def _scan(self, text):
+        return [(0, len(text))], \
+               self._re_shorted_organization.search(text) is not None
+
+
+class _FullScanChapterWrapper(_ChapterWrapper):
+    """
+    _ChapterWrapper which searches every heading pattern in the whole text.
+    """
+    def _search(self, pattern, text, scheme, token=None, word=None):
+        return pattern.search(text)
+
+
+class _RegexTextCleaner(TextCleaner):
+    """
+    TextCleaner which applies regular expressions one by one until they
+    don't match and replaces characters one by one (previous clean_text()).
+    """
+    def __init__(self):
+        TextCleaner.__init__(self)
+        ligature = lambda code: re.compile(unichr(239) + unichr(172)
+                                           + unichr(code), re.U)
+        umlaut = lambda codes: re.compile("(" + "|".join(
+            [unichr(code) for code in codes]) + ")" + unichr(168), re.U)
+        self._substitutions = [
+            (ligature(129), "fi"), (ligature(128), "ff"), (ligature(130), "fl"),
+            (ligature(132), "ffl"), (ligature(131), "ffi"),
+            (ligature(133), "ft"), (ligature(134), "st"),
+            (umlaut(range(192, 198)), "a"), (umlaut(range(200, 204)), "e"),
+            (umlaut(range(204, 208)), "c"), (umlaut(range(210, 215)), "o"),
+            (umlaut(range(217, 221)), "u"),
+            (re.compile(self._pat_quotes, re.U), '"'),
+            (re.compile("([a-z])" + u"\u0022".encode('utf-8') + "([a-z])",
+                        re.U | re.I), "\g<1>'\g<2>"),
+            (re.compile(self._pat_dashes, re.U), '-'),
+            (re.compile(unichr(226) + unichr(136) + unichr(146), re.U), '-')]
+
+    def clean_text(self, text):
+        if not isinstance(text, unicode):
+            text = text.decode("utf-8")
+        for regex, replacement in self._substitutions:
+            while regex.search(text):
+                text = regex.sub(replacement, text)
+        for i in range(1, 9) + [11, 12] + range(14, 32):
+            text = text.replace(unichr(i), "")
+        for i in [10, 13]:
+            text = text.replace(unichr(i), "\n")
+        for i in range(127, 161):
+            text = text.replace(unichr(i), "")
+        for c in text:
+            try:
+                unicode(chr(ord(c)))
+            except ValueError:
+                text = text.replace(c, "")
+        return str(text)
+
+
+class _RegexNormalize(Normalize):
+    """
+    Normalize which translates national characters and fixes white spaces
+    by regular expressions applied until they don't match (previous
+    implementation).
+    """
+    @classmethod
+    def _white_space_fix(self, txt):
+        while re.search("\s\s+", txt):
+            txt = re.sub("\s\s+", " ", txt)
+        txt = re.sub("^\s+", "", txt)
+        return re.sub("\s+$", "", txt)
+
+    @classmethod
+    def translate_national(self, txt):
+        if type(txt) is not unicode:
+            txt = unicode(str(txt), encoding='utf-8')
+        for letter in "aeioucnysrztd":
+            regex = getattr(Normalize, "re_" + letter)
+            while regex.search(txt):
+                txt = regex.sub(letter, txt)
+        return txt
+
+
+def _best_time(fnc, repeat):
+    best = None
+    for _ in xrange(repeat):
+        start = time.time()
+        fnc()
+        t = time.time() - start
+        if best is None or t < best:
+            best = t
+    return best
+
+
+def _organizations(found):
+    return [(o.get('title'), o.get('credibility')) for o in found]
+
+
+def benchmark_organizations(sections, repeat=REPEAT):
+    """
+    Measures extract_organizations() of OrganizationExtractor on sections
+    (see module documentation). Returns list of results per section, times
+    are in seconds.
+    """
+    extractors = [("scan", EntityExtractor.OrganizationExtractor()),
+                  ("full_scan", _FullScanOrganizationExtractor())]
+    results = []
+    for name, section in sections:
+        result = {'name': name, 'chars': len(section)}
+        found = {}
+        for mode, extractor in extractors:
+            result[mode + '_seconds'] = _best_time(
+                lambda: extractor.extract_organizations(section), repeat)
+            found[mode] = _organizations(extractor.extract_organizations(section))
+        result['organizations'] = len(found['scan'])
+        result['same_results'] = found['scan'] == found['full_scan']
+        results.append(result)
+    return results
+
+
+def _citations(references):
+    citations = []
+    for reference in references:
+        citation = RRSCitation(content="")
+        citation['reference'] = RRSReference(content=reference)
+        citations.append(citation)
+    return citations
+
+
+def _publications(citations):
+    found = []
+    for citation in citations:
+        publ = citation['reference'].get('referenced_publication')
+        persons = [p.get('full_name') for r in publ.get('person')
+                   for p in r.get_entities()]
+        found.append((publ.get('title'), publ.get('year'), publ.get('pages'),
+                      publ.get('credibility'), publ.get('type').get('type'),
+                      persons))
+    return found
+
+
+def benchmark_citations(sections, repeat=REPEAT, workers=WORKERS):
+    """
+    Measures CitationEntityExtractor on references of sections (see module
+    documentation). Returns list of results per section, times are in
+    seconds.
+    """
+    single = CitationEntityExtractor(ALL, 'db09')
+    pool = CitationEntityExtractor(ALL, 'db09', workers=workers)
+    modes = [("single", lambda c: [single.extract(x) for x in c]),
+             ("batch", single.extract_many),
+             ("pool", pool.extract_many)]
+    results = []
+    try:
+        for name, section in sections:
+            references = split_references(section)
+            result = {'name': name, 'references': len(references),
+                      'distinct': len(set(references)), 'workers': workers}
+            found = {}
+            for mode, fnc in modes:
+                result[mode + '_seconds'] = _best_time(
+                    lambda: fnc(_citations(references)), repeat)
+                found[mode] = _publications(fnc(_citations(references)))
+            result['same_results'] = found['single'] == found['batch'] == \
+                                     found['pool']
+            results.append(result)
+    finally:
+        pool.close()
+    return results
+
+
+def _chapters(found):
+    return [(c['name'], c['num'], c['credibility'], c.get('position_from'),
+             c.get('position_to'), c.get('subChpts')) for c in found]
+
+
+def benchmark_chapters(documents, repeat=REPEAT):
+    """
+    Measures get_chapters() of _ChapterWrapper on documents (see module
+    documentation). Returns list of results per document, times are in
+    seconds.
+    """
+    wrappers = [("table", _ChapterWrapper), ("full_scan", _FullScanChapterWrapper)]
+    results = []
+    for name, text in documents:
+        result = {'name': name, 'chars': len(text),
+                  'pages': len(text) // PAGE_CHARS}
+        found = {}
+        for mode, wrapper in wrappers:
+            result[mode + '_seconds'] = _best_time(
+                lambda: wrapper().get_chapters(text), repeat)
+            found[mode] = _chapters(wrapper().get_chapters(text))
+        result['chapters'] = len(found['table'])
+        result['same_results'] = found['table'] == found['full_scan']
+        results.append(result)
+    return results
+
+
+def _bibliography(text):
+    wrapper = _CitationWrapper()
+    citations = wrapper.get_citations(text)
+    return _ReferenceHandler().assign(citations, wrapper.get_rest())
+
+
+def benchmark_bibliography(documents, repeat=REPEAT):
+    """
+    Measures splitting of citations by _CitationWrapper and their assignment
+    to the text by _ReferenceHandler on documents (see module documentation).
+    Returns list of results per document, times are in seconds.
+    """
+    results = []
+    for name, text in documents:
+        citations = _bibliography(text)
+        results.append({'name': name, 'chars': len(text),
+                        'pages': len(text) // PAGE_CHARS,
+                        'citations': len(citations),
+                        'assigned': len([c for c in citations
+                                         if c.get('content')]),
+                        'seconds': _best_time(lambda: _bibliography(text),
+                                              repeat)})
+    return results
+
+
+def _megabyte(text):
+    # text with special characters (see SAMPLE_SPECIAL) repeated to at least
+    # one megabyte
+    if not isinstance(text, unicode):
+        text = text.decode("utf-8", "replace")
+    text += SAMPLE_SPECIAL
+    return text * (MEGABYTE // len(text) + 1)
+
+
+def _normalizations(cleaner, normalize):
+    return [("clean_text", cleaner.clean_text),
+            ("clean_stream",
+             lambda text: "".join(cleaner.clean_stream(text, CHUNK_SIZE))),
+            ("translate_national", normalize.translate_national),
+            ("white_space_fix", normalize._white_space_fix)]
+
+
+def benchmark_normalization(documents, repeat=REPEAT):
+    """
+    Measures functions of normalize module on documents (see module
+    documentation). Returns list of results per document and function,
+    times are in seconds.
+    """
+    current = _normalizations(TextCleaner(), Normalize)
+    previous = dict(_normalizations(_RegexTextCleaner(), _RegexNormalize))
+    # clean_stream() is compared to the previous clean_text()
+    previous["clean_stream"] = previous["clean_text"]
+    results = []
+    for name, text in documents:
+        text = _megabyte(text)
+        for function, fnc in current:
+            result = {'name': name, 'function': function, 'chars': len(text),
+                      'seconds': _best_time(lambda: fnc(text), repeat),
+                      'regex_seconds': _best_time(
+                          lambda: previous[function](text), repeat)}
+            result['same_results'] = fnc(text) == previous[function](text)
+            results.append(result)
+    return results
+
+
+def run(paths, repeat=REPEAT, workers=WORKERS):
+    """
+    Measures all workloads on files (chapters) and their reference sections.
+    Returns document with environment and results of workloads.
+    """
+    sections = load_sections(paths)
+    documents = load_documents(paths)
+    return {'environment': {'python': platform.python_version(),
+                            'platform': platform.platform(),
+                            'time': time.strftime("%Y-%m-%dT%H:%M:%S"),
+                            'repeat': repeat, 'sections': len(sections),
+                            'chars': sum(len(s) for n, s in sections)},
+            'organizations': benchmark_organizations(sections, repeat),
+            'citations': benchmark_citations(sections, repeat, workers),
+            'chapters': benchmark_chapters(documents, repeat),
+            'bibliography': benchmark_bibliography(documents, repeat),
+            'normalization': benchmark_normalization(documents, repeat)}
+
+
+def _print_summary(document, f):
+    f.write("%-30s %8s %10s %12s %8s %5s\n" % ("section", "chars", "scan ms",
+                                               "full scan ms", "speedup", "same"))
+    for r in document['organizations']:
+        f.write("%-30s %8d %10.1f %12.1f %8.1f %5s\n" %
+                (r['name'][:30], r['chars'], 1000 * r['scan_seconds'],
+                 1000 * r['full_scan_seconds'],
+                 r['full_scan_seconds'] / max(r['scan_seconds'], 1e-9),
+                 r['same_results'] and "yes" or "NO"))
+    f.write("\n%-30s %6s %10s %10s %10s %8s %5s\n" % ("section", "refs",
+            "single ms", "batch ms", "pool ms", "refs/s", "same"))
+    for r in document['citations']:
+        f.write("%-30s %6d %10.1f %10.1f %10.1f %8.1f %5s\n" %
+                (r['name'][:30], r['references'], 1000 * r['single_seconds'],
+                 1000 * r['batch_seconds'], 1000 * r['pool_seconds'],
+                 r['references'] / max(min(r['batch_seconds'],
+                                           r['pool_seconds']), 1e-9),
+                 r['same_results'] and "yes" or "NO"))
+    f.write("\n%-30s %6s %6s %10s %12s %8s %5s\n" % ("document", "pages",
+            "chpts", "table ms", "full scan ms", "speedup", "same"))
+    for r in document['chapters']:
+        f.write("%-30s %6d %6d %10.1f %12.1f %8.1f %5s\n" %
+                (r['name'][:30], r['pages'], r['chapters'],
+                 1000 * r['table_seconds'], 1000 * r['full_scan_seconds'],
+                 r['full_scan_seconds'] / max(r['table_seconds'], 1e-9),
+                 r['same_results'] and "yes" or "NO"))
+    f.write("\n%-30s %6s %6s %8s %10s %10s\n" % ("document", "pages", "cits",
+            "assigned", "ms", "pages/s"))
+    for r in document['bibliography']:
+        f.write("%-30s %6d %6d %8d %10.1f %10.1f\n" %
+                (r['name'][:30], r['pages'], r['citations'], r['assigned'],
+                 1000 * r['seconds'], r['pages'] / max(r['seconds'], 1e-9)))
+    f.write("\n%-30s %-18s %8s %8s %9s %8s %5s\n" % ("document", "function",
+            "chars", "ms", "regex ms", "MB/s", "same"))
+    for r in document['normalization']:
+        f.write("%-30s %-18s %8d %8.1f %9.1f %8.1f %5s\n" %
+                (r['name'][:30], r['function'], r['chars'],
+                 1000 * r['seconds'], 1000 * r['regex_seconds'],
+                 r['chars'] / float(MEGABYTE) / max(r['seconds'], 1e-9),
+                 r['same_results'] and "yes" or "NO"))
+
+
+if __name__ == "__main__":
+    parser = OptionParser(usage="%prog [options] [file.txt ...]")
+    parser.add_option("-o", "--output", dest="output",
+                      help="write JSON results into file (default stdout)")
+    parser.add_option("--repeat", dest="repeat", type="int", default=REPEAT,
+                      help="runs of every measurement (the best is taken)")
+    parser.add_option("--workers", dest="workers", type="int", default=WORKERS,
+                      help="processes of the pool for citations")
+    (options, args) = parser.parse_args()
+
+    document = run(args, options.repeat, options.workers)
+    _print_summary(document, sys.stderr)
+    if options.output:
+        f = open(options.output, "w")
+        json.dump(document, f, indent=1, sort_keys=True)
+        f.close()
+    else:
+        json.dump(document, sys.stdout, indent=1, sort_keys=True)
+        sys.stdout.write("\n")
@@ -11,6 +11,7 @@ Classes:
 from codecs import Codec
 import codecs
 import re
+import string
 import sys
 
 __modulename__ = "normalize"
@@ -19,6 +20,8 @@ __email__ = "xlokaj03@stud.fit.vutbr.cz"
 __date__ = "$Date$"
 __version__ = "$Revision$"
 
+#Default size of chunks of TextCleaner.clean_stream() (characters)
+CHUNK_SIZE = 65536
 
 
 try:
@@ -90,35 +93,34 @@ class TextCleaner(object):
             u"\u00ac".encode('utf-8') + "|" + \
             u"\u2013".encode('utf-8') + "|" + \
             u"\u2014".encode('utf-8') + ")"
-        self._re_quotes_1 = re.compile(self._pat_quotes, re.U)
-        self._re_quotes_2 = re.compile("([a-z])" + u"\u0022".encode('utf-8')
-                                       + "([a-z])", re.U | re.I)
-        self._re_dashes_1 = re.compile(self._pat_dashes, re.U)
-        self._re_dashes_2 = re.compile(unichr(226) + unichr(136) + unichr(146),
-                                       re.U)
-        self._re_a = re.compile("(" + unichr(192) + "|" + unichr(193) + "|"
-                                + unichr(194) + "|" + unichr(195) + "|"
-                                + unichr(196) + "|" + unichr(197) + ")"
-                                + unichr(168), re.U)
-        self._re_e = re.compile("(" + unichr(200) + "|" + unichr(201) + "|"
-                                + unichr(202) + "|" + unichr(203) + ")"
-                                + unichr(168), re.U)
-        self._re_i = re.compile("(" + unichr(204) + "|" + unichr(205) + "|"
-                                + unichr(206) + "|" + unichr(207) + ")"
-                                + unichr(168), re.U)
-        self._re_o = re.compile("(" + unichr(210) + "|" + unichr(211) + "|"
-                                + unichr(212) + "|" + unichr(213) + "|"
-                                + unichr(214) + ")" + unichr(168), re.U)
-        self._re_u = re.compile("(" + unichr(217) + "|" + unichr(218) + "|"
-                                + unichr(219) + "|" + unichr(220) + ")"
-                                + unichr(168), re.U)
-        self._re_ff = re.compile(unichr(239) + unichr(172) + unichr(128), re.U)
-        self._re_fi = re.compile(unichr(239) + unichr(172) + unichr(129), re.U)
-        self._re_fl = re.compile(unichr(239) + unichr(172) + unichr(130), re.U)
-        self._re_ffi = re.compile(unichr(239) + unichr(172) + unichr(131), re.U)
-        self._re_ffl = re.compile(unichr(239) + unichr(172) + unichr(132), re.U)
-        self._re_ft = re.compile(unichr(239) + unichr(172) + unichr(133), re.U)
-        self._re_st = re.compile(unichr(239) + unichr(172) + unichr(134), re.U)
+        # Sequences replaced by clean_text() in one pass: ligatures and
+        # umlauts of wrongly decoded UTF-8 (umlauts of "i" are replaced by "c"
+        # as they always were), quotes and dashes. Patterns of quotes and
+        # dashes are UTF-8 encoded, so they match their bytes decoded as
+        # Latin-1 in unicode text.
+        self._sequences = {}
+        for i, ligature in enumerate(["ff", "fi", "fl", "ffi", "ffl", "ft",
+                                      "st"]):
+            self._sequences[unichr(239) + unichr(172) + unichr(128 + i)] = \
+                ligature
+        for letter, codes in [("a", range(192, 198)), ("e", range(200, 204)),
+                              ("c", range(204, 208)), ("o", range(210, 215)),
+                              ("u", range(217, 221))]:
+            for code in codes:
+                self._sequences[unichr(code) + unichr(168)] = letter
+        for pattern, replacement in [(self._pat_quotes, '"'),
+                                     (self._pat_dashes, '-')]:
+            for sequence in pattern[1:-1].split("|"):
+                self._sequences[sequence.decode("latin-1")] = replacement
+        self._sequences[unichr(226) + unichr(136) + unichr(146)] = '-'
+        self._re_sequences = re.compile("|".join(
+            [re.escape(seq) for seq in self._sequences]), re.U)
+        self._re_quotes_inner = re.compile('(?<=[a-z])"(?=[a-z])', re.U | re.I)
+        # Cleaned text is ASCII, \r is translated to \n and control chars
+        # except of \t and \n are deleted.
+        self._ascii_table = string.maketrans("\r", "\n")
+        self._ascii_delete = "".join([chr(i) for i in range(1, 9) + [11, 12]
+                                      + range(14, 32) + [127]])
 
 
     def clean_text(self, text):
@@ -133,63 +135,46 @@ class TextCleaner(object):
 
         if not isinstance(text, unicode):
             text = text.decode("utf-8")
-        #Fix ligatures
-        while self._re_fi.search(text):
-            text = self._re_fi.sub("fi", text)
-        while self._re_ff.search(text):
-            text = self._re_ff.sub("ff", text)
-        while self._re_fl.search(text):
-            text = self._re_fl.sub("fl", text)
-        while self._re_ffl.search(text):
-            text = self._re_ffl.sub("ffl", text)
-        while self._re_ffi.search(text):
-            text = self._re_ffi.sub("ffi", text)
-        while self._re_ft.search(text):
-            text = self._re_ft.sub("ft", text)
-        while self._re_st.search(text):
-            text = self._re_st.sub("st", text)
-
-        #Fix umlauts
-        while self._re_a.search(text):
-            text = self._re_a.sub("a", text)
-        while self._re_e.search(text):
-            text = self._re_e.sub("e", text)
-        while self._re_i.search(text):
-            text = self._re_i.sub("c", text)
-        while self._re_o.search(text):
-            text = self._re_o.sub("o", text)
-        while self._re_u.search(text):
-            text = self._re_u.sub("u", text)
-
-        #Unite quotes
-        while self._re_quotes_1.search(text):
-            text = self._re_quotes_1.sub('"', text)
-        while self._re_quotes_2.search(text):
-            text = self._re_quotes_2.sub("\g<1>'\g<2>", text)
-
-        #Unite dashes
-        while self._re_dashes_1.search(text):
-            text = self._re_dashes_1.sub('-', text)
-        while self._re_dashes_2.search(text):
-            text = self._re_dashes_2.sub('-', text)
-
-        #Fix unappropriate chars
-        for i in [1, 2, 3, 4, 5, 6, 7, 8, 11, 12, 14, 15, 16, 17, 18, 19,
-                  20, 21, 22, 23, 24, 25, 26, 27, 28, 29, 30, 31]:
-            text = text.replace(unichr(i), "")
-        for i in [10, 13]:
-            text = text.replace(unichr(i), "\n")
-
-        for i in range(127, 161):
-            text = text.replace(unichr(i), "")
-
-        #Remove other unappropriate chars, which weren't fixed
-        for c in text:
-            try:
-                unicode(chr(ord(c)))
-            except ValueError:
-                text = text.replace(c, "")
-        return str(text)
+        #Fix ligatures and umlauts, unite quotes and dashes
+        text = self._re_sequences.sub(lambda m: self._sequences[m.group(0)],
+                                      text)
+        text = self._re_quotes_inner.sub("'", text)
+        #Remove unappropriate chars (all non-ASCII chars)
+        text = text.encode("ascii", "ignore")
+        return text.translate(self._ascii_table, self._ascii_delete)
+
+
+    def clean_stream(self, source, chunk_size=CHUNK_SIZE):
+        """
+        This method cleans text of source in chunks and generates cleaned
+        parts. Chunks end after white space, so that joined parts are the
+        same as clean_text() of the whole text.
+
+        @param source: text to be cleaned
+        @type source: str, unicode, file or iterable of str or unicode
+        @param chunk_size: minimal size of chunk (characters)
+        @type chunk_size: int
+        @return: generator of cleaned parts
+        @rtype: generator of str
+        """
+        if isinstance(source, basestring):
+            source = [source]
+        elif hasattr(source, "read"):
+            source = iter(lambda: source.read(chunk_size), "")
+        decoder = codecs.getincrementaldecoder("utf-8")()
+        buf = u""
+        for part in source:
+            if not isinstance(part, unicode):
+                part = decoder.decode(part)
+            buf += part
+            if len(buf) < chunk_size:
+                continue
+            #No replaced sequence contains white space
+            cut = max([buf.rfind(c) for c in u" \t\n\r"]) + 1
+            if cut:
+                yield self.clean_text(buf[:cut])
+                buf = buf[cut:]
+        yield self.clean_text(buf + decoder.decode("", True))
 
 
     def read(self, ifile_path, clean=True):
@@ -266,6 +251,21 @@ class TextCleaner(object):
 
 
 
+def _translation_table(letters):
+    """
+    Returns translation table (for unicode.translate()) of chars matched by
+    regular expressions "(x|y|...)" of (letter, regular expression) pairs to
+    the letter. First pair matching char is used. ASCII chars are mapped to
+    themselves, missing keys make unicode.translate() much slower.
+    """
+    table = dict([(i, unichr(i)) for i in range(128)])
+    for letter, regex in letters:
+        for char in regex.pattern[1:-1].split("|"):
+            table.setdefault(ord(char), unicode(letter))
+    return table
+
+
+
 class Normalize(object):
     """
     This class converts titles of database elements into a normalized form
@@ -303,6 +303,13 @@ class Normalize(object):
     re_z = re.compile("(" + unichr(381) + "|" + unichr(382) + ")", re.U)
     re_t = re.compile("(" + unichr(357) + "|" + unichr(356) + ")", re.U)
     re_d = re.compile("(" + unichr(270) + "|" + unichr(271) + ")", re.U)
+    #Translation table of national chars (see translate_national())
+    tr = _translation_table([("a", re_a), ("e", re_e), ("i", re_i),
+                             ("o", re_o), ("u", re_u), ("c", re_c),
+                             ("n", re_n), ("y", re_y), ("s", re_s),
+                             ("r", re_r), ("z", re_z), ("t", re_t),
+                             ("d", re_d)])
+    re_white_spaces = re.compile("\s\s+")
 
     #List of words occuring in organizations
     org_replace = {"university":"univ", "univerzita":"univ", "universität":"univ",
@@ -361,14 +368,9 @@ class Normalize(object):
         @type txt: str
         @return: fixed text
         @rtype: str
-
-        @todo: not quickest solution, but it works:)
         """
-        while re.search("\s\s+", txt):
-            txt = re.sub("\s\s+", " ", txt)
-        txt = re.sub("^\s+", "", txt)
-        txt = re.sub("\s+$", "", txt)
-        return txt
+        txt = Normalize.re_white_spaces.sub(" ", txt)
+        return txt.strip(" \t\n\r\f\v")
 
 
     @classmethod
@@ -380,40 +382,10 @@ class Normalize(object):
         @type txt: str
         @return: translated text
         @rtype: str
-
-        @todo: not quickest solution, but it works:)
         """
         if type(txt) is not unicode:
             txt = unicode(str(txt), encoding='utf-8')
-        while Normalize.re_a.search(txt):
-            txt = Normalize.re_a.sub("a", txt)
-        while Normalize.re_e.search(txt):
-            txt = Normalize.re_e.sub("e", txt)
-        while Normalize.re_i.search(txt):
-            txt = Normalize.re_i.sub("i", txt)
-        while Normalize.re_o.search(txt):
-            txt = Normalize.re_o.sub("o", txt)
-        while Normalize.re_u.search(txt):
-            txt = Normalize.re_u.sub("u", txt)
-        while Normalize.re_c.search(txt):
-            txt = Normalize.re_c.sub("c", txt)
-        while Normalize.re_n.search(txt):
-            txt = Normalize.re_n.sub("n", txt)
-        while Normalize.re_y.search(txt):
-            txt = Normalize.re_y.sub("y", txt)
-        while Normalize.re_s.search(txt):
-            txt = Normalize.re_s.sub("s", txt)
-        while Normalize.re_r.search(txt):
-            txt = Normalize.re_r.sub("r", txt)
-        while Normalize.re_z.search(txt):
-            txt = Normalize.re_z.sub("z", txt)
-        while Normalize.re_t.search(txt):
-            txt = Normalize.re_t.sub("t", txt)
-        while Normalize.re_d.search(txt):
-            txt = Normalize.re_d.sub("d", txt)
-        #for letter in Normalize.tr:
-            #txt = re.sub(letter, Normalize.tr[letter], txt)
-        return txt
+        return txt.translate(Normalize.tr)
 
 
     @classmethod
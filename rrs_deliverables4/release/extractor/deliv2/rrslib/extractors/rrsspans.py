@@ -0,0 +1,153 @@
+#!/usr/bin/env python
+
+"""
+Module rrsspans implements annotations of immutable text for extractor
+components.
+
+Components used to "consume" found entities by removing them from the text
+(re.sub() per match), so the following searches didn't find them again. Every
+removal copies the whole text, which makes extraction quadratic in size of the
+document. Instead, components add spans (start, end, type, credibility) to
+SpanSet over the original text. Spans may overlap; overlaps are resolved once
+at the end by resolve(), which keeps spans in order of priority (lower first),
+credibility and length, and marks accepted spans in coverage bitmap. The rest
+of the text (text without extracted entities) is built from the bitmap in one
+pass.
+"""
+
+__modulename__ = "rrsspans"
+__date__ = "$20.10.2026 09:41:05$"
+
+import re
+
+_COVERED = "\x01"
+_RUN_RE = re.compile(_COVERED + "+")
+
+
+class Span(object):
+    """
+    Annotation of text[start:end]. Value is the extracted object (RRSPerson,
+    RRSProject...), priority orders spans of different searches (spans of
+    search with lower priority win overlaps).
+    """
+    __slots__ = ('start', 'end', 'type', 'credibility', 'priority', 'value')
+
+    def __init__(self, start, end, type, credibility=0, priority=0, value=None):
+        self.start = start
+        self.end = end
+        self.type = type
+        self.credibility = credibility
+        self.priority = priority
+        self.value = value
+
+
+    def __len__(self):
+        return self.end - self.start
+
+
+    def __repr__(self):
+        return "Span(%d, %d, %r, %r, %r)" % (self.start, self.end, self.type,
+                                             self.credibility, self.priority)
+
+#-------------------------------------------------------------------------------
+# End of class Span
+#-------------------------------------------------------------------------------
+
+
+class SpanSet(object):
+    """
+    Spans over immutable text and bitmap of characters covered by spans (see
+    module documentation).
+    """
+    def __init__(self, text):
+        self.text = text
+        self.spans = []
+        self.coverage = bytearray(len(text))
+
+
+    def __len__(self):
+        return len(self.spans)
+
+
+    def __iter__(self):
+        return iter(self.spans)
+
+
+    def add(self, start, end, type, credibility=0, priority=0, value=None):
+        """
+        Adds span text[start:end] and returns it. Coverage is not changed
+        until resolve().
+        """
+        span = Span(start, end, type, credibility, priority, value)
+        self.spans.append(span)
+        return span
+
+
+    def add_match(self, match, type, credibility=0, priority=0, value=None,
+                  group=0):
+        """
+        Adds span of group of regular expression match.
+        """
+        return self.add(match.start(group), match.end(group), type,
+                        credibility, priority, value)
+
+
+    def is_free(self, start, end):
+        """
+        Returns True if no character of text[start:end] is covered.
+        """
+        return self.coverage.find(_COVERED, start, end) == -1
+
+
+    def cover(self, start, end):
+        self.coverage[start:end] = _COVERED * (end - start)
+
+
+    def uncover(self, start, end):
+        self.coverage[start:end] = "\x00" * (end - start)
+
+
+    def resolve(self, spans=None):
+        """
+        Returns non-overlapping spans (all spans of the set by default) sorted
+        by start. Spans are accepted in order of priority, credibility
+        (higher first), length (longer first) and start; span overlapping
+        already accepted span is dropped. Accepted spans are marked in
+        coverage.
+        """
+        if spans is None:
+            spans = self.spans
+        order = sorted(spans, key=lambda s: (s.priority, -(s.credibility or 0),
+                                             s.start - s.end, s.start))
+        accepted = []
+        for span in order:
+            if span.start < span.end and not self.is_free(span.start, span.end):
+                continue
+            self.cover(span.start, span.end)
+            accepted.append(span)
+        accepted.sort(key=lambda s: (s.start, s.end))
+        return accepted
+
+
+    def runs(self):
+        """
+        Returns list of (start, end) of maximal covered parts of the text.
+        """
+        return [m.span() for m in _RUN_RE.finditer(str(self.coverage))]
+
+
+    def rest(self):
+        """
+        Returns text without covered characters.
+        """
+        parts = []
+        pos = 0
+        for start, end in self.runs():
+            parts.append(self.text[pos:start])
+            pos = end
+        parts.append(self.text[pos:])
+        return "".join(parts)
+
+#-------------------------------------------------------------------------------
+# End of class SpanSet
+#-------------------------------------------------------------------------------
@@ -0,0 +1,280 @@
+#!/usr/bin/env python
+
+"""
+StreamEntityExtractor is a streaming front-end of EntityExtractor for large
+documents (deliverables, theses, books).
+
+Components of EntityExtractor work on whole strings and some of their regular
+expressions (lazy ".*?" with re.IGNORECASE or re.DOTALL) backtrack badly on
+texts of hundreds of pages. StreamEntityExtractor reads the text (string, file
+or any iterable of strings) and splits it into windows of limited size, which
+end at the end of line or sentence. Consecutive windows overlap, so an entity
+crossing the end of window is found whole in the next one. Extractors are run
+per window (optionally in a pool of processes) and results are merged:
+entities found in more windows are kept once, with the best credibility.
+
+Memory and the worst-case time of regular expressions are therefore bounded
+by size of the window, not by size of the document. Time of the whole
+extraction can be limited by deadline, which is checked between windows
+(extraction of one window is never interrupted, so shared dictionaries and
+caches of extractors stay consistent).
+"""
+
+__modulename__ = "streamextractor"
+__date__ = "$20.10.2026 11:02:47$"
+
+import multiprocessing
+import re
+import time
+
+from rrslib.db.model import _RRSDatabaseEntity
+import entityextractor as ee
+
+# default size of window and of overlap of windows (characters)
+WINDOW_SIZE = 8000
+OVERLAP = 400
+
+# entities found in running text by default (see entityextractor constants)
+DEFAULT_ENTITIES = [ee.AUTHOR, ee.EMAIL, ee.ORGANIZATION, ee.LOCATION,
+                    ee.PROJECT, ee.PUBLISHED_DATE, ee.EVENT, ee.TELEPHONE,
+                    ee.FAX, ee.URL]
+
+# attributes which don't identify entity
+_IGNORED_ATTRIBUTES = ('id', 'credibility', 'module', 'original')
+
+_BOUNDARY_RE = re.compile('\n|[.!?;]\s')
+
+
+class DeadlineExceeded(Exception):
+    """
+    Raised by StreamEntityExtractor.extract() when the deadline passes before
+    all windows are extracted.
+    """
+    pass
+
+
+def _cut(text, low, high):
+    # position after the last line or sentence end in text[low:high], high
+    # if there is none
+    cut = high
+    for m in _BOUNDARY_RE.finditer(text, low, high):
+        cut = m.end()
+    return cut
+
+
+def _first_cut(text, low, high):
+    # position after the first line or sentence end in text[low:high - 1],
+    # after the first space if there is none
+    m = _BOUNDARY_RE.search(text, low, high - 1)
+    if m is not None:
+        return m.end()
+    return text.find(" ", low, high - 1) + 1 or low
+
+
+def _ranges(buf, pos, size, overlap, final):
+    # (start, end) of windows of buf starting at pos and position of the
+    # next window
+    ranges = []
+    while len(buf) - pos > size:
+        end = _cut(buf, pos + size // 2, pos + size)
+        ranges.append((pos, end))
+        pos = _first_cut(buf, max(end - overlap, pos + 1), end)
+    if final and pos < len(buf):
+        ranges.append((pos, len(buf)))
+    return ranges, pos
+
+
+def windows(source, size=WINDOW_SIZE, overlap=OVERLAP):
+    """
+    Generates (offset, text) windows of source (string or iterable of
+    strings). Window is at most size characters long and ends at the end
+    of line or sentence in its second half if there is one. Next window
+    starts after the first line or sentence end within the last overlap
+    characters of the previous window.
+    """
+    if overlap * 2 > size:
+        raise ValueError("Overlap has to be at most half of the window.")
+    if isinstance(source, basestring):
+        source = [source]
+    buf = ""
+    pos = 0
+    offset = 0
+    pending = []
+    pending_len = 0
+    for part in source:
+        # parts are joined only when there is enough text for a window
+        pending.append(part)
+        pending_len += len(part)
+        if len(buf) - pos + pending_len <= size:
+            continue
+        buf = buf[pos:] + "".join(pending)
+        offset += pos
+        pending = []
+        pending_len = 0
+        ranges, pos = _ranges(buf, 0, size, overlap, False)
+        for start, end in ranges:
+            yield offset + start, buf[start:end]
+    buf = buf[pos:] + "".join(pending)
+    offset += pos
+    ranges, pos = _ranges(buf, 0, size, overlap, True)
+    for start, end in ranges:
+        yield offset + start, buf[start:end]
+
+
+def entity_key(entity):
+    """
+    Returns key identifying extracted entity (equal entities found in more
+    windows have the same key).
+    """
+    if isinstance(entity, _RRSDatabaseEntity):
+        key = [type(entity).__name__]
+        for attr in sorted(entity.__types__):
+            if attr in _IGNORED_ATTRIBUTES:
+                continue
+            value = getattr(entity, attr, None)
+            if isinstance(value, basestring):
+                key.append((attr, value.strip().lower()))
+            elif isinstance(value, (int, long)):
+                key.append((attr, value))
+        return tuple(key)
+    if isinstance(entity, basestring):
+        return (type(entity).__name__, entity.strip().lower())
+    return (type(entity).__name__, str(entity))
+
+
+def _credibility(entity):
+    try:
+        return entity.get('credibility') or 0
+    except Exception:
+        return 0
+
+
+def merge(results, keys, entity_const, found):
+    """
+    Merges entities found in one window into results (dictionary entity
+    constant -> list of entities). Found is result of find_* method of
+    EntityExtractor (list, one value or None), keys is dictionary entity
+    constant -> {entity key: index in results} kept between calls.
+    """
+    if found is None:
+        return
+    if not isinstance(found, list):
+        found = [found]
+    merged = results.setdefault(entity_const, [])
+    keys = keys.setdefault(entity_const, {})
+    for entity in found:
+        if entity is None:
+            continue
+        key = entity_key(entity)
+        if key not in keys:
+            keys[key] = len(merged)
+            merged.append(entity)
+        elif _credibility(entity) > _credibility(merged[keys[key]]):
+            merged[keys[key]] = entity
+
+
+# EntityExtractor of the process, created on the first use
+_extractor = None
+
+
+def _get_extractor():
+    # EntityExtractor.__init__ creates all its components again, so it is
+    # called once per process (workers inherit the instance of the parent)
+    global _extractor
+    if _extractor is None:
+        _extractor = ee.EntityExtractor()
+    return _extractor
+
+
+def _extract_window(args):
+    # extracts entities from one window (runs in worker process too)
+    entities, text = args
+    extractor = _get_extractor()
+    found = []
+    for entity_const in entities:
+        method = getattr(extractor, ee.ENTITY2METHOD[entity_const])
+        found.append((entity_const, method(text)[0]))
+    return found
+
+
+class StreamEntityExtractor(object):
+    """
+    Streaming front-end of EntityExtractor (see module documentation).
+
+    Entities is list of entityextractor constants (AUTHOR, ORGANIZATION...),
+    workers is count of processes extracting windows in parallel (1 means
+    extraction in this process). Pool of workers is created on first use
+    (EntityExtractor is created before, so the workers share its
+    dictionaries) and stopped by close().
+    """
+    def __init__(self, entities=DEFAULT_ENTITIES, window=WINDOW_SIZE,
+                 overlap=OVERLAP, workers=1):
+        for entity_const in entities:
+            if entity_const not in ee.ENTITY2METHOD:
+                raise ValueError("Unknown entity %r." % entity_const)
+        if overlap * 2 > window:
+            raise ValueError("Overlap has to be at most half of the window.")
+        self.entities = list(entities)
+        self.window = window
+        self.overlap = overlap
+        self.workers = workers
+        self._pool = None
+        _get_extractor()
+
+
+    def _batches(self, source):
+        # one window at a time in this process, so the deadline is checked
+        # after each of them
+        size = self.workers > 1 and self.workers * 2 or 1
+        batch = []
+        for offset, text in windows(source, self.window, self.overlap):
+            batch.append((self.entities, text))
+            if len(batch) >= size:
+                yield batch
+                batch = []
+        if batch:
+            yield batch
+
+
+    def extract(self, source, results=None, deadline=None):
+        """
+        Extracts entities from source (string, file or iterable of strings).
+        Returns dictionary entity constant -> list of entities. Results of
+        already extracted windows are merged into given results dictionary
+        as soon as they are extracted, so they are available even if the
+        extraction is interrupted. If deadline (time.time() value) passes,
+        no other window is extracted and DeadlineExceeded is raised.
+        """
+        if results is None:
+            results = {}
+        keys = {}
+        for entity_const in self.entities:
+            results.setdefault(entity_const, [])
+        for batch in self._batches(source):
+            if deadline is not None and time.time() >= deadline:
+                raise DeadlineExceeded("Deadline passed before the end of "
+                                       "the source.")
+            if self.workers > 1:
+                if self._pool is None:
+                    self._pool = multiprocessing.Pool(self.workers)
+                found = self._pool.map(_extract_window, batch)
+            else:
+                found = map(_extract_window, batch)
+            for window_found in found:
+                for entity_const, entities in window_found:
+                    merge(results, keys, entity_const, entities)
+        return dict((c, results[c]) for c in self.entities)
+
+
+    def close(self):
+        """
+        Stops pool of workers.
+        """
+        if self._pool is not None:
+            self._pool.close()
+            self._pool.join()
+            self._pool = None
+
+#-------------------------------------------------------------------------------
+# End of class StreamEntityExtractor
+#-------------------------------------------------------------------------------
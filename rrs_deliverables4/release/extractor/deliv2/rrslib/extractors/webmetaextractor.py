@@ -38,6 +38,7 @@ from rrslib.web.crawler import Crawler, FileDownloader
 from rrslib.web.mime import MIMEhandler
 from rrslib.web.sequencewrapper import HTMLSequenceWrapper
 from rrslib.web.htmltools import HTMLDocument, SimpleHTMLCleaner
+from rrslib.others.pattern import memoized
 
 # import psyco to improve speed
 try:
@@ -329,6 +330,7 @@ class _RRSPropertyGeneralizer(object):
               'related', 'comments', 'references', 'reviews'] #20-23
 
 
+    @memoized
     def generalize(self, term):
         # preprocessing
         term = term.lower()
@@ -930,7 +932,7 @@ class PublicationPageExtractor(object):
         self._publ = RRSPublication()
         cleaned_etree = SimpleHTMLCleaner.clean_html(etree)
         page = HTMLDocument(cleaned_etree, url)
-        self.pagetext = page.get_etree().getroot().text_content()
+        self.pagetext = page.text_content()
         # parse CSS and metadata on the page
         page.parse_document()
         # get data from <meta> tags nad convert to RRS format
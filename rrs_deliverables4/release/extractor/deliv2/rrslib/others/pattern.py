@@ -2,6 +2,19 @@
 
 """
 Abstract classes representing some design patterns.
+
+The module also contains a small caching toolkit:
+ - lazy, lazyproperty (cachedproperty) - per-instance "compute once" helpers
+ - memoized - per-instance method cache bounded by LRU policy
+ - LRUCache, lrucached - size (and optionally time) bounded caches with
+   hit/miss statistics
+ - WeakKeyCache, weakcached - caches keyed by weak references, so that cached
+   values live only as long as the objects they were computed for
+
+Except for memoized methods of instances which can't be weak-referenced (see
+memoized), none of the caches keeps strong references to the instances they
+serve, so long-running crawls don't accumulate documents and their element
+trees.
 """
 
 __modulename__ = "pattern"
@@ -13,6 +26,9 @@ import threading
 import warnings
 import functools
 import sys
+import time
+import weakref
+from collections import namedtuple, OrderedDict
 
 
 class Singleton(object):
@@ -36,10 +52,230 @@ class Singleton(object):
 # End of class Singleton
 #-------------------------------------------------------------------------------
 
+#
+# Caches
+#
+
+CacheInfo = namedtuple("CacheInfo", "hits misses maxsize currsize")
+
+
+class LRUCache(object):
+    """
+    Thread-safe mapping with bounded size. When the cache is full, the least
+    recently used item is discarded. If ttl (in seconds) is set, items older
+    than ttl are considered missing.
+
+    The cache counts hits and misses of get(), see info().
+    """
+    _missing = object()
+
+    def __init__(self, maxsize=128, ttl=None):
+        if maxsize is not None and maxsize < 1:
+            raise ValueError("maxsize has to be positive integer or None")
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._data = OrderedDict()
+        self._lock = threading.RLock()
+        self.hits = 0
+        self.misses = 0
+
+
+    def _expired(self, stamp):
+        return self.ttl is not None and time.time() - stamp > self.ttl
+
+
+    def get(self, key, default=None):
+        """
+        Returns value stored under key or default. Hit moves the key to the
+        most recently used position.
+        """
+        with self._lock:
+            try:
+                value, stamp = self._data.pop(key)
+            except KeyError:
+                self.misses += 1
+                return default
+            if self._expired(stamp):
+                self.misses += 1
+                return default
+            self._data[key] = (value, stamp)
+            self.hits += 1
+            return value
+
+
+    def set(self, key, value):
+        """
+        Stores value under key and evicts least recently used items if the
+        cache is full.
+        """
+        with self._lock:
+            self._data.pop(key, None)
+            self._data[key] = (value, time.time())
+            if self.maxsize is not None:
+                while len(self._data) > self.maxsize:
+                    self._data.popitem(last=False)
+
+
+    def __getitem__(self, key):
+        value = self.get(key, self._missing)
+        if value is self._missing:
+            raise KeyError(key)
+        return value
+
+    __setitem__ = set
+
+    def __delitem__(self, key):
+        with self._lock:
+            del self._data[key]
+
+    def __contains__(self, key):
+        with self._lock:
+            try:
+                return not self._expired(self._data[key][1])
+            except KeyError:
+                return False
+
+    def __len__(self):
+        return len(self._data)
+
+
+    def clear(self):
+        """
+        Removes all items and resets statistics.
+        """
+        with self._lock:
+            self._data.clear()
+            self.hits = self.misses = 0
+
+
+    def info(self):
+        """
+        Returns statistics of the cache - instance of CacheInfo.
+        """
+        return CacheInfo(self.hits, self.misses, self.maxsize, len(self._data))
+
+#-------------------------------------------------------------------------------
+# End of class LRUCache
+#-------------------------------------------------------------------------------
+
+
+class WeakKeyCache(object):
+    """
+    Cache keyed by weak references to objects. Once the key object is garbage
+    collected, its entry disappears from the cache, so the cache never extends
+    the lifetime of the objects (HTML documents, lxml elements etc.).
+    """
+    _missing = object()
+
+    def __init__(self):
+        self._data = weakref.WeakKeyDictionary()
+        self._lock = threading.RLock()
+        self.hits = 0
+        self.misses = 0
+
+
+    def get(self, key, default=None):
+        with self._lock:
+            value = self._data.get(key, self._missing)
+            if value is self._missing:
+                self.misses += 1
+                return default
+            self.hits += 1
+            return value
+
+
+    def set(self, key, value):
+        with self._lock:
+            self._data[key] = value
+
+
+    def __getitem__(self, key):
+        value = self.get(key, self._missing)
+        if value is self._missing:
+            raise KeyError(key)
+        return value
+
+    __setitem__ = set
+
+    def __contains__(self, key):
+        return key in self._data
+
+    def __len__(self):
+        return len(self._data)
+
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+            self.hits = self.misses = 0
+
+
+    def info(self):
+        return CacheInfo(self.hits, self.misses, None, len(self._data))
+
+#-------------------------------------------------------------------------------
+# End of class WeakKeyCache
+#-------------------------------------------------------------------------------
+
+
 #
 # Decorators
 #
 
+def _make_key(args, kw):
+    if kw:
+        return (args, frozenset(kw.items()))
+    return args
+
+
+def lrucached(maxsize=128, ttl=None):
+    """
+    Decorator factory caching return values of a function in LRUCache. All
+    arguments of the function must be hashable. Decorated function gets
+    methods cache_info() and cache_clear().
+
+    @lrucached(maxsize=1024)
+    def normalize(term):
+        ...
+    """
+    def decorator(func):
+        cache = LRUCache(maxsize, ttl)
+        missing = LRUCache._missing
+
+        @functools.wraps(func)
+        def wrapper(*args, **kw):
+            key = _make_key(args, kw)
+            res = cache.get(key, missing)
+            if res is missing:
+                res = func(*args, **kw)
+                cache.set(key, res)
+            return res
+        wrapper.cache_info = cache.info
+        wrapper.cache_clear = cache.clear
+        return wrapper
+    return decorator
+
+
+def weakcached(func):
+    """
+    Decorator caching return value of a function of one (weak-referenceable)
+    object. The value is forgotten together with the object.
+    """
+    cache = WeakKeyCache()
+    missing = WeakKeyCache._missing
+
+    @functools.wraps(func)
+    def wrapper(obj):
+        res = cache.get(obj, missing)
+        if res is missing:
+            res = func(obj)
+            cache.set(obj, res)
+        return res
+    wrapper.cache_info = cache.info
+    wrapper.cache_clear = cache.clear
+    return wrapper
+
+
 ## {{{ http://code.activestate.com/recipes/577452/ (r1)
 class memoized(object):
     """cache the return value of a method
@@ -49,6 +285,17 @@ class memoized(object):
     was invoked. All arguments passed to a method decorated with memoize must
     be hashable.
 
+    The cache of every method is an LRUCache bounded by memoized.maxsize
+    items and it is stored in the instance's __dict__ under the decorator
+    object, so it is freed together with the instance and a memoized method
+    doesn't share its cache with the memoized method it overrides. Caches of
+    instances without __dict__ (classes with __slots__) are kept in
+    a WeakKeyCache of the method. Instances which can't be weak-referenced
+    (builtin types, __slots__ without __weakref__) share one LRUCache of the
+    method keyed by the instance and the arguments - this cache keeps strong
+    references to at most memoized.maxsize instances and the instances have
+    to be hashable.
+
     If a memoized method is invoked directly on its class the result will not
     be cached. Instead the method will be invoked like a static method:
     class Obj(object):
@@ -58,28 +305,52 @@ class memoized(object):
     Obj.add_to(1) # not enough arguments
     Obj.add_to(1, 2) # returns 3, result is not cached
     """
+    maxsize = 256
+
     def __init__(self, func):
         self.func = func
+        self._weak = WeakKeyCache()
+        self._shared = LRUCache(self.maxsize)
+        functools.update_wrapper(self, func)
 
     def __get__(self, obj, objtype=None):
         if obj is None:
             return self.func
         return functools.partial(self, obj)
 
-    def __call__(self, *args, **kw):
-        try:
-            obj = args[0]
-        except IndexError:
-            obj = self
+    def _instance_cache(self, obj):
+        """
+        Returns LRUCache of the method for obj or None if obj has neither
+        __dict__ nor can be weak-referenced.
+        """
         try:
-            cache = obj.__cache
+            caches = obj.__dict__.setdefault("_memoized_caches", {})
         except AttributeError:
-            cache = obj.__cache = {}
-        key = (self.func, args[1:], frozenset(kw.items()))
+            try:
+                cache = self._weak.get(obj)
+            except TypeError:
+                return None
+            if cache is None:
+                cache = LRUCache(self.maxsize)
+                self._weak.set(obj, cache)
+            return cache
         try:
-            res = cache[key]
+            return caches[self]
         except KeyError:
-            res = cache[key] = self.func(*args, **kw)
+            cache = caches[self] = LRUCache(self.maxsize)
+            return cache
+
+    def __call__(self, *args, **kw):
+        cache = self._instance_cache(args[0]) if args else None
+        if cache is None:
+            cache = self._shared
+            key = _make_key(args, kw)
+        else:
+            key = _make_key(args[1:], kw)
+        res = cache.get(key, LRUCache._missing)
+        if res is LRUCache._missing:
+            res = self.func(*args, **kw)
+            cache.set(key, res)
         return res
 
 cached = memoized
@@ -119,32 +390,71 @@ def debugged(f):
 
 class lazy(object):
     """
-    Make the method lazy. Once the method was called, it wouldnt call any
+    Make the method lazy. Once the method was called on an instance, following
+    calls on the same instance do nothing and return None. The "called" flags
+    are kept in the instance's __dict__ as a set of decorator objects, so the
+    decorator itself holds no reference to the instance (it can be garbage
+    collected as usual) and a lazy override still runs the lazy method it
+    overrides.
+
+    When a plain function is decorated, it is called only once at all.
     """
     def __init__(self, func):
         self.func = func
-        self._partial = {}
+        self._called = False
+        functools.update_wrapper(self, func)
 
     def __get__(self, obj, objtype=None):
         if obj is None:
             return self.func
-        if not obj in self._partial:
-            self._partial[obj] = functools.partial(self, obj)
-            #self.func = self._partial[obj]
-        return self._partial[obj]
+        return functools.partial(self._call_once, obj)
 
-
-    def __call__(self, *args, **kw):
+    def _call_once(self, obj, *args, **kw):
+        called = obj.__dict__.setdefault("_lazy_called", set())
+        if self in called:
+            return None
+        # set the flag before the call - lazy methods may call each other
+        called.add(self)
         try:
-            obj = self._partial[args[0]]
+            return self.func(obj, *args, **kw)
         except:
-            obj = self.func
+            called.discard(self)
+            raise
+
+    def __call__(self, *args, **kw):
+        if self._called:
+            return None
+        self._called = True
         try:
-            if obj.__called:
-                return None
-        except AttributeError:
-            obj.__called = 1
             return self.func(*args, **kw)
+        except:
+            self._called = False
+            raise
+
+
+class lazyproperty(object):
+    """
+    Property which is computed on the first access and then stored into the
+    instance's __dict__ under the same name. Following accesses are ordinary
+    attribute lookups, so the decorated method is called exactly once per
+    instance.
+
+    class Doc(object):
+        @lazyproperty
+        def text(self):
+            return expensive_serialization(self)
+    """
+    def __init__(self, func):
+        self.func = func
+        functools.update_wrapper(self, func)
+
+    def __get__(self, obj, objtype=None):
+        if obj is None:
+            return self
+        value = obj.__dict__[self.__name__] = self.func(obj)
+        return value
+
+cachedproperty = lazyproperty
 
 
 if __name__ == "__main__":
@@ -158,6 +468,12 @@ if __name__ == "__main__":
     def f(g):
         print g
 
+    class B(object):
+        @lazyproperty
+        def p(self):
+            print "computing p"
+            return 42
+
     a = A()
     b = A()
     print a.m
@@ -173,4 +489,8 @@ if __name__ == "__main__":
     print "bm call"
     b.m()
     print "second bm call"
-    b.m()
\ No newline at end of file
+    b.m()
+
+    c = B()
+    print c.p
+    print c.p
\ No newline at end of file
@@ -12,5 +12,5 @@ FUTURE: client-module for rrsproxy
 # which will use rrs-proxy
 
 __all__ = ['crawler', 'mime', 'separsers', 'sequencewrapper', 'htmltools',
-           'csstools', 'lxmlsupport']
+           'csstools', 'lxmlsupport', 'entities', 'urltools']
 
@@ -32,6 +32,7 @@ import urllib2
 import threading
 import thread
 from httptools import is_url_valid
+from urltools import url_key
 import re
 
 
@@ -306,8 +307,19 @@ class Crawler:
         self.queue.clear()
         if len(urls) == 0:
             return {}
+        # every page is downloaded only once, other spellings of its URL
+        # (fragments, trailing slash, case of the host, default port...) get
+        # the same result
+        first = {}
+        aliases = []
         for link in urls:
             if link == None: continue
+            key = url_key(link, fold_slash=True) or link
+            if key in first:
+                if first[key] != link:
+                    aliases.append((link, first[key]))
+                continue
+            first[key] = link
             try:
                 thrd = CrawlerThread(link, self.preffered_handler, headers=self._headers)
             except CrawlerThreadError, e:
@@ -335,6 +347,10 @@ class Crawler:
             self.queue[s.name]= s.__getresult__()
             if s.name != s.__geturl__():
                 self.redir[s.name] = s.__geturl__()
+        for alias, link in aliases:
+            self.queue[alias] = self.queue[link]
+            if link in self.redir:
+                self.redir[alias] = self.redir[link]
 
         mtlen = len(self.mythreads)
         for t in range(mtlen):
@@ -517,7 +517,8 @@ class CSSParser(object):
         # css style parser converts css rules to css styles
         self.cssstyleparser = _CSSStyleParser()
         # element -> font style mapper maps lxml elements to CSSStyle instances
-        self._elem2style_map = Element2CSSStyleMapper()
+        # (created for every parse())
+        self._elem2style_map = None
 
 
     def _identical_domain(self, url1, url2):
@@ -614,12 +615,14 @@ class CSSParser(object):
         self._sheet = CascadeStyleSheet(self._rules)
         # stylesheet is instance of CSSSelector2CSSStyleMapper
         self._selector2style_map = self.cssstyleparser.get_style_mapper(self._sheet)
-        # parse font styles
-
+        # parse font styles (mapper of this parse keeps styles of parents, it is
+        # dropped at the end together with the elements it holds)
+        self._elem2style_map = Element2CSSStyleMapper()
         for elem in root.iterdescendants():
             style = CSSStyle()
             style.parse_element(elem, self._selector2style_map, self._elem2style_map)
             elem.style = style
+        self._elem2style_map = None
 
 
     def get_sheet(self):
@@ -904,8 +907,8 @@ class CSSStyle(object):
             # have to)
             _parentstyle = element_styles.get_elem_style(p)
             if _parentstyle != None:
-                parent_styles[str(p)] = _parentstyle
-                parent_order.append(str(p))
+                parent_styles[p] = _parentstyle
+                parent_order.append(p)
                 break
 
             # new styles we will process
@@ -939,9 +942,9 @@ class CSSStyle(object):
                     c.inherite(result_css)
                     result_css = c
                 except AttributeError: pass
-            # store textual representation of this tag
-            parent_styles[str(p)] = result_css
-            parent_order.append(str(p))
+            # store style of this tag
+            parent_styles[p] = result_css
+            parent_order.append(p)
 
             # go to next parent
             p = p.getparent()
@@ -966,7 +969,7 @@ class CSSStyle(object):
                 element_styles.add_elem_style(parent_order[-i+1], parent_styles[parent_order[-i+1]])
 
         # store inherited properties to THIS CSSStyle object
-        # parent_order[0] == this tag's name with address (textual representation)
+        # parent_order[0] == this element
         # parent_styles[parent_order[0]] == last inherited style (and of course
         # this style)
         self.copy(parent_styles[parent_order[0]])
@@ -1171,12 +1174,13 @@ class Element2CSSStyleMapper(object):
         lxml.Element. If trying to add style to element, which is already mapped,
         raises HSWCSSElementStyleError.
         """
-        # we hash string representation of object. lxml.Element containts unique repr
-        # (0x address in memory) so this should be safe.
-        if str(elem) in self._style_tree:
+        # elements are keyed by themselves: the mapping keeps their proxies
+        # alive, so lxml returns the same proxy for the same element while the
+        # mapping exists (use one mapping for one parse of the tree).
+        if elem in self._style_tree:
             raise CSSElementStyleError("Element already mapped to style " + \
-                                           str(self._style_tree[str(elem)]))
-        self._style_tree[str(elem)] = style
+                                           str(self._style_tree[elem]))
+        self._style_tree[elem] = style
 
 
     def get_elem_style(self, elem):
@@ -1184,9 +1188,7 @@ class Element2CSSStyleMapper(object):
         Returns appropriate FontStyle for element $elem. If element not found
         (not stored yet), returns None.
         """
-        if str(elem) not in self._style_tree:
-            return None
-        return self._style_tree[str(elem)]
+        return self._style_tree.get(elem)
 
 #    __single = None # Singleton instance
 #    _style_tree = None
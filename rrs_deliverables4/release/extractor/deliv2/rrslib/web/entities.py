@@ -0,0 +1,254 @@
+#! /usr/bin/python
+# -*- coding: utf-8 -*-
+
+"""
+Decoding of HTML entities and normalization of short texts harvested from web
+pages (titles, anchors, table cells). This module is shared by rrslib
+(htmltools) and deliverable extractor (deliv2), which used to have their own
+decoders.
+
+The table of entities is precomputed once when the module is imported. Texts
+without any ampersand are returned without touching the regex engine at all,
+other texts are decoded in one pass of a compiled pattern, where the callback
+does only a dictionary lookup. Results for short strings are kept in a bounded
+LRU cache, because the same titles and anchor texts repeat all over the pages
+of one site.
+"""
+
+__modulename__ = "entities"
+__date__ = "$19.10.2026 10:12:40$"
+
+import htmlentitydefs
+import re
+import unicodedata
+
+from rrslib.others.pattern import LRUCache
+
+
+# named entity -> unicode character (full HTML 4 table + &apos;)
+NAME2CHAR = dict((name, unichr(cp)) for name, cp in htmlentitydefs.name2codepoint.iteritems())
+NAME2CHAR['apos'] = u"'"
+
+# typographic entities simplified to plain ASCII (used for titles of
+# deliverables and other short texts, where we don't want fancy quotes)
+SIMPLIFIED_NAME2CHAR = dict(NAME2CHAR)
+SIMPLIFIED_NAME2CHAR.update({'nbsp': u' ', 'mdash': u'-', 'ndash': u'-',
+                             'ldquo': u'"', 'rdquo': u'"', 'lsquo': u"'",
+                             'rsquo': u"'", 'lsaquo': u'<', 'rsaquo': u'>'})
+
+# strings shorter than this are cached
+CACHED_LENGTH = 256
+
+_entity_re = re.compile(r'&(#[xX]?)?(\w+);')
+
+# whitespace handled by formatter (the same set as textwrap uses)
+_whitespace_re = re.compile(u'[ \t\n\r\x0b\x0c]+')
+
+
+def _make_substitute(table):
+    get = table.get
+    def substitute(match):
+        num, name = match.groups()
+        if num is None:
+            return get(name, match.group(0))
+        try:
+            if len(num) == 2:
+                return unichr(int(name, 16))
+            return unichr(int(name))
+        except (ValueError, OverflowError):
+            return match.group(0)
+    return substitute
+
+_substitute = _make_substitute(NAME2CHAR)
+_substitute_simplified = _make_substitute(SIMPLIFIED_NAME2CHAR)
+
+_cache = LRUCache(maxsize=8192)
+_cache_simplified = LRUCache(maxsize=8192)
+
+
+def _to_unicode(text):
+    if isinstance(text, unicode):
+        return text
+    try:
+        return text.decode('utf-8')
+    except UnicodeDecodeError:
+        return text.decode('iso-8859-1')
+
+
+def decode_htmlentities(text, simplify=False):
+    """
+    Returns text with decoded named (&amp;), decimal (&#38;) and hexadecimal
+    (&#x26;) entities. Unknown entities are left untouched. If simplify is True,
+    typographic entities (dashes, quotes, nbsp) are translated to plain ASCII.
+
+    Byte strings are decoded from utf-8 (or iso-8859-1), unicode is returned
+    for all texts (None for None).
+    """
+    if text is None:
+        return None
+    if '&' not in text:
+        return _to_unicode(text)
+    if simplify:
+        cache, subst = _cache_simplified, _substitute_simplified
+    else:
+        cache, subst = _cache, _substitute
+    short = len(text) < CACHED_LENGTH
+    if short:
+        res = cache.get(text)
+        if res is not None:
+            return res
+    res = _entity_re.sub(subst, _to_unicode(text))
+    if short:
+        cache.set(text, res)
+    return res
+
+
+def cache_info():
+    """
+    Returns statistics of caches of decoded strings (tuple of CacheInfo for
+    plain and simplified decoding).
+    """
+    return (_cache.info(), _cache_simplified.info())
+
+
+class HtmlEntityDecoder(object):
+    """
+    HtmlEntityDecoder decodes HTML named and numbered entities to text.
+    Object wrapper of decode_htmlentities() kept for compatibility.
+    """
+
+    def __init__(self, simplify=False):
+        self.simplify = simplify
+
+
+    def decode_htmlentities(self, string):
+        """
+        Returns string with decoded entities
+        """
+        return decode_htmlentities(string, self.simplify)
+
+#-------------------------------------------------------------------------------
+# End of class HtmlEntityDecoder
+#-------------------------------------------------------------------------------
+
+
+class TextFormatUtils(object):
+    """
+    Utility for encoding and formatting short texts from web pages: decodes
+    byte strings in charset of the page, normalizes unicode (NFKD), decodes
+    HTML entities and squeezes white characters.
+    """
+
+    def __init__(self, charset=None):
+        # charset (iso-8859-2, cp1250 etc.)
+        self.charset = charset
+
+
+    def set_charset(self, chs):
+        """
+        Charset initializer
+        """
+        self.charset = chs
+
+
+    def get_charset(self):
+        """
+        Get formatter charset
+        """
+        return self.charset
+
+
+    def _decode(self, data):
+        for chset in (self.charset, 'iso-8859-2', 'cp1250', 'iso-8859-1'):
+            if chset is None:
+                continue
+            try:
+                return unicodedata.normalize('NFKD', data.decode(chset))
+            except (UnicodeDecodeError, LookupError):
+                continue
+        return data
+
+
+    def format(self, data):
+        """
+        Main method formats the string: decodes it, deletes white characters
+        (\\t, \\n etc.) and decodes html entities.
+        """
+        if isinstance(data, str):
+            data = self._decode(data)
+        data = decode_htmlentities(data, simplify=True)
+        return _whitespace_re.sub(u' ', data).strip(u' ')
+
+#-------------------------------------------------------------------------------
+# End of class TextFormatUtils
+#-------------------------------------------------------------------------------
+
+
+if __name__ == "__main__":
+    # Benchmark of the decoder against the previous implementations (regex
+    # callback per entity + textwrap). Give saved HTML pages (e.g. pages with
+    # deliverables) as arguments.
+    import sys
+    import textwrap
+    import timeit
+
+    class _OldDecoder(object):
+        # rrslib.web.htmltools
+        def __init__(self):
+            self.pattern = re.compile(r'&(#?)(x?)(\w+);')
+        def _substitute_entity(self, match):
+            entity_name = match.group(3)
+            try:
+                entdef = htmlentitydefs.entitydefs[entity_name]
+                if entdef.startswith("#?"):
+                    entdef = entdef[2:-1]
+            except KeyError:
+                entdef = entity_name
+            try:
+                entdef = unichr(int(entdef))
+            except: pass
+            # the original crashed here on latin-1 characters
+            if isinstance(entdef, str):
+                entdef = entdef.decode('iso-8859-1')
+            return entdef
+        def decode_htmlentities(self, string):
+            return self.pattern.sub(self._substitute_entity, string)
+
+    class _OldDelivDecoder(_OldDecoder):
+        # deliv2 getdelivrecords, getdeliverablerecords
+        name2text = {'apos': '\'', 'nbsp': ' ', 'mdash': '-', 'ndash': '-',
+                     'ldquo': '\"', 'rdquo': '\"', 'lsquo': '\'',
+                     'rsquo': '\'', 'lsaquo': '<', 'rsaquo': '>'}
+        def _substitute_entity(self, match):
+            return self.name2text.get(match.group(3))
+
+    class _OldFormatter(object):
+        def __init__(self):
+            self.wrapper = textwrap.TextWrapper(width=500, expand_tabs=False)
+            self.hed = _OldDelivDecoder()
+        def format(self, data):
+            for chset in (None, 'iso-8859-2', 'cp1250', 'iso-8859-1'):
+                try:
+                    data = data.decode(chset).encode('utf-8')
+                    data = unicodedata.normalize('NFKD', unicode(data, 'utf-8'))
+                    break
+                except:
+                    continue
+            data = self.hed.decode_htmlentities(data)
+            data = ''.join(self.wrapper.wrap(data))
+            return re.sub('[ ]+', ' ', data).strip(' ')
+
+    if len(sys.argv) < 2:
+        sys.exit("usage: entities.py page.html [page.html ...]")
+    pages = [open(f).read() for f in sys.argv[1:]]
+    upages = [p.decode('utf-8', 'replace') for p in pages]
+    # short strings: lines of the pages (anchors, titles, cells)
+    lines = [l for p in pages for l in p.splitlines() if l.strip()]
+    old, new = _OldFormatter(), TextFormatUtils()
+    olddec = _OldDecoder()
+    for name, stmt in (("old decoder, pages", lambda: [olddec.decode_htmlentities(p) for p in upages]),
+                       ("new decoder, pages", lambda: [decode_htmlentities(p) for p in pages]),
+                       ("old formatter, lines", lambda: [old.format(l) for l in lines]),
+                       ("new formatter, lines", lambda: [new.format(l) for l in lines])):
+        print "%-22s %.4f s" % (name, min(timeit.repeat(stmt, number=5, repeat=3)) / 5)
+    print cache_info()
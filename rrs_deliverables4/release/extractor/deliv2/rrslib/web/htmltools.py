@@ -12,65 +12,21 @@ __author__ = "Stanislav Heller"
 __email__ = "xhelle03@stud.fit.vutbr.cz"
 __date__  = "$31.3.2011 18:01:11$"
 
-import htmlentitydefs
 import re
 import string
+from urlparse import urlsplit
 
 from lxml.etree import ElementTree
 from lxml.html import fromstring, tostring
 
 from rrslib.web.csstools import CSSParser
 from rrslib.web.lxmlsupport import persist_ElementTree
-from rrslib.others.pattern import cached, lazy
+from rrslib.web.entities import decode_htmlentities
+from rrslib.others.pattern import lazy, lazyproperty, lrucached
 from rrslib.classifiers.language import LanguageIdentifier
 from rrslib.extractors.normalize import Normalize
 
 
-class HtmlEntityDecoder(object):
-    """
-    HtmlEntityDecoder decodes HTML named and numbered entities to text.
-    """
-
-    def __init__(self):
-        # pattern to recognize html entity
-        self.pattern = re.compile(r'&(#?)(x?)(\w+);')
-        # dictionary translating usual entities
-        self.name2text = {'apos': '\'', 'nbsp': ' ', 'mdash': '-', 'ndash': '-',
-                          'ldquo': '\"', 'rdquo': '\"', 'lsquo': '\'',
-                          'rsquo': '\'', 'lsaquo': '<', 'rsaquo': '>'}
-
-    def _substitute_entity(self, match):
-        """
-        Get the entity and return character or unicode
-        """
-        entity_name = match.group(3)
-        try:
-            # get named entities
-            entdef = htmlentitydefs.entitydefs[entity_name]
-            if entdef.startswith("#?"):
-                entdef = entdef[2:-1]
-            #entdef = self.name2text[entity_name]
-        except KeyError:
-            entdef = entity_name
-        try:
-            # convert numbered entity
-            entdef = unichr(int(entdef))
-        except: pass
-        return entdef
-
-
-    def decode_htmlentities(self, string):
-        """
-        Returns string with decoded entities
-        """
-        dec_string = self.pattern.sub(self._substitute_entity, string, re.U)
-        return dec_string
-
-#-------------------------------------------------------------------------------
-# End of class HtmlEntityDecoder
-#-------------------------------------------------------------------------------
-
-
 class SimpleHTMLCleaner(object):
     """
     HTMLCleander provides simple methods for cleaning text and HTML code.
@@ -97,9 +53,8 @@ class SimpleHTMLCleaner(object):
         HTML entities and translates national characters into normal form.
         Warining! This method creates new ElementTree instead of the old one!
         """
-        ed = HtmlEntityDecoder()
         html = tostring(elemtree)
-        html = ed.decode_htmlentities(html)
+        html = decode_htmlentities(html)
         html = Normalize.translate_national(html)
         html = re.sub("<[bB][rR][^>]*\/?>", " ", html)
         return ElementTree( fromstring(html) )
@@ -138,6 +93,10 @@ class HTMLDocument(object):
      - frame checking
      - metadata parsing
      - navigation storage (should parse the page implicitly)
+
+    Text content, metadata, frames and language of the document are computed
+    lazily on the first request and kept for the lifetime of the object, so
+    repeated calls of the accessors are cheap.
     """
     def __init__(self, elemtree, url):
         # object tree representing this document
@@ -145,17 +104,18 @@ class HTMLDocument(object):
         # css parser parses extern and inline css declarations on page
         self.cssparser = CSSParser()
 
-        # metadata, additional information about document
-        self.frames = []
+        # metadata, additional information about document (frames and meta
+        # tags are lazy properties, see below)
         self.url = url
-        self._meta = {}
 
         # content
         self.navigation = {}
         self.name = None
 
 
-    def _normalize_meta_property(self, property):
+    @staticmethod
+    @lrucached(maxsize=512)
+    def _normalize_meta_property(property):
         for delim in (".", ":"):
             if delim in property:
                 property = property.split(delim)[1]
@@ -179,8 +139,13 @@ class HTMLDocument(object):
         return property
 
 
-    @lazy
-    def _parse_meta(self):
+    @lazyproperty
+    def _meta(self):
+        """
+        Map of normalized meta properties to lists of their values. Parsed on
+        the first access, also sets the name of the document (<title>).
+        """
+        meta_map = {}
         title = self._lxmletree.find('.//title')
         if title is not None:
             self.name = title.text
@@ -191,32 +156,32 @@ class HTMLDocument(object):
             if name is not None:
                 name = self._normalize_meta_property(name)
                 if name == 'keywords':
-                    self._meta[name] = [x.strip() for x in content.split(",")]
+                    meta_map[name] = [x.strip() for x in content.split(",")]
                 else:
-                    if name in self._meta:
-                        if content not in self._meta[name]:
-                            self._meta[name].append(content)
+                    if name in meta_map:
+                        if content not in meta_map[name]:
+                            meta_map[name].append(content)
                     else:
-                        self._meta[name] = [content]
+                        meta_map[name] = [content]
             elif httpequiv is not None:
                 httpequiv = httpequiv.lower()
                 if httpequiv == 'content-type':
                       contenttype, charset = content.split(";")
-                      self._meta[httpequiv] = contenttype
-                      self._meta['charset'] = charset.split("=")[1]
+                      meta_map[httpequiv] = contenttype
+                      meta_map['charset'] = charset.split("=")[1]
                 else:
-                    self._meta[httpequiv] = content
+                    meta_map[httpequiv] = content
             elif property is not None:
                 property = self._normalize_meta_property(property)
-                if property in self._meta:
-                    if content not in self._meta[property]:
-                        self._meta[property].append(content)
+                if property in meta_map:
+                    if content not in meta_map[property]:
+                        meta_map[property].append(content)
                 else:
-                    self._meta[property] = [content]
+                    meta_map[property] = [content]
+        return meta_map
 
 
     def get_meta(self, name):
-        self._parse_meta()
         try:
             return self._meta[name]
         except KeyError:
@@ -224,7 +189,6 @@ class HTMLDocument(object):
 
 
     def get_meta_map(self):
-        self._parse_meta()
         return self._meta
 
 
@@ -238,17 +202,23 @@ class HTMLDocument(object):
         # Parse css
         self.cssparser.parse(self._lxmletree, self.url)
         # parse metadata
-        self._parse_meta()
+        self.get_meta_map()
 
 
-    @cached
-    def get_language(self):
+    @lazyproperty
+    def _text_content(self):
+        return self._lxmletree.getroot().text_content()
+
+    @lazyproperty
+    def _language(self):
         l = LanguageIdentifier()
-        return l.identify(self.text_content())
+        return l.identify(self._text_content)
+
+    def get_language(self):
+        return self._language
 
-    @cached
     def text_content(self):
-        return self._lxmletree.getroot().text_content()
+        return self._text_content
 
 
     def get_element_visibility(self, elem):
@@ -257,11 +227,11 @@ class HTMLDocument(object):
         """
         return elem.style.get_visibility()
 
-    @cached
-    def get_frames(self):
+    @lazyproperty
+    def frames(self):
         """
-        If page contains frames, returns their urls (from "src" attribute)
-        @return list of frame's URL's or None if no frames on the page
+        URLs of frames on the page (from "src" attribute) or None if the page
+        contains no frames.
         """
         # get all frames on the page
         f = []
@@ -284,6 +254,13 @@ class HTMLDocument(object):
             f.append(frame.get('src'))
         return f # list of frames URLs
 
+    def get_frames(self):
+        """
+        If page contains frames, returns their urls (from "src" attribute)
+        @return list of frame's URL's or None if no frames on the page
+        """
+        return self.frames
+
 
     def add_menu_item(self, text, link):
         self.navigation[text] = link
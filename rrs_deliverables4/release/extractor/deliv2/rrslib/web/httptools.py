@@ -59,14 +59,16 @@ def is_url_alive(url, timeout=10):
         return False
 
 
+_valid_url_re = re.compile('^(http|https|ftp)' + # scheme
+                           '\://[a-z0-9\-\.]+\.[a-z]{2,3}(:[a-z0-9]*)?/?' + # path
+                           '([\:a-z0-9\-\._\?\,\'/\\\+&amp;%\$#\=~])*' + # query, fragment
+                           '$', re.I)
+
 def is_url_valid(url):
     """
     Check if URL is valid using RE.
     """
-    if not re.search('^(http|https|ftp)' + # scheme
-                     '\://[a-z0-9\-\.]+\.[a-z]{2,3}(:[a-z0-9]*)?/?' + # path
-                     '([\:a-z0-9\-\._\?\,\'/\\\+&amp;%\$#\=~])*' + # query, fragment
-                     '$', url, re.I):
+    if not _valid_url_re.search(url):
         return False
     return True
 
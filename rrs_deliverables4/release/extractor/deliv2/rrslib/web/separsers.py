@@ -4,6 +4,11 @@
 """
 Module separsers contains parsers of web search engines, which creates API for
 easy information retrieval and comfortable processing of obtained data.
+
+Parsers process one page of results. Class MultiPageSearch runs a query over
+several pages of results at once: the pages are downloaded concurrently,
+parsed results are cached on disk (SearchResultCache) and hits are returned
+merged and deduplicated.
 """
 
 __modulename__ = "separsers"
@@ -13,8 +18,13 @@ __date__ = "$18-March-2011 22:22:47$"
 
 
 # load core libraries
+import cPickle
+import hashlib
+import os
 import re
 import string
+import tempfile
+import time
 
 # load element tree libs
 from lxml import etree
@@ -24,6 +34,7 @@ import StringIO
 # load rrs libraries
 from crawler import Crawler
 from rrslib.web.httptools import url_safe
+from rrslib.web.urltools import URLSeenSet
 
 # SE = search engine
 
@@ -505,6 +516,201 @@ class GoogleParser:
 # end of class GoogleParser
 #-------------------------------------------------------------------------------
 
+class SearchResultCache(object):
+    """
+    Disk cache of parsed search results. Results (lists of result-items as
+    returned by get_list()) are keyed by (engine, query, page) and stored one
+    pickle per key in the cache directory. Entries older than ttl seconds are
+    ignored.
+    """
+    def __init__(self, directory=None, ttl=86400):
+        if directory is None:
+            directory = os.path.join(tempfile.gettempdir(), "rrslib_separsers")
+        self.directory = directory
+        self.ttl = ttl
+        if not os.path.isdir(directory):
+            try:
+                os.makedirs(directory)
+            except OSError:
+                # created by another process in the meantime
+                if not os.path.isdir(directory):
+                    raise
+
+
+    def _path(self, engine, query, page):
+        if isinstance(query, unicode):
+            query = query.encode('utf-8')
+        key = hashlib.md5("%s\0%s\0%d" % (engine, query, page)).hexdigest()
+        return os.path.join(self.directory, key + ".rrscache")
+
+
+    def get(self, engine, query, page):
+        """
+        Returns cached list of results or None if there is no valid entry.
+        """
+        path = self._path(engine, query, page)
+        try:
+            f = open(path, 'rb')
+        except IOError:
+            return None
+        try:
+            try:
+                created, rlist = cPickle.load(f)
+            except Exception:
+                # broken entry
+                return None
+        finally:
+            f.close()
+        if self.ttl is not None and time.time() - created > self.ttl:
+            return None
+        return rlist
+
+
+    def set(self, engine, query, page, rlist):
+        """
+        Stores list of results. The file is written under temporary name and
+        renamed, so that readers never see half-written entries.
+        """
+        path = self._path(engine, query, page)
+        fd, tmp = tempfile.mkstemp(dir=self.directory)
+        f = os.fdopen(fd, 'wb')
+        try:
+            cPickle.dump((time.time(), rlist), f, cPickle.HIGHEST_PROTOCOL)
+        finally:
+            f.close()
+        os.rename(tmp, path)
+
+
+    def clear(self):
+        """
+        Deletes all entries from the cache.
+        """
+        for name in os.listdir(self.directory):
+            if name.endswith(".rrscache"):
+                os.remove(os.path.join(self.directory, name))
+
+#-------------------------------------------------------------------------------
+# end of class SearchResultCache
+#-------------------------------------------------------------------------------
+
+
+# search engines which support paging: name -> (parser class, query method)
+SEARCH_ENGINES = {
+    'altavista': (AltaVistaParser, 'get_altavista_query'),
+    'ask': (AskParser, 'get_ask_query'),
+    'bing': (BingParser, 'get_bing_query'),
+}
+
+
+class MultiPageSearch(object):
+    """
+    Class MultiPageSearch executes query on several pages of results of one
+    search engine. Pages which are not in the cache are downloaded
+    concurrently (by Crawler), parsed and stored in the cache. Method search()
+    yields result-items of all pages in order of the pages, without duplicate
+    URLs and with rank renumbered across the pages.
+
+    Downloading can be replaced by parameter fetch, which is a function taking
+    list of URLs and returning dictionary {url: etree._ElementTree} (the same
+    as Crawler.start()). That is useful for testing on saved pages.
+    """
+    def __init__(self, engine='bing', pages=3, cache=None, fetch=None):
+        if engine not in SEARCH_ENGINES:
+            raise AttributeError("Unknown search engine '%s'. Supported engines: %s" \
+                                 % (engine, ", ".join(sorted(SEARCH_ENGINES))))
+        self.engine = engine
+        self.pages = pages
+        self.cache = cache
+        self._parser_class, self._query_method = SEARCH_ENGINES[engine]
+        if fetch is None:
+            fetch = Crawler().start
+        self._fetch = fetch
+
+
+    def get_query_url(self, query, page=1):
+        """
+        Returns URL of the page of results of the query.
+        """
+        return getattr(self._parser_class(), self._query_method)(query, page)
+
+
+    def _parse(self, tree):
+        parser = self._parser_class()
+        try:
+            parser.parse(tree, genxml=False)
+        except (AttributeError, IndexError, TypeError):
+            # not a page of results (error page, no results etc.)
+            return None
+        return parser.get_list()
+
+
+    def _download(self, query, pages):
+        """
+        Downloads and parses pages of results concurrently. Returns dictionary
+        {page: list of results}. Pages which failed are missing.
+        """
+        urls = dict((self.get_query_url(query, page), page) for page in pages)
+        trees = self._fetch(urls.keys())
+        results = {}
+        for url, page in urls.iteritems():
+            tree = trees.get(url)
+            if not isinstance(tree, etree._ElementTree):
+                continue
+            rlist = self._parse(tree)
+            if rlist is None:
+                continue
+            results[page] = rlist
+            if self.cache is not None:
+                self.cache.set(self.engine, query, page, rlist)
+        return results
+
+
+    def search(self, query, pages=None):
+        """
+        Generator of result-items (dictionaries with keys title, abstract, url,
+        rank, page). Results of cached leading pages are yielded before the
+        rest of the pages is downloaded.
+        """
+        if isinstance(query, unicode):
+            query = query.encode('utf-8')
+        if pages is None:
+            pages = self.pages
+        results = {}
+        missing = []
+        for page in range(1, pages + 1):
+            rlist = None
+            if self.cache is not None:
+                rlist = self.cache.get(self.engine, query, page)
+            if rlist is None:
+                missing.append(page)
+            else:
+                results[page] = rlist
+        seen = URLSeenSet()
+        rank = 0
+        for page in range(1, pages + 1):
+            if page in missing:
+                results.update(self._download(query, missing))
+                missing = []
+            for item in results.get(page, ()):
+                if not seen.add(item.get('url')):
+                    continue
+                rank += 1
+                item = dict(item)
+                item['rank'] = rank
+                item['page'] = page
+                yield item
+
+
+    def get_list(self, query, pages=None):
+        """
+        Returns list of all result-items (see search()).
+        """
+        return list(self.search(query, pages))
+
+#-------------------------------------------------------------------------------
+# end of class MultiPageSearch
+#-------------------------------------------------------------------------------
+
 if __name__ == '__main__':
     query = "Search Engine Ranking Factors"
     crawler = Crawler()
@@ -514,3 +720,7 @@ if __name__ == '__main__':
     bing.parse(res[qbi])
     for item in bing.get_list():
         print item['rank'], item['title'], item['url']
+
+    search = MultiPageSearch('bing', pages=3, cache=SearchResultCache())
+    for item in search.search(query):
+        print item['page'], item['rank'], item['title'], item['url']
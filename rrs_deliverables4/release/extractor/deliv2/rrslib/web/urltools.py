@@ -0,0 +1,356 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+Module urltools provides canonicalization of URLs and compact structures for
+remembering visited URLs in crawler frontiers.
+
+Canonical form of URL (canonicalize()):
+ - relative URL is joined with the base (without the base, URLs with no
+   scheme are returned unchanged, they can't be resolved),
+ - scheme and host are lowercased, default port and trailing dot of the host
+   are removed,
+ - dot-segments of the path are resolved, empty path becomes "/", percent
+   escapes are uppercased and unsafe characters are quoted,
+ - tracking parameters of campaigns and ad clicks (utm_*, gclid, fbclid,
+   mc_*) are dropped and the rest of the query is sorted (session ids are
+   kept, some sites choose the content by them),
+ - fragment is dropped.
+
+Two URLs pointing to the same page can still differ in the trailing slash
+("/a" and "/a/"). Servers usually redirect one to the other, but they are not
+interchangeable as base URLs of the page (relative links are resolved
+differently), so the slash is significant in canonicalize() and url_key().
+Crawlers which only download pages may ignore it by url_key(fold_slash=True)
+(or URLSeenSet(fold_slash=True)) and keep fetching the URLs as they were
+found.
+"""
+
+__modulename__ = "urltools"
+__date__ = "$19.10.2026 14:31:07$"
+
+import hashlib
+import math
+import posixpath
+import re
+import struct
+import urllib
+from urlparse import urlsplit, urlunsplit, urljoin, parse_qsl
+
+from rrslib.others.pattern import lrucached
+
+
+DEFAULT_PORTS = {'http': '80', 'https': '443', 'ftp': '21'}
+
+# query parameters which don't change the content of the page
+TRACKING_PARAMS = frozenset(['utm_source', 'utm_medium', 'utm_campaign',
+                             'utm_term', 'utm_content', 'utm_id', 'gclid',
+                             'dclid', 'fbclid', 'msclkid', 'mc_cid', 'mc_eid'])
+
+# second level suffixes under which domains are registered (the most common
+# ones for european project sites, no public suffix list is available here)
+MULTIPART_SUFFIXES = frozenset([
+    'co.uk', 'ac.uk', 'org.uk', 'gov.uk', 'ltd.uk', 'me.uk', 'net.uk',
+    'nhs.uk', 'sch.uk', 'ac.at', 'co.at', 'or.at', 'gv.at', 'ac.be',
+    'ac.cy', 'com.cy', 'ac.il', 'co.il', 'org.il', 'ac.jp', 'co.jp',
+    'or.jp', 'ne.jp', 'com.au', 'edu.au', 'org.au', 'gov.au', 'ac.nz',
+    'co.nz', 'org.nz', 'com.br', 'edu.br', 'org.br', 'com.cn', 'edu.cn',
+    'org.cn', 'ac.cn', 'com.gr', 'edu.gr', 'com.pl', 'edu.pl', 'org.pl',
+    'com.pt', 'edu.pt', 'com.es', 'edu.es', 'org.es', 'com.tr', 'edu.tr',
+    'ac.za', 'co.za', 'co.in', 'ac.in', 'ac.kr', 'co.kr', 'com.mt',
+    'edu.mt', 'ac.rs', 'co.rs', 'com.ro', 'europa.eu'])
+
+_escape_re = re.compile(r'%[0-9a-fA-F]{2}')
+_path_safe = "/%:@!$&'()*+,;=-._~"
+_host_prefix_re = re.compile(r'^(www\d*|wiki)\.')
+
+
+def _upper_escape(match):
+    return match.group(0).upper()
+
+
+def _canonical_path(path):
+    if not path:
+        return '/'
+    trailing = path.endswith('/')
+    path = posixpath.normpath(path)
+    # normpath keeps two leading slashes, we don't want them
+    if path.startswith('//'):
+        path = '/' + path.lstrip('/')
+    if path == '.':
+        path = '/'
+    if trailing and path != '/':
+        path += '/'
+    path = urllib.quote(path, _path_safe)
+    return _escape_re.sub(_upper_escape, path)
+
+
+def _canonical_query(query, strip_tracking):
+    if not query:
+        return ''
+    params = parse_qsl(query, keep_blank_values=True)
+    if strip_tracking:
+        params = [p for p in params if p[0].lower() not in TRACKING_PARAMS]
+    params.sort()
+    return urllib.urlencode(params)
+
+
+@lrucached(maxsize=16384)
+def _canonicalize(url, strip_tracking):
+    url = url.strip()
+    split = urlsplit(url)
+    scheme = split.scheme.lower()
+    host = (split.hostname or '').rstrip('.')
+    port = split.port
+    netloc = host
+    if split.username:
+        netloc = '@'.join((split.username + (split.password and ':' + split.password or ''), netloc))
+    if port is not None and str(port) != DEFAULT_PORTS.get(scheme):
+        netloc += ':' + str(port)
+    path = _canonical_path(split.path)
+    query = _canonical_query(split.query, strip_tracking)
+    return urlunsplit((scheme, netloc, path, query, ''))
+
+
+def canonicalize(url, base=None, strip_tracking=True):
+    """
+    Returns canonical form of the URL (see module documentation). If base is
+    given, relative URL is made absolute first. URL without scheme (relative
+    URL without base) is returned unchanged. Returns None for empty URLs and
+    for URLs which can't be fetched (javascript:, mailto:).
+    """
+    if not url:
+        return None
+    if isinstance(url, unicode):
+        url = url.encode('utf-8')
+    if base is not None:
+        if isinstance(base, unicode):
+            base = base.encode('utf-8')
+        url = urljoin(base, url.strip())
+    lower = url[:11].lower()
+    if lower.startswith('javascript:') or lower.startswith('mailto:'):
+        return None
+    if not urlsplit(url).scheme:
+        return url
+    try:
+        return _canonicalize(url, strip_tracking)
+    except ValueError:
+        # invalid port etc.
+        return None
+
+
+def url_key(url, base=None, fold_slash=False):
+    """
+    Returns the key identifying the page for deduplication: canonical URL
+    (without trailing slash of the path if fold_slash is True).
+    """
+    url = canonicalize(url, base)
+    if url is None or not fold_slash:
+        return url
+    split = urlsplit(url)
+    if len(split.path) > 1 and split.path.endswith('/'):
+        url = urlunsplit((split.scheme, split.netloc, split.path.rstrip('/'), split.query, ''))
+    return url
+
+
+def get_host(url):
+    """
+    Returns lowercased host name of the URL without port (or None).
+    """
+    try:
+        host = urlsplit(url).hostname
+    except ValueError:
+        return None
+    if host:
+        return host.rstrip('.')
+    return None
+
+
+def registered_domain(url_or_host):
+    """
+    Returns the registered domain of the URL or host name, e.g.
+    "www.cs.example.ac.uk" -> "example.ac.uk". IP addresses are returned as
+    they are.
+    """
+    host = url_or_host
+    if '/' in url_or_host or ':' in url_or_host:
+        host = get_host(url_or_host)
+    if not host:
+        return None
+    host = host.lower().rstrip('.')
+    if host.replace('.', '').isdigit():
+        return host
+    labels = host.split('.')
+    if len(labels) <= 2:
+        return host
+    if '.'.join(labels[-2:]) in MULTIPART_SUFFIXES:
+        return '.'.join(labels[-3:])
+    return '.'.join(labels[-2:])
+
+
+def same_host(url1, url2):
+    """
+    Returns True if both URLs point to the same host. Prefixes "www." and
+    "wiki." are ignored ("www.example.org" is the same host as "example.org").
+    """
+    h1, h2 = get_host(url1), get_host(url2)
+    if not h1 or not h2:
+        return False
+    return _host_prefix_re.sub('', h1) == _host_prefix_re.sub('', h2)
+
+
+def same_site(url1, url2):
+    """
+    Returns True if both URLs belong to the same registered domain.
+    """
+    d1 = registered_domain(url1)
+    return d1 is not None and d1 == registered_domain(url2)
+
+
+class BloomFilter(object):
+    """
+    Bloom filter of strings. Memory usage depends only on the capacity and
+    the error rate (about 1.2 MB for million of items and 1% of false
+    positives). False positives are possible, false negatives are not.
+    """
+    def __init__(self, capacity=100000, error_rate=0.01):
+        if not 0 < error_rate < 1:
+            raise ValueError("error_rate has to be between 0 and 1")
+        self.capacity = capacity
+        self.error_rate = error_rate
+        self.nbits = int(math.ceil(-capacity * math.log(error_rate) / (math.log(2) ** 2)))
+        self.nhashes = max(1, int(round(math.log(2) * self.nbits / capacity)))
+        self._bits = bytearray((self.nbits + 7) // 8)
+        self._count = 0
+
+
+    def _positions(self, item):
+        # double hashing: h1 + i*h2 (Kirsch-Mitzenmacher)
+        h1, h2 = struct.unpack('<QQ', hashlib.md5(item).digest())
+        nbits = self.nbits
+        return [(h1 + i * h2) % nbits for i in xrange(self.nhashes)]
+
+
+    def add(self, item):
+        """
+        Adds item into the filter. Returns True if the item was not there yet.
+        """
+        new = False
+        bits = self._bits
+        for pos in self._positions(item):
+            mask = 1 << (pos & 7)
+            if not bits[pos >> 3] & mask:
+                bits[pos >> 3] |= mask
+                new = True
+        if new:
+            self._count += 1
+        return new
+
+
+    def __contains__(self, item):
+        bits = self._bits
+        for pos in self._positions(item):
+            if not bits[pos >> 3] & (1 << (pos & 7)):
+                return False
+        return True
+
+
+    def __len__(self):
+        return self._count
+
+#-------------------------------------------------------------------------------
+# End of class BloomFilter
+#-------------------------------------------------------------------------------
+
+
+class URLSeenSet(object):
+    """
+    Set of visited URLs for crawler frontiers. URLs are identified by url_key()
+    so that different spellings of one page are considered identical.
+
+    By default only 64-bit hashes of the keys are stored (collision
+    probability is negligible for crawls of millions of pages). With
+    bloom=True, the set is backed by a BloomFilter of given capacity and
+    error rate, which uses even less memory, but may claim a new URL as seen
+    with probability error_rate. With fold_slash=True, URLs differing only
+    in the trailing slash are identical (see url_key()).
+    """
+    def __init__(self, urls=(), bloom=False, capacity=100000, error_rate=0.001,
+                 fold_slash=False):
+        self.fold_slash = fold_slash
+        if bloom:
+            self._filter = BloomFilter(capacity, error_rate)
+            self._hashes = None
+        else:
+            self._filter = None
+            self._hashes = set()
+        for url in urls:
+            self.add(url)
+
+
+    def _hash(self, key):
+        return struct.unpack('<q', hashlib.md5(key).digest()[:8])[0]
+
+
+    def add(self, url, base=None):
+        """
+        Adds the URL into the set. Returns True if the URL wasn't seen yet,
+        False if it was (or if it's not an URL of a page).
+        """
+        key = url_key(url, base, self.fold_slash)
+        if key is None:
+            return False
+        if self._filter is not None:
+            return self._filter.add(key)
+        h = self._hash(key)
+        if h in self._hashes:
+            return False
+        self._hashes.add(h)
+        return True
+
+
+    def __contains__(self, url):
+        key = url_key(url, fold_slash=self.fold_slash)
+        if key is None:
+            return False
+        if self._filter is not None:
+            return key in self._filter
+        return self._hash(key) in self._hashes
+
+
+    def __len__(self):
+        if self._filter is not None:
+            return len(self._filter)
+        return len(self._hashes)
+
+#-------------------------------------------------------------------------------
+# End of class URLSeenSet
+#-------------------------------------------------------------------------------
+
+
+def unique_urls(urls, base=None):
+    """
+    Returns list of URLs with duplicates (URLs with the same url_key()) and
+    URLs which can't be fetched removed. The first spelling of every page is
+    returned as it is (joined with the base, if given), in the original order.
+    """
+    seen = URLSeenSet()
+    result = []
+    for url in urls:
+        if base is not None and url:
+            url = urljoin(base, url.strip())
+        if seen.add(url):
+            result.append(url)
+    return result
+
+
+if __name__ == "__main__":
+    for u in ("HTTP://WWW.Example.org:80/a/./b/../c/?utm_source=x&b=2&a=1#frag",
+              "http://www.example.org/a/c", "/a/c/#top", "mailto:x@example.org",
+              "www.example.org/%7euser/page with space.html"):
+        print u, "->", canonicalize(u, "http://www.example.org/"), url_key(u, "http://www.example.org/", True)
+    print registered_domain("http://www.fit.vutbr.cz/"), registered_domain("www.cs.ox.ac.uk")
+    s = URLSeenSet(fold_slash=True)
+    print s.add("http://example.org/a"), s.add("http://example.org/a/"), s.add("http://EXAMPLE.org/a#x")
+    b = URLSeenSet(bloom=True, capacity=1000, fold_slash=True)
+    print b.add("http://example.org/a"), b.add("http://example.org/a/"), "http://example.org/a" in b
@@ -13,6 +13,8 @@ import urlparse
 
 sys.path.insert(0, 'deliv2')
 import deliverables 
+from rrslib.web.separsers import MultiPageSearch, SearchResultCache
+from rrslib.web.urltools import registered_domain
 
 deliv_options = {
         'debug' : False,
@@ -25,6 +27,12 @@ deliv_options = {
         'lookup_page' : False,
     }
 
+# search engine and number of pages of results used to find web sites of
+# projects which are not linked from CORDIS
+WEB_SEARCH_ENGINE = 'bing'
+WEB_SEARCH_PAGES = 2
+webSearch = None
+
 def findDeliverables2(aUrl):
     # give the link to the rrs_deliverables2 to find the page containing deliverables
     mdeliv = deliverables.Deliverables(deliv_options, aUrl)
@@ -60,3 +68,59 @@ def findDeliverables2(aUrl):
 
     return (page, links)
 
+def hostNames(aHost):
+    '''
+    Returns names in host name which can be a project acronym: labels of the
+    host without the public suffix and "www", their parts separated by
+    hyphens and the labels without hyphens (www.e-content.ac.uk: e-content,
+    e, content, econtent).
+    '''
+
+    host = aHost.lower().rstrip(".")
+    domain = registered_domain(host) or host
+    labels = host.split(".")
+    suffix = len(domain.split(".")) - 1
+    if suffix and len(labels) > suffix:
+        labels = labels[:-suffix]
+    names = set()
+    for label in labels:
+        names.add(label)
+        names.add(label.replace("-", ""))
+        names.update(label.split("-"))
+    names.discard("www")
+    names.discard("")
+    return names
+
+def findProjectWeb(aAbbr, aTitle=None, aSearch=None):
+    '''
+    Searches for the web site of a project which is not linked from CORDIS.
+    Returns URL of the first hit whose host name contains the project acronym
+    as a whole name (see hostNames()), or None. Pages of results are downloaded concurrently and cached on disk
+    (see rrslib.web.separsers.MultiPageSearch).
+    '''
+
+    global webSearch
+    name = re.sub(r'[^a-z0-9]', '', aAbbr.lower())
+    if not name:
+        return None
+    if aSearch is None:
+        if webSearch is None:
+            webSearch = MultiPageSearch(WEB_SEARCH_ENGINE, WEB_SEARCH_PAGES, SearchResultCache())
+        aSearch = webSearch
+    query = aAbbr
+    if aTitle:
+        query += " " + aTitle
+
+    try:
+        for hit in aSearch.search(query):
+            url = hit.get('url')
+            host = urlparse.urlsplit(url or "").hostname or ""
+            # CORDIS and other EU portals mention every project
+            if host.endswith("europa.eu"):
+                continue
+            if name in hostNames(host):
+                return url
+    except Exception as e:
+        print "Error occurent during project web search:"
+        print e
+    return None
@@ -0,0 +1,242 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+#------------        Autori: Martin Cvicek, Lucie Dvorakova      -------------#
+#----------------           Loginy: xcvice01, xdvora1f         ---------------#
+#-- Rozšíření portálu evropských výzkumných projektů o pokročilé vyhledávání -#
+#----------------- Automaticky aktualizovaný webový portál -------------------#
+#------------------- o evropských výzkumných projektech ----------------------#
+
+# Volitelna extrakce entit (osoby, organizace, mista, projekty, e-maily, data)
+# z textu deliverables pomoci rrslib EntityExtractor.
+
+# // Pool(), cpu_count()
+import multiprocessing
+
+# // time()
+import time
+
+import sys
+
+from common import *
+
+sys.path.insert(0, 'deliv2')
+
+# default time budget for one deliverable (seconds)
+DEFAULT_TIME_BUDGET = 60
+
+# names of indexed fields (see deliv_mapping in initializedb.py)
+FIELDS = \
+{
+    "persons":          "deliv_persons",
+    "organizations":    "deliv_organizations",
+    "locations":        "deliv_locations",
+    "projects":         "deliv_projects",
+    "emails":           "deliv_emails",
+    "dates":            "deliv_dates",
+    "years":            "deliv_years"
+}
+FIELD_STATUS    = "deliv_entities_status"
+FIELD_TIME      = "deliv_entities_time"
+
+STATUS_OK       = "ok"
+STATUS_TIMEOUT  = "timeout"
+STATUS_ERROR    = "error"
+
+# configuration of the stage (see enable())
+config = {
+    'enabled':      False,
+    'workers':      None,
+    'timeBudget':   DEFAULT_TIME_BUDGET
+}
+
+# pool of workers, created on the first use
+pool = None
+
+# stream extractor of the process, created on the first use (see getStream())
+stream = None
+
+
+def enable(workers=None, timeBudget=DEFAULT_TIME_BUDGET):
+    '''
+    Turns the extraction stage on. Dictionaries of the extractor are loaded
+    here, before the workers are forked, so the workers share them. Returns
+    False (and the stage stays off) if the extractor cannot be created.
+    '''
+
+    try:
+        getStream()
+    except Exception as e:
+        err("Entity extractor cannot be created, extraction is disabled!")
+        err(str(e))
+        return False
+    config['enabled'] = True
+    config['workers'] = workers or multiprocessing.cpu_count()
+    config['timeBudget'] = timeBudget
+    return True
+
+def isEnabled():
+    return config['enabled']
+
+def getStream():
+    '''
+    Returns StreamEntityExtractor of this process. It is created on the first
+    call (in enable() before the workers are forked, so they inherit it) and
+    reused for all deliverables.
+    '''
+
+    global stream
+    if stream == None:
+        from rrslib.extractors import entityextractor as ee
+        from rrslib.extractors.streamextractor import StreamEntityExtractor
+        stream = StreamEntityExtractor([ee.AUTHOR, ee.ORGANIZATION, ee.LOCATION, \
+            ee.PROJECT, ee.EMAIL, ee.PUBLISHED_DATE])
+    return stream
+
+def close():
+    '''
+    Stops workers of the pool.
+    '''
+
+    global pool
+    if pool != None:
+        pool.close()
+        pool.join()
+        pool = None
+
+def _append(aList, aValue):
+    if aValue and aValue not in aList:
+        aList.append(aValue)
+
+def _location(aLocation):
+    parts = []
+    for attr in ('name', 'address', 'city', 'country'):
+        _append(parts, aLocation.get(attr))
+    return ", ".join(parts)
+
+def _date(aDate):
+    '''
+    Returns complete date as yyyy-mm-dd. Dates without month or day (e.g.
+    "2009", "May 2009") are not dates of one day, only their year is indexed
+    (see _year()).
+    '''
+
+    if aDate.get('year') == None or aDate.get('month') == None or \
+        aDate.get('day') == None:
+        return None
+    return "%04d-%02d-%02d" % (aDate.get('year'), aDate.get('month'), \
+        aDate.get('day'))
+
+def _year(aDate):
+    return aDate.get('year')
+
+def _fields(aFound):
+    '''
+    Converts entities found by StreamEntityExtractor to lists of strings
+    (years are numbers).
+    '''
+
+    from rrslib.extractors import entityextractor as ee
+
+    result = dict((name, []) for name in FIELDS)
+    for person in aFound.get(ee.AUTHOR, []):
+        _append(result["persons"], person.get('full_name'))
+    for organization in aFound.get(ee.ORGANIZATION, []):
+        _append(result["organizations"], organization.get('title'))
+    for location in aFound.get(ee.LOCATION, []):
+        _append(result["locations"], _location(location))
+    for project in aFound.get(ee.PROJECT, []):
+        _append(result["projects"], project.get('title') or project.get('acronym'))
+    for email in aFound.get(ee.EMAIL, []):
+        _append(result["emails"], str(email))
+    for date in aFound.get(ee.PUBLISHED_DATE, []):
+        _append(result["dates"], _date(date))
+        _append(result["years"], _year(date))
+    return result
+
+def extractEntities(aText, aTimeBudget=DEFAULT_TIME_BUDGET):
+    '''
+    Extracts entities from text of one deliverable in this process (text is
+    processed in windows by StreamEntityExtractor). Returns document fields
+    (see FIELDS) with lists of strings, status of extraction and its time.
+    The time budget is checked between windows: when it runs out, entities
+    of already processed windows are returned with status "timeout".
+    '''
+
+    from rrslib.extractors.streamextractor import DeadlineExceeded
+
+    start = time.time()
+    found = {}
+    status = STATUS_OK
+    deadline = None
+    if aTimeBudget:
+        deadline = start + aTimeBudget
+    try:
+        getStream().extract(aText or "", found, deadline)
+    except DeadlineExceeded:
+        status = STATUS_TIMEOUT
+    except Exception as e:
+        err("Entity extraction ended with an error!")
+        err(str(e))
+        status = STATUS_ERROR
+
+    fields = dict((FIELDS[name], values) for (name, values) in _fields(found).items())
+    fields[FIELD_STATUS] = status
+    fields[FIELD_TIME] = time.time() - start
+    return fields
+
+def _worker(aItem):
+    (key, text, timeBudget) = aItem
+    return (key, len(text or ""), extractEntities(text, timeBudget))
+
+def extractMany(aItems, aStats=None):
+    '''
+    Extracts entities from (key, text) items in the pool of workers. Yields
+    (key, fields) in order of completion. If aStats is given, it is updated
+    (see Stats).
+    '''
+
+    global pool
+    if pool == None:
+        pool = multiprocessing.Pool(config['workers'])
+    budget = config['timeBudget']
+    work = [ (key, text, budget) for (key, text) in aItems ]
+    for (key, length, fields) in pool.imap_unordered(_worker, work):
+        if aStats != None:
+            aStats.add(length, fields)
+        yield (key, fields)
+
+class Stats:
+    '''
+    Metriky propustnosti extrakce.
+    '''
+
+    def __init__(self):
+        self.start = time.time()
+        self.docs = 0
+        self.chars = 0
+        self.extractTime = 0.0
+        self.maxTime = 0.0
+        self.status = { STATUS_OK: 0, STATUS_TIMEOUT: 0, STATUS_ERROR: 0 }
+
+    def add(self, aChars, aFields):
+        self.docs += 1
+        self.chars += aChars
+        self.extractTime += aFields[FIELD_TIME]
+        self.maxTime = max(self.maxTime, aFields[FIELD_TIME])
+        self.status[aFields[FIELD_STATUS]] += 1
+
+    def elapsed(self):
+        return time.time() - self.start
+
+    def report(self):
+        elapsed = max(self.elapsed(), 1e-6)
+        info("Entity extraction: %d documents, %d characters in %.1f s" % \
+            (self.docs, self.chars, elapsed))
+        info("  %.2f documents/s, %.0f characters/s, %d workers" % \
+            (self.docs / elapsed, self.chars / elapsed, config['workers'] or 0))
+        if self.docs:
+            info("  document time: mean %.2f s, max %.2f s" % \
+                (self.extractTime / self.docs, self.maxTime))
+        info("  ok: %d, timeout: %d, error: %d" % (self.status[STATUS_OK], \
+            self.status[STATUS_TIMEOUT], self.status[STATUS_ERROR]))
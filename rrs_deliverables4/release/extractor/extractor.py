@@ -9,6 +9,7 @@
 
 import re
 from project import *
+import entities
 
 # ArgumentParser class
 import argparse
@@ -96,7 +97,7 @@ def getProjectURLs(aURL, aDate1, aDate2):
 
     return project_info
 
-def indexProject(aURL):
+def indexProject(aURL, aSearchWeb=False):
     '''
     Don't understand why it is here. But we change url and this check is no more
     valid
@@ -108,17 +109,17 @@ def indexProject(aURL):
     rcn = rcn.group(1)
     '''
     proj = Project(aURL)
-    proj.fillData()
+    proj.fillData(searchWeb=aSearchWeb)
     proj.normalizeData()
     proj.printData()
     proj.indexData()
 
-def indexProjects(aFile):
+def indexProjects(aFile, aSearchWeb=False):
     with open(aFile, "r") as fin:
         urls = fin.readlines()
 
     for url in urls:
-        indexProject(url.strip())
+        indexProject(url.strip(), aSearchWeb)
 
 def findProjects(aFile, aBaseUrl, aFrom, aTo, my_switch):
     global switch
@@ -181,22 +182,45 @@ def main():
         help="A file containing urls of projects to update (one per line)")
     group_me.add_argument("-e", "--ext-delivs", dest="ext", action="store_true", \
         default=False, help="Tries to find deliverables at project sites")
+    group_me.add_argument("-b", "--backfill-entities", dest="backfill", action="store_true", \
+        default=False, help="Extracts entities from already indexed deliverables (implies -x)")
     parser.add_argument('-r', '--refresh-interval', nargs=2, type=getDate, \
         help='Determines date interval (dates should be formatted as DD/MM/YYYY)')
+    parser.add_argument("-x", "--extract-entities", dest="entities", action="store_true", \
+        default=False, help="Extracts entities (persons, organizations, ...) from deliverables")
+    parser.add_argument("-w", "--search-web", dest="searchweb", action="store_true", \
+        default=False, help="Searches webs of projects not linked from Cordis by a search engine")
+    parser.add_argument("--workers", type=int, default=None, \
+        help="Number of entity extraction workers (default: number of CPUs)")
+    parser.add_argument("--time-budget", dest="budget", type=int, \
+        default=entities.DEFAULT_TIME_BUDGET, \
+        help="Maximal time of entity extraction from one deliverable (seconds)")
+    parser.add_argument("--window", type=int, default=None, \
+        help="Time window of --backfill-entities (minutes)")
     args = parser.parse_args()
 
     debug(args.url)
     debug(args.refresh_interval)
     debug(args.ext)
 
+    if args.entities or args.backfill:
+        if not entities.enable(args.workers, args.budget):
+            return
+
     if args.url != None:
         findProjects(DEFAULT_PROJECT_LIST_FILENAME, args.url[0], \
             args.refresh_interval[0], args.refresh_interval[1])
-        indexProjects(DEFAULT_PROJECT_LIST_FILENAME)
+        indexProjects(DEFAULT_PROJECT_LIST_FILENAME, args.searchweb)
     elif args.file != None:
-        indexProjects(args.file[0])
+        indexProjects(args.file[0], args.searchweb)
     elif args.ext: # (i.e., not None or False)
         Project.updateExtDelivs(args.refresh_interval[0], args.refresh_interval[1])
+    elif args.backfill:
+        window = None
+        if args.window != None:
+            window = args.window * 60
+        Project.updateEntities(window)
+    entities.close()
 
 if __name__ == "__main__":
     main()
@@ -96,6 +96,15 @@ deliv_mapping = {
             "deliv_url":        {"type":"string"},
             "deliv_article":    {"type":"string"},
             "deliv_extraInfo":  {"type":"string"},
+            "deliv_persons":    {"type":"string",   'analyzer'  : 'analyzer_keyword'},
+            "deliv_organizations": {"type":"string", 'analyzer' : 'analyzer_keyword'},
+            "deliv_locations":  {"type":"string",   'analyzer'  : 'analyzer_keyword'},
+            "deliv_projects":   {"type":"string",   'analyzer'  : 'analyzer_keyword'},
+            "deliv_emails":     {"type":"string",   'index'     : 'not_analyzed'},
+            "deliv_dates":      {"type":"date",     "format"    : "dateOptionalTime"},
+            "deliv_years":      {"type":"integer"},
+            "deliv_entities_status": {"type":"string", 'index'  : 'not_analyzed'},
+            "deliv_entities_time": {"type":"float"},
             "endDate":          {"type":"date",     "format"    : "dateOptionalTime"},
             "euCon":            {"type":"string"},
             "fundedUnder":      {"type":"string"},
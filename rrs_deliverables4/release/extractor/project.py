@@ -9,6 +9,7 @@
 
 from common import *
 from delivs import *
+import entities
 
 import re
 from elasticsearch import Elasticsearch
@@ -20,6 +21,22 @@ IDXDELIV    = "xcvice01_deliverables"
 DOCTYPE     = "data"
 URL_BASE    = "http://cordis.europa.eu/project/rcn/"
 
+# size of a page of deliverables processed by updateEntities()
+ENTITIES_PAGE = 100
+
+def extractDelivEntities(aPdfs):
+    '''
+    Returns entity fields of deliverables (deliv_id -> fields), if entity
+    extraction is enabled (see entities.enable()).
+    '''
+
+    if not entities.isEnabled():
+        return {}
+    stats = entities.Stats()
+    found = dict(entities.extractMany([ (pdf[0], pdf[3]) for pdf in aPdfs ], stats))
+    stats.report()
+    return found
+
 class Project:
     '''
     Objekt obsahujici potrebna data do databaze.
@@ -72,9 +89,11 @@ class Project:
         # Ziskavani cisla projektu (rcn)
         self.rcn = re.search( self.reMap['rcn'], self.url).group(1)
 
-    def fillData(self, getExternalDelivs=True):
+    def fillData(self, getExternalDelivs=True, searchWeb=False):
         '''
-        Otevirani projektu a ziskavani jeho HTML.
+        Otevirani projektu a ziskavani jeho HTML. If searchWeb is True, web
+        of the project which is not linked from CORDIS is searched for by a
+        search engine (see findProjectWeb()).
         '''
 
         url = URL_BASE + self.url + '.html'
@@ -254,27 +273,33 @@ class Project:
             if web:
                 self.origWeb = web.group(1)
 
-                if getExternalDelivs:
-                    # Use RRS Deliverables to find links to third party deliverables
-                    delivs = findDeliverables2(self.origWeb)
-
-                    nextok = 0
-                    # Try to download the newly found deliverables
-                    for (pdf_title, pdf_url) in delivs[1]:
-                        # Stahnuti deliverable a jeho konverze
-                        txt = None
-                        info("Attempt to download: %s" % pdf_url)
-                        if downloadFile(pdf_url, "./tmp.pdf"):
-                            txt = pdf2txt("./tmp.pdf")
-                            if txt != None:
-                                numHash = computeHash(txt)
-                                self.pdf += [( numHash, pdf_title, pdf_url, txt )]
-                                nextok += 1
-
-                    nextfound = len(delivs[1])
-                    self.delivWeb = delivs[0] 
-                    self.nExtDelivs = nextfound
-                    self.nExtDelivsOk = nextok
+        if getExternalDelivs and searchWeb and not self.origWeb and self.abbr:
+            # Project web is not linked from CORDIS, try to find it by a search engine
+            self.origWeb = findProjectWeb(self.abbr, self.title)
+            if self.origWeb:
+                info("Project web found by search engine: %s" % self.origWeb)
+
+        if getExternalDelivs and self.origWeb:
+            # Use RRS Deliverables to find links to third party deliverables
+            delivs = findDeliverables2(self.origWeb)
+
+            nextok = 0
+            # Try to download the newly found deliverables
+            for (pdf_title, pdf_url) in delivs[1]:
+                # Stahnuti deliverable a jeho konverze
+                txt = None
+                info("Attempt to download: %s" % pdf_url)
+                if downloadFile(pdf_url, "./tmp.pdf"):
+                    txt = pdf2txt("./tmp.pdf")
+                    if txt != None:
+                        numHash = computeHash(txt)
+                        self.pdf += [( numHash, pdf_title, pdf_url, txt )]
+                        nextok += 1
+
+            nextfound = len(delivs[1])
+            self.delivWeb = delivs[0] 
+            self.nExtDelivs = nextfound
+            self.nExtDelivsOk = nextok
 
         prog_done = False
         if self.fundedUnder:
@@ -462,6 +487,7 @@ class Project:
 
         # Then, index its deliverables. Database is intentionally denormalized.
         if self.pdf:
+            found = extractDelivEntities(self.pdf)
             for pdf in self.pdf:
                 doc = project.copy()
                 doc["deliv_id"] = pdf[0]
@@ -469,6 +495,7 @@ class Project:
                 doc["deliv_url"] = pdf[2]
                 doc["deliv_article"] = pdf[3]
                 doc["deliv_extraInfo"] = ""
+                doc.update(found.get(pdf[0], {}))
                 try:
                     es.index(index=IDXDELIV, doc_type=DOCTYPE, id=doc["deliv_id"], body=doc)
                 except Exception as e:
@@ -552,6 +579,7 @@ class Project:
 
                 # Then, index its deliverables. Database is intentionally denormalized.
                 if pdfs:
+                    found = extractDelivEntities(pdfs)
                     for pdf in pdfs:
                         doc = proj.copy()
                         doc["deliv_id"] = pdf[0]
@@ -559,6 +587,7 @@ class Project:
                         doc["deliv_url"] = pdf[2]
                         doc["deliv_article"] = pdf[3]
                         doc["deliv_extraInfo"] = ""
+                        doc.update(found.get(pdf[0], {}))
                         try:
                             es.index(index=IDXDELIV, doc_type=DOCTYPE, id=doc["deliv_id"], body=doc)
                         except Exception as e:
@@ -566,3 +595,51 @@ class Project:
                             err(str(e))
                             # Try to index remaing deliverables ...
                             #return False
+
+    @classmethod
+    def updateEntities(cls, aWindow=None, aPage=ENTITIES_PAGE):
+        '''
+        Extracts entities from deliverables which were indexed without them
+        (back catalogue). Deliverables are read page by page and processed
+        by workers of entities module; no new page is started after aWindow
+        seconds, remaining deliverables are processed by the next run.
+        '''
+
+        if not entities.isEnabled():
+            err("Entity extraction is not enabled!")
+            return
+
+        # Connection to ElasticSearch database
+        try:
+            es = Elasticsearch(host=HOST, port=PORT)
+        except Exception as e:
+            err("Connection to ElasticSearch cannot be established!")
+            err(str(e))
+            return
+
+        qbody = {
+                "_source" : [ "deliv_article" ],
+                "filter" : {
+                    "missing" : { "field" : entities.FIELD_STATUS }
+                }
+        }
+
+        stats = entities.Stats()
+        results = es.search(index=IDXDELIV, doc_type=DOCTYPE, body=qbody, \
+            scroll="30m", size=aPage)
+        info("Deliverables without entities: %d" % results["hits"]["total"])
+        while results["hits"]["hits"]:
+            hits = results["hits"]["hits"]
+            items = [ (hit["_id"], hit["_source"].get("deliv_article")) for hit in hits ]
+            for (delivId, fields) in entities.extractMany(items, stats):
+                try:
+                    es.update(index=IDXDELIV, doc_type=DOCTYPE, id=delivId, \
+                        body={ "doc": fields })
+                except Exception as e:
+                    err("Deliverable update ended with an error!")
+                    err(str(e))
+            stats.report()
+            if aWindow != None and stats.elapsed() > aWindow:
+                warn("Time window exceeded, remaining deliverables are left for the next run.")
+                break
+            results = es.scroll(scroll_id=results["_scroll_id"], scroll="30m")
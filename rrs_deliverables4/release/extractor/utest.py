@@ -10,9 +10,44 @@ import unittest
 import random
 import string
 import os
+import ast
+import cPickle
+import shutil
+import tempfile
+import threading
+import time
+import urlparse
+import BaseHTTPServer
+import warnings
 from common import *
 from project import *
 from delivs import *
+import entities
+from rrslib.extractors.normalize import TextCleaner, Normalize
+from rrslib.extractors.extractorbenchmark import _RegexTextCleaner, _RegexNormalize, \
+    _citations, _publications, _FullScanChapterWrapper
+from rrslib.extractors.citationentityextractor import CitationEntityExtractor
+from rrslib.extractors.documentwrapper import DocumentWrapper, _ChapterWrapper
+from rrslib.dictionaries.rrsdictionary import RRSDictionary, RRSDictionaryError, \
+    BNC_LEMMATISED, NON_NAMES, CITIES, NAME_FF_CZ, NAME_SF_CZ, CASE_SENSITIVE, \
+    CASE_INSENSITIVE, FIRST_UPPER, ADD
+from rrslib.dictionaries.rrskeyindex import normalize as normalize_key
+from rrslib.dictionaries.rrsdictcreator import RRSDictionaryCreator, DTYPE_DICT, \
+    convert_to_binary
+from rrslib.dictionaries.rrsbinary import BinaryDictionary
+from rrslib.dictionaries.rrsfrequency import FrequencyDictionary
+from rrslib import dictionaries
+from rrslib.dictionaries import rrsregistry
+from rrslib.others.pattern import memoized, lazy
+from rrslib.web.entities import decode_htmlentities
+from rrslib.web.urltools import canonicalize, url_key, unique_urls, URLSeenSet
+from rrslib.web.separsers import MultiPageSearch, SearchResultCache
+from rrslib.web.crawler import GetHTMLPage
+from rrslib.extractors import streamextractor
+from rrslib.extractors import entityextractor as ee
+from rrslib.extractors.rrsspans import SpanSet
+from rrslib.db.model import RRSPerson, RRSOrganization, RRSLocation, RRSProject, RRSEmail, \
+    RRSDateTime
 
 TPDF = "./test_tmp.pdf"
 TPDFLINK = "http://decipher-research.eu/sites/decipherdrupal/files/decipher_presentation_version_01_1.pdf"
@@ -71,6 +106,974 @@ class TestCommon(unittest.TestCase):
         self.assertTrue(os.path.exists(TPDF))
         os.remove(TPDF)
 
+def normalizeRegex(aText):
+    '''
+    Previous implementation of normalize() (full-text re.sub() passes).
+    '''
+
+    txt = re.sub(r'\s|\.\s*\.\s*\.\s*[\.\s*]+|-\s*-\s*-\s*[-\s*]+', " ", aText)
+    txt = re.sub(r'\\[ntr]', " ", txt)
+    txt = re.sub(r'<[^>]+>', "", txt)
+    txt = re.sub(r'&lt;[^&]+&gt;', "", txt)
+    txt = re.sub(r'&[^ ]+;', " ", txt)
+    txt = re.sub(r'\s+', " ", txt)
+    txt = re.sub(r'(\w)- (\w)', r'\1\2', txt)
+    return txt
+
+def randomText(aPieces, aLength):
+    return "".join([ random.choice(aPieces) for _ in range(aLength) ])
+
+# pieces of texts of normalization tests: markup, white and control characters,
+# wrongly decoded UTF-8 (ligatures, umlauts, quotes, dashes), national characters
+COMMON_PIECES = ["word", "x1", " ", "\t", "\n", "\r", "\x0b", "\x0c", "\x1c", ".", "-", "*",
+    "\\", "n", "<", ">", "&", ";", "&lt;", "&gt;", "&#149;", "- ", "_", "\xc3\xa9"]
+CLEANER_PIECES = [u"a", u"Z", u"word", u" ", u"\t", u"\n", u"\r", u"\x0b", u"\x0c", u"\xa0", u'"',
+    u"'", u"`", u"-", u".", u"\x00", u"\x01", u"\x7f", u"\x80", u"\xa8", u"\u2013", u"\u0130",
+    u"\u212a", u"\xef\xac\x81", u"\xef\xac\x84", u"\xef\xac", u"\xc0\xa8", u"\xcc\xa8",
+    u"\xc2\xa8", u"\xc2\xb4", u"\xc2\xac", u"\xe2\x80\x98", u"\xe2\x80\x94", u"\xe2\x88\x92",
+    u"\xe2\x80", u"\xe1", u"\u011b", u"\u0161", u"\u014a", u"\xd8", u"\xc4", u"\xef", u"\xff"]
+
+class TestNormalization(unittest.TestCase):
+    def test_Normalize_Equivalence(self):
+        for i in range(2000):
+            text = randomText(COMMON_PIECES, random.randint(0, 60))
+            self.assertEqual(normalize(text), normalizeRegex(text))
+            text = text.decode("utf-8")
+            self.assertEqual(normalize(text), normalizeRegex(text))
+
+    def test_Normalize_Megabyte(self):
+        text = randomText(COMMON_PIECES, 300000)
+        self.assertEqual(normalize(text), normalizeRegex(text))
+
+    def test_TextCleaner_Equivalence(self):
+        cleaner = TextCleaner()
+        regexCleaner = _RegexTextCleaner()
+        for i in range(2000):
+            text = randomText(CLEANER_PIECES, random.randint(0, 60))
+            exp = regexCleaner.clean_text(text)
+            utf8 = text.encode("utf-8")
+            self.assertEqual(cleaner.clean_text(text), exp)
+            self.assertEqual(cleaner.clean_text(utf8), exp)
+            self.assertEqual("".join(cleaner.clean_stream(text, 7)), exp)
+            parts = [ utf8[j:j + 3] for j in range(0, len(utf8), 3) ]
+            self.assertEqual("".join(cleaner.clean_stream(parts, 7)), exp)
+
+    def test_Normalize_National(self):
+        for i in range(2000):
+            text = randomText(CLEANER_PIECES, random.randint(0, 60))
+            for txt in (text, text.encode("utf-8")):
+                self.assertEqual(Normalize.translate_national(txt),
+                    _RegexNormalize.translate_national(txt))
+                self.assertEqual(Normalize._white_space_fix(txt),
+                    _RegexNormalize._white_space_fix(txt))
+
+    def test_DecodeEntities_Unicode(self):
+        # unicode is returned with or without entities
+        for text in ("Work package 2", "Work&nbsp;package 2", "Pr\xc3\xa1ce", "Pr\xe1ce",
+                     u"Pr\xe1ce", u"Pr\xe1ce &amp; v\xfdzkum"):
+            self.assertTrue(isinstance(decode_htmlentities(text), unicode))
+            self.assertTrue(isinstance(decode_htmlentities(text, simplify=True), unicode))
+        self.assertEqual(decode_htmlentities("Pr\xc3\xa1ce"), u"Pr\xe1ce")
+        self.assertEqual(decode_htmlentities("Pr\xe1ce"), u"Pr\xe1ce")
+        self.assertEqual(decode_htmlentities("D1 &amp; D2"), u"D1 & D2")
+        self.assertEqual(decode_htmlentities(None), None)
+
+DICTIONARIES = os.path.dirname(os.path.abspath(dictionaries.__file__))
+
+def copyDictionary(aName):
+    '''
+    Copies pickled dictionary into temporary directory, returns its path.
+    '''
+
+    path = os.path.join(tempfile.mkdtemp(), aName)
+    shutil.copytree(os.path.join(DICTIONARIES, aName), path)
+    return path
+
+OLD_BOUNDARY_BEFORE = r'(?<![a-zA-Z0-9\-])('
+OLD_BOUNDARY_AFTER = r')(?![a-zA-Z0-9\-])'
+
+def isUtf8(aText):
+    try:
+        aText.decode("utf-8")
+        return True
+    except UnicodeDecodeError:
+        return False
+
+def oldKeysPatterns(aName):
+    '''
+    Returns regular expression of keys compiled by older versions of the
+    dictionary (keys_compiled.rrsdict) and the same expression with
+    semantics of rrsmatcher: the longest key wins, boundary on both sides.
+    '''
+
+    with open(os.path.join(DICTIONARIES, aName, "keys_compiled.rrsdict"), "rb") as fin:
+        old = cPickle.load(fin)
+    body = old.pattern[len(OLD_BOUNDARY_BEFORE):]
+    if body.endswith(OLD_BOUNDARY_AFTER):
+        body = body[:-len(OLD_BOUNDARY_AFTER)]
+    else:
+        body = body[:-1]
+    keys = sorted(re.split(r'(?<!\\)\|', body), key=len, reverse=True)
+    return old, re.compile(OLD_BOUNDARY_BEFORE + "|".join(keys) + OLD_BOUNDARY_AFTER, old.flags)
+
+def levenshtein(aFirst, aSecond):
+    row = range(len(aSecond) + 1)
+    for i in range(1, len(aFirst) + 1):
+        new = [i]
+        for j in range(1, len(aSecond) + 1):
+            new.append(min(new[j - 1] + 1, row[j] + 1,
+                row[j - 1] + (aFirst[i - 1] != aSecond[j - 1])))
+        row = new
+    return row[-1]
+
+NOVAKOVA = ["Novakov\xc3\x81", "Nov\xc3\x81kov\xc3\x81"]
+
+class TestDictionaries(unittest.TestCase):
+    def test_Binary_NestedValues(self):
+        # translations of BNC homographs are nested lists
+        path = copyDictionary(BNC_LEMMATISED)
+        try:
+            binary = BinaryDictionary(convert_to_binary(path))
+            pickled = RRSDictionary(BNC_LEMMATISED)
+            for key in pickled.get_keys():
+                self.assertEqual(binary.translate(key), pickled.translate(key))
+            self.assertEqual(binary.translate("force"), ['23785', 'n', ['12606', 'v']])
+        finally:
+            shutil.rmtree(os.path.dirname(path))
+
+    def test_Creator_NestedValues(self):
+        # dictionary created from rows of BNC dictionary (sorted in more runs)
+        pickled = RRSDictionary(BNC_LEMMATISED)
+        tmp = tempfile.mkdtemp()
+        try:
+            source = os.path.join(tmp, "bnc.txt")
+            with open(source, "w") as fout:
+                for key in pickled.get_keys():
+                    fout.write("%s\t%r\n" % (key, pickled.translate(key)))
+            creator = RRSDictionaryCreator(source, os.path.join(tmp, "bnc"), DTYPE_DICT)
+            creator.set_parser(lambda row: (row.split("\t")[0], ast.literal_eval(row.split("\t")[1])))
+            creator.create(showprogress=False, run_size=500, tmpdir=tmp)
+            binary = BinaryDictionary(os.path.join(tmp, "bnc", "dict.rrsbin"))
+            for key in pickled.get_keys():
+                self.assertEqual(binary.translate(key), pickled.translate(key))
+        finally:
+            shutil.rmtree(tmp)
+
+    def test_TextSearch_OldRegex(self):
+        # more-word dictionaries with expressions compiled by older versions
+        random.seed(2)
+        for name in ("city2country", "city2woeid", "non_names", "project_acronym2title",
+                     "universities"):
+            d = RRSDictionary(name)
+            self.assertFalse(d.is_simplekeys())
+            old, longest = oldKeysPatterns(name)
+            keys = random.sample(list(d.get_keys()), 500)
+            # lines are decoded from utf-8 or latin-1 (some dictionaries have
+            # latin-1 keys), keys in one line have the same encoding
+            encoded = {}
+            for key in keys:
+                encoded.setdefault(isUtf8(key), []).append(key)
+            lines = []
+            for key in keys:
+                words = [key, "and", "x" + key, key + "-y",
+                         key + " " + random.choice(encoded[isUtf8(key)])]
+                if old.flags & re.IGNORECASE and key == key.decode("ascii", "replace"):
+                    words.append(key.upper())
+                random.shuffle(words)
+                lines.append(", ".join(words))
+            text = "\n".join(lines)
+            found = d.text_search(text)
+            self.assertEqual(found, longest.findall(text))
+            if old.pattern.endswith(OLD_BOUNDARY_AFTER):
+                # old expression differs only in preferring earlier keys of the
+                # alternation (found matches are the same or longer)
+                self.assertTrue(len("".join(found)) >= len("".join(old.findall(text))))
+        # documented differences (see module rrsmatcher)
+        text = "WEB and WATER, COST ACTION 623"
+        self.assertEqual(oldKeysPatterns("non_names")[0].findall(text), ["WE", "and", "WA"])
+        self.assertEqual(RRSDictionary("non_names").text_search(text), ["and"])
+        self.assertEqual(oldKeysPatterns("project_acronym2title")[0].findall(text), ["WATER", "COST", "ACTION"])
+        self.assertEqual(RRSDictionary("project_acronym2title").text_search(text), ["WATER", "COST ACTION 623"])
+
+    def test_TextSearch_StrayBytes(self):
+        # invalid utf-8 spoils only its line
+        text = "Aachen, T\xc3\xbcbingen and Gr\xc3\xa4fenhainichen\nbad \xff byte, Aachen"
+        self.assertEqual(RRSDictionary(CITIES).text_search(text),
+            ["Aachen", "T\xc3\xbcbingen", "Gr\xc3\xa4fenhainichen", "Aachen"])
+        self.assertEqual(RRSDictionary(CITIES).text_search("Alaj\xe4rvi, Aachen"), ["Alaj\xe4rvi", "Aachen"])
+
+    def test_Merge_NestedValues(self):
+        # translations of added keys and extended dictionaries are merged
+        d = RRSDictionary(BNC_LEMMATISED)
+        d.add("newword", ["5"], ADD)
+        d.add("force", ["1", ["12606", "v"], ["2", "x"]], ADD)
+        self.assertEqual(d.translate("newword"), ["5"])
+        self.assertEqual(d.translate("force"), ["23785", "n", ["12606", "v"], "1", ["2", "x"]])
+        other = RRSDictionary(BNC_LEMMATISED)
+        other.add("force", ["23785", ["7", "adj"]], ADD)
+        d = RRSDictionary(BNC_LEMMATISED)
+        d.extend(other)
+        self.assertEqual(d.translate("force"), ["23785", "n", ["12606", "v"], ["7", "adj"]])
+        self.assertEqual(d.translate("round"), RRSDictionary(BNC_LEMMATISED).translate("round"))
+
+    def test_Frequency_Homographs(self):
+        # frequencies of all parts of speech of BNC homographs are summed
+        freq = FrequencyDictionary(BNC_LEMMATISED)
+        self.assertEqual(freq.frequency("yellow"), 4111)
+        self.assertEqual(freq.frequency("force"), 23785 + 12606)
+        self.assertEqual(freq.frequency("like"), 3712 + 3990 + 1792 + 1180 + 110090 + 41909)
+        self.assertEqual(freq.top(1), [("the", 6187267)])
+        self.assertEqual(FrequencyDictionary("firstname_male_xx2frequency").frequency("Paul"), 1)
+
+    def test_TextSearch_PickledBinary(self):
+        # non_names had case insensitive compiled expression, city2country not
+        random.seed(1)
+        for name in (NON_NAMES, CITIES):
+            path = copyDictionary(name)
+            try:
+                convert_to_binary(path)
+                keys = random.sample(list(RRSDictionary(name).get_keys()), 300)
+                words = []
+                for key in keys:
+                    words += [key, key.upper(), key.lower(), "and", "x" + key, key + "-y"]
+                random.shuffle(words)
+                text = " ".join(words)
+                for sensitivity in (CASE_SENSITIVE, CASE_INSENSITIVE):
+                    pickled = RRSDictionary(name, sensitivity)
+                    binary = RRSDictionary(os.path.relpath(path, DICTIONARIES), sensitivity)
+                    self.assertTrue(binary._binary is not None)
+                    found = pickled.text_search(text)
+                    self.assertEqual(binary.text_search(text), found)
+                    fold = name == NON_NAMES or sensitivity == CASE_INSENSITIVE
+                    self.assertEqual(keys[0].upper() in found, fold or keys[0] == keys[0].upper())
+            finally:
+                shutil.rmtree(os.path.dirname(path))
+
+    def test_ContainsKey_CaseInsensitive(self):
+        # every key is found in any case (bisection of older versions missed
+        # about a fifth of the keys, e.g. "Research", "Redmond" and "MIT")
+        d = RRSDictionary(NON_NAMES, CASE_INSENSITIVE)
+        keys = list(d.get_keys())
+        self.assertEqual(len(keys), 5087)
+        for key in keys:
+            for word in (key, key.upper(), key.lower(), key.swapcase()):
+                self.assertTrue(d.contains_key(word), word)
+        for word in ("Research", "Redmond", "MIT", "mit"):
+            self.assertTrue(d.contains_key(word))
+        sensitive = RRSDictionary(NON_NAMES, CASE_SENSITIVE)
+        self.assertTrue(sensitive.contains_key("Research"))
+        self.assertFalse(sensitive.contains_key("RESEARCH"))
+
+    def test_Batch_Lookup(self):
+        # duplicates, empty and short keys (mintextlen), keys in other case
+        keys = ["Paris", "paris", "PARIS", "Paris", "", "a", "Brno", "Xqzz", u"Praha",
+            "Aachen", "aachen", "Alaj\xe4rvi"]
+        for name in (CITIES, NAME_FF_CZ):
+            for sensitivity in (CASE_SENSITIVE, CASE_INSENSITIVE, FIRST_UPPER):
+                d = RRSDictionary(name, sensitivity)
+                found = d.contains_many(keys)
+                self.assertEqual(found, [ d.contains_key(k) for k in keys ])
+                self.assertTrue(all([ isinstance(f, bool) for f in found ]))
+                self.assertEqual(d.translate_many(keys), [ d.translate(k) for k in keys ])
+        d = RRSDictionary(CITIES, FIRST_UPPER)
+        self.assertEqual(d.contains_many(["Paris", "paris", "PARIS", ""]), [True, False, True, False])
+        self.assertEqual(d.contains_many([]), [])
+        self.assertEqual(d.translate_many([]), [])
+        self.assertRaises(RRSDictionaryError, d.contains_many, ["Paris", None])
+
+    def test_KeyIndex_Normalized(self):
+        # case, diacritics and hyphens (with line breaks) are ignored
+        d = RRSDictionary(NAME_SF_CZ, CASE_INSENSITIVE)
+        for word in ("NOVA-\nKOVA", "novakova", u"Nov\xe1kov\xe1", "Nov\xc3\xa1kov\xc3\xa1",
+                     "Nov\xe2\x80\x90akova"):
+            self.assertEqual(d.normalized_lookup(word), NOVAKOVA)
+        self.assertEqual(d.normalized_lookup("Novakovaa"), [])
+        self.assertEqual(d.prefix_search(u"NOV\xc1KO"), NOVAKOVA + ["Novakovi\xc4\x8cov\xc3\x81",
+            "Novakovsk\xc3\x81"])
+        self.assertEqual(d.prefix_search("nova-\nko", limit=3), NOVAKOVA + ["Novakovi\xc4\x8cov\xc3\x81"])
+        self.assertEqual(d.prefix_search("Xqz"), [])
+
+    def test_KeyIndex_Fuzzy(self):
+        d = RRSDictionary(NAME_SF_CZ, CASE_INSENSITIVE)
+        self.assertEqual(d.fuzzy_search("Novakova", 0), [ (k, 0) for k in NOVAKOVA ])
+        self.assertEqual(d.fuzzy_search("Nowakowa", 1), [("Nowakov\xc3\x81", 1), ("Now\xc3\x81kov\xc3\x81", 1)])
+        self.assertEqual(d.fuzzy_search("Nowakowa", 2, limit=5), [("Nowakov\xc3\x81", 1),
+            ("Now\xc3\x81kov\xc3\x81", 1), ("Lowakov\xc3\x81", 2), ("Nos\xc3\x81kov\xc3\x81", 2),
+            ("Novakov\xc3\x81", 2)])
+        # all keys within the distance are found (compared with brute force)
+        d = RRSDictionary(NAME_FF_CZ, CASE_INSENSITIVE)
+        norms = [ (k, normalize_key(k)) for k in d.get_keys() ]
+        for word in ("Jana", "Marketa", "Kristyna", "Zdenka", "xyz"):
+            for distance in (0, 1, 2):
+                exp = sorted([ (k, levenshtein(n, normalize_key(word))) for k, n in norms
+                    if levenshtein(n, normalize_key(word)) <= distance ], key=lambda x: (x[1], x[0]))
+                self.assertEqual(d.fuzzy_search(word, distance), exp)
+
+    def test_KeyIndex_Errors(self):
+        d = RRSDictionary(NAME_FF_CZ, CASE_INSENSITIVE)
+        for call in (lambda: d.prefix_search(None), lambda: d.normalized_lookup(3),
+                     lambda: d.fuzzy_search(["Jana"]), lambda: d.fuzzy_search("Jana", -1),
+                     lambda: d.fuzzy_search("Jana", 1.5), lambda: d.fuzzy_search("Jana", "1")):
+            self.assertRaises(RRSDictionaryError, call)
+
+    def test_Views_Shipped(self):
+        # male Czech and US and female international first names are not shipped
+        with warnings.catch_warnings(record=True) as caught:
+            warnings.simplefilter("always")
+            names = rrsregistry.shipped(rrsregistry.MERGED_VIEWS[rrsregistry.NAMES])
+        self.assertEqual(len(caught), 3)
+        self.assertTrue("firstname_male_xx2frequency" in names)
+        self.assertFalse("firstname_male_cz2frequency" in names)
+        # views are built from the shipped dictionaries
+        tmp = tempfile.mkdtemp()
+        prefixes = (rrsregistry.MERGED_PREFIX, rrsregistry.CLASSES_PREFIX)
+        rrsregistry.MERGED_PREFIX = os.path.join(os.path.relpath(tmp, DICTIONARIES), "merged_")
+        rrsregistry.CLASSES_PREFIX = os.path.join(os.path.relpath(tmp, DICTIONARIES), "classes_")
+        try:
+            with warnings.catch_warnings():
+                warnings.simplefilter("ignore")
+                rrsregistry.build_merged([rrsregistry.NAMES])
+                rrsregistry.build_class_indexes([rrsregistry.NAME_CLASSES])
+                self.assertTrue(rrsregistry.is_merged_built(rrsregistry.NAMES))
+                self.assertTrue(rrsregistry.is_class_index_built(rrsregistry.NAME_CLASSES))
+                merged = rrsregistry.DictionaryRegistry().get(rrsregistry.NAMES, CASE_INSENSITIVE)
+                classes = rrsregistry.DictionaryRegistry().get_class_index(rrsregistry.NAME_CLASSES)
+            self.assertTrue(merged.contains_key("paul"))
+            self.assertEqual(classes.frequency("paul") & 1, 1)
+        finally:
+            (rrsregistry.MERGED_PREFIX, rrsregistry.CLASSES_PREFIX) = prefixes
+            shutil.rmtree(tmp)
+
+class TestURLs(unittest.TestCase):
+    def test_Canonicalize_Relative(self):
+        self.assertEqual(canonicalize("/a/c"), "/a/c")
+        self.assertEqual(canonicalize("c#top", "HTTP://Example.org:80/a/"), "http://example.org/a/c")
+        self.assertEqual(canonicalize("mailto:x@example.org"), None)
+
+    def test_UniqueURLs_Original(self):
+        links = ["/a/#x", "http://EXAMPLE.org/a/", "/a", "/b", "javascript:void(0)", "/b?utm_source=x"]
+        self.assertEqual(unique_urls(links, "http://example.org/"),
+            ["http://example.org/a/#x", "http://example.org/a", "http://example.org/b"])
+
+    def test_URLSeenSet(self):
+        for seen in (URLSeenSet(), URLSeenSet(bloom=True, capacity=100)):
+            self.assertTrue(seen.add("http://example.org/a"))
+            self.assertFalse(seen.add("http://Example.org:80/a#top"))
+            self.assertTrue("http://example.org/a?utm_source=x&gclid=1" in seen)
+            self.assertFalse("http://example.org/b" in seen)
+            self.assertEqual(len(seen), 1)
+
+    def test_URLKey_SessionIds(self):
+        # session ids may choose the content, they are not tracking parameters
+        self.assertEqual(url_key("http://example.org/page.php?sid=123&utm_medium=x"),
+            "http://example.org/page.php?sid=123")
+        self.assertNotEqual(url_key("http://example.org/page.php?sid=123"),
+            url_key("http://example.org/page.php?sid=456"))
+        self.assertFalse("http://example.org/?PHPSESSID=2" in URLSeenSet(["http://example.org/?PHPSESSID=1"]))
+
+    def test_URLKey_TrailingSlash(self):
+        # relative links of "/a" and "/a/" are resolved differently
+        self.assertEqual(url_key("http://example.org/a/"), "http://example.org/a/")
+        self.assertNotEqual(url_key("http://example.org/a"), url_key("http://example.org/a/"))
+        # crawlers may fold the slash
+        self.assertEqual(url_key("http://example.org/a/", fold_slash=True), "http://example.org/a")
+        self.assertEqual(url_key("http://example.org/", fold_slash=True), "http://example.org/")
+        seen = URLSeenSet(["http://example.org/a"], fold_slash=True)
+        self.assertTrue("http://example.org/a/" in seen)
+        self.assertFalse("http://example.org/a/" in URLSeenSet(["http://example.org/a"]))
+
+MEMOIZED_CALLS = []
+
+def doubleValue(self, aValue):
+    MEMOIZED_CALLS.append(aValue)
+    return aValue * 2
+
+class Counted(object):
+    double = memoized(doubleValue)
+
+class SlotsCounted(object):
+    __slots__ = ()
+    double = memoized(doubleValue)
+
+class WeakSlotsCounted(object):
+    __slots__ = ("__weakref__",)
+    double = memoized(doubleValue)
+
+class Base(object):
+    @memoized
+    def name(self, aValue):
+        return "A%d" % aValue
+
+class Derived(Base):
+    @memoized
+    def name(self, aValue):
+        return "B" + super(Derived, self).name(aValue)
+
+class LazyBase(object):
+    def __init__(self):
+        self.log = []
+
+    @lazy
+    def init(self):
+        self.log.append("A")
+
+class LazyDerived(LazyBase):
+    @lazy
+    def init(self):
+        self.log.append("B")
+        super(LazyDerived, self).init()
+
+class TestMemoized(unittest.TestCase):
+    def setUp(self):
+        del MEMOIZED_CALLS[:]
+
+    def test_Memoized_Dict(self):
+        obj = Counted()
+        self.assertEqual([obj.double(1), obj.double(1), obj.double(2)], [2, 2, 4])
+        self.assertEqual(MEMOIZED_CALLS, [1, 2])
+        # cache of other instance
+        self.assertEqual(Counted().double(1), 2)
+        self.assertEqual(MEMOIZED_CALLS, [1, 2, 1])
+
+    def test_Memoized_Slots(self):
+        # instances without __dict__ share the cache of the method
+        obj = SlotsCounted()
+        self.assertFalse(hasattr(obj, "__dict__"))
+        self.assertEqual([obj.double(3), obj.double(3)], [6, 6])
+        self.assertEqual(MEMOIZED_CALLS, [3])
+        self.assertEqual(SlotsCounted().double(3), 6)
+        self.assertEqual(MEMOIZED_CALLS, [3, 3])
+
+    def test_Memoized_WeakSlots(self):
+        # caches of weak-referenceable instances are freed with the instance
+        obj = WeakSlotsCounted()
+        self.assertEqual([obj.double(4), obj.double(4)], [8, 8])
+        self.assertEqual(MEMOIZED_CALLS, [4])
+        self.assertEqual(len(WeakSlotsCounted.__dict__["double"]._weak), 1)
+        del obj
+        self.assertEqual(len(WeakSlotsCounted.__dict__["double"]._weak), 0)
+
+    def test_Memoized_Override(self):
+        # memoized override doesn't share the cache of the overridden method
+        obj = Derived()
+        self.assertEqual(obj.name(1), "BA1")
+        self.assertEqual(super(Derived, obj).name(1), "A1")
+        self.assertEqual(obj.name(1), "BA1")
+
+    def test_Lazy_Override(self):
+        # lazy override still runs the overridden lazy method once
+        obj = LazyDerived()
+        obj.init()
+        obj.init()
+        self.assertEqual(obj.log, ["B", "A"])
+        self.assertEqual(LazyDerived().init(), None)
+
+TESTDATA = os.path.join(os.path.dirname(os.path.abspath(__file__)), "testdata")
+
+class FixtureHandler(BaseHTTPServer.BaseHTTPRequestHandler):
+    '''
+    Serves saved pages of Bing results (testdata/bing_<page>.html), the page
+    is given by parameter "first" of the query.
+    '''
+
+    def do_GET(self):
+        query = dict(urlparse.parse_qsl(urlparse.urlsplit(self.path).query))
+        page = (int(query.get("first", "1")) + 9) / 10
+        path = os.path.join(TESTDATA, "bing_%d.html" % page)
+        self.server.requests.append(page)
+        if not os.path.exists(path):
+            self.send_error(404)
+            return
+        with open(path, "rb") as fin:
+            data = fin.read()
+        self.send_response(200)
+        self.send_header("Content-Type", "text/html; charset=utf-8")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def log_message(self, *aArgs):
+        pass
+
+def fetchLocal(aPort, aUrls):
+    '''
+    Downloads URLs of a search engine from the local fixture server (the same
+    as Crawler.start(), which accepts only public host names).
+    '''
+
+    result = {}
+    for url in aUrls:
+        handler = GetHTMLPage()
+        local = "http://127.0.0.1:%d/search?%s" % (aPort, urlparse.urlsplit(url).query)
+        if handler.get_page(local)[0] == 1:
+            result[url] = handler.get_etree()
+    return result
+
+class TestSearch(unittest.TestCase):
+    def setUp(self):
+        self.server = BaseHTTPServer.HTTPServer(("127.0.0.1", 0), FixtureHandler)
+        self.server.requests = []
+        self.thread = threading.Thread(target=self.server.serve_forever)
+        self.thread.daemon = True
+        self.thread.start()
+        self.tmp = tempfile.mkdtemp()
+
+    def tearDown(self):
+        self.server.shutdown()
+        self.server.server_close()
+        shutil.rmtree(self.tmp)
+
+    def search(self, aCache=None):
+        port = self.server.server_address[1]
+        return MultiPageSearch("bing", 3, aCache, lambda urls: fetchLocal(port, urls))
+
+    def test_MultiPage_Paging(self):
+        hits = self.search().get_list("decipher project")
+        self.assertEqual(sorted(self.server.requests), [1, 2, 3])
+        # duplicates of page 2 and 3 (other spellings of the URL) are skipped
+        self.assertEqual([ (h["url"], h["page"], h["rank"]) for h in hits ], [
+            ("http://cordis.europa.eu/project/rcn/97302_en.html", 1, 1),
+            ("http://decipher-research.eu/", 1, 2),
+            ("http://en.wikipedia.org/wiki/Decipherment", 1, 3),
+            ("http://www.example.org/heritage/narratives?utm_source=bing", 2, 4),
+            ("http://www.example.org/heritage/", 2, 5),
+            ("http://www.facebook.com/decipher.project", 3, 6),
+            ("http://museums.example.com/collections", 3, 7)])
+        self.assertEqual(hits[1]["title"], "DECIPHER project")
+
+    def test_MultiPage_Cache(self):
+        cache = SearchResultCache(self.tmp, ttl=3600)
+        hits = self.search(cache).get_list("decipher project")
+        self.assertEqual(len(self.server.requests), 3)
+        self.assertEqual(self.search(cache).get_list("decipher project"), hits)
+        self.assertEqual(len(self.server.requests), 3)
+        # missing page is downloaded, the rest is read from the cache
+        os.remove(cache._path("bing", "decipher project", 2))
+        self.assertEqual(self.search(cache).get_list("decipher project"), hits)
+        self.assertEqual(self.server.requests[3:], [2])
+        # other query is not in the cache
+        self.search(cache).get_list("decipher")
+        self.assertEqual(len(self.server.requests), 7)
+
+    def test_MultiPage_Expiry(self):
+        hits = self.search(SearchResultCache(self.tmp, ttl=0.5)).get_list("decipher project")
+        self.assertEqual(self.search(SearchResultCache(self.tmp, ttl=0.5)).get_list("decipher project"), hits)
+        self.assertEqual(len(self.server.requests), 3)
+        time.sleep(0.6)
+        self.assertEqual(self.search(SearchResultCache(self.tmp, ttl=0.5)).get_list("decipher project"), hits)
+        self.assertEqual(len(self.server.requests), 6)
+
+    def test_ProjectWeb(self):
+        self.assertEqual(findProjectWeb("DECIPHER", None, self.search()), "http://decipher-research.eu/")
+        self.assertEqual(findProjectWeb("HERITAGE-X", None, self.search()), None)
+        self.assertEqual(findProjectWeb("---", None, self.search()), None)
+        # acronyms which are only parts of names of hosts (facebook, museums)
+        self.assertEqual(findProjectWeb("ACE", None, self.search()), None)
+        self.assertEqual(findProjectWeb("MUSEUM", None, self.search()), None)
+        self.assertEqual(findProjectWeb("EU", None, self.search()), None)
+
+    def test_HostNames(self):
+        self.assertEqual(hostNames("www.e-content.ac.uk"), set(["e-content", "e", "content", "econtent"]))
+        self.assertEqual(hostNames("decipher.fit.vutbr.cz"), set(["decipher", "fit", "vutbr"]))
+        self.assertEqual(hostNames("localhost"), set(["localhost"]))
+
+def fakeStreamExtractor(aDelay=0, aError=None):
+    '''
+    Returns class used instead of StreamEntityExtractor: it finds one person,
+    then raises aError.
+    '''
+
+    class Extractor(object):
+        def __init__(self, aEntities):
+            pass
+
+        def extract(self, aSource, aResults, aDeadline=None):
+            aResults[ee.AUTHOR] = [RRSPerson(full_name="John Smith")]
+            if aError != None:
+                raise aError
+    return Extractor
+
+def slowWindow(aArgs):
+    '''
+    Used instead of extraction of one window: finds one person in 0.1 s.
+    '''
+
+    time.sleep(0.1)
+    return [(ee.AUTHOR, [RRSPerson(full_name="John Smith")])]
+
+DELIVERABLE = """Deliverable D8.1.3 of the DECIPHER project.
+Prepared by John Smith, Brno University of Technology, Brno, Czech Republic.
+Contact: xcvice01@stud.fit.vutbr.cz
+Date: 14 May 2009
+"""
+
+class TestEntities(unittest.TestCase):
+    def setUp(self):
+        self.stream = streamextractor.StreamEntityExtractor
+        self.window = streamextractor._extract_window
+        self.init = ee.EntityExtractor.__init__
+        self.config = dict(entities.config)
+        entities.stream = None
+
+    def tearDown(self):
+        streamextractor.StreamEntityExtractor = self.stream
+        streamextractor._extract_window = self.window
+        ee.EntityExtractor.__init__ = self.init
+        entities.config.update(self.config)
+        entities.stream = None
+
+    def test_Fields(self):
+        found = {
+            ee.AUTHOR: [RRSPerson(full_name="John Smith"), RRSPerson(full_name="John Smith")],
+            ee.ORGANIZATION: [RRSOrganization(title="Brno University of Technology")],
+            ee.LOCATION: [RRSLocation(name="FIT", city="Brno", country="Czech Republic")],
+            ee.PROJECT: [RRSProject(acronym="DECIPHER")],
+            ee.EMAIL: [RRSEmail(email="xcvice01@stud.fit.vutbr.cz")],
+            ee.PUBLISHED_DATE: [RRSDateTime(year=2009), RRSDateTime(year=2009, month=5),
+                RRSDateTime(year=2009, month=5, day=14), RRSDateTime(year=2010, month=1, day=1)]
+        }
+        self.assertEqual(entities._fields(found), {
+            "persons": ["John Smith"],
+            "organizations": ["Brno University of Technology"],
+            "locations": ["FIT, Brno, Czech Republic"],
+            "projects": ["DECIPHER"],
+            "emails": ["xcvice01@stud.fit.vutbr.cz"],
+            # partial dates are indexed only by year
+            "dates": ["2009-05-14", "2010-01-01"],
+            "years": [2009, 2010]
+        })
+        self.assertEqual(entities._fields({})["dates"], [])
+
+    def test_ExtractEntities_Ok(self):
+        streamextractor.StreamEntityExtractor = fakeStreamExtractor()
+        fields = entities.extractEntities("text", 5)
+        self.assertEqual(fields[entities.FIELD_STATUS], entities.STATUS_OK)
+        self.assertEqual(fields["deliv_persons"], ["John Smith"])
+        self.assertEqual(fields["deliv_years"], [])
+        self.assertEqual(sorted(fields), sorted(entities.FIELDS.values() + \
+            [entities.FIELD_STATUS, entities.FIELD_TIME]))
+
+    def test_ExtractEntities_Timeout(self):
+        # 100 windows of 0.1 s, the budget is checked after each of them
+        streamextractor._extract_window = slowWindow
+        fields = entities.extractEntities("Line of text.\n" * 100 * 600, 0.25)
+        self.assertEqual(fields[entities.FIELD_STATUS], entities.STATUS_TIMEOUT)
+        # entities found before the time budget ran out are kept
+        self.assertEqual(fields["deliv_persons"], ["John Smith"])
+        self.assertTrue(0.25 <= fields[entities.FIELD_TIME] < 1)
+
+    def test_ExtractEntities_Real(self):
+        self.assertTrue(entities.enable(1))
+        text = "The results are described below.\n" * 600 + DELIVERABLE
+        fields = entities.extractEntities(text, 60)
+        self.assertEqual(fields[entities.FIELD_STATUS], entities.STATUS_OK)
+        self.assertEqual(fields["deliv_persons"], ["John Smith"])
+        self.assertEqual(fields["deliv_locations"], ["Brno, Czech Republic"])
+        self.assertEqual(fields["deliv_projects"], ["DECIPHER"])
+        self.assertEqual(fields["deliv_emails"], ["xcvice01@stud.fit.vutbr.cz"])
+        self.assertEqual(fields["deliv_years"], [2009])
+
+    def test_ExtractEntities_Reuse(self):
+        # extractors are created once per process, not per document or window
+        created = []
+        def init(aSelf):
+            created.append(aSelf)
+            self.init(aSelf)
+        ee.EntityExtractor.__init__ = init
+        streamextractor._extractor = None
+        text = "The results are described below.\n" * 600 + DELIVERABLE
+        for i in range(2):
+            fields = entities.extractEntities(text, 60)
+            self.assertEqual(fields["deliv_persons"], ["John Smith"])
+        self.assertEqual(len(created), 1)
+        self.assertTrue(entities.getStream() is entities.getStream())
+
+    def test_ExtractEntities_Error(self):
+        streamextractor.StreamEntityExtractor = fakeStreamExtractor(aError=ValueError("broken"))
+        fields = entities.extractEntities("text", 5)
+        self.assertEqual(fields[entities.FIELD_STATUS], entities.STATUS_ERROR)
+        self.assertEqual(fields["deliv_persons"], ["John Smith"])
+
+def personNames(aPersons):
+    return [ (p.get("first_name"), p.get("middle_name"), p.get("last_name"),
+        p.get("credibility")) for p in aPersons ]
+
+def organizationTitles(aOrganizations):
+    return [ (o.get("title"), o.get("credibility")) for o in aOrganizations ]
+
+def locationsOf(aLocations):
+    return [ (l.get("city"), l.get("country"), l.get("woeid"), l.get("credibility"))
+        for l in aLocations or [] ]
+
+CITATION_MIXED = "Smith, J.: Annotation. Stanford University, 2004."
+CITATION_CAPS = "J. DVORAK. SEMANTIC ANNOTATION. FACULTY OF INFORMATION TECHNOLOGY, " \
+    "BRNO UNIV. OF TECHNOLOGY, 2010."
+
+REFERENCES = [
+    "[1] Smith, J.: Semantic annotation of web pages. In: Proceedings of the 5th "
+    "International Conference on Web Engineering, Springer, 2005, pp. 120-131.",
+    "[2] John Smith and Jan Novak. Technical report, Microsoft Research, Redmond, 2009.",
+    "[3] J. DVORAK. SEMANTIC ANNOTATION. FACULTY OF INFORMATION TECHNOLOGY, BRNO "
+    "UNIV. OF TECHNOLOGY, 2010.",
+    "[4] Novak, P., Dvorak, J.: Extraction of entities from citations. Brno "
+    "University of Technology, Brno, 2008."]
+
+class TestExtractors(unittest.TestCase):
+    def setUp(self):
+        self.extractor = ee.EntityExtractor()
+
+    def test_SpanSet(self):
+        spans = SpanSet("John Smith and Jan Novak")
+        a = spans.add(0, 10, ee.AUTHOR, 60, 1, "John Smith")
+        # overlapping span of lower priority wins despite lower credibility
+        b = spans.add(5, 14, ee.AUTHOR, 40, 0, "Smith and")
+        c = spans.add(15, 24, ee.AUTHOR, 60, 1, "Jan Novak")
+        d = spans.add(15, 18, ee.AUTHOR, 60, 1, "Jan")
+        self.assertEqual(len(spans), 4)
+        self.assertEqual(spans.resolve(), [b, c])
+        self.assertEqual(spans.runs(), [(5, 14), (15, 24)])
+        self.assertEqual(spans.rest(), "John  ")
+        # text is not changed
+        self.assertEqual(spans.text, "John Smith and Jan Novak")
+        self.assertFalse(spans.is_free(5, 6))
+        self.assertTrue(spans.is_free(0, 5))
+        spans.uncover(15, 24)
+        self.assertEqual(spans.rest(), "John  Jan Novak")
+        # empty set keeps the whole text
+        self.assertEqual(SpanSet("text").rest(), "text")
+        self.assertEqual(SpanSet("text").resolve(), [])
+        # uncovered characters can be covered by other spans
+        self.assertEqual([ x.value for x in spans.resolve([a, d]) ], ["Jan"])
+
+    def test_FindAuthors_Mixed(self):
+        persons, rest = self.extractor.find_authors(CITATION_MIXED)
+        self.assertEqual(personNames(persons), [("J.", None, "Smith", 80)])
+        self.assertEqual(persons[0].get("full_name"), "J. Smith")
+        self.assertEqual(rest, ": Annotation. Stanford University, 2004.")
+        persons, rest = self.extractor.find_authors("John Smith and Jan Novak. Report, 2009.")
+        self.assertEqual(personNames(persons), [("John", None, "Smith", 60), ("Jan", None, "Novak", 60)])
+        self.assertEqual(persons[1].get("full_name"), "Jan Novak")
+        self.assertEqual(rest, " and . Report, 2009.")
+
+    def test_FindAuthors_Caps(self):
+        # "DVORAK. S" is read as Surname, N.; "J." and "SEMANTIC" are not
+        # adjacent in the text, so "J. SEMANTIC" is not a person (it was found
+        # when the extractor removed "DVORAK." from the text)
+        persons, rest = self.extractor.find_authors(CITATION_CAPS)
+        self.assertEqual(personNames(persons), [("K.", None, "DVORA", 50),
+            ("N.", None, "ANNOTATIO", 50), ("V.", None, "UNI", 50)])
+        self.assertEqual(rest, "J. SEMANTIC FACULTY OF INFORMATION TECHNOLOGY, BRNO OF TECHNOLOGY, 2010.")
+        persons, rest = self.extractor.find_authors("P. NOVAK. THESIS. BRNO, 2010.")
+        self.assertEqual(personNames(persons), [("S.", None, "THESI", 50), ("P.", None, "NOVAK", 80)])
+        self.assertEqual(rest, ". BRNO, 2010.")
+
+    def test_FindAuthors_NonNames(self):
+        # words of non-names are not persons ("Research, Redmond" and "MIT."
+        # used to be found as persons)
+        persons, rest = self.extractor.find_authors(
+            "John Smith. Technical report, Microsoft Research, Redmond, 2009.")
+        self.assertEqual(personNames(persons), [("John", None, "Smith", 60)])
+        self.assertEqual(rest, ". Technical report, Microsoft Research, Redmond, 2009.")
+        persons, rest = self.extractor.find_authors("John Smith. Report of MIT. Cambridge, 2001.")
+        self.assertEqual(persons, [])
+
+    def test_ExtractMany(self):
+        references = REFERENCES + [REFERENCES[1], REFERENCES[0]]
+        single = CitationEntityExtractor(ee.ALL, "db09")
+        expected = _publications([ single.extract(c) for c in _citations(references) ])
+        self.assertEqual(expected[4:], [expected[1], expected[0]])
+        citations = _citations(references)
+        self.assertTrue(single.extract_many(citations) is citations)
+        self.assertEqual(_publications(citations), expected)
+        # names of all references were looked up in one batch and are cached
+        self.assertTrue("Dvorak" in single.entity_extractor.name_e._name_cache)
+        # citations of the same reference get their own publications
+        publ = citations[1]["reference"].get("referenced_publication")
+        self.assertFalse(publ is citations[4]["reference"].get("referenced_publication"))
+        self.assertEqual(single.extract_many([]), [])
+        pool = CitationEntityExtractor(ee.ALL, "db09", workers=2)
+        try:
+            self.assertEqual(_publications(pool.extract_many(_citations(references))), expected)
+            self.assertEqual(pool.extract_many([]), [])
+            self.assertEqual(_publications(pool.extract_many(_citations(references[::-1]))),
+                expected[::-1])
+        finally:
+            pool.close()
+        self.assertTrue(pool._pool is None)
+
+    def test_FindOrganization(self):
+        orgs, rest = self.extractor.find_organization(CITATION_MIXED)
+        self.assertEqual(organizationTitles(orgs), [("Stanford University", 100)])
+        self.assertEqual(rest, "Smith, J.: Annotation, 2004.")
+        orgs, rest = self.extractor.find_organization(CITATION_MIXED.upper())
+        self.assertEqual(organizationTitles(orgs), [("STANFORD UNIVERSITY", 100)])
+        self.assertEqual(rest, "SMITH, J.: ANNOTATION, 2004.")
+        orgs, rest = self.extractor.find_organization(
+            "Dept. of Computer Science, University of California, Berkeley.")
+        self.assertEqual(organizationTitles(orgs), [("University of California, Berkeley", 100)])
+        self.assertEqual(rest, "Dept. of Computer Science.")
+        orgs, rest = self.extractor.find_organization(CITATION_CAPS)
+        self.assertEqual(orgs, [])
+        self.assertEqual(rest, CITATION_CAPS)
+
+    def test_FindAuthors_ClassIndex(self):
+        def findAuthors():
+            names = ee.EntityExtractor.NameExtractor()
+            return (names._name_classes is not None,
+                [ (personNames(names.extract_persons(x)), names.get_rest()) for x in REFERENCES ])
+        indexed, expected = findAuthors()
+        self.assertFalse(indexed)
+        # class index is built into temporary directory and loaded by new registry
+        tmp = tempfile.mkdtemp()
+        saved = (rrsregistry.CLASSES_PREFIX, rrsregistry._registry)
+        rrsregistry.CLASSES_PREFIX = os.path.join(os.path.relpath(tmp, DICTIONARIES), "classes_")
+        rrsregistry._registry = rrsregistry.DictionaryRegistry()
+        try:
+            with warnings.catch_warnings():
+                warnings.simplefilter("ignore")
+                rrsregistry.build_class_indexes([rrsregistry.NAME_CLASSES])
+                indexed, persons = findAuthors()
+            self.assertTrue(indexed)
+            self.assertEqual(persons, expected)
+        finally:
+            (rrsregistry.CLASSES_PREFIX, rrsregistry._registry) = saved
+            shutil.rmtree(tmp)
+
+    def test_FindLocation_GeoHierarchy(self):
+        texts = REFERENCES + ["Brno, Czech Republic", "Redmond, WA, USA", "Paris"]
+        def findLocations():
+            geo = ee.EntityExtractor.GeographicLocationExtractor
+            # resolved hierarchies are shared by all instances
+            geo._hierarchies.clear()
+            geo._country_cities.clear()
+            locations = geo()
+            return (locations.geo_hierarchy is not None,
+                [ (locationsOf(locations.extract_locations(x)), locations.get_rest()) for x in texts ],
+                locations._hierarchy("Brno", "city"))
+        indexed, expected, brno = findLocations()
+        self.assertFalse(indexed)
+        self.assertEqual(brno["continent"], "Europe")
+        # hierarchy is built into temporary directory and loaded by new registry
+        tmp = tempfile.mkdtemp()
+        saved = (rrsregistry.GEO_HIERARCHY, rrsregistry._registry)
+        rrsregistry.GEO_HIERARCHY = os.path.join(os.path.relpath(tmp, DICTIONARIES), "geo_hierarchy")
+        rrsregistry._registry = rrsregistry.DictionaryRegistry()
+        try:
+            rrsregistry.build_geo_hierarchy()
+            self.assertEqual(findLocations(), (True, expected, brno))
+        finally:
+            (rrsregistry.GEO_HIERARCHY, rrsregistry._registry) = saved
+            ee.EntityExtractor.GeographicLocationExtractor._hierarchies.clear()
+            shutil.rmtree(tmp)
+
+def readTestdata(aName):
+    with open(os.path.join(TESTDATA, aName)) as fin:
+        return fin.read()
+
+def sectionsOf(aDocument):
+    return [ (s.get("title"), s.get("number"), s.get("text_position_from"),
+        s.get("text_position_to"), s.get("credibility")) for s in aDocument.get_chapters() ]
+
+DOCUMENTS = ["document_arabic.txt", "document_chapter.txt", "document_plain.txt",
+    "document_roman.txt"]
+
+def citationsOf(aDocument):
+    return [ (c.get("content"), c.get("credibility"), c.get("reference").get("content"),
+        c.get("reference").get("credibility")) for c in aDocument.get_citations() ]
+
+class TestDocuments(unittest.TestCase):
+    def wrap(self, aName):
+        with warnings.catch_warnings():
+            warnings.simplefilter("ignore")
+            return DocumentWrapper().wrap(readTestdata(aName))
+
+    def test_Sections_Arabic(self):
+        # subchapters are not sections, the last chapter has no position
+        self.assertEqual(sectionsOf(self.wrap("document_arabic.txt")), [
+            ("Introduction", 1, 21, 524, 100),
+            ("Related Work", 2, 538, 703, 100),
+            ("Extraction of Entities", 3, 727, 1067, 80),
+            ("Conclusion", 4, None, None, 100)])
+
+    def test_Sections_Chapter(self):
+        self.assertEqual(sectionsOf(self.wrap("document_chapter.txt")), [
+            ("Introduction", 1, 21, 162, 100)])
+
+    def test_Sections_Plain(self):
+        # not numbered headings are followed by lines of their paragraphs
+        self.assertEqual(sectionsOf(self.wrap("document_plain.txt")), [
+            ("Introduction", None, 20, 153, 10),
+            ("The entity extractor finds persons, organizations and locations in the", None, 91, 153, 10),
+            ("Method", None, 163, 276, 10),
+            ("One hundred deliverables were annotated by two annotators. The extractor", None, 236, 276, 10),
+            ("Conclusion", None, None, None, 10)])
+
+    def test_Sections_FullScan(self):
+        # table of candidate headings finds the same chapters as the search of
+        # every heading pattern in the whole text
+        for name in DOCUMENTS:
+            text = readTestdata(name)
+            self.assertEqual(_ChapterWrapper().get_chapters(text),
+                _FullScanChapterWrapper().get_chapters(text))
+
+    def test_Citations_Brackets(self):
+        # "[n]" references, sentences citing them are found by their markers
+        self.assertEqual(citationsOf(self.wrap("document_arabic.txt")), [
+            ("3.1 Dictionaries Dictionaries of first names, surnames and cities are shared by all "
+             "components of the extractor [1]", 80,
+             "[1] J. Smith, P. Svoboda. Requirements of digital libraries. Technical report, "
+             "Department of Computer Science, Brno University of Technology, 2009. ", 60),
+            ("Extraction of named entities was described in [2] and evaluated on citations [3]", 80,
+             "[2] M. Garcia. Ontology alignment. In Proc. of the International Conference on "
+             "Information Systems, Universidad Politecnica de Madrid, Spain, 2008. ", 60),
+            ("Precision of persons was 0.82 and recall 0.74 [3]", 80,
+             "[3] T. Mueller, A. Kowalska. Evaluation of search engines. Fraunhofer Institute for "
+             "Computer Graphics Research, Darmstadt, 2010. ", 60),
+            ("These entities are not part of metadata published by the projects [4]", 80,
+             "[4] K. Brown. Grid computing. Lawrence Livermore National Laboratory, Livermore, "
+             "CA, 2007. ", 60),
+            ("Methods based on machine learning need annotated corpora, which are not available "
+             "for deliverables [5]", 75,
+             "[5] J. Dvorak. Semantic annotation. Faculty of Information Technology, Brno Univ. "
+             "of Technology, Bozetechova 2, Brno, 2010.", 50)])
+
+    def test_Citations_Numbers(self):
+        # "n." references cited by names of authors and years
+        self.assertEqual(citationsOf(self.wrap("document_roman.txt")), [
+            ("The crawler downloads the pages and finds links to the documents (Smith, 2009)", 70,
+             "1. J. Smith. Web crawling. Technical report, Brno University of Technology, 2009. ", 70),
+            ("II. RELATED WORK Focused crawlers were studied by Garcia (2008)", 70,
+             "2. M. Garcia. Focused crawlers. In Proc. of the International Conference on Web "
+             "Engineering, Madrid, Spain, 2008. ", 70),
+            (None, 50, "3. T. Mueller. Ranking of web pages. Darmstadt, 2010.", 60)])
+
+    def test_Citations_Unnumbered(self):
+        self.assertEqual(citationsOf(self.wrap("document_chapter.txt")), [
+            (None, 50, "Smith, J., Novak, J.: Portal of research projects. Brno University of "
+             "Technology, 2011", 60),
+            (None, 50, "Garcia, M.: Dissemination of project results", 60)])
+
+    def test_Citations_Appendix(self):
+        # bibliography ends by the appendix after it; a "References" line in
+        # the text before the bibliography is not its heading
+        expected = [
+            (None, 50, "[1] J. Smith. Annotation of deliverables. Brno University of "
+             "Technology, 2010. ", 60),
+            ("Introduction The entity extractor finds persons, organizations and locations in "
+             "the text of deliverables [2]", 80,
+             "[2] M. Garcia. Named entity recognition. In Proc. of the International Conference "
+             "on Computational Linguistics, Madrid, Spain, 2008. ", 60),
+            ("Results Precision of persons was 0.82, precision of organizations 0.71 [3]", 75,
+             "[3] T. Mueller. Evaluation of extractors. Darmstadt, 2011. ", 50)]
+        self.assertEqual(citationsOf(self.wrap("document_plain.txt")), expected)
+        expected[1] = (expected[1][0][len("Introduction "):],) + expected[1][1:]
+        self.assertEqual(citationsOf(self.wrap("document_references.txt")), expected)
+
+    def test_Sections_Roman(self):
+        # chapters introduced by roman numerals are searched, but
+        # _extract_roman_numerals() doesn't return them
+        self.assertEqual(sectionsOf(self.wrap("document_roman.txt")), [])
+
 class TestPDF(unittest.TestCase):
     @classmethod
     def setUp(cls):